@@ -0,0 +1,136 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import ManyRelatedField
+
+# Campos a pedido y expansión de relaciones, para todas las apps:
+#
+#   GET /api/v1/control-gases/registros/?fields=id,fecha,nivel,nombre&expand=nombre.proyecto
+#
+# - Las relaciones se devuelven como clave primaria. Las que el serializador declara
+#   en `expandibles` se reemplazan por el objeto completo con ?expand=campo, y con
+#   puntos se expanden también las relaciones del objeto (nombre.proyecto).
+# - ?fields= limita los campos de la respuesta; con puntos se limitan los campos de
+#   un objeto expandido (fields=id,nombre.nombre&expand=nombre).
+# - El ViewSet (ConsultaExpandibleMixin) agrega el select_related/prefetch_related que
+#   necesita la respuesta pedida, así la cantidad de consultas de un listado no
+#   depende de la cantidad de filas.
+
+
+def _arbol(valor):
+    # 'nombre,nombre.proyecto' -> {'nombre': {'proyecto': {}}}
+    arbol = {}
+    for ruta in valor.split(','):
+        nivel = arbol
+        for parte in ruta.strip().split('.'):
+            if parte:
+                nivel = nivel.setdefault(parte, {})
+    return arbol
+
+
+def _ruta_a_uno(modelo, partes):
+    # Parte inicial de partes que recorre claves foráneas (para select_related)
+    ruta = []
+    for parte in partes:
+        try:
+            campo = modelo._meta.get_field(parte)
+        except FieldDoesNotExist:
+            break
+        if not (campo.many_to_one or campo.one_to_one):
+            break
+        ruta.append(parte)
+        modelo = campo.related_model
+    return '__'.join(ruta)
+
+
+class ExpandibleMixin:
+    """ModelSerializer con ?fields= y ?expand= (ver arriba)."""
+
+    # {'campo': SerializadorDelObjeto}; el campo tiene que ser una relación del modelo
+    expandibles = {}
+
+    def __init__(self, *args, campos=None, expandir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expandir is None:
+            # Serializador principal: se toma lo pedido en la consulta
+            request = kwargs.get('context', {}).get('request')
+            parametros = getattr(request, 'query_params', {})
+            campos = _arbol(parametros['fields']) if parametros.get('fields') else None
+            expandir = _arbol(parametros.get('expand', ''))
+        self._campos = campos
+        self._expandir = expandir
+        self._hijos = {}
+
+    @cached_property
+    def _readable_fields(self):
+        legibles = list(super()._readable_fields)
+        nombres = [campo.field_name for campo in legibles]
+        if self._campos is not None:
+            invalidos = [nombre for nombre in self._campos if nombre not in nombres]
+            if invalidos:
+                raise ValidationError({'fields': f'Campos no permitidos: {", ".join(invalidos)}. Use {", ".join(nombres)}.'})
+            legibles = [campo for campo in legibles if campo.field_name in self._campos]
+        invalidos = [nombre for nombre in self._expandir if nombre not in self.expandibles or nombre not in nombres]
+        if invalidos:
+            permitidos = ', '.join(nombre for nombre in self.expandibles if nombre in nombres) or 'ninguno'
+            raise ValidationError({'expand': f'Campos no expandibles: {", ".join(invalidos)}. Use {permitidos}.'})
+        return legibles
+
+    def _hijo(self, nombre):
+        # Serializador del objeto expandido, uno por campo y reutilizado en cada fila
+        if nombre not in self._hijos:
+            campos = self._campos.get(nombre) if self._campos is not None else None
+            self._hijos[nombre] = self.expandibles[nombre](
+                campos=campos or None,
+                expandir=self._expandir[nombre],
+                context=self.context,
+            )
+        return self._hijos[nombre]
+
+    def to_representation(self, instance):
+        datos = super().to_representation(instance)
+        for campo in self._readable_fields:
+            if campo.field_name not in self._expandir:
+                continue
+            hijo = self._hijo(campo.field_name)
+            relacionado = getattr(instance, campo.source)
+            if isinstance(campo, ManyRelatedField):
+                datos[campo.field_name] = [hijo.to_representation(objeto) for objeto in relacionado.all()]
+            else:
+                datos[campo.field_name] = hijo.to_representation(relacionado) if relacionado is not None else None
+        return datos
+
+    def relaciones(self):
+        # (select_related, prefetch_related) que necesita la respuesta pedida
+        uno, muchos = [], []
+        modelo = self.Meta.model
+        for campo in self._readable_fields:
+            if campo.field_name in self._expandir:
+                fuente = campo.source
+                hijo_uno, hijo_muchos = self._hijo(campo.field_name).relaciones()
+                if isinstance(campo, ManyRelatedField):
+                    muchos += [fuente, *(f'{fuente}__{ruta}' for ruta in hijo_uno + hijo_muchos)]
+                else:
+                    uno += [fuente, *(f'{fuente}__{ruta}' for ruta in hijo_uno)]
+                    muchos += [f'{fuente}__{ruta}' for ruta in hijo_muchos]
+            else:
+                # Campos planos de un objeto relacionado (source='cedula.nombres')
+                ruta = _ruta_a_uno(modelo, campo.source_attrs[:-1])
+                if ruta:
+                    uno.append(ruta)
+        return list(dict.fromkeys(uno)), list(dict.fromkeys(muchos))
+
+
+class ConsultaExpandibleMixin:
+    """ViewSet que carga las relaciones que pide ?expand= (serializador con ExpandibleMixin)."""
+
+    def relacionar(self, consulta):
+        uno, muchos = self.get_serializer().relaciones()
+        if uno:
+            consulta = consulta.select_related(*uno)
+        if muchos:
+            consulta = consulta.prefetch_related(*muchos)
+        return consulta
+
+    def get_queryset(self):
+        return self.relacionar(super().get_queryset())
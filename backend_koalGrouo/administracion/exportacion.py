@@ -0,0 +1,117 @@
+import csv
+import io
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+# Exportación completa de un listado, para todas las apps:
+#
+#   GET /api/v1/produccion/exportar/?formato=csv&columnas=fecha,proyecto,cantidad_producida
+#
+# - Usa los mismos filtros que el listado (get_queryset/filter_queryset del ViewSet).
+# - Lee con values_list().iterator(chunk_size=...), sin crear instancias ni pasar por
+#   el serializador, y escribe la respuesta a medida que llegan las filas
+#   (StreamingHttpResponse): la memoria no crece con el tamaño de la tabla y los
+#   primeros bytes salen apenas la base devuelve el primer bloque.
+# - formato=csv (por defecto) o ndjson (un objeto JSON por línea).
+# - Las columnas por defecto son los campos del modelo, con las relaciones como clave
+#   primaria igual que en el listado, salvo los binarios (plantillas de huella). Un
+#   ViewSet puede limitar los campos a una lista en campos_exportacion y agregar
+#   columnas de objetos relacionados en columnas_exportacion
+#   ({'proyectoNombre': 'proyecto__nombre'}).
+
+FORMATOS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+BLOQUE = 2000
+# Bytes que se juntan antes de enviar un trozo de la respuesta
+TROZO = 64 * 1024
+
+
+class _Codificador(JSONEncoder):
+    # Decimales como texto, igual que en los serializadores
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+def _csv(columnas, filas):
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow(fila)
+        if salida.tell() >= TROZO:
+            yield salida.getvalue()
+            salida.seek(0)
+            salida.truncate()
+    yield salida.getvalue()
+
+
+def _ndjson(columnas, filas):
+    codificar = _Codificador(ensure_ascii=False).encode
+    trozo = []
+    largo = 0
+    for fila in filas:
+        linea = codificar(dict(zip(columnas, fila)))
+        trozo.append(linea)
+        largo += len(linea)
+        if largo >= TROZO:
+            yield '\n'.join(trozo) + '\n'
+            trozo = []
+            largo = 0
+    if trozo:
+        yield '\n'.join(trozo) + '\n'
+
+
+class ExportableMixin:
+    """ModelViewSet con la acción exportar (ver arriba)."""
+
+    # Campos del modelo que se exportan; None para todos salvo los binarios
+    campos_exportacion = None
+    # {'columna': 'ruta de values()'} que se agregan a los campos del modelo
+    columnas_exportacion = {}
+
+    def rutas_exportacion(self):
+        # Columnas disponibles: {'nombre en el archivo': 'ruta de values()'}
+        modelo = self.queryset.model
+        rutas = {
+            campo.name: campo.attname for campo in modelo._meta.concrete_fields
+            if campo.get_internal_type() != 'BinaryField'
+            and (self.campos_exportacion is None or campo.name in self.campos_exportacion)
+        }
+        rutas.update(self.columnas_exportacion)
+        return rutas
+
+    def filas_exportacion(self, rutas):
+        # Tuplas con los valores de las rutas, en orden y con los filtros del listado
+        consulta = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        if not consulta.ordered:
+            consulta = consulta.order_by('pk')
+        return consulta.values_list(*rutas).iterator(chunk_size=BLOQUE)
+
+    @action(detail=False, methods=['get'])
+    # Todo el listado filtrado en CSV o NDJSON, en streaming:
+    # ?formato=csv|ndjson&columnas=campo1,campo2 más los filtros del listado
+
+    def exportar(self, request):
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            raise ValidationError({'formato': f'Use {", ".join(FORMATOS)}.'})
+        disponibles = self.rutas_exportacion()
+        columnas = [columna for columna in request.query_params.get('columnas', '').split(',') if columna]
+        invalidas = [columna for columna in columnas if columna not in disponibles]
+        if invalidas:
+            raise ValidationError({'columnas': f'Columnas no permitidas: {", ".join(invalidas)}. Use {", ".join(disponibles)}.'})
+        columnas = columnas or list(disponibles)
+        # La consulta se arma (y se validan los filtros) antes de empezar a responder
+        filas = self.filas_exportacion([disponibles[columna] for columna in columnas])
+
+        generar = _csv if formato == 'csv' else _ndjson
+        respuesta = StreamingHttpResponse(generar(columnas, filas), content_type=FORMATOS[formato])
+        nombre = f'{self.basename or "exportacion"}-{timezone.localdate():%Y%m%d}.{formato}'
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return respuesta
@@ -0,0 +1,387 @@
+import hashlib
+import heapq
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from datetime import timezone as zona
+from pathlib import Path
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from control_gases import archivo as archivo_gases
+
+# Instantáneas columnares y tipadas de las tablas de todas las apps, para pandas y BI.
+# - Cada tabla se guarda en DIRECTORIO/<app>.<modelo>/ como archivos .npz de NumPy
+#   (np.savez_compressed, una columna por arreglo): pd.DataFrame(dict(np.load(ruta))).
+#   Los tipos se mantienen: enteros int64, decimales y float float64 (NaN si es nulo;
+#   max_digits <= 15 entra exacto redondeando a los decimales del campo), fechas
+#   datetime64[D], fecha y hora datetime64[us] en UTC, horas timedelta64[us] desde
+#   la medianoche, booleanos bool y textos str. Las columnas enteras, booleanas o de
+#   texto que aceptan nulos traen además <columna>__nulo (bool).
+# - Las tablas de hechos (PARTICIONES) se parten por mes del campo indicado
+#   (AAAA-MM.npz). Cada corrida calcula la huella de cada mes (filas, id máximo y,
+#   si el modelo lo tiene, el máximo de actualizado) y solo escribe los meses nuevos o
+#   cambiados. Sin actualizado, filas e id máximo no ven una fila editada, así que la
+#   huella suma un hash del contenido del mes: esos meses se leen enteros en cada
+#   corrida (sin escribirlos si no cambiaron). El resto de las tablas son chicas y se
+#   reescriben enteras (completo.npz).
+# - Las lecturas de gas que archivar_gases sacó de la tabla (ARCHIVADAS, ver
+#   control_gases/archivo.py) siguen en la instantánea: el mes suma las filas del
+#   archivo frío a las de la tabla, y su huella incluye los archivos del mes (nombre,
+#   tamaño y fecha de modificación) y cuántas lecturas tienen. Un mes que ya está
+#   entero en el archivo se decide solo por esa huella, sin volver a leerlo.
+# - manifiesto.json describe tablas, columnas, particiones y huellas.
+# - generar() corre en el proceso que la llama (comando generar_instantaneas);
+#   iniciar() lanza ese comando en otro proceso, para no bloquear una petición.
+#   Un archivo de bloqueo evita dos generaciones a la vez.
+
+DIRECTORIO = Path(getattr(settings, 'INSTANTANEAS_DIR', settings.BASE_DIR / 'instantaneas'))
+APPS = ['administracion', 'control_acceso', 'control_gases', 'inventario', 'produccion', 'lugares_trabajo']
+# Modelo -> campo de fecha por el que se particiona
+PARTICIONES = {
+    'control_acceso.ControlDeIngreso': 'fecha',
+    'control_acceso.JornadaDiaria': 'fecha',
+    'control_gases.Registro_de_gases': 'fecha',
+    'control_gases.ResumenGas': 'fecha',
+    'control_gases.EventoGas': 'creado',
+    'inventario.Verificacion': 'fecha_verificacion',
+    'inventario.Prestamo': 'fecha_entrega',
+    'produccion.Produccion': 'fecha',
+    'produccion.ProductividadDiaria': 'fecha',
+}
+# Tablas con lecturas movidas a archivos fríos que la instantánea sigue incluyendo
+ARCHIVADAS = {'control_gases.Registro_de_gases'}
+# Tablas internas de los procesos incrementales
+EXCLUIDOS = {
+    'control_acceso.JornadaPendiente',
+    'control_acceso.MarcaRollup',
+    'control_acceso.CambioRoster',
+    'control_acceso.MarcacionSincronizada',
+}
+COMPLETO = 'completo'
+MANIFIESTO = 'manifiesto.json'
+BLOQUEO = '.generando'
+# Salida de la última generación lanzada con iniciar()
+REGISTRO = 'generacion.log'
+# Un bloqueo más viejo que esto es de una generación que murió sin borrarlo
+BLOQUEO_VENCIDO = timedelta(hours=6)
+BLOQUE = 10000
+
+ENTEROS = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+}
+NAT = np.iinfo(np.int64).min
+
+
+class GeneracionEnCurso(Exception):
+    pass
+
+
+def tablas():
+    # [(nombre, modelo)] de las apps del proyecto, sin las tablas internas
+    resultado = []
+    for etiqueta in APPS:
+        for modelo in apps.get_app_config(etiqueta).get_models():
+            nombre = f'{etiqueta}.{modelo.__name__}'
+            if nombre not in EXCLUIDOS:
+                resultado.append((nombre, modelo))
+    return resultado
+
+
+def _campos(modelo):
+    # Las plantillas de huella (BinaryField) no se exportan
+    return [campo for campo in modelo._meta.concrete_fields if campo.get_internal_type() != 'BinaryField']
+
+
+def _tipo(campo):
+    if campo.is_relation:
+        campo = campo.target_field
+    return campo.get_internal_type()
+
+
+def _columnas(campo, valores):
+    # {nombre: arreglo} de una columna, con su máscara de nulos si corresponde
+    tipo = _tipo(campo)
+    nombre = campo.attname
+    if tipo in ENTEROS or tipo == 'BooleanField':
+        arreglo = np.array([0 if valor is None else valor for valor in valores], dtype='<i8' if tipo in ENTEROS else '?')
+    elif tipo in ('DecimalField', 'FloatField'):
+        arreglo = np.array([np.nan if valor is None else float(valor) for valor in valores], dtype='<f8')
+    elif tipo == 'DateField':
+        arreglo = np.array(valores, dtype='datetime64[D]')
+    elif tipo == 'DateTimeField':
+        arreglo = np.array(
+            [None if valor is None else timezone.make_naive(valor, zona.utc) for valor in valores],
+            dtype='datetime64[us]',
+        )
+    elif tipo == 'TimeField':
+        arreglo = np.array(
+            [
+                NAT if valor is None
+                else ((valor.hour * 60 + valor.minute) * 60 + valor.second) * 1_000_000 + valor.microsecond
+                for valor in valores
+            ],
+            dtype='<i8',
+        ).view('timedelta64[us]')
+    elif tipo == 'JSONField':
+        arreglo = np.array([json.dumps(valor, ensure_ascii=False) for valor in valores], dtype=str)
+    else:
+        arreglo = np.array(['' if valor is None else str(valor) for valor in valores], dtype=str)
+    columnas = {nombre: arreglo}
+    if campo.null and arreglo.dtype.kind in 'ibU':
+        columnas[f'{nombre}__nulo'] = np.array([valor is None for valor in valores], dtype='?')
+    return columnas
+
+
+def _describir(modelo):
+    descripcion = {}
+    for campo in _campos(modelo):
+        columna = {'tipo': campo.get_internal_type(), 'nulo': campo.null}
+        if campo.is_relation:
+            columna['relacion'] = campo.related_model._meta.label
+        if columna['tipo'] == 'DecimalField':
+            columna['decimales'] = campo.decimal_places
+        descripcion[campo.attname] = columna
+    return descripcion
+
+
+def _leer(modelo, consulta, archivadas=()):
+    # Valores de la consulta por columna, cantidad de filas y hash del contenido.
+    # archivadas: filas del archivo frío (tuplas con los mismos campos) que se
+    # intercalan por pk; si una fila está en los dos lados gana la de la tabla.
+    campos = _campos(modelo)
+    valores = [[] for _ in campos]
+    contenido = hashlib.sha256()
+    filas = 0
+    leidas = consulta.order_by('pk').values_list(*(campo.attname for campo in campos)).iterator(chunk_size=BLOQUE)
+    if archivadas:
+        leidas = _sin_repetidas(heapq.merge(
+            ((fila[0], 0, fila) for fila in leidas),
+            ((fila[0], 1, fila) for fila in sorted(archivadas, key=lambda fila: fila[0])),
+        ))
+    for fila in leidas:
+        for columna, valor in zip(valores, fila):
+            columna.append(valor)
+        contenido.update(repr(fila).encode())
+        filas += 1
+    return valores, filas, contenido.hexdigest()
+
+
+def _sin_repetidas(combinadas):
+    # Filas de la mezcla (pk, origen, fila) sin repetir la pk consecutiva
+    anterior = None
+    for pk, _, fila in combinadas:
+        if pk != anterior:
+            yield fila
+        anterior = pk
+
+
+def _meses_archivados(tabla):
+    # {AAAA-MM: {'archivo': [[nombre, tamaño, modificado], ...], 'archivadas': filas}}
+    # de los archivos fríos de la tabla
+    if tabla not in ARCHIVADAS:
+        return {}
+    meses = {}
+    for origen in archivo_gases.archivos():
+        estado = origen.stat()
+        with archivo_gases.Archivo(origen) as abierto:
+            filas = abierto.pie['filas']
+        mes = meses.setdefault(origen.name[:7], {'archivo': [], 'archivadas': 0})
+        mes['archivo'].append([origen.name, estado.st_size, estado.st_mtime_ns])
+        mes['archivadas'] += filas
+    return meses
+
+
+def _filas_archivadas(modelo, mes):
+    # Lecturas archivadas del mes como tuplas en el orden de _campos
+    campos = _campos(modelo)
+    fin = (mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return [
+        tuple(lectura[campo.attname] for campo in campos)
+        for lectura in archivo_gases.lecturas({'fecha__gte': mes, 'fecha__lte': fin})
+    ]
+
+
+def _escribir(modelo, valores, destino):
+    # Escribe los valores leídos con _leer en destino (.npz). Se escribe en un temporal
+    # y se reemplaza al final: quien descarga nunca ve un archivo a medias.
+    campos = _campos(modelo)
+    arreglos = {}
+    for campo, columna in zip(campos, valores):
+        arreglos.update(_columnas(campo, columna))
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + '.tmp')
+    with open(temporal, 'wb') as archivo:
+        np.savez_compressed(archivo, **arreglos)
+    os.replace(temporal, destino)
+
+
+def _fecha(valor):
+    return timezone.localtime(valor).date() if isinstance(valor, datetime) else valor
+
+
+def _limite(campo, dia):
+    # Límite de un filtro por mes sobre un DateField o un DateTimeField
+    if isinstance(campo, models.DateTimeField):
+        return timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+    return dia
+
+
+def _con_actualizado(modelo):
+    return any(campo.name == 'actualizado' for campo in modelo._meta.concrete_fields)
+
+
+def _meses(modelo, nombre_campo, archivados=None):
+    # {AAAA-MM: (filtro del mes, huella)} de los meses con filas en la tabla o en
+    # archivados (ver _meses_archivados)
+    archivados = archivados or {}
+    campo = modelo._meta.get_field(nombre_campo)
+    rango = modelo.objects.aggregate(primero=Min(nombre_campo), ultimo=Max(nombre_campo))
+    fechas = [date.fromisoformat(f'{mes}-01') for mes in archivados]
+    if rango['primero'] is not None:
+        fechas += [_fecha(rango['primero']), _fecha(rango['ultimo'])]
+    if not fechas:
+        return {}
+    huella = {'filas': Count('pk'), 'ultimo': Max('pk')}
+    if _con_actualizado(modelo):
+        huella['actualizado'] = Max('actualizado')
+    meses = {}
+    mes = min(fechas).replace(day=1)
+    ultimo = max(fechas)
+    while mes <= ultimo:
+        siguiente = (mes + timedelta(days=32)).replace(day=1)
+        filtro = {f'{nombre_campo}__gte': _limite(campo, mes), f'{nombre_campo}__lt': _limite(campo, siguiente)}
+        valores = modelo.objects.filter(**filtro).aggregate(**huella)
+        clave = f'{mes:%Y-%m}'
+        if valores['filas'] or clave in archivados:
+            if valores.get('actualizado'):
+                valores['actualizado'] = valores['actualizado'].isoformat()
+            valores.update(archivados.get(clave, {}))
+            meses[clave] = (filtro, valores)
+        mes = siguiente
+    return meses
+
+
+def leer_manifiesto():
+    try:
+        with open(DIRECTORIO / MANIFIESTO, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return {'generado': None, 'tablas': {}}
+
+
+def _guardar_manifiesto(manifiesto):
+    temporal = DIRECTORIO / (MANIFIESTO + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=1)
+    os.replace(temporal, DIRECTORIO / MANIFIESTO)
+
+
+def ruta(tabla, particion):
+    return DIRECTORIO / tabla / f'{particion}.npz'
+
+
+def en_curso():
+    try:
+        creado = (DIRECTORIO / BLOQUEO).stat().st_mtime
+    except FileNotFoundError:
+        return False
+    return time.time() - creado < BLOQUEO_VENCIDO.total_seconds()
+
+
+def _bloquear():
+    DIRECTORIO.mkdir(parents=True, exist_ok=True)
+    bloqueo = DIRECTORIO / BLOQUEO
+    if bloqueo.exists() and not en_curso():
+        bloqueo.unlink(missing_ok=True)
+    try:
+        os.close(os.open(bloqueo, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        raise GeneracionEnCurso('Ya hay una generación de instantáneas en curso.')
+
+
+def generar(completo=False, informar=None, bloqueado=False):
+    # Escribe las particiones nuevas o cambiadas (todas con completo) y actualiza el
+    # manifiesto. informar(tabla, particion, filas) se llama por cada archivo escrito.
+    # Con bloqueado, el bloqueo ya lo tomó iniciar(). Devuelve la cantidad de archivos escritos.
+    if not bloqueado:
+        _bloquear()
+    try:
+        manifiesto = leer_manifiesto()
+        anteriores = manifiesto['tablas']
+        nuevas = {}
+        escritos = 0
+        for tabla, modelo in tablas():
+            anterior = anteriores.get(tabla, {}).get('particiones', {})
+            particiones = {}
+            campo = PARTICIONES.get(tabla)
+            if campo is None:
+                valores, filas, _ = _leer(modelo, modelo.objects.all())
+                _escribir(modelo, valores, ruta(tabla, COMPLETO))
+                particiones[COMPLETO] = {'filas': filas}
+                escritos += 1
+                if informar:
+                    informar(tabla, COMPLETO, filas)
+            else:
+                por_contenido = not _con_actualizado(modelo)
+                for mes, (filtro, huella) in _meses(modelo, campo, _meses_archivados(tabla)).items():
+                    guardada = anterior.get(mes)
+                    vigente = not completo and guardada is not None and ruta(tabla, mes).exists()
+                    sin_contenido = {clave: valor for clave, valor in (guardada or {}).items() if clave != 'contenido'}
+                    # Sin filas en la tabla el mes está entero en el archivo frío, que
+                    # solo cambia si cambian sus archivos (y eso está en la huella)
+                    if vigente and sin_contenido == huella and (not por_contenido or not huella['filas']):
+                        particiones[mes] = guardada
+                        continue
+                    archivadas = _filas_archivadas(modelo, date.fromisoformat(f'{mes}-01')) if 'archivo' in huella else ()
+                    valores, filas, contenido = _leer(modelo, modelo.objects.filter(**filtro), archivadas)
+                    if por_contenido:
+                        huella = {**huella, 'contenido': contenido}
+                        if vigente and guardada == huella:
+                            particiones[mes] = huella
+                            continue
+                    _escribir(modelo, valores, ruta(tabla, mes))
+                    particiones[mes] = huella
+                    escritos += 1
+                    if informar:
+                        informar(tabla, mes, filas)
+                # Meses que ya no tienen filas
+                for mes in set(anterior) - set(particiones):
+                    ruta(tabla, mes).unlink(missing_ok=True)
+            nuevas[tabla] = {'particion': campo, 'columnas': _describir(modelo), 'particiones': particiones}
+        _guardar_manifiesto({'generado': timezone.now().isoformat(), 'tablas': nuevas})
+        return escritos
+    finally:
+        (DIRECTORIO / BLOQUEO).unlink(missing_ok=True)
+
+
+def iniciar(completo=False):
+    # Lanza el comando generar_instantaneas en otro proceso y vuelve enseguida. El
+    # bloqueo se toma acá, así dos pedidos seguidos no lanzan dos generaciones; lo
+    # libera el proceso al terminar.
+    _bloquear()
+    comando = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'generar_instantaneas', '--bloqueado']
+    if completo:
+        comando.append('--completo')
+    try:
+        with open(DIRECTORIO / REGISTRO, 'wb') as registro:
+            subprocess.Popen(
+                comando,
+                cwd=settings.BASE_DIR,
+                stdin=subprocess.DEVNULL,
+                stdout=registro,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+    except OSError:
+        (DIRECTORIO / BLOQUEO).unlink(missing_ok=True)
+        raise
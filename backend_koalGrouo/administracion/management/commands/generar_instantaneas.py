@@ -0,0 +1,31 @@
+import argparse
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from administracion import instantaneas
+
+
+class Command(BaseCommand):
+    help = (
+        'Escribe instantáneas columnares (.npz por mes) de las tablas de todas las apps en '
+        'INSTANTANEAS_DIR, solo los meses nuevos o cambiados (ver administracion/instantaneas.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Reescribe todas las particiones.')
+        # Lo usa instantaneas.iniciar(), que toma el bloqueo antes de lanzar el proceso
+        parser.add_argument('--bloqueado', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **opciones):
+        inicio = time.perf_counter()
+        informar = lambda tabla, particion, filas: self.stdout.write(f'{tabla} {particion}: {filas} filas')
+        try:
+            escritos = instantaneas.generar(
+                completo=opciones['completo'], informar=informar, bloqueado=opciones['bloqueado'],
+            )
+        except instantaneas.GeneracionEnCurso as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'{escritos} archivos escritos en {instantaneas.DIRECTORIO} en {time.perf_counter() - inicio:.1f} s.'
+        ))
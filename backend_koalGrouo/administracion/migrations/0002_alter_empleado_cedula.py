@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='empleado',
+            name='cedula',
+            field=models.IntegerField(db_index=True),
+        ),
+    ]
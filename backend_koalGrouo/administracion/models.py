@@ -16,7 +16,7 @@ class Empleado(models.Model):
     cargo = models.ForeignKey(Cargo, on_delete=models.PROTECT) # Proteger: no permitir borrar un Cargo si tiene empleados asociado
     
     #Este campo va a almacenar la cedula de los empleados
-    cedula = models.IntegerField()
+    cedula = models.IntegerField(db_index=True)
     
     
     nombres = models.CharField(max_length=150)
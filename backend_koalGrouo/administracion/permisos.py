@@ -1,5 +1,9 @@
 from rest_framework.permissions import BasePermission
 
+# Grupo de los usuarios con los que se autentican las terminales de control de acceso
+# (lo crea la migración 0006 de control_acceso)
+GRUPO_TERMINALES = 'terminales'
+
 class EsAdministrador(BasePermission):
     """Permite acceso solo a usuarios"""
     
@@ -11,4 +15,12 @@ class EsSupervisor (BasePermission):
     
     def has_permission(self, request, view):
         return request.user and request.user.is_staff and not request.user.is_superuser
-    
+
+class EsTerminal(BasePermission):
+    """Permite acceso a las terminales de control de acceso (usuarios del grupo terminales)."""
+
+    def has_permission(self, request, view):
+        return bool(
+            request.user and request.user.is_authenticated
+            and request.user.groups.filter(name=GRUPO_TERMINALES).exists()
+        )
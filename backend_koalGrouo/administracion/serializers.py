@@ -1,19 +1,23 @@
 from rest_framework import serializers
+from .expansion import ExpandibleMixin
 from .models import Cargo, Empleado, Proyecto
 
-class CargoSerializer(serializers.ModelSerializer):
+class CargoSerializer(ExpandibleMixin, serializers.ModelSerializer):
     class Meta:
         model = Cargo
         fields = '__all__'
 
-class EmpleadoSerializer(serializers.ModelSerializer):
-    cargo = CargoSerializer(read_only=True)  # Anida el detalle del cargo
+class EmpleadoSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    cargo = serializers.PrimaryKeyRelatedField(read_only=True)  # Detalle del cargo con ?expand=cargo
+    expandibles = {'cargo': CargoSerializer}
 
     class Meta:
         model = Empleado
         fields = '__all__'
 
-class ProyectoSerializer(serializers.ModelSerializer):
+class ProyectoSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    expandibles = {'supervisor': EmpleadoSerializer}
+
     class Meta:
         model = Proyecto
         fields = '__all__'
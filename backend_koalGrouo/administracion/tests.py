@@ -1,3 +1,179 @@
+import csv
+import io
+import tempfile
+from datetime import date, time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from control_gases import archivo
+from control_gases.models import EventoGas, Registro_de_gases
+from lugares_trabajo.models import Lugares_de_trabajo
+from . import instantaneas
+from .models import Cargo, Empleado, Proyecto
+from .views import EmpleadoViewSet, ProyectoViewSet
+
+
+class ExportacionTests(TestCase):
+
+    def setUp(self):
+        cargo = Cargo.objects.create(nombre_cargo='Minero', nivel_acceso='bajo')
+        Empleado.objects.create(cargo=cargo, cedula=1001, nombres='Ana Pérez', nivel_acceso='bajo', huella=b'\x00\x01plantilla')
+
+    def exportar(self, consulta=None, **opciones):
+        vista = EmpleadoViewSet.as_view({'get': 'exportar'}, permission_classes=[], **opciones)
+        return vista(APIRequestFactory().get('/', consulta or {}))
+
+    def filas(self, respuesta):
+        self.assertEqual(respuesta.status_code, 200)
+        contenido = b''.join(respuesta.streaming_content).decode()
+        return list(csv.reader(io.StringIO(contenido)))
+
+    def test_empleados_sin_huella(self):
+        columnas, fila = self.filas(self.exportar())
+        self.assertNotIn('huella', columnas)
+        self.assertEqual(dict(zip(columnas, fila))['nombres'], 'Ana Pérez')
+
+        respuesta = self.exportar({'columnas': 'cedula,huella'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('huella', str(respuesta.data['columnas']))
+
+    def test_sin_lista_se_excluyen_los_binarios(self):
+        columnas, _ = self.filas(self.exportar(campos_exportacion=None))
+        self.assertIn('cedula', columnas)
+        self.assertNotIn('huella', columnas)
+
+
+class ExpansionTests(TestCase):
+
+    def setUp(self):
+        self.cargo = Cargo.objects.create(nombre_cargo='Supervisor', nivel_acceso='alto')
+        for numero in range(3):
+            supervisor = Empleado.objects.create(
+                cargo=self.cargo, cedula=2000 + numero, nombres=f'Supervisor {numero}', nivel_acceso='alto',
+            )
+            Proyecto.objects.create(nombre=f'Proyecto {numero}', fecha_inicio=date(2026, 1, 1), supervisor=supervisor)
+        Proyecto.objects.create(nombre='Sin supervisor', fecha_inicio=date(2026, 1, 1))
+
+    def listar(self, **consulta):
+        vista = ProyectoViewSet.as_view({'get': 'list'}, permission_classes=[])
+        return vista(APIRequestFactory().get('/', consulta))
+
+    def test_campos_y_relaciones_anidadas(self):
+        consulta = {'fields': 'nombre,supervisor.nombres,supervisor.cargo', 'expand': 'supervisor.cargo'}
+        # Una sola consulta con select_related, sin importar cuántos proyectos haya
+        with self.assertNumQueries(1):
+            respuesta = self.listar(**consulta)
+        self.assertEqual(respuesta.status_code, 200)
+        primero, *_, ultimo = sorted(respuesta.data, key=lambda proyecto: proyecto['nombre'])
+        self.assertEqual(primero, {
+            'nombre': 'Proyecto 0',
+            'supervisor': {'nombres': 'Supervisor 0', 'cargo': {
+                'id': self.cargo.pk, 'nombre_cargo': 'Supervisor', 'descripcion': None, 'nivel_acceso': 'alto',
+            }},
+        })
+        self.assertEqual(ultimo, {'nombre': 'Sin supervisor', 'supervisor': None})
+
+        # Más filas no agregan consultas
+        for numero in range(3, 10):
+            supervisor = Empleado.objects.create(
+                cargo=self.cargo, cedula=2000 + numero, nombres=f'Supervisor {numero}', nivel_acceso='alto',
+            )
+            Proyecto.objects.create(nombre=f'Proyecto {numero}', fecha_inicio=date(2026, 1, 1), supervisor=supervisor)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.listar(**consulta).data), 11)
+
+        # Sin expand la relación es la clave primaria
+        (proyecto, *_) = self.listar(fields='nombre,supervisor').data
+        self.assertIsInstance(proyecto['supervisor'], int)
+
+    def test_campos_o_expansiones_no_permitidas(self):
+        for consulta, campo in (({'fields': 'nombre,clave'}, 'fields'), ({'expand': 'nombre'}, 'expand')):
+            respuesta = self.listar(**consulta)
+            self.assertEqual(respuesta.status_code, 400, consulta)
+            self.assertIn(campo, respuesta.data)
+
+
+class InstantaneasTests(TestCase):
+    tabla = 'control_gases.EventoGas'
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        parche = mock.patch.object(instantaneas, 'DIRECTORIO', Path(directorio.name))
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.eventos = [
+            EventoGas.objects.create(tipo=EventoGas.LECTURA, ubicacion=ubicacion, tipo_gas='Metano', datos={})
+            for ubicacion in ('Mina Norte', 'Mina Sur')
+        ]
+
+    def generar(self):
+        escritos = []
+        instantaneas.generar(informar=lambda tabla, particion, filas: escritos.append((tabla, particion)))
+        return [particion for tabla, particion in escritos if tabla == self.tabla]
+
+    def test_fila_editada_sin_actualizado_reescribe_el_mes(self):
+        (mes,) = self.generar()
+        self.assertEqual(self.generar(), [])
+
+        # Misma cantidad de filas y mismo id máximo: solo cambia el contenido
+        EventoGas.objects.filter(pk=self.eventos[0].pk).update(ubicacion='Mina Este')
+        self.assertEqual(self.generar(), [mes])
+        columnas = np.load(instantaneas.ruta(self.tabla, mes))
+        self.assertEqual(columnas['ubicacion'].tolist(), ['Mina Este', 'Mina Sur'])
+
+
+class InstantaneasArchivoTests(TestCase):
+    tabla = 'control_gases.Registro_de_gases'
+
+    def setUp(self):
+        for modulo in (instantaneas, archivo):
+            directorio = tempfile.TemporaryDirectory()
+            self.addCleanup(directorio.cleanup)
+            parche = mock.patch.object(modulo, 'DIRECTORIO', Path(directorio.name))
+            parche.start()
+            self.addCleanup(parche.stop)
+        proyecto = Proyecto.objects.create(nombre='Mina', fecha_inicio=date(2025, 1, 1))
+        self.lugar = Lugares_de_trabajo.objects.create(
+            nombre='Mina Norte', estado='activo', ubicacion='Mina Norte', trabajadores=10,
+            start_date=date(2025, 1, 1), estimated_end=date(2026, 1, 1), proyecto=proyecto,
+        )
+
+    def guardar(self, *fechas):
+        Registro_de_gases.objects.bulk_create([
+            Registro_de_gases(
+                fecha=fecha, hora=time(8, 0), ubicacion='Mina Norte - Sección A', tipo_gas='Metano', nivel='1%',
+                nivel_valor=1.0, nivel_unidad='%', estado='Normal', registrado_por='sensor', nombre=self.lugar,
+            )
+            for fecha in fechas
+        ])
+
+    def generar(self):
+        escritos = []
+        instantaneas.generar(informar=lambda tabla, particion, filas: escritos.append((tabla, particion, filas)))
+        return [(particion, filas) for tabla, particion, filas in escritos if tabla == self.tabla]
+
+    def test_mes_archivado_conserva_su_particion(self):
+        self.guardar(date(2025, 1, 10), date(2025, 1, 11))
+        self.assertEqual(self.generar(), [('2025-01', 2)])
+        ids = sorted(Registro_de_gases.objects.values_list('pk', flat=True))
+        call_command('archivar_gases', dias=1, stdout=io.StringIO())
+        self.assertFalse(Registro_de_gases.objects.exists())
+
+        # El mes quedó entero en el archivo: sigue en el manifiesto y se vuelve a
+        # escribir una sola vez (cambió su huella), con las lecturas archivadas
+        self.assertEqual(self.generar(), [('2025-01', 2)])
+        self.assertIn('2025-01', instantaneas.leer_manifiesto()['tablas'][self.tabla]['particiones'])
+        columnas = np.load(instantaneas.ruta(self.tabla, '2025-01'))
+        self.assertEqual(columnas['id'].tolist(), ids)
+        self.assertEqual(self.generar(), [])
 
-# Create your tests here.
+        # Una lectura atrasada del mes archivado se suma a las del archivo
+        self.guardar(date(2025, 1, 12))
+        self.assertEqual(self.generar(), [('2025-01', 3)])
+        self.assertTrue(instantaneas.ruta(self.tabla, '2025-01').exists())
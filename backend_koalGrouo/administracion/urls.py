@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CargoViewSet ,EmpleadoViewSet ,ProyectoViewSet
+from .views import CargoViewSet ,EmpleadoViewSet ,ProyectoViewSet, InstantaneaViewSet
 
 router =DefaultRouter()
 router.register(r'cargos', CargoViewSet)
 router.register(r'empleados', EmpleadoViewSet)
 router.register(r'proyectos', ProyectoViewSet)
+router.register(r'instantaneas', InstantaneaViewSet, basename='instantaneas')
 
 urlpatterns = [
     path('',include(router.urls)),
@@ -1,11 +1,18 @@
-from rest_framework import viewsets
+from django.http import FileResponse
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 from .models import Cargo, Empleado, Proyecto
 from .serializers import CargoSerializer, EmpleadoSerializer,ProyectoSerializer
+from administracion.expansion import ConsultaExpandibleMixin
+from administracion.exportacion import ExportableMixin
+from . import instantaneas
 from administracion.permisos import EsAdministrador
 
 # Create your views here.
 
-class CargoViewSet(viewsets.ModelViewSet):
+class CargoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint que permite ver , crear , actualizar y eliminar cargos.
     
@@ -13,17 +20,59 @@ class CargoViewSet(viewsets.ModelViewSet):
     serializer_class = CargoSerializer
     permission_classes = [EsAdministrador]
     
-class EmpleadoViewSet(viewsets.ModelViewSet):
+class EmpleadoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
      
     #API endpoint para registrar empleados
     queryset = Empleado.objects.all()
     serializer_class = EmpleadoSerializer
     permission_classes = [EsAdministrador]
+    # La huella no se exporta
+    campos_exportacion = [
+        'id', 'cargo', 'cedula', 'nombres', 'telefono', 'email', 'estado', 'fecha_creacion', 'fecha_registro',
+        'nivel_acceso',
+    ]
     
-class ProyectoViewSet(viewsets.ModelViewSet):
+class ProyectoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint para gestionar proyectos.
     queryset = Proyecto.objects.all()
     serializer_class =  ProyectoSerializer
     permission_classes = [EsAdministrador]
-    
\ No newline at end of file
+
+
+class InstantaneaViewSet(viewsets.ViewSet):
+
+    # Instantáneas columnares de las tablas para pandas y BI (ver instantaneas.py).
+    # GET lista las tablas, columnas y particiones del manifiesto.
+    permission_classes = [EsAdministrador]
+
+    def list(self, request):
+        return Response({**instantaneas.leer_manifiesto(), 'en_curso': instantaneas.en_curso()})
+
+    @action(detail=False, methods=['post'])
+    # Genera las particiones nuevas o cambiadas en otro proceso (?completo=1 para todas)
+    # y responde enseguida; el avance se ve en en_curso del listado.
+
+    def generar(self, request):
+        try:
+            instantaneas.iniciar(completo=request.query_params.get('completo') in ('1', 'true'))
+        except instantaneas.GeneracionEnCurso as error:
+            return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response({'detail': 'Generación iniciada.'}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'])
+    # Descarga una partición: ?tabla=produccion.Produccion&particion=2026-10 (o completo)
+
+    def descargar(self, request):
+        tabla = request.query_params.get('tabla')
+        particion = request.query_params.get('particion')
+        if not tabla or not particion:
+            raise ValidationError({'detail': 'Indique tabla y particion.'})
+        particiones = instantaneas.leer_manifiesto()['tablas'].get(tabla, {}).get('particiones', {})
+        if particion not in particiones:
+            raise NotFound('No hay una instantánea de esa tabla y partición.')
+        try:
+            archivo = open(instantaneas.ruta(tabla, particion), 'rb')
+        except FileNotFoundError:
+            raise NotFound('No hay una instantánea de esa tabla y partición.')
+        return FileResponse(archivo, as_attachment=True, filename=f'{tabla}-{particion}.npz', content_type='application/octet-stream')
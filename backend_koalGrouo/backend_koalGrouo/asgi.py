@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_koalGrouo.settings')
 
 application = get_asgi_application()
+
+# Solo los servidores (no los comandos de manage.py) precargan el índice de huellas
+from control_acceso.huellas import precargar  # noqa: E402
+
+precargar()
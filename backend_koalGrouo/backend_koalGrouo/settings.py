@@ -87,6 +87,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL: las lecturas no se bloquean mientras la ingesta de sensores escribe
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+        # Base de pruebas en archivo y no en memoria: las pruebas de marcaciones
+        # simultáneas necesitan el mismo bloqueo (WAL con espera) que producción
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Caché compartida por los workers del servidor, en disco para no depender de otro
+# servicio. La usan las últimas lecturas de gases (control_gases/ultimas.py); con
+# Redis o Memcached basta con cambiar BACKEND y LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ControlDeIngreso
+from .models import ControlDeIngreso, JornadaDiaria, OcupacionArea
 @admin.register(ControlDeIngreso)
 class ControlDeIngresoAdmin(admin.ModelAdmin):
     list_display = (
@@ -18,4 +18,14 @@ class ControlDeIngresoAdmin(admin.ModelAdmin):
     search_fields = ('cedula__nombres', 'cedula__cedula', 'proyecto__nombre', 'lugar_trabajo')
     list_filter = ('fecha', 'proyecto', 'estado_salud_entrada', 'estado_salud_Salida', 'estado')
 
+@admin.register(OcupacionArea)
+class OcupacionAreaAdmin(admin.ModelAdmin):
+    list_display = ('lugar_trabajo', 'personas', 'actualizado')
+
+@admin.register(JornadaDiaria)
+class JornadaDiariaAdmin(admin.ModelAdmin):
+    list_display = ('empleado', 'proyecto', 'fecha', 'horas', 'turnos', 'turnos_abiertos')
+    search_fields = ('empleado__nombres', 'empleado__cedula', 'proyecto__nombre')
+    list_filter = ('fecha', 'proyecto')
+
 # Register your models here.
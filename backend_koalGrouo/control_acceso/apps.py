@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ControlAccesoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'control_acceso'
+
+    def ready(self):
+        # Registra las señales que mantienen el roster en caché
+        from . import signals  # noqa: F401
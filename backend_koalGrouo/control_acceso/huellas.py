@@ -0,0 +1,207 @@
+import logging
+import time
+from threading import RLock
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from administracion.models import Empleado
+
+# Índice en memoria para identificación 1:N por huella dactilar.
+# Cada plantilla (Empleado.huella) es un vector de características float32
+# (little-endian) de longitud fija que entrega el lector. Las plantillas se
+# normalizan y se guardan como filas de una matriz, así una sonda se compara
+# contra todas con un solo producto matriz-vector (similitud coseno).
+# El índice es local al proceso: cada worker tiene su copia (plantillas x dimensión
+# float32). Se carga al arrancar el servidor (precargar(), desde wsgi.py y asgi.py)
+# para que la primera identificación no pague la carga; con gunicorn --preload se
+# carga una vez en el proceso maestro y los workers la comparten al hacer fork
+# hasta el primer cambio. Los comandos de manage.py no la cargan.
+# Las señales que actualizan el índice solo llegan al worker que guardó el empleado.
+# Para los demás, cada cambio publica una versión nueva en la caché de Django
+# (CLAVE_VERSION); identificar() la lee a lo sumo una vez cada REVISION segundos y,
+# si cambió, vuelve a cargar el índice entero antes de comparar.
+
+UMBRAL = getattr(settings, 'CONTROL_ACCESO_HUELLA_UMBRAL', 0.90)
+PRECARGAR = getattr(settings, 'CONTROL_ACCESO_PRECARGAR_HUELLAS', True)
+CLAVE_VERSION = 'control_acceso:huellas:version'
+REVISION = getattr(settings, 'CONTROL_ACCESO_HUELLAS_REVISION', 1.0)
+TIPO = np.dtype('<f4')
+
+registro = logging.getLogger(__name__)
+
+
+def plantilla_desde_bytes(datos):
+    # Convierte los bytes de una plantilla a un vector normalizado, o None si no es válida
+    if not datos:
+        return None
+    datos = bytes(datos)
+    if len(datos) % TIPO.itemsize:
+        return None
+    vector = np.frombuffer(datos, dtype=TIPO).astype(np.float32)
+    norma = np.linalg.norm(vector)
+    if not vector.size or not np.isfinite(norma) or norma == 0:
+        return None
+    return vector / norma
+
+
+class IndiceHuellas:
+    """Matriz de plantillas de huella con altas, bajas y cambios incrementales."""
+
+    def __init__(self, umbral=UMBRAL):
+        self.umbral = umbral
+        self._lock = RLock()
+        self._cargado = False
+        self._dimension = None
+        self._matriz = np.empty((0, 0), dtype=np.float32)
+        self._empleados = np.empty(0, dtype=np.int64)
+        self._cedulas = np.empty(0, dtype=np.int64)
+        self._nombres = []
+        self._total = 0
+        self._posicion = {}
+        # Versión compartida con la que se cargó el índice y cuándo se revisó (time.monotonic())
+        self._version = None
+        self._revisado = None
+
+    def __len__(self):
+        return self._total
+
+    def cargar(self):
+        # Carga todas las plantillas una sola vez por proceso
+        with self._lock:
+            if self._cargado:
+                return
+            self._reiniciar()
+            # Se lee antes de cargar: un cambio durante la carga fuerza otra más adelante
+            self._version = cache.get(CLAVE_VERSION)
+            self._revisado = time.monotonic()
+            empleados = Empleado.objects.filter(huella__isnull=False).values_list('pk', 'cedula', 'nombres', 'huella')
+            for empleado_id, cedula, nombres, huella in empleados.iterator(chunk_size=500):
+                self._poner(empleado_id, cedula, nombres, huella)
+            self._cargado = True
+
+    def actualizar(self, empleado):
+        # Alta o cambio de un empleado (llamado desde la señal post_save)
+        with self._lock:
+            if not self._cargado:
+                return
+            self._quitar(empleado.pk)
+            self._poner(empleado.pk, empleado.cedula, empleado.nombres, empleado.huella)
+
+    def eliminar(self, empleado_id):
+        with self._lock:
+            if self._cargado:
+                self._quitar(empleado_id)
+
+    def invalidar(self):
+        with self._lock:
+            self._cargado = False
+            self._reiniciar()
+
+    def publicar_cambio(self):
+        # Avisa a los demás workers que cambiaron las plantillas (llamar al confirmar
+        # la transacción). Este worker ya actualizó su índice por la señal.
+        version = time.time_ns()
+        cache.set(CLAVE_VERSION, version, None)
+        with self._lock:
+            self._version = version
+
+    def revisar(self):
+        # Descarta el índice si otro worker publicó un cambio desde que se cargó
+        ahora = time.monotonic()
+        with self._lock:
+            if not self._cargado or (self._revisado is not None and ahora - self._revisado < REVISION):
+                return
+            self._revisado = ahora
+        version = cache.get(CLAVE_VERSION)
+        with self._lock:
+            if version != self._version:
+                self.invalidar()
+
+    def identificar(self, datos):
+        # Devuelve (empleado_id, cedula, nombres, puntaje) de la mejor coincidencia
+        # que supere el umbral, o None si la huella no se reconoce
+        sonda = plantilla_desde_bytes(datos)
+        if sonda is None:
+            raise ValueError('Plantilla de huella inválida.')
+        self.revisar()
+        self.cargar()
+        with self._lock:
+            if not self._total or sonda.shape[0] != self._dimension:
+                return None
+            puntajes = self._matriz[:self._total] @ sonda
+            mejor = int(np.argmax(puntajes))
+            puntaje = float(puntajes[mejor])
+            if puntaje < self.umbral:
+                return None
+            return int(self._empleados[mejor]), int(self._cedulas[mejor]), self._nombres[mejor], puntaje
+
+    def _reiniciar(self):
+        self._dimension = None
+        self._matriz = np.empty((0, 0), dtype=np.float32)
+        self._empleados = np.empty(0, dtype=np.int64)
+        self._cedulas = np.empty(0, dtype=np.int64)
+        self._nombres = []
+        self._total = 0
+        self._posicion = {}
+
+    def _poner(self, empleado_id, cedula, nombres, huella):
+        vector = plantilla_desde_bytes(huella)
+        if vector is None:
+            return
+        if self._dimension is None:
+            self._dimension = vector.shape[0]
+        if vector.shape[0] != self._dimension:
+            # Plantilla de otro formato de lector: no se puede comparar
+            return
+        if self._total == self._matriz.shape[0]:
+            self._crecer()
+        fila = self._total
+        self._matriz[fila] = vector
+        self._empleados[fila] = empleado_id
+        self._cedulas[fila] = cedula
+        self._nombres.append(nombres)
+        self._posicion[empleado_id] = fila
+        self._total += 1
+
+    def _quitar(self, empleado_id):
+        # Se mueve la última fila al hueco para mantener la matriz compacta
+        fila = self._posicion.pop(empleado_id, None)
+        if fila is None:
+            return
+        ultima = self._total - 1
+        if fila != ultima:
+            self._matriz[fila] = self._matriz[ultima]
+            self._empleados[fila] = self._empleados[ultima]
+            self._cedulas[fila] = self._cedulas[ultima]
+            self._nombres[fila] = self._nombres[ultima]
+            self._posicion[int(self._empleados[fila])] = fila
+        self._nombres.pop()
+        self._total = ultima
+
+    def _crecer(self):
+        capacidad = max(64, self._matriz.shape[0] * 2)
+        matriz = np.zeros((capacidad, self._dimension), dtype=np.float32)
+        if self._total:
+            matriz[:self._total] = self._matriz[:self._total]
+        empleados = np.zeros(capacidad, dtype=np.int64)
+        empleados[:self._total] = self._empleados[:self._total]
+        cedulas = np.zeros(capacidad, dtype=np.int64)
+        cedulas[:self._total] = self._cedulas[:self._total]
+        self._matriz, self._empleados, self._cedulas = matriz, empleados, cedulas
+
+
+indice_huellas = IndiceHuellas()
+
+
+def precargar():
+    # Carga el índice al arrancar el servidor. Si la base no está lista (por ejemplo,
+    # sin migrar) se deja para la primera identificación, como antes.
+    if not PRECARGAR:
+        return
+    try:
+        indice_huellas.cargar()
+    except DatabaseError:
+        registro.warning('No se pudo precargar el índice de huellas; se cargará en la primera identificación.', exc_info=True)
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import ControlDeIngreso, JornadaDiaria, JornadaPendiente, MarcaRollup
+
+# Rollup incremental de ControlDeIngreso a JornadaDiaria.
+# Cada corrida busca los días con registros modificados después de la marca de agua
+# (campo actualizado) más los días pendientes por borrados, y reescribe por completo
+# las jornadas de esos días. Reescribir el día entero hace que el proceso sea idempotente.
+# Después de reescribir un día se envía jornada_recalculada (fecha=...), dentro de la
+# misma transacción, para las tablas que dependen de las horas (productividad).
+
+MARCA = 'jornadas'
+# Margen para no saltarse escrituras de transacciones que todavía no hicieron commit
+MARGEN = timedelta(seconds=60)
+UN_DIA = timedelta(days=1)
+
+jornada_recalculada = Signal()
+
+
+def horas_turno(hora_entrada, hora_salida):
+    # Horas entre entrada y salida. Si la salida es anterior a la entrada,
+    # el turno cruzó la medianoche y termina al día siguiente.
+    if hora_entrada is None or hora_salida is None:
+        return None
+    entrada = datetime.combine(datetime.min, hora_entrada)
+    salida = datetime.combine(datetime.min, hora_salida)
+    if salida < entrada:
+        salida += UN_DIA
+    return Decimal((salida - entrada).total_seconds()) / Decimal(3600)
+
+
+def recalcular_dia(fecha):
+    # Reescribe las jornadas de un día a partir de los registros crudos
+    totales = {}
+    registros = ControlDeIngreso.objects.filter(fecha=fecha).values_list(
+        'cedula_id', 'proyecto_id', 'hora_entrada', 'hora_salida'
+    )
+    for empleado_id, proyecto_id, hora_entrada, hora_salida in registros.iterator(chunk_size=2000):
+        total = totales.setdefault((empleado_id, proyecto_id), [Decimal(0), 0, 0])
+        horas = horas_turno(hora_entrada, hora_salida)
+        total[1] += 1
+        if horas is None:
+            total[2] += 1
+        else:
+            total[0] += horas
+
+    with transaction.atomic():
+        JornadaDiaria.objects.filter(fecha=fecha).delete()
+        JornadaDiaria.objects.bulk_create(
+            [
+                JornadaDiaria(
+                    empleado_id=empleado_id,
+                    proyecto_id=proyecto_id,
+                    fecha=fecha,
+                    horas=horas.quantize(Decimal('0.01')),
+                    turnos=turnos,
+                    turnos_abiertos=abiertos,
+                )
+                for (empleado_id, proyecto_id), (horas, turnos, abiertos) in totales.items()
+            ],
+            batch_size=1000,
+        )
+        jornada_recalculada.send(sender=JornadaDiaria, fecha=fecha)
+    return len(totales)
+
+
+def dias_cambiados(desde, hasta):
+    # Días con registros modificados en (desde, hasta]
+    cambios = ControlDeIngreso.objects.filter(actualizado__lte=hasta)
+    if desde is not None:
+        cambios = cambios.filter(actualizado__gt=desde)
+    return set(cambios.values_list('fecha', flat=True).distinct())
+
+
+def actualizar(margen=MARGEN):
+    # Procesa los días cambiados desde la última marca y la avanza.
+    # Devuelve la lista de días recalculados.
+    corte = timezone.now() - margen
+    marca = MarcaRollup.objects.filter(nombre=MARCA).first()
+    desde = marca.marca if marca else None
+    if desde is not None and desde >= corte:
+        return []
+
+    pendientes = dict(JornadaPendiente.objects.values_list('pk', 'fecha'))
+    dias = sorted(dias_cambiados(desde, corte) | set(pendientes.values()))
+    for fecha in dias:
+        recalcular_dia(fecha)
+    with transaction.atomic():
+        JornadaPendiente.objects.filter(pk__in=list(pendientes)).delete()
+        MarcaRollup.objects.update_or_create(nombre=MARCA, defaults={'marca': corte})
+    return dias
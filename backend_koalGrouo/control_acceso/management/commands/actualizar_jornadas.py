@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from control_acceso import jornadas
+from control_acceso.models import MarcaRollup
+
+
+class Command(BaseCommand):
+    help = 'Actualiza la tabla JornadaDiaria con los días de ControlDeIngreso que cambiaron desde la última corrida.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Recalcula solo este día (AAAA-MM-DD) sin mover la marca de agua.')
+        parser.add_argument('--reconstruir', action='store_true', help='Borra la marca de agua y recalcula todos los días.')
+        parser.add_argument(
+            '--margen', type=int, default=int(jornadas.MARGEN.total_seconds()),
+            help='Segundos hacia atrás desde ahora que no se procesan todavía.',
+        )
+
+    def handle(self, *args, **opciones):
+        if opciones['fecha']:
+            fecha = parse_date(opciones['fecha'])
+            if fecha is None:
+                raise CommandError('Fecha inválida, use el formato AAAA-MM-DD.')
+            filas = jornadas.recalcular_dia(fecha)
+            self.stdout.write(self.style.SUCCESS(f'{fecha}: {filas} jornadas recalculadas.'))
+            return
+
+        if opciones['reconstruir']:
+            MarcaRollup.objects.filter(nombre=jornadas.MARCA).delete()
+
+        dias = jornadas.actualizar(margen=timedelta(seconds=opciones['margen']))
+        if not dias:
+            self.stdout.write('No hay días con cambios.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'{len(dias)} días recalculados ({dias[0]} a {dias[-1]}).'))
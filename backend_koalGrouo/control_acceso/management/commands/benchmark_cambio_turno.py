@@ -0,0 +1,208 @@
+import json
+import logging
+import random
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from administracion.models import Empleado
+from control_acceso.models import ControlDeIngreso
+from control_acceso.roster import roster
+
+# Repite un cambio de turno contra la API dentro del proceso (sin servidor HTTP):
+# cada trabajador se busca por cédula y marca entrada o salida, y entre marcaciones
+# se consultan los listados de cada app. Reporta latencia p50/p95/p99 y consultas SQL
+# por petición, y compara contra una línea base guardada.
+#
+# - Todo corre dentro de una transacción que se revierte al final, así la base
+#   queda igual y dos corridas sobre los mismos datos son comparables.
+# - Se omiten los permisos de las vistas (se mide el costo del endpoint, no la
+#   autorización); la autenticación se hace con force_authenticate.
+# - Pensado para la base generada con generar_datos_sinteticos. Los listados sin
+#   paginación devuelven la tabla completa, elegir la escala con eso en mente.
+
+PREFIJO = '/api/v1'
+
+# nombre: ruta del listado (GET)
+LISTADOS = {
+    'empleados': '/administracion/empleados/',
+    'ingresos': '/control-acceso/ControlDeAcceso/',
+    'filtro_de_busqueda': '/control-acceso/filtro_de_busqueda/',
+    'jornadas': '/control-acceso/jornadas/',
+    'ocupacion': '/control-acceso/ocupacion/',
+    'gases': '/control-gases/registros/',
+    'lugares_trabajo': '/lugares_trabajo/',
+    'herramientas': '/inventario/herramientas/',
+    'prestamos': '/inventario/prestamos/',
+    'produccion': '/produccion/',
+}
+
+MARCACION = '/control-acceso/ControlDeAcceso/registrar-entrada-salida/'
+BUSCAR_EMPLEADO = '/control-acceso/buscar-empleado/'
+
+
+def percentil(tiempos, p):
+    return tiempos[min(len(tiempos) - 1, int(len(tiempos) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Repite un cambio de turno contra la API y reporta latencia y consultas SQL por endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Usuario autenticado (por defecto el primer superusuario).')
+        parser.add_argument('--trabajadores', type=int, default=300, help='Empleados que marcan en el cambio de turno.')
+        parser.add_argument('--listados-cada', type=int, default=25, help='Marcaciones entre cada ronda de listados.')
+        parser.add_argument(
+            '--listados', nargs='*', choices=sorted(LISTADOS), default=sorted(LISTADOS),
+            help='Listados a incluir en el recorrido.',
+        )
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--guardar-linea-base', metavar='ARCHIVO', help='Guarda los resultados como línea base.')
+        parser.add_argument('--linea-base', metavar='ARCHIVO', help='Compara contra una línea base y falla si empeora.')
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help='Aumento relativo permitido en p95 respecto de la línea base (0.25 = 25 %%).',
+        )
+        parser.add_argument(
+            '--margen-ms', type=float, default=2.0,
+            help='Diferencias de p95 menores a este margen no cuentan como regresión.',
+        )
+
+    def handle(self, *args, **opciones):
+        random.seed(opciones['semilla'])
+        cliente = APIClient()
+        cliente.force_authenticate(self._usuario(opciones['usuario']))
+
+        empleados = list(Empleado.objects.values_list('cedula', 'nombres'))
+        if not empleados:
+            raise CommandError('No hay empleados; ejecutar antes generar_datos_sinteticos.')
+        turno = random.sample(empleados, min(opciones['trabajadores'], len(empleados)))
+        listados = {nombre: LISTADOS[nombre] for nombre in opciones['listados']}
+
+        mediciones = {}
+        roster.limpiar()
+        # Las respuestas 4xx esperadas (jornada terminada, entrada duplicada) no se registran
+        registro = logging.getLogger('django.request')
+        nivel = registro.level
+        registro.setLevel(logging.ERROR)
+        try:
+            with mock.patch.object(APIView, 'check_permissions', lambda vista, request: None):
+                with transaction.atomic():
+                    self._recorrido(cliente, turno, listados, opciones['listados_cada'], mediciones)
+                    transaction.set_rollback(True)
+        finally:
+            registro.setLevel(nivel)
+            roster.limpiar()
+
+        resultados = self._resumir(mediciones)
+        self._reportar(resultados)
+
+        if opciones['guardar_linea_base']:
+            with open(opciones['guardar_linea_base'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Línea base guardada en {opciones["guardar_linea_base"]}')
+        if opciones['linea_base']:
+            self._comparar(resultados, opciones['linea_base'], opciones['tolerancia'], opciones['margen_ms'])
+
+    def _usuario(self, nombre):
+        usuarios = get_user_model().objects.all()
+        usuario = usuarios.filter(username=nombre).first() if nombre else usuarios.filter(is_superuser=True).first()
+        if usuario is None:
+            raise CommandError('No se encontró el usuario para autenticar las peticiones.')
+        return usuario
+
+    def _medir(self, mediciones, nombre, peticion):
+        # Las consultas se cuentan con un execute_wrapper: CaptureQueriesContext guarda
+        # como máximo 9000 y los listados con N+1 sobre tablas grandes lo superan
+        consultas = 0
+
+        def contar(ejecutar, sql, parametros, muchos, contexto):
+            nonlocal consultas
+            consultas += 1
+            return ejecutar(sql, parametros, muchos, contexto)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            respuesta = peticion()
+            duracion = (time.perf_counter() - inicio) * 1000
+        if respuesta.status_code >= 500:
+            raise CommandError(f'{nombre} respondió {respuesta.status_code}')
+        mediciones.setdefault(nombre, []).append((duracion, consultas))
+        return respuesta
+
+    def _recorrido(self, cliente, turno, listados, listados_cada, mediciones):
+        # Cambio de turno: la portería busca al trabajador y registra la marcación.
+        # Quien tiene el turno abierto marca salida, el resto marca entrada.
+        lugares = [lugar for lugar, _ in ControlDeIngreso.OPCIONES_LUGAR_DE_TRABAJO]
+        for numero, (cedula, nombres) in enumerate(turno, start=1):
+            self._medir(mediciones, 'buscar-empleado', lambda: cliente.get(
+                PREFIJO + BUSCAR_EMPLEADO, {'cedula': cedula}
+            ))
+            self._medir(mediciones, 'registrar-entrada-salida', lambda: cliente.post(PREFIJO + MARCACION, {
+                'cedula': cedula,
+                'nombre': nombres,
+                'estado_salud': 'Bien',
+                'lugar_trabajo': random.choice(lugares),
+            }, format='json'))
+            if numero % listados_cada == 0:
+                for nombre, ruta in listados.items():
+                    self._medir(mediciones, nombre, lambda: cliente.get(PREFIJO + ruta))
+
+    def _resumir(self, mediciones):
+        resultados = {}
+        for nombre, valores in mediciones.items():
+            tiempos = sorted(duracion for duracion, _ in valores)
+            consultas = [cantidad for _, cantidad in valores]
+            resultados[nombre] = {
+                'peticiones': len(valores),
+                'p50': round(statistics.median(tiempos), 3),
+                'p95': round(percentil(tiempos, 95), 3),
+                'p99': round(percentil(tiempos, 99), 3),
+                'consultas_promedio': round(statistics.mean(consultas), 2),
+                'consultas_max': max(consultas),
+            }
+        return resultados
+
+    def _reportar(self, resultados):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{"endpoint":<26}{"n":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"SQL prom":>10}{"SQL max":>9}'
+        ))
+        for nombre, r in sorted(resultados.items()):
+            self.stdout.write(
+                f'{nombre:<26}{r["peticiones"]:>6}{r["p50"]:>10.2f}{r["p95"]:>10.2f}{r["p99"]:>10.2f}'
+                f'{r["consultas_promedio"]:>10.2f}{r["consultas_max"]:>9}'
+            )
+
+    def _comparar(self, resultados, ruta, tolerancia, margen_ms):
+        # Regresión: más consultas SQL que la línea base (son deterministas) o un p95
+        # que supera la tolerancia relativa y el margen absoluto a la vez
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                base = json.load(archivo)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'No se pudo leer la línea base {ruta}: {error}')
+
+        regresiones = []
+        for nombre, actual in sorted(resultados.items()):
+            anterior = base.get(nombre)
+            if anterior is None:
+                continue
+            if actual['consultas_max'] > anterior['consultas_max']:
+                regresiones.append(
+                    f'{nombre}: consultas SQL {anterior["consultas_max"]} -> {actual["consultas_max"]}'
+                )
+            limite = max(anterior['p95'] * (1 + tolerancia), anterior['p95'] + margen_ms)
+            if actual['p95'] > limite:
+                regresiones.append(f'{nombre}: p95 {anterior["p95"]:.2f} ms -> {actual["p95"]:.2f} ms')
+
+        if regresiones:
+            for regresion in regresiones:
+                self.stdout.write(self.style.ERROR(f'  {regresion}'))
+            raise CommandError(f'{len(regresiones)} regresiones respecto de {ruta}.')
+        self.stdout.write(self.style.SUCCESS(f'Sin regresiones respecto de {ruta}.'))
@@ -0,0 +1,185 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, time as hora, timedelta
+
+from django.core.management.base import BaseCommand
+
+# Benchmark de las consultas de la portería sobre una base SQLite temporal,
+# antes y después de los índices de control_acceso/migrations/0002.
+# No toca la base de datos del proyecto.
+
+ESQUEMA = [
+    '''CREATE TABLE administracion_empleado (
+        id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+        cedula integer NOT NULL,
+        nombres varchar(150) NOT NULL
+    )''',
+    '''CREATE TABLE control_acceso_controldeingreso (
+        id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+        fecha date NOT NULL,
+        hora_entrada time NOT NULL,
+        hora_salida time NULL,
+        lugar_trabajo varchar(100) NULL,
+        estado varchar(50) NOT NULL,
+        cedula_id bigint NOT NULL REFERENCES administracion_empleado (id),
+        proyecto_id bigint NOT NULL
+    )''',
+    # Índice que Django ya crea para la clave foránea en 0001_initial
+    'CREATE INDEX control_acceso_controldeingreso_cedula_id ON control_acceso_controldeingreso (cedula_id)',
+]
+
+INDICES_NUEVOS = [
+    'CREATE INDEX administracion_empleado_cedula ON administracion_empleado (cedula)',
+    'CREATE INDEX ingreso_ced_fecha_salida_idx ON control_acceso_controldeingreso (cedula_id, fecha, hora_salida)',
+    'CREATE INDEX ingreso_ced_ultima_ent_idx ON control_acceso_controldeingreso (cedula_id, fecha DESC, hora_entrada DESC)',
+    'CREATE INDEX ingreso_fecha_hora_ent_idx ON control_acceso_controldeingreso (fecha DESC, hora_entrada DESC)',
+    '''CREATE UNIQUE INDEX ingreso_un_turno_abierto_por_dia ON control_acceso_controldeingreso (cedula_id, fecha)
+        WHERE hora_salida IS NULL''',
+]
+
+# Consultas equivalentes a las que hacen registrar_entrada_salida, buscar_empleado_por_cedula,
+# buscar_area_por_cedula y el listado del ViewSet
+CONSULTAS = [
+    (
+        'empleado por cédula',
+        'SELECT id, nombres FROM administracion_empleado WHERE cedula = :cedula ORDER BY id LIMIT 1',
+    ),
+    (
+        'jornada del día',
+        '''SELECT id, hora_entrada, hora_salida FROM control_acceso_controldeingreso
+           WHERE cedula_id = :empleado AND fecha = :fecha ORDER BY id''',
+    ),
+    (
+        'turno abierto',
+        '''SELECT id FROM control_acceso_controldeingreso
+           WHERE cedula_id = :empleado AND fecha = :fecha AND hora_salida IS NULL ORDER BY id DESC LIMIT 1''',
+    ),
+    (
+        'última área',
+        '''SELECT lugar_trabajo FROM control_acceso_controldeingreso
+           WHERE cedula_id = :empleado AND hora_entrada IS NOT NULL
+           ORDER BY fecha DESC, hora_entrada DESC LIMIT 1''',
+    ),
+    (
+        'listado reciente',
+        '''SELECT id, fecha, hora_entrada FROM control_acceso_controldeingreso
+           ORDER BY fecha DESC, hora_entrada DESC LIMIT 50''',
+    ),
+]
+
+LUGARES = ['Mina Norte', 'Mina Sur', 'Procesamiento', 'Administración', 'Mantenimiento']
+
+
+class Command(BaseCommand):
+    help = 'Compara planes de consulta y latencia de control de acceso antes y después de los índices.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000, help='Registros de ControlDeIngreso a generar.')
+        parser.add_argument('--empleados', type=int, default=3000, help='Empleados a generar.')
+        parser.add_argument('--repeticiones', type=int, default=200, help='Ejecuciones por consulta.')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **opciones):
+        random.seed(opciones['semilla'])
+        directorio = tempfile.mkdtemp(prefix='bench_acceso_')
+        ruta = os.path.join(directorio, 'bench.sqlite3')
+        conexion = sqlite3.connect(ruta)
+        try:
+            dias = self._poblar(conexion, opciones['filas'], opciones['empleados'])
+            antes = self._medir(conexion, opciones['empleados'], dias, opciones['repeticiones'])
+
+            inicio = time.perf_counter()
+            for sentencia in INDICES_NUEVOS:
+                conexion.execute(sentencia)
+            conexion.execute('ANALYZE')
+            conexion.commit()
+            self.stdout.write(f'Índices creados en {time.perf_counter() - inicio:.1f} s\n')
+
+            despues = self._medir(conexion, opciones['empleados'], dias, opciones['repeticiones'])
+            self._reportar(antes, despues)
+        finally:
+            conexion.close()
+            os.remove(ruta)
+            os.rmdir(directorio)
+
+    def _poblar(self, conexion, filas, empleados):
+        for sentencia in ESQUEMA:
+            conexion.execute(sentencia)
+        conexion.executemany(
+            'INSERT INTO administracion_empleado (id, cedula, nombres) VALUES (?, ?, ?)',
+            ((i, 10_000_000 + i, f'Empleado {i}') for i in range(1, empleados + 1)),
+        )
+
+        # Un registro por empleado y día hacia atrás desde hoy; los de hoy quedan abiertos
+        dias = max(1, -(-filas // empleados))
+        hoy = date.today()
+
+        def registros():
+            generados = 0
+            for dia in range(dias):
+                fecha = (hoy - timedelta(days=dia)).isoformat()
+                for empleado in range(1, empleados + 1):
+                    if generados >= filas:
+                        return
+                    entrada = hora(random.randint(5, 8), random.randint(0, 59)).isoformat()
+                    salida = None if dia == 0 else hora(random.randint(14, 18), random.randint(0, 59)).isoformat()
+                    yield (fecha, entrada, salida, random.choice(LUGARES), 'activo', empleado, 1)
+                    generados += 1
+
+        inicio = time.perf_counter()
+        conexion.executemany(
+            '''INSERT INTO control_acceso_controldeingreso
+               (fecha, hora_entrada, hora_salida, lugar_trabajo, estado, cedula_id, proyecto_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            registros(),
+        )
+        conexion.execute('ANALYZE')
+        conexion.commit()
+        self.stdout.write(
+            f'{filas} registros de {empleados} empleados en {dias} días generados '
+            f'en {time.perf_counter() - inicio:.1f} s\n'
+        )
+        return dias
+
+    def _medir(self, conexion, empleados, dias, repeticiones):
+        hoy = date.today()
+        resultados = {}
+        for nombre, sql in CONSULTAS:
+            plan = [fila[3] for fila in conexion.execute('EXPLAIN QUERY PLAN ' + sql, self._parametros(empleados, dias, hoy))]
+            tiempos = []
+            for _ in range(repeticiones):
+                parametros = self._parametros(empleados, dias, hoy)
+                inicio = time.perf_counter()
+                conexion.execute(sql, parametros).fetchall()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            resultados[nombre] = {
+                'plan': plan,
+                'p50': statistics.median(tiempos),
+                'p95': tiempos[int(len(tiempos) * 0.95) - 1],
+            }
+        return resultados
+
+    def _parametros(self, empleados, dias, hoy):
+        empleado = random.randint(1, empleados)
+        return {
+            'empleado': empleado,
+            'cedula': 10_000_000 + empleado,
+            'fecha': (hoy - timedelta(days=random.randint(0, dias - 1))).isoformat(),
+        }
+
+    def _reportar(self, antes, despues):
+        for nombre, _ in CONSULTAS:
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            for etiqueta, medicion in (('antes', antes[nombre]), ('después', despues[nombre])):
+                self.stdout.write(
+                    f'  {etiqueta:<8} p50={medicion["p50"]:.3f} ms  p95={medicion["p95"]:.3f} ms'
+                )
+                for paso in medicion['plan']:
+                    self.stdout.write(f'           {paso}')
+            mejora = antes[nombre]['p50'] / despues[nombre]['p50'] if despues[nombre]['p50'] else float('inf')
+            self.stdout.write(f'  mejora p50: x{mejora:.1f}\n')
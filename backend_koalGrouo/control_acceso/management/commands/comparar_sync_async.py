@@ -0,0 +1,131 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from administracion.models import Empleado
+
+# Prueba de carga de las vistas síncronas contra las asíncronas de la portería.
+# Abre N conexiones concurrentes (keep-alive) contra un servidor ya levantado, por ejemplo:
+#   uvicorn backend_koalGrouo.asgi:application --workers 1
+# y reporta peticiones por segundo y latencias p50/p95/p99 de cada variante.
+
+ENDPOINTS = {
+    'buscar-empleado': ('/api/v1/control-acceso/buscar-empleado/', '/api/v1/control-acceso/async/buscar-empleado/'),
+    'buscar-area': ('/api/v1/control-acceso/buscar_area_por_cedula/', '/api/v1/control-acceso/async/buscar_area_por_cedula/'),
+}
+
+
+def percentil(tiempos, p):
+    return tiempos[min(len(tiempos) - 1, int(len(tiempos) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Compara latencia y rendimiento de las vistas síncronas y asíncronas de control de acceso.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor a probar.')
+        parser.add_argument('--usuario', required=True, help='Usuario con el que se genera el token JWT.')
+        parser.add_argument('--conexiones', type=int, default=500, help='Conexiones concurrentes.')
+        parser.add_argument('--peticiones', type=int, default=20, help='Peticiones por conexión.')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='buscar-empleado')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **opciones):
+        random.seed(opciones['semilla'])
+        try:
+            usuario = get_user_model().objects.get(username=opciones['usuario'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No existe el usuario {opciones["usuario"]}.')
+        token = str(AccessToken.for_user(usuario))
+        cedulas = list(Empleado.objects.values_list('cedula', flat=True)[:5000])
+        if not cedulas:
+            raise CommandError('No hay empleados para consultar.')
+
+        url = urlsplit(opciones['url'])
+        servidor = (url.hostname, url.port or 80)
+        for variante, ruta in zip(('síncrona', 'asíncrona'), ENDPOINTS[opciones['endpoint']]):
+            resultado = asyncio.run(self._carga(
+                servidor, ruta, token, cedulas, opciones['conexiones'], opciones['peticiones']
+            ))
+            self._reportar(variante, ruta, resultado)
+
+    async def _carga(self, servidor, ruta, token, cedulas, conexiones, peticiones):
+        tiempos = []
+        errores = []
+        # Todas las conexiones arrancan juntas para medir con la concurrencia completa
+        salida = asyncio.Event()
+        tareas = [
+            asyncio.create_task(self._cliente(servidor, ruta, token, cedulas, peticiones, salida, tiempos, errores))
+            for _ in range(conexiones)
+        ]
+        await asyncio.sleep(0)
+        inicio = time.perf_counter()
+        salida.set()
+        await asyncio.gather(*tareas)
+        return tiempos, errores, time.perf_counter() - inicio
+
+    async def _cliente(self, servidor, ruta, token, cedulas, peticiones, salida, tiempos, errores):
+        await salida.wait()
+        try:
+            lector, escritor = await asyncio.open_connection(*servidor)
+        except OSError as error:
+            errores.append(str(error))
+            return
+        try:
+            for _ in range(peticiones):
+                peticion = (
+                    f'GET {ruta}?cedula={random.choice(cedulas)} HTTP/1.1\r\n'
+                    f'Host: {servidor[0]}\r\n'
+                    f'Authorization: Bearer {token}\r\n'
+                    'Connection: keep-alive\r\n\r\n'
+                ).encode()
+                inicio = time.perf_counter()
+                escritor.write(peticion)
+                await escritor.drain()
+                codigo = await self._leer_respuesta(lector)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                if codigo >= 500 or codigo in (401, 403):
+                    errores.append(f'HTTP {codigo}')
+        except (OSError, asyncio.IncompleteReadError, ValueError) as error:
+            errores.append(str(error) or type(error).__name__)
+        finally:
+            escritor.close()
+
+    async def _leer_respuesta(self, lector):
+        # Lee una respuesta HTTP/1.1 completa (las vistas responden con Content-Length)
+        estado = await lector.readline()
+        codigo = int(estado.split()[1])
+        largo = 0
+        while True:
+            linea = await lector.readline()
+            if linea in (b'\r\n', b''):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            if nombre.strip().lower() == 'content-length':
+                largo = int(valor)
+        if largo:
+            json.loads(await lector.readexactly(largo))
+        return codigo
+
+    def _reportar(self, variante, ruta, resultado):
+        tiempos, errores, duracion = resultado
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{variante} ({ruta})'))
+        if not tiempos:
+            self.stdout.write(f'  sin respuestas, errores: {len(errores)}\n')
+            return
+        tiempos.sort()
+        self.stdout.write(
+            f'  {len(tiempos)} peticiones en {duracion:.2f} s = {len(tiempos) / duracion:.0f} req/s, '
+            f'errores: {len(errores)}'
+        )
+        self.stdout.write(
+            f'  p50={statistics.median(tiempos):.1f} ms  p95={percentil(tiempos, 95):.1f} ms  '
+            f'p99={percentil(tiempos, 99):.1f} ms\n'
+        )
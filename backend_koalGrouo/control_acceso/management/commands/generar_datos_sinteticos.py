@@ -0,0 +1,224 @@
+import random
+import time
+from datetime import time as hora, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from administracion.models import Cargo, Empleado, Proyecto
+from control_acceso.models import CambioRoster, ControlDeIngreso
+from control_acceso.ocupacion import reconciliar
+from control_gases.models import Registro_de_gases
+from lugares_trabajo.models import Lugares_de_trabajo
+
+# Genera datos sintéticos a escala para pruebas de carga (ver benchmark_cambio_turno).
+# Escribe en la base de datos configurada: usar una base separada de la de producción,
+# por ejemplo con un settings que apunte a otro archivo SQLite y DATOS_SINTETICOS = True.
+# Sin ese ajuste el comando se niega a correr salvo que se pase --forzar.
+# Las filas se insertan con bulk_create por lotes, así que no se disparan las señales;
+# al final se registran los empleados para la sincronización de terminales, se
+# calculan las jornadas (y con ellas la productividad) de los ingresos, se
+# reconcilia la ocupación por área y se reconstruyen los resúmenes de gases.
+
+CARGO = 'Operario sintético'
+PROYECTO = 'Proyecto sintético'
+LUGARES_ACCESO = [lugar for lugar, _ in ControlDeIngreso.OPCIONES_LUGAR_DE_TRABAJO]
+UBICACIONES = [ubicacion for ubicacion, _ in Registro_de_gases.UBICACIONES]
+ESTADOS_SALUD = ['Bien', 'Bien', 'Bien', 'Regular', 'Mal']
+
+# tipo de gas: (unidad, valor normal, límite de advertencia, límite de peligro)
+GASES = {
+    'Metano': ('%', 0.3, 1.0, 1.5),
+    'Monóxido de carbono': ('ppm', 8, 25, 50),
+    'Sulfuro de hidrógeno': ('ppm', 2, 10, 15),
+    'Oxígeno': ('%', 20.9, None, None),
+}
+
+
+def por_lotes(filas, tamano):
+    filas = iter(filas)
+    while lote := list(islice(filas, tamano)):
+        yield lote
+
+
+class Command(BaseCommand):
+    help = 'Genera empleados, registros de ingreso y lecturas de gases sintéticos para pruebas de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empleados', type=int, default=3000)
+        parser.add_argument('--ingresos', type=int, default=1_000_000, help='Registros de ControlDeIngreso.')
+        parser.add_argument('--gases', type=int, default=10_000_000, help='Lecturas de Registro_de_gases.')
+        parser.add_argument('--intervalo-gases', type=int, default=60, help='Segundos entre lecturas de un sensor.')
+        parser.add_argument('--cedula-inicial', type=int, default=90_000_000)
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create.')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Escribir aunque la base no esté marcada como dedicada (DATOS_SINTETICOS).',
+        )
+
+    def handle(self, *args, **opciones):
+        if not (opciones['forzar'] or getattr(settings, 'DATOS_SINTETICOS', False)):
+            raise CommandError(
+                f'La base {connection.settings_dict["NAME"]} no está marcada como dedicada a datos sintéticos; '
+                'usar un settings con DATOS_SINTETICOS = True o pasar --forzar.'
+            )
+        random.seed(opciones['semilla'])
+        self.lote = opciones['lote']
+        hoy = timezone.localdate()
+
+        cargo, _ = Cargo.objects.get_or_create(nombre_cargo=CARGO, defaults={'nivel_acceso': 'bajo'})
+        proyecto = Proyecto.objects.filter(nombre=PROYECTO).first() or Proyecto.objects.create(
+            nombre=PROYECTO, fecha_inicio=hoy - timedelta(days=365), estado='en_progreso'
+        )
+        empleados = self._empleados(cargo, opciones['empleados'], opciones['cedula_inicial'])
+        if opciones['ingresos']:
+            self._ingresos(empleados, proyecto, opciones['ingresos'], hoy)
+            # Sin margen: los registros recién insertados también entran al rollup
+            call_command('actualizar_jornadas', margen=0, stdout=self.stdout)
+        if opciones['gases']:
+            lugares = self._lugares(proyecto, hoy)
+            self._gases(lugares, opciones['gases'], opciones['intervalo_gases'])
+            call_command('reconstruir_resumenes_gases', stdout=self.stdout)
+
+        diferencias = reconciliar()
+        self.stdout.write(f'Ocupación reconciliada ({len(diferencias)} áreas cambiaron).')
+        self.stdout.write(self.style.SUCCESS('Datos sintéticos generados.'))
+
+    def _insertar(self, modelo, filas, total):
+        inicio = time.perf_counter()
+        insertadas = 0
+        for lote in por_lotes(filas, self.lote):
+            with transaction.atomic():
+                modelo.objects.bulk_create(lote)
+            insertadas += len(lote)
+            if insertadas % (self.lote * 100) == 0:
+                self.stdout.write(f'  {insertadas}/{total}')
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f'{insertadas} {modelo._meta.verbose_name_plural} en {duracion:.1f} s '
+            f'({insertadas / duracion if duracion else 0:.0f} filas/s)'
+        )
+        return insertadas
+
+    def _empleados(self, cargo, cantidad, cedula_inicial):
+        # Reutiliza los empleados sintéticos de corridas anteriores y crea los que falten
+        existentes = Empleado.objects.filter(cargo=cargo).count()
+        filas = (
+            Empleado(
+                cargo=cargo,
+                cedula=cedula_inicial + i,
+                nombres=f'Empleado Sintético {i}',
+                estado='activo',
+                nivel_acceso='bajo',
+            )
+            for i in range(existentes, cantidad)
+        )
+        if existentes < cantidad:
+            self._insertar(Empleado, filas, cantidad - existentes)
+            nuevos = Empleado.objects.filter(cargo=cargo).order_by('pk').values_list('pk', flat=True)[existentes:]
+            # Las terminales de portería reciben los empleados nuevos en la próxima sincronización
+            CambioRoster.objects.bulk_create(
+                [CambioRoster(modelo='empleado', objeto_id=pk) for pk in nuevos], batch_size=self.lote
+            )
+        return list(Empleado.objects.filter(cargo=cargo).order_by('pk').values_list('pk', flat=True)[:cantidad])
+
+    def _ingresos(self, empleados, proyecto, cantidad, hoy):
+        # Un turno por empleado y día hacia atrás desde hoy (~90 % de asistencia).
+        # Un tercio de la planta trabaja de noche y sale al día siguiente.
+        # Los turnos de hoy quedan abiertos para la mitad de los empleados.
+        def filas():
+            generadas = 0
+            dia = 0
+            while True:
+                fecha = hoy - timedelta(days=dia)
+                for indice, empleado_id in enumerate(empleados):
+                    if generadas >= cantidad:
+                        return
+                    if random.random() > 0.9:
+                        continue
+                    nocturno = indice % 3 == 0
+                    if nocturno:
+                        entrada = hora(random.randint(18, 20), random.randint(0, 59))
+                        salida = hora(random.randint(2, 6), random.randint(0, 59))
+                    else:
+                        entrada = hora(random.randint(5, 8), random.randint(0, 59))
+                        salida = hora(random.randint(14, 18), random.randint(0, 59))
+                    abierto = dia == 0 and indice % 2 == 0
+                    yield ControlDeIngreso(
+                        cedula_id=empleado_id,
+                        proyecto=proyecto,
+                        fecha=fecha,
+                        hora_entrada=entrada,
+                        hora_salida=None if abierto else salida,
+                        estado_salud_entrada=random.choice(ESTADOS_SALUD),
+                        estado_salud_Salida=None if abierto else random.choice(ESTADOS_SALUD),
+                        lugar_trabajo=LUGARES_ACCESO[indice % len(LUGARES_ACCESO)],
+                        estado='activo' if abierto else 'completado',
+                    )
+                    generadas += 1
+                dia += 1
+
+        self._insertar(ControlDeIngreso, filas(), cantidad)
+
+    def _lugares(self, proyecto, hoy):
+        # Un lugar de trabajo por ubicación de los sensores de gas
+        lugares = []
+        for ubicacion in UBICACIONES:
+            lugar, _ = Lugares_de_trabajo.objects.get_or_create(
+                nombre=ubicacion,
+                proyecto=proyecto,
+                defaults={
+                    'estado': 'activo',
+                    'ubicacion': ubicacion,
+                    'trabajadores': 0,
+                    'start_date': hoy - timedelta(days=365),
+                    'estimated_end': hoy + timedelta(days=365),
+                },
+            )
+            lugares.append(lugar)
+        return lugares
+
+    def _gases(self, lugares, cantidad, intervalo):
+        # Cada ubicación tiene un sensor por tipo de gas que reporta cada `intervalo`
+        # segundos, hacia atrás desde ahora; de vez en cuando hay un pico
+        sensores = [(lugar, gas) for lugar in lugares for gas in GASES]
+        lecturas = -(-cantidad // len(sensores))
+        ahora = timezone.localtime().replace(microsecond=0, tzinfo=None)
+
+        def filas():
+            generadas = 0
+            for paso in range(lecturas):
+                momento = ahora - timedelta(seconds=paso * intervalo)
+                for lugar, gas in sensores:
+                    if generadas >= cantidad:
+                        return
+                    unidad, normal, advertencia, peligro = GASES[gas]
+                    valor = max(0.0, random.gauss(normal, normal * 0.15))
+                    if advertencia is not None and random.random() < 0.002:
+                        valor = random.uniform(advertencia, peligro * 1.2)
+                    if peligro is not None and valor >= peligro:
+                        estado = 'Peligro'
+                    elif advertencia is not None and valor >= advertencia:
+                        estado = 'Advertencia'
+                    else:
+                        estado = 'Normal'
+                    yield Registro_de_gases(
+                        fecha=momento.date(),
+                        hora=momento.time(),
+                        ubicacion=lugar.ubicacion,
+                        tipo_gas=gas,
+                        nivel=f'{valor:.2f}%' if unidad == '%' else f'{valor:.0f} ppm',
+                        nivel_valor=round(valor, 2) if unidad == '%' else round(valor),
+                        nivel_unidad=unidad,
+                        estado=estado,
+                        registrado_por=f'sensor-{lugar.pk}-{gas[:3].lower()}',
+                        nombre=lugar,
+                    )
+                    generadas += 1
+
+        self._insertar(Registro_de_gases, filas(), cantidad)
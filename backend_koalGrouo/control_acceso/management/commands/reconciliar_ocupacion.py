@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from control_acceso.ocupacion import reconciliar
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la ocupación por área a partir de los turnos abiertos en ControlDeIngreso.'
+
+    def handle(self, *args, **opciones):
+        diferencias = reconciliar()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('La ocupación ya coincidía con los registros.'))
+            return
+        for lugar, (antes, despues) in sorted(diferencias.items()):
+            self.stdout.write(f'{lugar}: {antes if antes is not None else "-"} -> {despues}')
+        self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} áreas corregidas.'))
@@ -0,0 +1,152 @@
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from . import ocupacion
+from .models import ControlDeIngreso
+from .roster import ajornada_en_base, jornada_en_base, roster
+
+# Lógica de registrar_entrada_salida, compartida por el endpoint individual, el
+# de huella, la réplica offline y la versión asíncrona (views_async.py).
+# -Si el empleado ya tiene una entrada ese día sin salida, se registra la salida.
+# -Si no, se registra la entrada.
+# El empleado y el estado de su jornada se leen del roster en caché, así que
+# en el caso común solo se hace la escritura. Si el roster estaba desactualizado
+# (otra marcación simultánea, u otro worker con su propio roster), la escritura
+# falla, se invalida la cédula y se vuelve a decidir con la jornada leída de la base.
+
+NO_ENCONTRADO = (status.HTTP_404_NOT_FOUND, 'Empleado no encontrado.')
+JORNADA_TERMINADA = (status.HTTP_409_CONFLICT, 'El empleado ya terminó su dia de trabajo')
+SIN_PROYECTO = (status.HTTP_400_BAD_REQUEST, 'No hay proyectos disponibles para asignar.')
+SALIDA_REGISTRADA = (status.HTTP_200_OK, 'Salida registrada correctamente.')
+ENTRADA_REGISTRADA = (status.HTTP_201_CREATED, 'Entrada registrada correctamente.')
+
+# Entrada que pierde la carrera -> salida que pierde la carrera -> jornada completa
+INTENTOS = 3
+
+
+def registrar_marcacion(cedula, nombre, estado_salud, lugar_trabajo, observacion=None, momento=None):
+    # Registra una marcación de entrada o salida y devuelve (código HTTP, detalle)
+    momento = momento or timezone.localtime()
+    hoy = momento.date()
+
+    # Si el roster estaba desactualizado se recarga desde la base de datos y se reintenta
+    for _ in range(INTENTOS):
+        #Buscar el empleado por cédula y nombre
+        entrada = roster.obtener(cedula, timezone.localdate())
+        if entrada is None or entrada.nombres != nombre:
+            return NO_ENCONTRADO
+
+        # El roster solo guarda la jornada de hoy. Una marcación de otro día
+        # (réplica offline) se decide con la base de datos.
+        jornada = entrada.jornada(hoy) if hoy == timezone.localdate() else None
+        if jornada is None:
+            jornada = jornada_en_base(entrada.empleado_id, hoy)
+        registro_abierto_id, completo = jornada
+
+        # Si ya está registrado con su entrada y salida en ese día
+        if completo:
+            return JORNADA_TERMINADA
+
+        if registro_abierto_id:
+            if not _escribir_salida(entrada, registro_abierto_id, momento, estado_salud):
+                continue
+            return SALIDA_REGISTRADA
+
+        proyecto_id = roster.proyecto_por_defecto_id()
+        if not proyecto_id:
+            return SIN_PROYECTO
+        resultado = _escribir_entrada(entrada, proyecto_id, momento, estado_salud, lugar_trabajo, observacion)
+        if resultado is None:
+            continue
+        return resultado
+
+    return JORNADA_TERMINADA
+
+
+async def aregistrar_marcacion(cedula, nombre, estado_salud, lugar_trabajo, observacion=None, momento=None):
+    # Igual que registrar_marcacion, pero las lecturas usan el ORM asíncrono.
+    # Las escrituras necesitan transaction.atomic, que no existe en contexto
+    # asíncrono, así que se ejecutan con sync_to_async.
+    momento = momento or timezone.localtime()
+    hoy = momento.date()
+
+    for _ in range(INTENTOS):
+        entrada = await roster.aobtener(cedula, timezone.localdate())
+        if entrada is None or entrada.nombres != nombre:
+            return NO_ENCONTRADO
+
+        jornada = entrada.jornada(hoy) if hoy == timezone.localdate() else None
+        if jornada is None:
+            jornada = await ajornada_en_base(entrada.empleado_id, hoy)
+        registro_abierto_id, completo = jornada
+
+        if completo:
+            return JORNADA_TERMINADA
+
+        if registro_abierto_id:
+            if not await sync_to_async(_escribir_salida)(entrada, registro_abierto_id, momento, estado_salud):
+                continue
+            return SALIDA_REGISTRADA
+
+        proyecto_id = await roster.aproyecto_por_defecto_id()
+        if not proyecto_id:
+            return SIN_PROYECTO
+        resultado = await sync_to_async(_escribir_entrada)(
+            entrada, proyecto_id, momento, estado_salud, lugar_trabajo, observacion
+        )
+        if resultado is None:
+            continue
+        return resultado
+
+    return JORNADA_TERMINADA
+
+
+def _escribir_salida(entrada, registro_abierto_id, momento, estado_salud):
+    # Si ya existe un registro de entrada sin salida , registrar la salida.
+    # El filtro por hora_salida evita cerrar dos veces el mismo registro.
+    # Devuelve False si el registro ya no estaba abierto (roster desactualizado).
+    hoy = momento.date()
+    with transaction.atomic():
+        actualizados = ControlDeIngreso.objects.filter(
+            pk=registro_abierto_id,
+            hora_salida__isnull=True,
+        ).update(hora_salida=momento.time(), estado_salud_Salida=estado_salud, actualizado=timezone.now())
+        if actualizados:
+            ocupacion.restar_por_registro(registro_abierto_id)
+    if not actualizados:
+        roster.invalidar_cedula(entrada.cedula)
+        return False
+    transaction.on_commit(lambda: roster.registrar_salida(entrada, hoy))
+    return True
+
+
+def _escribir_entrada(entrada, proyecto_id, momento, estado_salud, lugar_trabajo, observacion):
+    # Registrar entrada.
+    # Devuelve None si el día ya tenía registros que el roster no conocía: la marcación
+    # se vuelve a decidir (la perdedora de dos marcaciones simultáneas queda como salida).
+    hoy = momento.date()
+    try:
+        # La restricción ingreso_un_turno_abierto_por_dia rechaza una segunda
+        # entrada abierta creada por una marcación simultánea
+        with transaction.atomic():
+            registro = ControlDeIngreso.objects.create(
+                cedula_id=entrada.empleado_id,
+                fecha=hoy,
+                hora_entrada=momento.time(),
+                estado_salud_entrada=estado_salud,
+                proyecto_id=proyecto_id,
+                lugar_trabajo=lugar_trabajo,
+                observacion=observacion
+            )
+            # Una jornada ya completa no la frena la restricción (el turno está cerrado).
+            # Se consulta después del INSERT, con la escritura ya tomada.
+            if ControlDeIngreso.objects.filter(cedula_id=entrada.empleado_id, fecha=hoy).exclude(pk=registro.pk).exists():
+                raise IntegrityError('La jornada ya tiene registros.')
+            ocupacion.sumar(lugar_trabajo)
+    except IntegrityError:
+        roster.invalidar_cedula(entrada.cedula)
+        return None
+    transaction.on_commit(lambda: roster.registrar_entrada(entrada, hoy, registro.pk, lugar_trabajo))
+    return ENTRADA_REGISTRADA
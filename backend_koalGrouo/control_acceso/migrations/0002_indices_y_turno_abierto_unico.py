@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:55
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+# Marca de los turnos cerrados por esta migración (para revisarlos y para revertirla)
+ESTADO_DUPLICADO = 'duplicado'
+NOTA = 'Cerrado por la migración 0002: entrada abierta duplicada del mismo día.'
+
+
+def cerrar_turnos_abiertos_duplicados(apps, schema_editor):
+    # Antes de crear la restricción se cierran las entradas abiertas duplicadas
+    # (marcaciones dobles). No se borra ningún registro de asistencia: la última
+    # entrada queda abierta y las demás se cierran con duración cero
+    # (hora_salida = hora_entrada), estado 'duplicado' y una nota en la observación.
+    ControlDeIngreso = apps.get_model('control_acceso', 'ControlDeIngreso')
+    duplicados = (
+        ControlDeIngreso.objects.filter(hora_salida__isnull=True)
+        .values('cedula', 'fecha')
+        .annotate(total=Count('id'), ultimo=Max('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in duplicados:
+        registros = ControlDeIngreso.objects.filter(
+            cedula=grupo['cedula'],
+            fecha=grupo['fecha'],
+            hora_salida__isnull=True,
+        ).exclude(id=grupo['ultimo'])
+        for registro in registros:
+            registro.hora_salida = registro.hora_entrada
+            registro.estado = ESTADO_DUPLICADO
+            registro.observacion = f'{registro.observacion}\n{NOTA}' if registro.observacion else NOTA
+            registro.save(update_fields=['hora_salida', 'estado', 'observacion'])
+
+
+def reabrir_turnos_duplicados(apps, schema_editor):
+    ControlDeIngreso = apps.get_model('control_acceso', 'ControlDeIngreso')
+    for registro in ControlDeIngreso.objects.filter(estado=ESTADO_DUPLICADO):
+        observacion = (registro.observacion or '').replace(f'\n{NOTA}', '').replace(NOTA, '')
+        registro.hora_salida = None
+        registro.estado = 'activo'
+        registro.observacion = observacion or None
+        registro.save(update_fields=['hora_salida', 'estado', 'observacion'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_alter_empleado_cedula'),
+        ('control_acceso', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='controldeingreso',
+            index=models.Index(fields=['cedula', 'fecha', 'hora_salida'], name='ingreso_ced_fecha_salida_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='controldeingreso',
+            index=models.Index(fields=['cedula', '-fecha', '-hora_entrada'], name='ingreso_ced_ultima_ent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='controldeingreso',
+            index=models.Index(fields=['-fecha', '-hora_entrada'], name='ingreso_fecha_hora_ent_idx'),
+        ),
+        migrations.RunPython(cerrar_turnos_abiertos_duplicados, reabrir_turnos_duplicados),
+        migrations.AddConstraint(
+            model_name='controldeingreso',
+            constraint=models.UniqueConstraint(condition=models.Q(('hora_salida__isnull', True)), fields=('cedula', 'fecha'), name='ingreso_un_turno_abierto_por_dia'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:58
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_ocupacion(apps, schema_editor):
+    # Inicializa la ocupación de cada área con los turnos abiertos existentes
+    ControlDeIngreso = apps.get_model('control_acceso', 'ControlDeIngreso')
+    OcupacionArea = apps.get_model('control_acceso', 'OcupacionArea')
+    abiertos = dict(
+        ControlDeIngreso.objects.filter(hora_entrada__isnull=False, hora_salida__isnull=True)
+        .exclude(lugar_trabajo__isnull=True)
+        .values_list('lugar_trabajo')
+        .annotate(personas=Count('id'))
+    )
+    lugares = ['Mina Norte', 'Mina Sur', 'Procesamiento', 'Administración', 'Mantenimiento']
+    for lugar in dict.fromkeys(lugares + list(abiertos)):
+        OcupacionArea.objects.create(lugar_trabajo=lugar, personas=abiertos.get(lugar, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_acceso', '0002_indices_y_turno_abierto_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lugar_trabajo', models.CharField(choices=[('Mina Norte', 'Mina Norte'), ('Mina Sur', 'Mina Sur'), ('Procesamiento', 'Procesamiento'), ('Administración', 'Administración'), ('Mantenimiento', 'Mantenimiento')], max_length=100, unique=True)),
+                ('personas', models.IntegerField(default=0)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(poblar_ocupacion, migrations.RunPython.noop),
+    ]
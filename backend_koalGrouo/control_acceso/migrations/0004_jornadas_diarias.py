@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_alter_empleado_cedula'),
+        ('control_acceso', '0003_ocupacionarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JornadaPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MarcaRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('marca', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='controldeingreso',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='JornadaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('horas', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('turnos', models.PositiveIntegerField(default=0)),
+                ('turnos_abiertos', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jornadas', to='administracion.empleado')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jornadas', to='administracion.proyecto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='jornada_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'proyecto', 'fecha'), name='jornada_empleado_proyecto_fecha')],
+            },
+        ),
+    ]
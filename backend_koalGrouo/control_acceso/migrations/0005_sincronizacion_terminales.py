@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+def registrar_roster_existente(apps, schema_editor):
+    # Un cambio por cada cargo y empleado existente, para que una terminal
+    # nueva (token 0) reciba el roster completo
+    Cargo = apps.get_model('administracion', 'Cargo')
+    Empleado = apps.get_model('administracion', 'Empleado')
+    CambioRoster = apps.get_model('control_acceso', 'CambioRoster')
+    CambioRoster.objects.bulk_create(
+        [CambioRoster(modelo='cargo', objeto_id=pk) for pk in Cargo.objects.order_by('pk').values_list('pk', flat=True)]
+        + [CambioRoster(modelo='empleado', objeto_id=pk) for pk in Empleado.objects.order_by('pk').values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_alter_empleado_cedula'),
+        ('control_acceso', '0004_jornadas_diarias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioRoster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('empleado', 'Empleado'), ('cargo', 'Cargo')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('eliminado', models.BooleanField(default=False)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modelo', 'objeto_id'], name='cambio_roster_objeto_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MarcacionSincronizada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terminal', models.CharField(max_length=50)),
+                ('id_local', models.CharField(max_length=100)),
+                ('codigo', models.PositiveSmallIntegerField()),
+                ('detalle', models.CharField(max_length=200)),
+                ('recibido', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('terminal', 'id_local'), name='marcacion_terminal_id_local')],
+            },
+        ),
+        migrations.RunPython(registrar_roster_existente, migrations.RunPython.noop),
+    ]
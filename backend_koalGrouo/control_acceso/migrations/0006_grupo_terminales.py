@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from administracion.permisos import GRUPO_TERMINALES
+
+
+def crear_grupo_terminales(apps, schema_editor):
+    # Los usuarios de las terminales se agregan a este grupo (ver administracion/permisos.py)
+    Group = apps.get_model('auth', 'Group')
+    Group.objects.get_or_create(name=GRUPO_TERMINALES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('control_acceso', '0005_sincronizacion_terminales'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_grupo_terminales, migrations.RunPython.noop),
+    ]
@@ -42,6 +42,113 @@ class ControlDeIngreso(models.Model):
     # estado puede referirse al estado del registro (ej: 'activo', 'cerrado', 'pendiente')
     estado = models.CharField(max_length=50, default='activo')
     observacion = models.TextField(blank=True, null=True)
+    # Última modificación del registro; la usa el rollup de jornadas para procesar solo lo que cambió.
+    # Las escrituras con update()/bulk_update() deben asignarlo a mano.
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Consultas de la portería: jornada del día de un empleado (entrada/salida)
+            models.Index(fields=['cedula', 'fecha', 'hora_salida'], name='ingreso_ced_fecha_salida_idx'),
+            # Última área de un empleado: filtro por cédula ordenado por fecha y hora de entrada
+            models.Index(fields=['cedula', '-fecha', '-hora_entrada'], name='ingreso_ced_ultima_ent_idx'),
+            # Listados generales ordenados por fecha y hora de entrada descendente
+            models.Index(fields=['-fecha', '-hora_entrada'], name='ingreso_fecha_hora_ent_idx'),
+        ]
+        constraints = [
+            # Un empleado solo puede tener un turno abierto (sin salida) por día.
+            # Evita que dos marcaciones simultáneas creen dos entradas.
+            models.UniqueConstraint(
+                fields=['cedula', 'fecha'],
+                condition=models.Q(hora_salida__isnull=True),
+                name='ingreso_un_turno_abierto_por_dia',
+            ),
+        ]
 
     def _str_(self):
-        return{self.proyecto} + {self.lugar_trabajo}
\ No newline at end of file
+        return{self.proyecto} + {self.lugar_trabajo}
+
+class OcupacionArea(models.Model):
+    """Cantidad de personas dentro de cada lugar de trabajo (turnos abiertos)."""
+    lugar_trabajo = models.CharField(max_length=100, choices=ControlDeIngreso.OPCIONES_LUGAR_DE_TRABAJO, unique=True)
+    # Se actualiza con F() en la misma transacción que cada entrada o salida
+    personas = models.IntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.lugar_trabajo}: {self.personas}"
+
+
+class JornadaDiaria(models.Model):
+    """Horas trabajadas por empleado, proyecto y día, materializadas desde ControlDeIngreso."""
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='jornadas')
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='jornadas')
+    # Día de la entrada; un turno que cruza la medianoche cuenta para el día en que empezó
+    fecha = models.DateField()
+    horas = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    turnos = models.PositiveIntegerField(default=0)
+    # Turnos sin salida registrada (no suman horas)
+    turnos_abiertos = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'proyecto', 'fecha'], name='jornada_empleado_proyecto_fecha'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='jornada_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.empleado_id} {self.fecha}: {self.horas} h"
+
+
+class JornadaPendiente(models.Model):
+    """Días que hay que recalcular por registros borrados (los borrados no dejan marca de actualizado)."""
+    fecha = models.DateField(unique=True)
+
+
+class MarcaRollup(models.Model):
+    """Marca de agua de un proceso incremental: hasta dónde se procesaron los cambios."""
+    nombre = models.CharField(max_length=50, unique=True)
+    marca = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nombre}: {self.marca}"
+
+
+class CambioRoster(models.Model):
+    """Último cambio de cada Empleado o Cargo, para la sincronización delta de las terminales."""
+    MODELOS = [
+        ('empleado', 'Empleado'),
+        ('cargo', 'Cargo'),
+    ]
+    # El id autoincremental es el contador monótono de cambios: el token de
+    # sincronización de una terminal es el id del último cambio que recibió.
+    modelo = models.CharField(max_length=20, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    # Lápida: el objeto fue borrado
+    eliminado = models.BooleanField(default=False)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id'], name='cambio_roster_objeto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} {self.modelo} {self.objeto_id}{' (eliminado)' if self.eliminado else ''}"
+
+
+class MarcacionSincronizada(models.Model):
+    """Marcaciones offline ya procesadas, para que reenviar un lote no las repita."""
+    terminal = models.CharField(max_length=50)
+    id_local = models.CharField(max_length=100)
+    codigo = models.PositiveSmallIntegerField()
+    detalle = models.CharField(max_length=200)
+    recibido = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['terminal', 'id_local'], name='marcacion_terminal_id_local'),
+        ]
@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models import Count, F, Subquery
+from django.utils import timezone
+
+from .models import ControlDeIngreso, OcupacionArea
+
+# Contadores de ocupación por lugar de trabajo. Una persona está dentro de un
+# área mientras tenga un turno abierto (entrada sin salida) en ella.
+# registrar_marcacion y el endpoint por lotes los actualizan en la misma
+# transacción que la escritura; los cambios hechos por otras vías (CRUD, admin)
+# se corrigen con el comando reconciliar_ocupacion.
+
+
+def sumar(lugar_trabajo, cantidad=1):
+    # Suma (o resta) personas a un área con una sola sentencia UPDATE atómica
+    if not lugar_trabajo or not cantidad:
+        return
+    actualizados = OcupacionArea.objects.filter(lugar_trabajo=lugar_trabajo).update(
+        personas=F('personas') + cantidad,
+        actualizado=timezone.now(),
+    )
+    if not actualizados:
+        OcupacionArea.objects.get_or_create(lugar_trabajo=lugar_trabajo)
+        OcupacionArea.objects.filter(lugar_trabajo=lugar_trabajo).update(
+            personas=F('personas') + cantidad,
+            actualizado=timezone.now(),
+        )
+
+
+def restar_por_registro(registro_id):
+    # Resta una persona del área del registro que se acaba de cerrar, sin leerlo:
+    # el área se toma con una subconsulta dentro del mismo UPDATE
+    OcupacionArea.objects.filter(
+        lugar_trabajo=Subquery(ControlDeIngreso.objects.filter(pk=registro_id).values('lugar_trabajo')[:1])
+    ).update(personas=F('personas') - 1, actualizado=timezone.now())
+
+
+def aplicar_cambios(cambios):
+    # cambios: {lugar_trabajo: diferencia de personas}
+    for lugar_trabajo, cantidad in cambios.items():
+        sumar(lugar_trabajo, cantidad)
+
+
+def contar_turnos_abiertos():
+    # Ocupación calculada desde los registros crudos
+    abiertos = (
+        ControlDeIngreso.objects.filter(hora_entrada__isnull=False, hora_salida__isnull=True)
+        .exclude(lugar_trabajo__isnull=True)
+        .values('lugar_trabajo')
+        .annotate(personas=Count('id'))
+    )
+    return {fila['lugar_trabajo']: fila['personas'] for fila in abiertos}
+
+
+def reconciliar():
+    # Reconstruye la tabla de ocupación a partir de ControlDeIngreso.
+    # Devuelve {lugar_trabajo: (antes, después)} de las áreas que cambiaron.
+    with transaction.atomic():
+        reales = contar_turnos_abiertos()
+        lugares = {lugar for lugar, _ in ControlDeIngreso.OPCIONES_LUGAR_DE_TRABAJO} | set(reales)
+        actuales = {
+            ocupacion.lugar_trabajo: ocupacion
+            for ocupacion in OcupacionArea.objects.select_for_update()
+        }
+        diferencias = {}
+        ahora = timezone.now()
+        for lugar in lugares:
+            personas = reales.get(lugar, 0)
+            ocupacion = actuales.get(lugar)
+            if ocupacion is None:
+                OcupacionArea.objects.create(lugar_trabajo=lugar, personas=personas, actualizado=ahora)
+                diferencias[lugar] = (None, personas)
+            elif ocupacion.personas != personas:
+                diferencias[lugar] = (ocupacion.personas, personas)
+                ocupacion.personas = personas
+                ocupacion.actualizado = ahora
+                ocupacion.save(update_fields=['personas', 'actualizado'])
+        return diferencias
@@ -0,0 +1,345 @@
+import time
+from collections import OrderedDict
+from threading import RLock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from administracion.models import Empleado, Proyecto
+from .models import ControlDeIngreso
+
+# Caché local del proceso con el "roster" de la portería: por cada cédula guarda
+# el empleado, la última área de trabajo y el estado de su jornada en un día.
+# Se invalida desde las señales post_save/post_delete de Empleado, ControlDeIngreso
+# y Proyecto (ver signals.py). Al ser local al proceso, cada worker tiene la suya.
+# Las señales solo llegan al worker que hizo el cambio; para los demás, un alta, cambio
+# o baja de Empleado o Proyecto publica una versión nueva en la caché de Django
+# (CLAVE_VERSION, compartida entre los workers de la máquina con FileBasedCache). Cada
+# worker la lee a lo sumo una vez cada REVISION segundos y, si cambió, vacía su roster:
+# así una cédula guardada como inexistente antes del alta deja de dar 404 enseguida.
+# Las marcaciones de otros workers no publican versión: el roster las descubre al
+# escribir (ver marcaciones.py).
+
+TAMANO_MAXIMO = getattr(settings, 'CONTROL_ACCESO_ROSTER_MAX', 5000)
+CLAVE_VERSION = 'control_acceso:roster:version'
+REVISION = getattr(settings, 'CONTROL_ACCESO_ROSTER_REVISION', 1.0)
+
+# Marca para las cédulas consultadas que no existen (caché negativa)
+_NO_EXISTE = object()
+
+
+class EntradaRoster:
+    """Estado conocido de un empleado en la portería."""
+
+    __slots__ = ('empleado_id', 'cedula', 'nombres', 'ultima_area', 'fecha', 'registro_abierto_id', 'completo')
+
+    def __init__(self, empleado_id, cedula, nombres, ultima_area, fecha, registro_abierto_id, completo):
+        self.empleado_id = empleado_id
+        self.cedula = cedula
+        self.nombres = nombres
+        self.ultima_area = ultima_area
+        # fecha a la que se refieren registro_abierto_id y completo
+        self.fecha = fecha
+        self.registro_abierto_id = registro_abierto_id
+        self.completo = completo
+
+    def jornada(self, fecha):
+        # Devuelve (id del registro abierto, jornada completa) para la fecha dada.
+        # Si la entrada se cargó un día anterior, el día pedido aún no tiene registros:
+        # cualquier escritura en ControlDeIngreso habría invalidado la entrada.
+        # Para días anteriores a la carga devuelve None (hay que consultar la base).
+        if fecha < self.fecha:
+            return None
+        if fecha > self.fecha:
+            return None, False
+        return self.registro_abierto_id, self.completo
+
+
+class RosterCache:
+    """LRU acotada cédula -> EntradaRoster con contadores de aciertos y fallos."""
+
+    def __init__(self, tamano_maximo=TAMANO_MAXIMO):
+        self.tamano_maximo = tamano_maximo
+        self._entradas = OrderedDict()
+        self._cedula_por_empleado = {}
+        self._proyecto_id = None
+        # Se incrementa en cada invalidación para descartar cargas que quedaron viejas
+        self._generacion = 0
+        # Última versión compartida vista y cuándo se leyó (time.monotonic())
+        self._version = None
+        self._revisado = None
+        self._lock = RLock()
+        self.reiniciar_contadores()
+
+    def reiniciar_contadores(self):
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+
+    def obtener(self, cedula, fecha):
+        # Devuelve la EntradaRoster de la cédula o None si no existe el empleado.
+        # En un fallo se consulta la base de datos y se guarda el resultado.
+        if self._por_revisar():
+            self._aplicar_version(cache.get(CLAVE_VERSION))
+        cedula, encontrada, entrada, generacion = self._buscar(cedula)
+        if not encontrada:
+            entrada = self._cargar(cedula, fecha)
+            self._guardar(cedula, entrada, generacion)
+        return None if entrada is _NO_EXISTE else entrada
+
+    async def aobtener(self, cedula, fecha):
+        # Versión asíncrona de obtener(): los fallos se cargan con el ORM asíncrono
+        if self._por_revisar():
+            self._aplicar_version(await cache.aget(CLAVE_VERSION))
+        cedula, encontrada, entrada, generacion = self._buscar(cedula)
+        if not encontrada:
+            entrada = await self._acargar(cedula, fecha)
+            self._guardar(cedula, entrada, generacion)
+        return None if entrada is _NO_EXISTE else entrada
+
+    def proyecto_por_defecto_id(self):
+        # Equivalente en caché de Proyecto.objects.first()
+        if self._por_revisar():
+            self._aplicar_version(cache.get(CLAVE_VERSION))
+        proyecto_id, generacion = self._buscar_proyecto()
+        if proyecto_id is None:
+            proyecto_id = _consulta_proyecto().first()
+            self._guardar_proyecto(proyecto_id, generacion)
+        return proyecto_id
+
+    async def aproyecto_por_defecto_id(self):
+        if self._por_revisar():
+            self._aplicar_version(await cache.aget(CLAVE_VERSION))
+        proyecto_id, generacion = self._buscar_proyecto()
+        if proyecto_id is None:
+            proyecto_id = await _consulta_proyecto().afirst()
+            self._guardar_proyecto(proyecto_id, generacion)
+        return proyecto_id
+
+    def registrar_entrada(self, entrada, fecha, registro_id, lugar_trabajo):
+        # Guarda el nuevo estado después de escribir una entrada en la base de datos.
+        # La señal post_save ya invalidó la cédula; aquí se vuelve a poblar sin leer.
+        # Solo las marcaciones de hoy: las de otro día (réplica offline) no cambian el
+        # estado del día ni la última área, y la cédula se recarga en la próxima consulta.
+        if fecha != timezone.localdate():
+            return
+        self._guardar(entrada.cedula, EntradaRoster(
+            empleado_id=entrada.empleado_id,
+            cedula=entrada.cedula,
+            nombres=entrada.nombres,
+            ultima_area=lugar_trabajo,
+            fecha=fecha,
+            registro_abierto_id=registro_id,
+            completo=False,
+        ))
+
+    def registrar_salida(self, entrada, fecha):
+        # Guarda el nuevo estado después de escribir una salida en la base de datos
+        if fecha != timezone.localdate():
+            return
+        self._guardar(entrada.cedula, EntradaRoster(
+            empleado_id=entrada.empleado_id,
+            cedula=entrada.cedula,
+            nombres=entrada.nombres,
+            ultima_area=entrada.ultima_area,
+            fecha=fecha,
+            registro_abierto_id=None,
+            completo=True,
+        ))
+
+    def invalidar_cedula(self, cedula):
+        with self._lock:
+            self._generacion += 1
+            entrada = self._entradas.pop(int(cedula), None)
+            if entrada is not None:
+                self.invalidaciones += 1
+                if isinstance(entrada, EntradaRoster):
+                    self._cedula_por_empleado.pop(entrada.empleado_id, None)
+
+    def invalidar_empleado(self, empleado_id):
+        with self._lock:
+            cedula = self._cedula_por_empleado.get(empleado_id)
+            if cedula is not None:
+                self.invalidar_cedula(cedula)
+            else:
+                self._generacion += 1
+
+    def invalidar_proyecto(self):
+        with self._lock:
+            self._generacion += 1
+            self._proyecto_id = None
+
+    def publicar_cambio(self):
+        # Avisa a los demás workers que cambiaron empleados o proyectos (llamar al
+        # confirmar la transacción). Este worker ya invalidó lo suyo por la señal.
+        version = time.time_ns()
+        cache.set(CLAVE_VERSION, version, None)
+        with self._lock:
+            self._version = version
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.clear()
+            self._cedula_por_empleado.clear()
+            self._proyecto_id = None
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'tamano': len(self._entradas),
+                'tamano_maximo': self.tamano_maximo,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'invalidaciones': self.invalidaciones,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+            }
+
+    def _por_revisar(self):
+        # True si toca leer la versión compartida (a lo sumo una vez cada REVISION segundos)
+        ahora = time.monotonic()
+        with self._lock:
+            if self._revisado is not None and ahora - self._revisado < REVISION:
+                return False
+            self._revisado = ahora
+            return True
+
+    def _aplicar_version(self, version):
+        # Otro worker cambió empleados o proyectos: se descarta todo lo guardado
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            self.limpiar()
+
+    def _buscar(self, cedula):
+        # Devuelve (cédula, encontrada, entrada, generación) sin tocar la base de datos.
+        # Una cédula inválida cuenta como encontrada e inexistente.
+        try:
+            cedula = int(cedula)
+        except (TypeError, ValueError):
+            return cedula, True, _NO_EXISTE, None
+        with self._lock:
+            entrada = self._entradas.get(cedula)
+            if entrada is not None:
+                self._entradas.move_to_end(cedula)
+                self.aciertos += 1
+                return cedula, True, entrada, None
+            self.fallos += 1
+            return cedula, False, None, self._generacion
+
+    def _buscar_proyecto(self):
+        with self._lock:
+            if self._proyecto_id is not None:
+                self.aciertos += 1
+                return self._proyecto_id, None
+            self.fallos += 1
+            return None, self._generacion
+
+    def _guardar_proyecto(self, proyecto_id, generacion):
+        with self._lock:
+            if generacion == self._generacion:
+                self._proyecto_id = proyecto_id
+
+    def _guardar(self, cedula, entrada, generacion=None):
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._entradas[cedula] = entrada
+            self._entradas.move_to_end(cedula)
+            if isinstance(entrada, EntradaRoster):
+                self._cedula_por_empleado[entrada.empleado_id] = cedula
+            while len(self._entradas) > self.tamano_maximo:
+                _, expulsada = self._entradas.popitem(last=False)
+                self.expulsiones += 1
+                if isinstance(expulsada, EntradaRoster):
+                    self._cedula_por_empleado.pop(expulsada.empleado_id, None)
+
+    def _cargar(self, cedula, fecha):
+        empleado = _consulta_empleado(cedula).first()
+        if empleado is None:
+            return _NO_EXISTE
+        return _entrada_roster(
+            cedula,
+            empleado,
+            _consulta_ultima_area(empleado['pk']).first(),
+            jornada_en_base(empleado['pk'], fecha),
+            fecha,
+        )
+
+    async def _acargar(self, cedula, fecha):
+        empleado = await _consulta_empleado(cedula).afirst()
+        if empleado is None:
+            return _NO_EXISTE
+        return _entrada_roster(
+            cedula,
+            empleado,
+            await _consulta_ultima_area(empleado['pk']).afirst(),
+            await ajornada_en_base(empleado['pk'], fecha),
+            fecha,
+        )
+
+
+# Consultas del roster, compartidas por las versiones síncrona y asíncrona
+
+def _consulta_empleado(cedula):
+    return Empleado.objects.filter(cedula=cedula).order_by('pk').values('pk', 'nombres')
+
+
+def _consulta_ultima_area(empleado_id):
+    return ControlDeIngreso.objects.filter(
+        cedula_id=empleado_id,
+        hora_entrada__isnull=False,
+    ).order_by('-fecha', '-hora_entrada').values_list('lugar_trabajo', flat=True)
+
+
+def _consulta_jornada(empleado_id, fecha):
+    return ControlDeIngreso.objects.filter(
+        cedula_id=empleado_id, fecha=fecha
+    ).order_by('pk').values_list('pk', 'hora_entrada', 'hora_salida')
+
+
+def _consulta_proyecto():
+    return Proyecto.objects.order_by('pk').values_list('pk', flat=True)
+
+
+def _resumir_jornada(registros):
+    # Mismo criterio que registrar_entrada_salida: el último registro sin salida es
+    # el turno abierto; un registro con entrada y salida completa la jornada
+    registro_abierto_id = None
+    completo = False
+    for registro_id, hora_entrada, hora_salida in registros:
+        if hora_salida is None:
+            registro_abierto_id = registro_id
+        elif hora_entrada is not None:
+            completo = True
+    return registro_abierto_id, completo
+
+
+def _entrada_roster(cedula, empleado, ultima_area, jornada, fecha):
+    registro_abierto_id, completo = jornada
+    return EntradaRoster(
+        empleado_id=empleado['pk'],
+        cedula=cedula,
+        nombres=empleado['nombres'],
+        ultima_area=ultima_area,
+        fecha=fecha,
+        registro_abierto_id=registro_abierto_id,
+        completo=completo,
+    )
+
+
+def jornada_en_base(empleado_id, fecha):
+    # Estado de la jornada de un empleado en un día, leído de la base de datos
+    return _resumir_jornada(_consulta_jornada(empleado_id, fecha))
+
+
+async def ajornada_en_base(empleado_id, fecha):
+    return _resumir_jornada([registro async for registro in _consulta_jornada(empleado_id, fecha)])
+
+
+roster = RosterCache()
@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from .models import ControlDeIngreso, Empleado, Proyecto
+from administracion.expansion import ExpandibleMixin
+from .models import ControlDeIngreso, Empleado, JornadaDiaria, OcupacionArea, Proyecto
 
-class ControlDeIngresoSerializer(serializers.ModelSerializer):
+class ControlDeIngresoSerializer(ExpandibleMixin, serializers.ModelSerializer):
     empleadoId = serializers.IntegerField(source='cedula.cedula', read_only=True)
     empleadoNombre = serializers.CharField(source='cedula.nombres', read_only=True)
     proyectoNombre = serializers.CharField(source='proyecto.nombre', read_only=True)
@@ -25,4 +26,30 @@ class ControlDeIngresoSerializer(serializers.ModelSerializer):
             'lugar_trabajo', #Este es el area de trabajo 
             'estado',
             'observacion',
-        ]
\ No newline at end of file
+        ]
+
+class OcupacionAreaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OcupacionArea
+        fields = ['lugar_trabajo', 'personas', 'actualizado']
+
+
+class JornadaDiariaSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    empleadoId = serializers.IntegerField(source='empleado.cedula', read_only=True)
+    empleadoNombre = serializers.CharField(source='empleado.nombres', read_only=True)
+    proyectoNombre = serializers.CharField(source='proyecto.nombre', read_only=True)
+
+    class Meta:
+        model = JornadaDiaria
+        fields = [
+            'id',
+            'empleado',
+            'empleadoId',
+            'empleadoNombre',
+            'proyecto',
+            'proyectoNombre',
+            'fecha',
+            'horas',
+            'turnos',
+            'turnos_abiertos',
+        ]
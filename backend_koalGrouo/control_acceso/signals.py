@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from administracion.models import Cargo, Empleado, Proyecto
+from .models import ControlDeIngreso, JornadaPendiente
+from .huellas import indice_huellas
+from .roster import roster
+from .sincronizacion import registrar_cambio
+
+
+@receiver([post_save, post_delete], sender=Empleado)
+def invalidar_roster_empleado(sender, instance, **kwargs):
+    # Se invalida por id (por si cambió la cédula) y por la cédula actual
+    # (por si estaba guardada como inexistente)
+    roster.invalidar_empleado(instance.pk)
+    if instance.cedula is not None:
+        roster.invalidar_cedula(instance.cedula)
+    transaction.on_commit(roster.publicar_cambio)
+
+
+@receiver(post_save, sender=Empleado)
+def actualizar_indice_huellas(sender, instance, **kwargs):
+    indice_huellas.actualizar(instance)
+    transaction.on_commit(indice_huellas.publicar_cambio)
+
+
+@receiver(post_delete, sender=Empleado)
+def eliminar_del_indice_huellas(sender, instance, **kwargs):
+    indice_huellas.eliminar(instance.pk)
+    transaction.on_commit(indice_huellas.publicar_cambio)
+
+
+@receiver([post_save, post_delete], sender=ControlDeIngreso)
+def invalidar_roster_registro(sender, instance, **kwargs):
+    roster.invalidar_empleado(instance.cedula_id)
+
+
+@receiver(post_delete, sender=ControlDeIngreso)
+def marcar_jornada_pendiente(sender, instance, **kwargs):
+    # Un borrado no deja marca de actualizado: se anota el día para el rollup de jornadas
+    JornadaPendiente.objects.get_or_create(fecha=instance.fecha)
+
+
+@receiver([post_save, post_delete], sender=Proyecto)
+def invalidar_roster_proyecto(sender, instance, **kwargs):
+    roster.invalidar_proyecto()
+    transaction.on_commit(roster.publicar_cambio)
+
+
+@receiver(post_save, sender=Empleado)
+@receiver(post_save, sender=Cargo)
+def registrar_cambio_roster(sender, instance, **kwargs):
+    registrar_cambio(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_delete, sender=Empleado)
+@receiver(post_delete, sender=Cargo)
+def registrar_lapida_roster(sender, instance, **kwargs):
+    registrar_cambio(sender._meta.model_name, instance.pk, eliminado=True)
@@ -0,0 +1,48 @@
+from django.db import transaction
+
+from administracion.models import Cargo, Empleado
+from .models import CambioRoster
+
+# Sincronización delta del roster para las terminales de portería.
+# Cada alta, cambio o borrado de Empleado/Cargo deja una fila en CambioRoster
+# (las señales están en signals.py). Solo se conserva el último cambio de cada
+# objeto, así la tabla no crece más que el roster más sus lápidas.
+# Con SQLite las escrituras se serializan, por lo que los ids se confirman en orden
+# y una terminal no puede saltarse un cambio que se confirme después de su token.
+
+CAMPOS = {
+    'empleado': (Empleado, ['id', 'cedula', 'nombres', 'estado', 'nivel_acceso', 'cargo_id']),
+    'cargo': (Cargo, ['id', 'nombre_cargo', 'nivel_acceso']),
+}
+
+LIMITE_POR_DEFECTO = 500
+LIMITE_MAXIMO = 5000
+
+
+def registrar_cambio(modelo, objeto_id, eliminado=False):
+    with transaction.atomic():
+        CambioRoster.objects.filter(modelo=modelo, objeto_id=objeto_id).delete()
+        CambioRoster.objects.create(modelo=modelo, objeto_id=objeto_id, eliminado=eliminado)
+
+
+def cambios_desde(token, limite=LIMITE_POR_DEFECTO):
+    # Devuelve los objetos cambiados y borrados después del token, en orden de cambio,
+    # junto con el token nuevo y si quedan más cambios por pedir
+    cambios = list(CambioRoster.objects.filter(pk__gt=token).order_by('pk')[:limite + 1])
+    hay_mas = len(cambios) > limite
+    cambios = cambios[:limite]
+
+    respuesta = {}
+    for modelo, (clase, campos) in CAMPOS.items():
+        vivos = [cambio.objeto_id for cambio in cambios if cambio.modelo == modelo and not cambio.eliminado]
+        eliminados = [cambio.objeto_id for cambio in cambios if cambio.modelo == modelo and cambio.eliminado]
+        filas = list(clase.objects.filter(pk__in=vivos).values(*campos)) if vivos else []
+        # Un objeto borrado después de leer los cambios se informa como eliminado
+        encontrados = {fila['id'] for fila in filas}
+        eliminados.extend(pk for pk in vivos if pk not in encontrados)
+        respuesta[f'{modelo}s'] = filas
+        respuesta[f'{modelo}s_eliminados'] = eliminados
+
+    respuesta['token'] = cambios[-1].pk if cambios else token
+    respuesta['hay_mas'] = hay_mas
+    return respuesta
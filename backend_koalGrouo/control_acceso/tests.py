@@ -1,3 +1,540 @@
-from django.test import TestCase
+import io
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from administracion.models import Cargo, Empleado, Proyecto
+from administracion.permisos import GRUPO_TERMINALES
+from . import huellas, jornadas, views_async
+from .huellas import TIPO, indice_huellas, precargar
+from .marcaciones import (
+    ENTRADA_REGISTRADA, JORNADA_TERMINADA, SALIDA_REGISTRADA, registrar_marcacion,
+)
+from .models import ControlDeIngreso, JornadaDiaria
+from .views import (
+    ControlDeIngresoViewSet, filtro_de_busqueda_con_cedula_empleado, ocupacion_por_area, sincronizar_roster,
+    subir_marcaciones_offline,
+)
+from . import roster as modulo_roster
+from .roster import roster
+
+# Caché en memoria para no usar (ni borrar) la de desarrollo
+CACHE_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def crear_empleado(cedula=1001, nombres='Ana Pérez'):
+    cargo, _ = Cargo.objects.get_or_create(nombre_cargo='Minero', defaults={'nivel_acceso': 'bajo'})
+    Proyecto.objects.get_or_create(nombre='Mina', defaults={'fecha_inicio': '2025-01-01'})
+    return Empleado.objects.create(cargo=cargo, cedula=cedula, nombres=nombres, nivel_acceso='bajo')
+
+
+def marcar(empleado, momento=None, lugar_trabajo='Mina Norte'):
+    return registrar_marcacion(empleado.cedula, empleado.nombres, 'Bien', lugar_trabajo, momento=momento)
+
+
+def registro_de(empleado, fecha, hora_entrada, hora_salida=None):
+    # Registro escrito por otro worker: bulk_create no dispara las señales que invalidan el roster
+    ControlDeIngreso.objects.bulk_create([ControlDeIngreso(
+        cedula=empleado, fecha=fecha, hora_entrada=hora_entrada, hora_salida=hora_salida,
+        proyecto=Proyecto.objects.first(), lugar_trabajo='Mina Norte',
+    )])
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class MarcacionTests(TestCase):
+
+    def setUp(self):
+        roster.limpiar()
+        self.empleado = crear_empleado()
+
+    def test_entrada_y_salida(self):
+        self.assertEqual(marcar(self.empleado), ENTRADA_REGISTRADA)
+        self.assertEqual(marcar(self.empleado), SALIDA_REGISTRADA)
+        self.assertEqual(marcar(self.empleado), JORNADA_TERMINADA)
+        self.assertEqual(ControlDeIngreso.objects.filter(hora_salida__isnull=False).count(), 1)
+
+    def test_turno_abierto_por_otro_worker_se_cierra(self):
+        # El roster de este proceso cree que el empleado no marcó hoy
+        self.assertEqual(roster.obtener(self.empleado.cedula, timezone.localdate()).jornada(timezone.localdate()), (None, False))
+        registro_de(self.empleado, timezone.localdate(), time(6, 0))
+
+        self.assertEqual(marcar(self.empleado), SALIDA_REGISTRADA)
+        registro = ControlDeIngreso.objects.get()
+        self.assertIsNotNone(registro.hora_salida)
+
+    def test_jornada_completa_en_otro_worker_no_abre_otro_turno(self):
+        roster.obtener(self.empleado.cedula, timezone.localdate())
+        registro_de(self.empleado, timezone.localdate(), time(6, 0), time(14, 0))
+
+        self.assertEqual(marcar(self.empleado), JORNADA_TERMINADA)
+        self.assertEqual(ControlDeIngreso.objects.count(), 1)
+
+    def test_marcacion_offline_de_otro_dia_no_cambia_el_roster(self):
+        hoy = timezone.localdate()
+        ayer = timezone.make_aware(datetime.combine(hoy - timedelta(days=1), time(7, 0)))
+        self.assertEqual(marcar(self.empleado), ENTRADA_REGISTRADA)
+
+        # Entrada y salida atrasadas de ayer, subidas por una terminal offline
+        self.assertEqual(marcar(self.empleado, ayer, 'Mina Sur'), ENTRADA_REGISTRADA)
+        self.assertEqual(marcar(self.empleado, ayer + timedelta(hours=8), 'Mina Sur'), SALIDA_REGISTRADA)
+
+        entrada = roster.obtener(self.empleado.cedula, hoy)
+        self.assertEqual(entrada.fecha, hoy)
+        self.assertEqual(entrada.ultima_area, 'Mina Norte')
+        self.assertIsNotNone(entrada.jornada(hoy)[0])
+
+        # La siguiente marcación en vivo cierra el turno de hoy
+        self.assertEqual(marcar(self.empleado), SALIDA_REGISTRADA)
+        self.assertEqual(ControlDeIngreso.objects.filter(fecha=hoy).count(), 1)
+        self.assertFalse(ControlDeIngreso.objects.filter(hora_salida__isnull=True).exists())
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class LoteMarcacionesTests(TestCase):
+
+    def setUp(self):
+        roster.limpiar()
+        self.empleado = crear_empleado()
+        self.lote = ControlDeIngresoViewSet.as_view({'post': 'registrar_entrada_salida_batch'}, permission_classes=[])
+
+    def marcacion(self, hora, cedula=None, **extra):
+        momento = timezone.make_aware(datetime.combine(timezone.localdate(), hora))
+        return {
+            'cedula': cedula or self.empleado.cedula, 'nombre': self.empleado.nombres, 'estado_salud': 'Bien',
+            'lugar_trabajo': 'Mina Norte', 'timestamp': momento.isoformat(), **extra,
+        }
+
+    def enviar(self, marcaciones):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.lote(APIRequestFactory().post('/', marcaciones, format='json'))
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return [(resultado['indice'], resultado['status']) for resultado in respuesta.data['resultados']]
+
+    def test_lote_en_orden_cronologico(self):
+        # El roster de este proceso ya tiene al empleado sin marcaciones
+        self.assertEqual(roster.obtener(self.empleado.cedula, timezone.localdate()).jornada(timezone.localdate()), (None, False))
+        resultados = self.enviar([
+            self.marcacion(time(15, 0)),
+            self.marcacion(time(7, 0)),
+            self.marcacion(time(16, 0)),
+            self.marcacion(time(7, 5), cedula=999),
+            self.marcacion(time(8, 0), timestamp='ayer'),
+        ])
+        # Cada resultado queda en la posición de su marcación; la de las 7:00 es la entrada
+        self.assertEqual(resultados, [(0, 200), (1, 201), (2, 409), (3, 404), (4, 400)])
+
+        registro = ControlDeIngreso.objects.get()
+        self.assertEqual((registro.hora_entrada, registro.hora_salida), (time(7, 0), time(15, 0)))
+        # bulk_create no dispara señales: el lote invalida el roster al confirmar
+        self.assertEqual(roster.obtener(self.empleado.cedula, timezone.localdate()).jornada(timezone.localdate()), (None, True))
+
+    def test_salida_de_un_turno_abierto_antes_del_lote(self):
+        self.assertEqual(marcar(self.empleado), ENTRADA_REGISTRADA)
+        self.assertEqual(self.enviar([self.marcacion(time(23, 59))]), [(0, 200)])
+        self.assertFalse(ControlDeIngreso.objects.filter(hora_salida__isnull=True).exists())
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class JornadasTests(TestCase):
+    lunes = date(2026, 1, 5)
+    martes = date(2026, 1, 6)
+
+    def setUp(self):
+        self.ana = crear_empleado()
+        self.luis = crear_empleado(1002, 'Luis Gómez')
+
+    def jornadas(self):
+        return sorted(JornadaDiaria.objects.values_list('empleado__nombres', 'fecha', 'horas', 'turnos', 'turnos_abiertos'))
+
+    def actualizar(self):
+        return jornadas.actualizar(margen=timedelta(0))
+
+    def test_turno_que_cruza_la_medianoche(self):
+        self.assertEqual(jornadas.horas_turno(time(22, 0), time(6, 30)), Decimal('8.5'))
+        self.assertIsNone(jornadas.horas_turno(time(22, 0), None))
+
+    def test_solo_se_recalculan_los_dias_cambiados(self):
+        registro_de(self.ana, self.lunes, time(6, 0), time(10, 0))
+        registro_de(self.ana, self.lunes, time(12, 0), time(16, 30))
+        registro_de(self.luis, self.lunes, time(22, 0), time(6, 0))
+        registro_de(self.ana, self.martes, time(6, 0))
+        self.assertEqual(self.actualizar(), [self.lunes, self.martes])
+        self.assertEqual(self.jornadas(), [
+            ('Ana Pérez', self.lunes, Decimal('8.50'), 2, 0),
+            ('Ana Pérez', self.martes, Decimal('0.00'), 1, 1),
+            ('Luis Gómez', self.lunes, Decimal('8.00'), 1, 0),
+        ])
+        self.assertEqual(self.actualizar(), [])
+
+        # Se cierra el turno del martes: solo ese día
+        abierto = ControlDeIngreso.objects.get(fecha=self.martes)
+        abierto.hora_salida = time(14, 0)
+        abierto.save()
+        self.assertEqual(self.actualizar(), [self.martes])
+        self.assertIn(('Ana Pérez', self.martes, Decimal('8.00'), 1, 0), self.jornadas())
+
+        # Un borrado no deja actualizado: el día queda pendiente por la señal
+        ControlDeIngreso.objects.get(cedula=self.luis).delete()
+        self.assertEqual(self.actualizar(), [self.lunes])
+        self.assertNotIn('Luis Gómez', [jornada[0] for jornada in self.jornadas()])
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class OcupacionTests(TestCase):
+
+    def setUp(self):
+        roster.limpiar()
+        self.ana = crear_empleado()
+        self.luis = crear_empleado(1002, 'Luis Gómez')
+        self.usuario = get_user_model().objects.create_user('supervisor', password='x', is_staff=True)
+
+    def ocupacion(self):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.usuario)
+        datos = ocupacion_por_area(request).data
+        return {area['lugar_trabajo']: area['personas'] for area in datos['areas'] if area['personas']}, datos['total']
+
+    def test_entradas_y_salidas_mueven_los_contadores(self):
+        marcar(self.ana)
+        marcar(self.luis, lugar_trabajo='Mina Sur')
+        self.assertEqual(self.ocupacion(), ({'Mina Norte': 1, 'Mina Sur': 1}, 2))
+        marcar(self.ana)
+        self.assertEqual(self.ocupacion(), ({'Mina Sur': 1}, 1))
+
+    def test_reconciliar_corrige_lo_escrito_por_otras_vias(self):
+        marcar(self.ana)
+        # Un turno cargado sin pasar por las marcaciones no suma
+        registro_de(self.luis, timezone.localdate(), time(6, 0))
+        self.assertEqual(self.ocupacion(), ({'Mina Norte': 1}, 1))
+
+        salida = io.StringIO()
+        call_command('reconciliar_ocupacion', stdout=salida)
+        self.assertIn('Mina Norte: 1 -> 2', salida.getvalue())
+        self.assertEqual(self.ocupacion(), ({'Mina Norte': 2}, 2))
+        salida = io.StringIO()
+        call_command('reconciliar_ocupacion', stdout=salida)
+        self.assertIn('ya coincidía', salida.getvalue())
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class BusquedaRegistrosTests(TestCase):
+
+    def setUp(self):
+        self.ana = crear_empleado()
+        self.luis = crear_empleado(1002, 'Luis Gómez')
+        self.usuario = get_user_model().objects.create_user('supervisor', password='x', is_staff=True)
+        # Tres días, dos turnos por día a la misma hora (desempata el id)
+        for dia in range(1, 4):
+            for empleado in (self.ana, self.luis):
+                registro_de(empleado, datetime(2026, 1, dia).date(), time(7, 0), time(15, 0))
+
+    def buscar(self, **parametros):
+        request = APIRequestFactory().get('/', parametros)
+        force_authenticate(request, user=self.usuario)
+        return filtro_de_busqueda_con_cedula_empleado(request)
+
+    def test_paginas_por_cursor_sin_repetir(self):
+        claves = []
+        cursor = None
+        while True:
+            respuesta = self.buscar(limite=4, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(respuesta.status_code, 200, respuesta.data)
+            self.assertLessEqual(len(respuesta.data['resultados']), 4)
+            claves += [(registro['fecha'], registro['id']) for registro in respuesta.data['resultados']]
+            cursor = respuesta.data['siguiente']
+            if cursor is None:
+                break
+        esperadas = sorted(ControlDeIngreso.objects.values_list('fecha', 'id'), reverse=True)
+        self.assertEqual(claves, [(fecha.isoformat(), pk) for fecha, pk in esperadas])
+
+    def test_filtros_y_ndjson(self):
+        respuesta = self.buscar(cedula=self.luis.cedula, desde='2026-01-02', formato='ndjson')
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        lineas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual([linea['fecha'] for linea in lineas], ['2026-01-03', '2026-01-02'])
+
+        respuesta = self.buscar(nombres='ana', hasta='2026-01-01')
+        self.assertEqual(len(respuesta.data['resultados']), 1)
+        for parametros in ({'cursor': 'no-es-un-cursor'}, {'desde': '2026-02-30'}, {'limite': 0}):
+            self.assertEqual(self.buscar(**parametros).status_code, 400, parametros)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class VistasAsincronasTests(TestCase):
+
+    def setUp(self):
+        roster.limpiar()
+        self.empleado = crear_empleado()
+        usuarios = get_user_model().objects
+        self.supervisor = usuarios.create_user('supervisor', password='x', is_staff=True)
+        self.operario = usuarios.create_user('operario', password='x')
+
+    def pedir(self, vista, usuario=None, datos=None):
+        encabezados = {'Authorization': f'Bearer {AccessToken.for_user(usuario)}'} if usuario else {}
+        fabrica = AsyncRequestFactory()
+        if datos is None:
+            request = fabrica.get('/', {'cedula': self.empleado.cedula}, headers=encabezados)
+        else:
+            request = fabrica.post('/', datos, content_type='application/json', headers=encabezados)
+        return vista(request)
+
+    async def test_marcaciones_como_la_vista_sincrona(self):
+        datos = {'cedula': self.empleado.cedula, 'nombre': self.empleado.nombres, 'estado_salud': 'Bien', 'lugar_trabajo': 'Mina Norte'}
+        for esperado in (ENTRADA_REGISTRADA, SALIDA_REGISTRADA, JORNADA_TERMINADA):
+            respuesta = await self.pedir(views_async.registrar_entrada_salida, self.supervisor, datos)
+            self.assertEqual((respuesta.status_code, json.loads(respuesta.content)['detail']), esperado)
+        self.assertEqual(await ControlDeIngreso.objects.filter(hora_salida__isnull=False).acount(), 1)
+
+        respuesta = await self.pedir(views_async.buscar_area_por_cedula, self.operario)
+        self.assertEqual(json.loads(respuesta.content), {'area': 'Mina Norte'})
+
+    async def test_autenticacion_y_permisos(self):
+        respuesta = await self.pedir(views_async.buscar_empleado_por_cedula)
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertIn('WWW-Authenticate', respuesta)
+        respuesta = await self.pedir(views_async.buscar_empleado_por_cedula, self.operario)
+        self.assertEqual(json.loads(respuesta.content), {'nombre': self.empleado.nombres})
+
+        respuesta = await self.pedir(views_async.registrar_entrada_salida, self.operario, {'cedula': self.empleado.cedula})
+        self.assertEqual(respuesta.status_code, 403)
+        respuesta = await self.pedir(views_async.registrar_entrada_salida, self.supervisor, {'cedula': self.empleado.cedula})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class RosterEntreWorkersTests(TestCase):
+    # Los cambios hechos en otro worker no disparan señales acá: solo llega la versión
+
+    def setUp(self):
+        cache.clear()
+        roster.limpiar()
+        parche = mock.patch.object(modulo_roster, 'REVISION', 0)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.hoy = timezone.localdate()
+        self.empleado = crear_empleado()
+
+    def otro_worker(self):
+        cache.set(modulo_roster.CLAVE_VERSION, 'de otro worker', None)
+
+    def test_cedula_dada_de_alta_en_otro_worker(self):
+        self.assertIsNone(roster.obtener(3001, self.hoy))
+        with self.assertNumQueries(0):
+            self.assertIsNone(roster.obtener(3001, self.hoy))
+
+        Empleado.objects.bulk_create([Empleado(cargo=self.empleado.cargo, cedula=3001, nombres='Luis Gómez', nivel_acceso='bajo')])
+        self.otro_worker()
+        self.assertEqual(roster.obtener(3001, self.hoy).nombres, 'Luis Gómez')
+
+    def test_empleado_renombrado_y_borrado_en_otro_worker(self):
+        self.assertEqual(roster.obtener(self.empleado.cedula, self.hoy).nombres, 'Ana Pérez')
+        Empleado.objects.filter(pk=self.empleado.pk).update(nombres='Ana María Pérez')
+        self.otro_worker()
+        self.assertEqual(roster.obtener(self.empleado.cedula, self.hoy).nombres, 'Ana María Pérez')
+
+        Empleado.objects.filter(pk=self.empleado.pk).delete()
+        cache.set(modulo_roster.CLAVE_VERSION, 'otra vez', None)
+        self.assertIsNone(roster.obtener(self.empleado.cedula, self.hoy))
+
+    def test_el_cambio_propio_se_publica_al_confirmar(self):
+        roster.obtener(self.empleado.cedula, self.hoy)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empleado.nombres = 'Ana P.'
+            self.empleado.save()
+        self.assertIsNotNone(cache.get(modulo_roster.CLAVE_VERSION))
+        # La versión propia no vacía el roster de este worker
+        roster.obtener(self.empleado.cedula, self.hoy)
+        with self.assertNumQueries(0):
+            self.assertEqual(roster.obtener(self.empleado.cedula, self.hoy).nombres, 'Ana P.')
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class IndiceHuellasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        indice_huellas.invalidar()
+        self.addCleanup(indice_huellas.invalidar)
+        self.plantillas = np.random.default_rng(7).standard_normal((3, 64)).astype(TIPO)
+        self.empleados = [crear_empleado(cedula=2000 + i, nombres=f'Empleado {i}') for i in range(3)]
+        for empleado, plantilla in zip(self.empleados, self.plantillas):
+            empleado.huella = plantilla.tobytes()
+            empleado.save()
+
+    def test_precargar_evita_la_carga_en_la_primera_identificacion(self):
+        precargar()
+        with self.assertNumQueries(0):
+            resultado = indice_huellas.identificar(self.plantillas[1].tobytes())
+        self.assertEqual(resultado[:3], (self.empleados[1].pk, 2001, 'Empleado 1'))
+
+    def test_huella_desconocida(self):
+        precargar()
+        desconocida = np.random.default_rng(8).standard_normal(64).astype(TIPO)
+        self.assertIsNone(indice_huellas.identificar(desconocida.tobytes()))
+
+    def test_huella_registrada_en_otro_worker(self):
+        precargar()
+        nueva = np.random.default_rng(9).standard_normal(64).astype(TIPO)
+        # Alta hecha por otro worker: acá no llega la señal, solo la versión compartida
+        Empleado.objects.bulk_create([Empleado(
+            cargo=self.empleados[0].cargo, cedula=2100, nombres='Nuevo', nivel_acceso='bajo', huella=nueva.tobytes(),
+        )])
+        cache.set(huellas.CLAVE_VERSION, 'de otro worker', None)
+        with mock.patch.object(huellas, 'REVISION', 0):
+            self.assertEqual(indice_huellas.identificar(nueva.tobytes())[1:3], (2100, 'Nuevo'))
+            with self.assertNumQueries(0):
+                indice_huellas.identificar(nueva.tobytes())
+
+    def test_alta_local_publica_la_version(self):
+        precargar()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empleados[0].huella = self.plantillas[2].tobytes()
+            self.empleados[0].save()
+        self.assertIsNotNone(cache.get(huellas.CLAVE_VERSION))
+        with mock.patch.object(huellas, 'REVISION', 0), self.assertNumQueries(0):
+            indice_huellas.identificar(self.plantillas[0].tobytes())
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class TerminalesTests(TestCase):
+
+    def setUp(self):
+        self.empleado = crear_empleado()
+        usuarios = get_user_model().objects
+        self.terminal = usuarios.create_user('terminal-1', password='x')
+        self.terminal.groups.add(Group.objects.get(name=GRUPO_TERMINALES))
+        self.operario = usuarios.create_user('operario', password='x')
+
+    def pedir(self, vista, usuario, metodo='get', datos=None):
+        fabrica = APIRequestFactory()
+        request = fabrica.post('/', datos, format='json') if metodo == 'post' else fabrica.get('/', datos)
+        force_authenticate(request, user=usuario)
+        return vista(request)
+
+    def test_solo_las_terminales_sincronizan_el_roster(self):
+        respuesta = self.pedir(sincronizar_roster, self.terminal, datos={'token': 0})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(self.empleado.pk, [empleado['id'] for empleado in respuesta.data['empleados']])
+        self.assertEqual(self.pedir(sincronizar_roster, self.operario).status_code, 403)
+
+    def test_solo_las_terminales_suben_marcaciones(self):
+        lote = {'terminal': 'T1', 'marcaciones': [{
+            'id_local': 'a1', 'cedula': self.empleado.cedula, 'nombre': self.empleado.nombres,
+            'estado_salud': 'Bien', 'lugar_trabajo': 'Mina Norte', 'timestamp': timezone.now().isoformat(),
+        }]}
+        self.assertEqual(self.pedir(subir_marcaciones_offline, self.operario, 'post', lote).status_code, 403)
+        self.assertFalse(ControlDeIngreso.objects.exists())
+
+        respuesta = self.pedir(subir_marcaciones_offline, self.terminal, 'post', lote)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['resultados'][0]['status'], ENTRADA_REGISTRADA[0])
+        self.assertEqual(ControlDeIngreso.objects.count(), 1)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class DatosSinteticosTests(TestCase):
+
+    def test_sin_base_dedicada_no_escribe(self):
+        with self.assertRaisesMessage(CommandError, 'DATOS_SINTETICOS'):
+            call_command('generar_datos_sinteticos', empleados=5, ingresos=40, gases=0, stdout=io.StringIO())
+        self.assertFalse(Empleado.objects.exists())
+        self.assertFalse(ControlDeIngreso.objects.exists())
+
+    def test_genera_jornadas_de_los_ingresos(self):
+        call_command('generar_datos_sinteticos', empleados=5, ingresos=40, gases=0, forzar=True, stdout=io.StringIO())
+        self.assertEqual(ControlDeIngreso.objects.count(), 40)
+        turnos = sum(JornadaDiaria.objects.values_list('turnos', flat=True))
+        self.assertEqual(turnos, 40)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class MarcacionesSimultaneasTests(TransactionTestCase):
+
+    def setUp(self):
+        roster.limpiar()
+        self.empleado = crear_empleado()
+
+    def test_dos_marcaciones_simultaneas(self):
+        # Las dos ven el roster sin registros: una abre el turno y la otra lo cierra
+        roster.obtener(self.empleado.cedula, timezone.localdate())
+        resultados = []
+        barrera = threading.Barrier(2)
+
+        def hilo():
+            try:
+                barrera.wait()
+                resultados.append(marcar(self.empleado))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo) for _ in range(2)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        self.assertCountEqual(resultados, [ENTRADA_REGISTRADA, SALIDA_REGISTRADA])
+        registro = ControlDeIngreso.objects.get()
+        self.assertIsNotNone(registro.hora_salida)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class MigracionTurnosDuplicadosTests(TransactionTestCase):
+    # 0002 cierra las entradas abiertas duplicadas en vez de borrarlas
+
+    antes = [('control_acceso', '0001_initial')]
+    despues = [('control_acceso', '0002_indices_y_turno_abierto_unico')]
+
+    def migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_cierra_duplicados_sin_borrar(self):
+        apps = self.migrar(self.antes)
+        Cargo = apps.get_model('administracion', 'Cargo')
+        Empleado = apps.get_model('administracion', 'Empleado')
+        Proyecto = apps.get_model('administracion', 'Proyecto')
+        ControlDeIngreso = apps.get_model('control_acceso', 'ControlDeIngreso')
+        cargo = Cargo.objects.create(nombre_cargo='Minero', nivel_acceso='bajo')
+        empleado = Empleado.objects.create(cargo=cargo, cedula=1, nombres='Ana', nivel_acceso='bajo')
+        proyecto = Proyecto.objects.create(nombre='Mina', fecha_inicio='2025-01-01')
+        ids = [
+            ControlDeIngreso.objects.create(
+                cedula=empleado, fecha='2025-03-01', hora_entrada=hora, proyecto=proyecto, observacion=observacion,
+            ).pk
+            for hora, observacion in [(time(6, 0), None), (time(6, 1), 'doble marcación'), (time(6, 2), None)]
+        ]
+
+        apps = self.migrar(self.despues)
+        ControlDeIngreso = apps.get_model('control_acceso', 'ControlDeIngreso')
+        registros = {registro.pk: registro for registro in ControlDeIngreso.objects.all()}
+        self.assertEqual(sorted(registros), ids)
+        self.assertIsNone(registros[ids[2]].hora_salida)
+        for pk in ids[:2]:
+            self.assertEqual(registros[pk].hora_salida, registros[pk].hora_entrada)
+            self.assertEqual(registros[pk].estado, 'duplicado')
+        self.assertTrue(registros[ids[1]].observacion.startswith('doble marcación\n'))
+
+        apps = self.migrar(self.antes)
+        ControlDeIngreso = apps.get_model('control_acceso', 'ControlDeIngreso')
+        self.assertEqual(ControlDeIngreso.objects.filter(hora_salida__isnull=True).count(), 3)
+        self.assertEqual(ControlDeIngreso.objects.get(pk=ids[1]).observacion, 'doble marcación')
@@ -1,12 +1,22 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from .views import ControlDeIngresoViewSet, buscar_empleado_por_cedula,buscar_area_por_cedula,filtro_de_busqueda_con_cedula_empleado
+from . import views_async
+from .views import ControlDeIngresoViewSet, JornadaDiariaViewSet, buscar_empleado_por_cedula,buscar_area_por_cedula,filtro_de_busqueda_con_cedula_empleado,estadisticas_roster,ocupacion_por_area,sincronizar_roster,subir_marcaciones_offline
 
 router = DefaultRouter()
 router.register(r'ControlDeAcceso', ControlDeIngresoViewSet)
+router.register(r'jornadas', JornadaDiariaViewSet)
 
 urlpatterns = router.urls + [
     path('buscar-empleado/', buscar_empleado_por_cedula, name='buscar-empleado'),
     path('buscar_area_por_cedula/', buscar_area_por_cedula, name='buscar_area_por_cedula'),
     path('filtro_de_busqueda/', filtro_de_busqueda_con_cedula_empleado, name='filtro_de_busqueda'),
+    path('ocupacion/', ocupacion_por_area, name='ocupacion'),
+    path('sincronizacion/roster/', sincronizar_roster, name='sincronizar_roster'),
+    path('sincronizacion/marcaciones/', subir_marcaciones_offline, name='subir_marcaciones_offline'),
+    # Versiones asíncronas para servir con ASGI (ver views_async.py)
+    path('async/registrar-entrada-salida/', views_async.registrar_entrada_salida, name='registrar-entrada-salida-async'),
+    path('async/buscar-empleado/', views_async.buscar_empleado_por_cedula, name='buscar-empleado-async'),
+    path('async/buscar_area_por_cedula/', views_async.buscar_area_por_cedula, name='buscar_area_por_cedula-async'),
+    path('roster/estadisticas/', estadisticas_roster, name='estadisticas_roster'),
 ]
\ No newline at end of file
@@ -1,17 +1,38 @@
+import base64
+import binascii
+from decimal import Decimal
+
 from rest_framework import viewsets, status
-from rest_framework.decorators import action,api_view
+from rest_framework.decorators import action,api_view,permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from .models import ControlDeIngreso, Empleado, Proyecto
-from .serializers import ControlDeIngresoSerializer
-from administracion.permisos import EsSupervisor,EsAdministrador
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+from .models import ControlDeIngreso, Empleado, JornadaDiaria, MarcacionSincronizada, OcupacionArea
+from .serializers import ControlDeIngresoSerializer, JornadaDiariaSerializer, OcupacionAreaSerializer
+from administracion.expansion import ConsultaExpandibleMixin
+from administracion.exportacion import ExportableMixin
+from administracion.permisos import EsSupervisor,EsAdministrador,EsTerminal
+from .huellas import indice_huellas
+from . import ocupacion, sincronizacion
+from .marcaciones import registrar_marcacion
+from .roster import roster
 
-class ControlDeIngresoViewSet(viewsets.ModelViewSet):
+class ControlDeIngresoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     # ViewSet para manejar el control de ingreso de empleados
     queryset = ControlDeIngreso.objects.all()
     serializer_class = ControlDeIngresoSerializer
     permission_classes = [EsSupervisor ,EsAdministrador]
+    columnas_exportacion = {
+        'empleadoCedula': 'cedula__cedula',
+        'empleadoNombre': 'cedula__nombres',
+        'proyectoNombre': 'proyecto__nombre',
+    }
 
     @action(detail=False, methods=['post'], url_path='registrar-entrada-salida')
     # -Si el empleado ya tiene una entrada hoy sin salida, se registra la salida.
@@ -31,60 +52,255 @@ class ControlDeIngresoViewSet(viewsets.ModelViewSet):
         if not (cedula and nombre and estado_salud and lugar_trabajo):
             return Response({'detail': 'Datos obligatorios.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        #Buscar el empleado por cédula y nombre
+        codigo, detalle = registrar_marcacion(cedula, nombre, estado_salud, lugar_trabajo, observacion)
+        return Response({'detail': detalle}, status=codigo)
+
+    @action(detail=False, methods=['post'], url_path='identificar-huella')
+    # Identifica al empleado comparando la huella leída contra todas las plantillas
+    # registradas (1:N) y con ese empleado registra la entrada o la salida.
+
+    def identificar_huella(self, request):
+
+        huella = request.data.get('huella') # Plantilla leída por el lector, en base64
+        estado_salud = request.data.get('estado_salud')
+        lugar_trabajo = request.data.get('lugar_trabajo')
+        observacion = request.data.get('observacion')
+
+        if not (huella and estado_salud and lugar_trabajo):
+            return Response({'detail': 'Datos obligatorios.'}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            empleado = Empleado.objects.get(cedula=cedula, nombres=nombre)
-        except Empleado.DoesNotExist:
-            return Response({'detail': 'Empleado no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            coincidencia = indice_huellas.identificar(base64.b64decode(huella, validate=True))
+        except (binascii.Error, TypeError, ValueError):
+            return Response({'detail': 'Huella inválida.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if coincidencia is None:
+            return Response({'detail': 'Huella no reconocida.'}, status=status.HTTP_404_NOT_FOUND)
+
+        _, cedula, nombres, puntaje = coincidencia
+        codigo, detalle = registrar_marcacion(cedula, nombres, estado_salud, lugar_trabajo, observacion)
+        return Response(
+            {'detail': detalle, 'cedula': cedula, 'nombre': nombres, 'puntaje': round(puntaje, 4)},
+            status=codigo,
+        )
+
+    @action(detail=False, methods=['post'], url_path='registrar-entrada-salida/batch')
+    # Recibe una lista de marcaciones de los torniquetes y las procesa en bloque:
+    # una sola consulta para los empleados, una para los registros del día y
+    # escritura con bulk_create / bulk_update dentro de una transacción.
+    # Cada marcación recibe el mismo código que devolvería el endpoint individual
+    # (201 entrada, 200 salida, 404 empleado no encontrado, 409 día terminado).
+
+    def registrar_entrada_salida_batch(self, request):
+
+        marcaciones = request.data
+        if not isinstance(marcaciones, list) or not marcaciones:
+            return Response({'detail': 'Se espera una lista de marcaciones.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultados = [None] * len(marcaciones)
+        validas = []
+
+        # Validar cada marcación y calcular su fecha/hora local
+        for indice, marcacion in enumerate(marcaciones):
+            if not isinstance(marcacion, dict):
+                resultados[indice] = _resultado_marcacion(indice, None, status.HTTP_400_BAD_REQUEST, 'Datos obligatorios.')
+                continue
+            cedula = marcacion.get('cedula')
+            if not (cedula and marcacion.get('nombre') and marcacion.get('estado_salud') and marcacion.get('lugar_trabajo')):
+                resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_400_BAD_REQUEST, 'Datos obligatorios.')
+                continue
+            try:
+                int(cedula)
+            except (TypeError, ValueError):
+                resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_400_BAD_REQUEST, 'Cédula inválida.')
+                continue
+            momento = _parsear_timestamp(marcacion.get('timestamp'))
+            if momento is None:
+                resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_400_BAD_REQUEST, 'Timestamp inválido.')
+                continue
+            validas.append((momento, indice, marcacion))
+
+        # Las marcaciones se aplican en orden cronológico, como si llegaran una a una
+        validas.sort(key=lambda item: (item[0], item[1]))
+
+        # 1. Resolver todos los empleados en una sola consulta
+        cedulas = {int(marcacion['cedula']) for _, _, marcacion in validas}
+        empleados = {
+            (empleado.cedula, empleado.nombres): empleado
+            for empleado in Empleado.objects.filter(cedula__in=cedulas)
+        }
+
+        # 2. Traer los registros existentes de esos empleados en las fechas involucradas
+        fechas = {momento.date() for momento, _, _ in validas}
+        completos = set()
+        abiertos = {}
+        if empleados and fechas:
+            existentes = ControlDeIngreso.objects.filter(
+                cedula__in=[empleado.pk for empleado in empleados.values()],
+                fecha__in=fechas,
+            ).order_by('id')
+            for registro in existentes:
+                clave = (registro.cedula_id, registro.fecha)
+                if registro.hora_salida is None:
+                    abiertos[clave] = registro
+                elif registro.hora_entrada is not None:
+                    completos.add(clave)
+
+        proyecto_id = None
+        nuevos = []
+        actualizados = {}
+
+        # 3. Decidir entrada o salida para cada marcación
+        for momento, indice, marcacion in validas:
+            cedula = marcacion['cedula']
+            empleado = empleados.get((int(cedula), marcacion['nombre']))
+            if empleado is None:
+                resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_404_NOT_FOUND, 'Empleado no encontrado.')
+                continue
+
+            clave = (empleado.pk, momento.date())
+            if clave in completos:
+                resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_409_CONFLICT, 'El empleado ya terminó su dia de trabajo')
+                continue
+
+            registro = abiertos.pop(clave, None)
+            if registro:
+                # Registrar la salida sobre la entrada abierta (existente o creada en este lote)
+                registro.hora_salida = momento.time()
+                registro.estado_salud_Salida = marcacion['estado_salud']
+                registro.actualizado = timezone.now()
+                if registro.pk:
+                    actualizados[registro.pk] = registro
+                completos.add(clave)
+                resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_200_OK, 'Salida registrada correctamente.')
+                continue
 
-        
-        #Obtiene la fecha actual
-        hoy = timezone.localdate()
-        
-         # 1. Buscar si ya existe un registro COMPLETO para el empleado hoy (entrada y salida)
-        registro_completo_hoy = ControlDeIngreso.objects.filter(
-            cedula=empleado,
-            fecha =hoy ,
-            hora_entrada__isnull=False,
-            hora_salida__isnull=False
-        ).exists()
-        
-        # Si ya está registrado con su entrada y salida en el día de hoy
-        if registro_completo_hoy:
-            return Response (
-                {'detail': 'El empleado ya terminó su dia de trabajo'}, status= status.HTTP_409_CONFLICT
-            )
-        
-        #Buscar si ya existe un registro de entrada para el empleado hoy sin salida
-        registro = ControlDeIngreso.objects.filter(
-            cedula=empleado,
-            fecha=hoy,
-            hora_salida__isnull=True
-        ).last()
-
-        if registro:
-            # Si ya existe un registro de entrada sin salida , registrar la salida
-            registro.hora_salida = timezone.localtime().time()
-            registro.estado_salud_Salida = estado_salud
-            registro.save()
-            return Response({'detail': 'Salida registrada correctamente.'}, status=status.HTTP_200_OK)
-        else:
             # Registrar entrada
-            #Si no existe registrar una nueva  entrada 
-            proyecto = Proyecto.objects.first()
-            if not proyecto:
-                return Response({'detail': 'No hay proyectos disponibles para asignar.'}, status=status.HTTP_400_BAD_REQUEST)
-            ControlDeIngreso.objects.create(
+            if proyecto_id is None:
+                proyecto_id = roster.proyecto_por_defecto_id()
+                if not proyecto_id:
+                    resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_400_BAD_REQUEST, 'No hay proyectos disponibles para asignar.')
+                    continue
+            registro = ControlDeIngreso(
                 cedula=empleado,
-                fecha=hoy,
-                hora_entrada=timezone.localtime().time(),
-                estado_salud_entrada=estado_salud,
-                proyecto=proyecto,
-                lugar_trabajo=lugar_trabajo,
-                observacion=observacion
+                fecha=momento.date(),
+                hora_entrada=momento.time(),
+                estado_salud_entrada=marcacion['estado_salud'],
+                proyecto_id=proyecto_id,
+                lugar_trabajo=marcacion['lugar_trabajo'],
+                observacion=marcacion.get('observacion'),
             )
-            return Response({'detail': 'Entrada registrada correctamente.'}, status=status.HTTP_201_CREATED)
-        
+            nuevos.append(registro)
+            abiertos[clave] = registro
+            resultados[indice] = _resultado_marcacion(indice, cedula, status.HTTP_201_CREATED, 'Entrada registrada correctamente.')
+
+        # 4. Escribir todo el lote en una sola transacción
+        try:
+            self._guardar_lote(nuevos, actualizados)
+        except IntegrityError:
+            # Otra marcación abrió un turno mientras se procesaba el lote:
+            # no se escribe nada y el torniquete debe reenviar el lote
+            return Response(
+                {'detail': 'Conflicto con marcaciones simultáneas, reenvíe el lote.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response({'resultados': resultados}, status=status.HTTP_200_OK)
+
+    def _guardar_lote(self, nuevos, actualizados):
+        with transaction.atomic():
+            if nuevos:
+                ControlDeIngreso.objects.bulk_create(nuevos)
+            if actualizados:
+                ControlDeIngreso.objects.bulk_update(
+                    list(actualizados.values()), ['hora_salida', 'estado_salud_Salida', 'actualizado']
+                )
+            # Ocupación: +1 por cada entrada que queda abierta, -1 por cada turno existente cerrado
+            cambios = {}
+            for registro in nuevos:
+                if registro.hora_salida is None:
+                    cambios[registro.lugar_trabajo] = cambios.get(registro.lugar_trabajo, 0) + 1
+            for registro in actualizados.values():
+                cambios[registro.lugar_trabajo] = cambios.get(registro.lugar_trabajo, 0) - 1
+            ocupacion.aplicar_cambios(cambios)
+            # bulk_create/bulk_update no disparan señales: invalidar el roster a mano
+            empleados_afectados = {registro.cedula_id for registro in nuevos}
+            empleados_afectados.update(registro.cedula_id for registro in actualizados.values())
+            transaction.on_commit(lambda: [roster.invalidar_empleado(pk) for pk in empleados_afectados])
+
+
+class JornadaDiariaViewSet(ExportableMixin, viewsets.ReadOnlyModelViewSet):
+
+    # Horas trabajadas por empleado, proyecto y día desde la tabla materializada
+    # (ver jornadas.py y el comando actualizar_jornadas).
+    # Filtros: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&cedula=123&proyecto=1
+    queryset = JornadaDiaria.objects.all()
+    serializer_class = JornadaDiariaSerializer
+    permission_classes = [EsSupervisor ,EsAdministrador]
+    columnas_exportacion = {
+        'empleadoCedula': 'empleado__cedula',
+        'empleadoNombre': 'empleado__nombres',
+        'proyectoNombre': 'proyecto__nombre',
+    }
+
+    def get_queryset(self):
+        jornadas = JornadaDiaria.objects.select_related('empleado', 'proyecto').order_by('-fecha', 'empleado_id')
+        parametros = self.request.query_params
+        try:
+            if parametros.get('desde'):
+                jornadas = jornadas.filter(fecha__gte=_parsear_fecha(parametros['desde']))
+            if parametros.get('hasta'):
+                jornadas = jornadas.filter(fecha__lte=_parsear_fecha(parametros['hasta']))
+            if parametros.get('cedula'):
+                jornadas = jornadas.filter(empleado__cedula=int(parametros['cedula']))
+            if parametros.get('proyecto'):
+                jornadas = jornadas.filter(proyecto_id=int(parametros['proyecto']))
+        except ValueError as error:
+            raise ValidationError({'detail': str(error)})
+        return jornadas
+
+    @action(detail=False, methods=['get'])
+    # Total de horas por empleado en el rango pedido, sumado en la base de datos
+
+    def resumen(self, request):
+        totales = (
+            self.get_queryset()
+            .order_by()
+            .values('empleado__cedula', 'empleado__nombres')
+            .annotate(horas=Sum('horas'), turnos=Sum('turnos'), turnos_abiertos=Sum('turnos_abiertos'))
+            .order_by('empleado__nombres')
+        )
+        return Response([
+            {
+                'empleadoId': fila['empleado__cedula'],
+                'empleadoNombre': fila['empleado__nombres'],
+                'horas': str(Decimal(fila['horas']).quantize(Decimal('0.01'))),
+                'turnos': fila['turnos'],
+                'turnos_abiertos': fila['turnos_abiertos'],
+            }
+            for fila in totales
+        ])
+
+
+def _parsear_timestamp(valor):
+    # Convierte el timestamp de la marcación a fecha/hora local.
+    # Si el torniquete no lo envía se usa la hora actual del servidor.
+    if not valor:
+        return timezone.localtime()
+    try:
+        momento = parse_datetime(str(valor))
+    except ValueError:
+        return None
+    if momento is None:
+        return None
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return timezone.localtime(momento)
+
+
+def _resultado_marcacion(indice, cedula, codigo, detalle):
+    return {'indice': indice, 'cedula': cedula, 'status': codigo, 'detail': detalle}
+
     
 @api_view(['GET'])
 
@@ -101,16 +317,15 @@ def buscar_empleado_por_cedula(request):
     ## indicando que la cédula es requerida.
     if not cedula :
         return Response({'detail': 'Cédula requerida'},status=400)
-    try:
-        ## Se intenta buscar en la base de datos un empleado con la cédula dada.
-        ## Si no se encuentra, se lanza la excepción Empleado.DoesNotExist.
-        empleado =Empleado.objects.get(cedula=cedula) 
-        ## Si se encuentra el empleado, se devuelve su nombre en la respuesta.
-        return Response ({'nombre': empleado.nombres})
-    except Empleado.DoesNotExist:
+    ## Se busca el empleado con la cédula dada en el roster en caché
+    ## (solo consulta la base de datos la primera vez).
+    empleado = roster.obtener(cedula, timezone.localdate())
+    if empleado is None:
         ## Si no se encuentra ningún empleado con esa cédula,
         ## se devuelve un error 404 (Not Found) con un mensaje.
         return Response({'detail': 'La cedula no coincide con el nombre.'}, status=404)
+    ## Si se encuentra el empleado, se devuelve su nombre en la respuesta.
+    return Response ({'nombre': empleado.nombres})
     
 @api_view(['GET'])
 
@@ -121,45 +336,215 @@ def buscar_area_por_cedula(request):
     
     if not cedula:
         return Response({'detail': 'Cédula requerida'}, status=400)
-    try:
-        #Busca el empleado en la base de datos usando la cédula 
-        empleado = Empleado.objects.get(cedula=cedula)
-        
-        #Busca el último registro de entrada (hora_entrada no nula) de ese empleado,
-        #ordenando por fecha y hora de entrada descendente 
-        
-        ultimo_registro = ControlDeIngreso.objects.filter(
-            cedula=empleado,
-            hora_entrada__isnull= False 
-        ).order_by('-fecha', '-hora_entrada').first()
-        
-        if ultimo_registro and ultimo_registro.lugar_trabajo:
-            return Response({'area':ultimo_registro.lugar_trabajo})
-        else:
-            # Si no encuentra un área previa , retorna un error 404
-            return Response({'detail':'No se encontró un área de trabajo previa para este empleado'}, status=404)
-        
-    except Empleado.DoesNotExist:
+    #Busca el empleado en el roster en caché usando la cédula
+    empleado = roster.obtener(cedula, timezone.localdate())
+    if empleado is None:
         # Si la cédula no corresponde a ningún empleado, retorna un error 404
         return Response({'detail': 'La cédula no coincide con ningún empleado.'}, status=404)
+
+    #El roster guarda el área del último registro de entrada (hora_entrada no nula),
+    #ordenado por fecha y hora de entrada descendente
+    if empleado.ultima_area:
+        return Response({'area': empleado.ultima_area})
+    # Si no encuentra un área previa , retorna un error 404
+    return Response({'detail':'No se encontró un área de trabajo previa para este empleado'}, status=404)
     
+@api_view(['GET'])
+@permission_classes([EsAdministrador])
+
+def estadisticas_roster(request):
+    # Contadores de aciertos/fallos del roster en caché de este proceso
+    return Response(roster.estadisticas())
+
+@api_view(['GET'])
+
+# Ocupación actual de cada lugar de trabajo: lee la tabla de contadores,
+# una fila por área, sin recorrer los registros de ingreso.
+
+def ocupacion_por_area(request):
+    areas = OcupacionArea.objects.order_by('lugar_trabajo')
+    serializer = OcupacionAreaSerializer(areas, many=True)
+    total = sum(area['personas'] for area in serializer.data)
+    return Response({'areas': serializer.data, 'total': total})
+
+@api_view(['GET'])
+@permission_classes([EsTerminal | EsAdministrador])
+
+# Sincronización delta del roster para terminales offline.
+# La terminal envía el token de su última sincronización (0 la primera vez) y recibe
+# solo los empleados y cargos que cambiaron o se borraron desde entonces:
+#   ?token=1234&limite=500
+# Si hay_mas es verdadero debe volver a pedir con el token nuevo.
+
+def sincronizar_roster(request):
+    try:
+        token = int(request.GET.get('token', 0))
+        limite = min(int(request.GET.get('limite', sincronizacion.LIMITE_POR_DEFECTO)), sincronizacion.LIMITE_MAXIMO)
+    except ValueError:
+        return Response({'detail': 'Token o límite inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+    if token < 0 or limite < 1:
+        return Response({'detail': 'Token o límite inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(sincronizacion.cambios_desde(token, limite))
+
+@api_view(['POST'])
+@permission_classes([EsTerminal | EsAdministrador])
+
+# Recibe las marcaciones que una terminal guardó mientras estuvo sin conexión y las
+# aplica en orden cronológico con la misma lógica de registrar_entrada_salida:
+#   {"terminal": "T1", "marcaciones": [{"id_local": "...", "cedula": ..., "nombre": ...,
+#     "estado_salud": ..., "lugar_trabajo": ..., "timestamp": ...}, ...]}
+# Cada marcación se guarda junto con su resultado (terminal, id_local), así reenviar
+# el mismo lote después de un corte devuelve los resultados anteriores sin repetirla.
+
+def subir_marcaciones_offline(request):
+    terminal = request.data.get('terminal')
+    marcaciones = request.data.get('marcaciones')
+    if not terminal or not isinstance(marcaciones, list):
+        return Response({'detail': 'Datos obligatorios.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    resultados = [None] * len(marcaciones)
+    validas = []
+    for indice, marcacion in enumerate(marcaciones):
+        if not isinstance(marcacion, dict) or not marcacion.get('id_local'):
+            resultados[indice] = {'id_local': None, 'status': status.HTTP_400_BAD_REQUEST, 'detail': 'id_local requerido.'}
+            continue
+        id_local = str(marcacion['id_local'])
+        if not (marcacion.get('cedula') and marcacion.get('nombre') and marcacion.get('estado_salud') and marcacion.get('lugar_trabajo')):
+            resultados[indice] = {'id_local': id_local, 'status': status.HTTP_400_BAD_REQUEST, 'detail': 'Datos obligatorios.'}
+            continue
+        momento = _parsear_timestamp(marcacion.get('timestamp'))
+        if momento is None:
+            resultados[indice] = {'id_local': id_local, 'status': status.HTTP_400_BAD_REQUEST, 'detail': 'Timestamp inválido.'}
+            continue
+        validas.append((momento, indice, id_local, marcacion))
+
+    # Resultados de marcaciones que ya se habían recibido en un envío anterior
+    procesadas = {
+        id_local: (codigo, detalle)
+        for id_local, codigo, detalle in MarcacionSincronizada.objects.filter(
+            terminal=terminal, id_local__in=[id_local for _, _, id_local, _ in validas]
+        ).values_list('id_local', 'codigo', 'detalle')
+    }
+
+    validas.sort(key=lambda item: (item[0], item[1]))
+    for momento, indice, id_local, marcacion in validas:
+        duplicada = id_local in procesadas
+        if not duplicada:
+            with transaction.atomic():
+                codigo, detalle = registrar_marcacion(
+                    marcacion['cedula'], marcacion['nombre'], marcacion['estado_salud'],
+                    marcacion['lugar_trabajo'], marcacion.get('observacion'), momento,
+                )
+                MarcacionSincronizada.objects.create(terminal=terminal, id_local=id_local, codigo=codigo, detalle=detalle)
+            procesadas[id_local] = (codigo, detalle)
+        codigo, detalle = procesadas[id_local]
+        resultados[indice] = {'id_local': id_local, 'status': codigo, 'detail': detalle, 'duplicada': duplicada}
+
+    return Response({'resultados': resultados}, status=status.HTTP_200_OK)
+
+# Tamaño de página del filtro de búsqueda
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
 @api_view(['GET'])
 
+# Búsqueda de registros de acceso por cédula (exacta), nombre y rango de fechas.
+# Pagina por cursor (keyset) sobre (fecha, hora_entrada, id) en orden descendente:
+#   ?cedula=123&nombres=juan&desde=2025-01-01&hasta=2025-01-31&limite=50&cursor=...
+# Con ?formato=ndjson devuelve todos los registros en streaming, una línea JSON
+# por registro, leyendo con .iterator() para que la memoria no crezca.
+
 def filtro_de_busqueda_con_cedula_empleado(request):
     cedula = request.GET.get('cedula', '')
     nombres = request.GET.get('nombres', '')
-    
-    empleados =Empleado.objects.all()
+    desde = request.GET.get('desde', '')
+    hasta = request.GET.get('hasta', '')
+    cursor = request.GET.get('cursor', '')
+    formato = request.GET.get('formato', '')
+
+    registros = ControlDeIngreso.objects.select_related('cedula', 'proyecto')
+
+    if cedula:
+        try:
+            registros = registros.filter(cedula__cedula=int(cedula))
+        except ValueError:
+            return Response({'detail': 'Cédula inválida.'}, status=status.HTTP_400_BAD_REQUEST)
     if nombres:
-        empleados = empleados.filter(nombres__icontains=nombres)
-    
-    #Traer los registros de acceso de esos empleados
-    
-    registros = ControlDeIngreso.objects.filter(cedula__in=empleados).order_by('-fecha', '-hora_entrada')
-        
+        registros = registros.filter(cedula__nombres__icontains=nombres)
+
+    try:
+        if desde:
+            registros = registros.filter(fecha__gte=_parsear_fecha(desde))
+        if hasta:
+            registros = registros.filter(fecha__lte=_parsear_fecha(hasta))
+        if cursor:
+            registros = registros.filter(_filtro_despues_de(_decodificar_cursor(cursor)))
+    except ValueError as error:
+        return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    registros = registros.order_by('-fecha', '-hora_entrada', '-id')
+
+    if formato == 'ndjson':
+        return StreamingHttpResponse(_registros_ndjson(registros), content_type='application/x-ndjson')
+
+    try:
+        limite = min(int(request.GET.get('limite', LIMITE_POR_DEFECTO)), LIMITE_MAXIMO)
+    except ValueError:
+        return Response({'detail': 'Límite inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+    if limite < 1:
+        return Response({'detail': 'Límite inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Se pide un registro de más para saber si hay una página siguiente
+    pagina = list(registros[:limite + 1])
+    siguiente = None
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        siguiente = _codificar_cursor(pagina[-1])
+
     # Serializa los datos que necesito devolver al hacer el filtro de búsqueda
-    data = []
-    serializer = ControlDeIngresoSerializer(registros, many=True)
-    return Response(serializer.data)
+    serializer = ControlDeIngresoSerializer(pagina, many=True)
+    return Response({'resultados': serializer.data, 'siguiente': siguiente})
+
+
+def _parsear_fecha(valor):
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValueError('Fecha inválida, use el formato AAAA-MM-DD.')
+    return fecha
+
+
+def _codificar_cursor(registro):
+    # El cursor es la clave (fecha, hora_entrada, id) del último registro de la página
+    clave = f'{registro.fecha.isoformat()}|{registro.hora_entrada.isoformat()}|{registro.pk}'
+    return base64.urlsafe_b64encode(clave.encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    try:
+        fecha, hora_entrada, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return parse_date(fecha), parse_time(hora_entrada), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError('Cursor inválido.')
+
+
+def _filtro_despues_de(clave):
+    # Registros que van después de la clave en orden (fecha, hora_entrada, id) descendente
+    fecha, hora_entrada, pk = clave
+    if fecha is None or hora_entrada is None:
+        raise ValueError('Cursor inválido.')
+    return (
+        Q(fecha__lt=fecha)
+        | Q(fecha=fecha, hora_entrada__lt=hora_entrada)
+        | Q(fecha=fecha, hora_entrada=hora_entrada, id__lt=pk)
+    )
+
+
+def _registros_ndjson(registros):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for registro in registros.iterator(chunk_size=2000):
+        yield encoder.encode(ControlDeIngresoSerializer(registro).data) + '\n'
 
 # Create your views here.
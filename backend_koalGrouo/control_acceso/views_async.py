@@ -0,0 +1,146 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from administracion.permisos import EsAdministrador, EsSupervisor
+from .marcaciones import aregistrar_marcacion
+from .roster import roster
+
+# Versiones asíncronas (ASGI) de registrar_entrada_salida, buscar_empleado_por_cedula
+# y buscar_area_por_cedula. Usan el ORM asíncrono, así que mientras esperan a la base
+# de datos no ocupan un hilo del servidor. DRF no soporta vistas async, por eso la
+# autenticación JWT y los permisos se aplican aquí con los mismos mensajes y códigos
+# que devuelven las vistas síncronas.
+
+_jwt = JWTAuthentication()
+
+
+def _respuesta(datos, codigo=status.HTTP_200_OK, encabezados=None):
+    # Mismo JSON compacto que el JSONRenderer de DRF
+    respuesta = JsonResponse(
+        datos,
+        status=codigo,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+    for nombre, valor in (encabezados or {}).items():
+        respuesta[nombre] = valor
+    return respuesta
+
+
+def _respuesta_error(error):
+    datos = error.detail if isinstance(error.detail, dict) else {'detail': error.detail}
+    encabezados = {}
+    if isinstance(error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        encabezados['WWW-Authenticate'] = _jwt.authenticate_header(None)
+    return _respuesta(datos, error.status_code, encabezados)
+
+
+async def _autenticar(request, token_en_url=False):
+    # Equivalente asíncrono de JWTAuthentication: valida el token sin consultar
+    # la base de datos y busca el usuario con el ORM asíncrono.
+    # Con token_en_url también acepta ?token=, para clientes que no pueden enviar
+    # encabezados (EventSource del navegador).
+    encabezado = _jwt.get_header(request)
+    if encabezado is None:
+        if not (token_en_url and request.GET.get('token')):
+            return None
+        token = request.GET['token'].encode()
+    else:
+        token = _jwt.get_raw_token(encabezado)
+    if token is None:
+        return None
+    validado = _jwt.get_validated_token(token)
+    try:
+        user_id = validado[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+    try:
+        usuario = await get_user_model().objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except get_user_model().DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if not usuario.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return usuario
+
+
+def vista_api(metodo, permisos=(), token_en_url=False):
+    # Decorador para las vistas async: método HTTP, autenticación JWT y permisos,
+    # con las mismas respuestas de error que APIView
+    def decorador(vista):
+        @csrf_exempt
+        async def envoltura(request, *args, **kwargs):
+            try:
+                if request.method != metodo:
+                    raise exceptions.MethodNotAllowed(request.method)
+                try:
+                    request.user = await _autenticar(request, token_en_url)
+                except TokenError as error:
+                    raise InvalidToken(error.args[0])
+                if request.user is None:
+                    raise exceptions.NotAuthenticated()
+                for permiso in permisos:
+                    if not permiso().has_permission(request, None):
+                        raise exceptions.PermissionDenied()
+                return await vista(request, *args, **kwargs)
+            except exceptions.APIException as error:
+                return _respuesta_error(error)
+        return envoltura
+    return decorador
+
+
+def _datos(request):
+    # Cuerpo de la petición como lo entrega request.data de DRF (JSON o formulario)
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as error:
+            raise exceptions.ParseError(f'JSON parse error - {error}')
+    return request.POST
+
+
+# Supervisores o administradores (los dos permisos por separado no los cumple nadie)
+@vista_api('POST', permisos=(EsSupervisor | EsAdministrador,))
+async def registrar_entrada_salida(request):
+    datos = _datos(request)
+    cedula = datos.get('cedula')
+    nombre = datos.get('nombre')
+    estado_salud = datos.get('estado_salud')
+    lugar_trabajo = datos.get('lugar_trabajo')
+    observacion = datos.get('observacion')
+
+    if not (cedula and nombre and estado_salud and lugar_trabajo):
+        return _respuesta({'detail': 'Datos obligatorios.'}, status.HTTP_400_BAD_REQUEST)
+
+    codigo, detalle = await aregistrar_marcacion(cedula, nombre, estado_salud, lugar_trabajo, observacion)
+    return _respuesta({'detail': detalle}, codigo)
+
+
+@vista_api('GET')
+async def buscar_empleado_por_cedula(request):
+    cedula = request.GET.get('cedula')
+    if not cedula:
+        return _respuesta({'detail': 'Cédula requerida'}, 400)
+    empleado = await roster.aobtener(cedula, timezone.localdate())
+    if empleado is None:
+        return _respuesta({'detail': 'La cedula no coincide con el nombre.'}, 404)
+    return _respuesta({'nombre': empleado.nombres})
+
+
+@vista_api('GET')
+async def buscar_area_por_cedula(request):
+    cedula = request.GET.get('cedula')
+    if not cedula:
+        return _respuesta({'detail': 'Cédula requerida'}, 400)
+    empleado = await roster.aobtener(cedula, timezone.localdate())
+    if empleado is None:
+        return _respuesta({'detail': 'La cédula no coincide con ningún empleado.'}, 404)
+    if empleado.ultima_area:
+        return _respuesta({'area': empleado.ultima_area})
+    return _respuesta({'detail': 'No se encontró un área de trabajo previa para este empleado'}, 404)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Registro_de_gases
+from .models import Registro_de_gases, ResumenGas, UmbralGas
 
 @admin.register(Registro_de_gases)
 class RegistroDeGasesAdmin(admin.ModelAdmin):
@@ -9,9 +9,20 @@ class RegistroDeGasesAdmin(admin.ModelAdmin):
         'ubicacion',
         'tipo_gas',
         'nivel',
+        'nivel_valor',
         'estado',
         'registrado_por',
         'nombre'
     )
-    list_filter = ('fecha', 'ubicacion', 'estado', 'tipo_gas')
+    list_filter = ('fecha', 'ubicacion', 'estado', 'tipo_gas', 'nivel_unidad')
     search_fields = ('tipo_gas', 'registrado_por', 'ubicacion')
+
+@admin.register(ResumenGas)
+class ResumenGasAdmin(admin.ModelAdmin):
+    list_display = ('resolucion', 'fecha', 'hora', 'ubicacion', 'tipo_gas', 'lecturas', 'minimo', 'maximo', 'peor_estado')
+    list_filter = ('resolucion', 'ubicacion', 'tipo_gas', 'peor_estado')
+
+@admin.register(UmbralGas)
+class UmbralGasAdmin(admin.ModelAdmin):
+    list_display = ('tipo_gas', 'ubicacion', 'nivel_unidad', 'advertencia', 'peligro', 'histeresis', 'direccion')
+    list_filter = ('tipo_gas', 'direccion')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ControlGasesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'control_gases'
+
+    def ready(self):
+        # Registra las señales que invalidan la caché de lugares de la ingesta
+        from . import signals  # noqa: F401
@@ -0,0 +1,394 @@
+import heapq
+import itertools
+import json
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import RLock
+
+import numpy as np
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.utils.text import slugify
+
+from .models import Registro_de_gases
+
+# Archivo frío de lecturas de gas (ver el comando archivar_gases).
+# Las lecturas viejas salen de la tabla y se guardan en archivos columnares
+# comprimidos, uno por mes y ubicación, en CONTROL_GASES_ARCHIVO_DIR. El listado
+# y el resumen de registros leen la tabla y los archivos juntos; los resúmenes por
+# intervalo (ResumenGas) se quedan en la base, así que la serie no cambia.
+#
+# Formato de un archivo:
+#   MAGIA | bloques | pie (JSON) | largo del pie (uint64) | MAGIA
+# Las filas están ordenadas por momento y se parten en bloques de FILAS_POR_BLOQUE.
+# Cada columna de cada bloque es un arreglo little-endian comprimido con zlib; las
+# columnas de texto se guardan como códigos de un diccionario por archivo. El pie
+# tiene los diccionarios y, por bloque, el primer y último momento y la posición de
+# cada columna. Para leer un rango se mapea el archivo en memoria (mmap) y solo se
+# descomprimen las columnas de los bloques que caen en el rango.
+
+DIRECTORIO = Path(getattr(settings, 'CONTROL_GASES_ARCHIVO_DIR', settings.BASE_DIR / 'archivo_gases'))
+MAGIA = b'KGA1'
+EXTENSION = '.kga'
+FILAS_POR_BLOQUE = 65536
+NIVEL_COMPRESION = 6
+COLA = struct.Struct('<Q4s')
+
+# Columnas: nombre -> tipo numpy ('dic' = texto como código de diccionario)
+COLUMNAS = {
+    'id': '<i8',
+    'momento': '<i8',  # microsegundos desde EPOCA, en hora local como fecha/hora
+    'nivel_valor': '<f8',  # NaN si es nulo
+    'nombre_id': '<i8',
+    'tipo_gas': 'dic',
+    'nivel': 'dic',
+    'nivel_unidad': 'dic',
+    'estado': 'dic',
+    'registrado_por': 'dic',
+}
+TIPO_CODIGO = '<u4'
+DICCIONARIOS = [campo for campo, tipo in COLUMNAS.items() if tipo == 'dic']
+EPOCA = datetime(1970, 1, 1)
+MICROSEGUNDOS_DIA = 86_400_000_000
+
+
+def microsegundos(momento):
+    return (momento - EPOCA) // timedelta(microseconds=1)
+
+
+def ruta(mes, ubicacion):
+    # mes: cualquier fecha del mes
+    return DIRECTORIO / f'{mes:%Y-%m}_{slugify(ubicacion)}{EXTENSION}'
+
+
+def temporal(destino):
+    # Ruta donde escribir arma el archivo antes de publicarlo (archivos() no la lista)
+    destino = Path(destino)
+    return destino.with_name(destino.name + '.tmp')
+
+
+def escribir(destino, ubicacion, mes, filas, publicar=True):
+    # filas: tuplas en el orden de COLUMNAS, ordenadas por (momento, id). Se consumen
+    # de a FILAS_POR_BLOQUE, así que puede ser un generador y la memoria no depende del
+    # tamaño del mes. Se escribe en temporal(destino) y se reemplaza el destino al
+    # final, así un lector nunca ve un archivo a medias. Con publicar=False el archivo
+    # queda en temporal(destino) y el reemplazo lo hace quien llama (archivar_gases lo
+    # publica recién después de borrar las lecturas de la tabla). Devuelve las filas
+    # escritas.
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    filas = iter(filas)
+    codigos = {campo: {} for campo in DICCIONARIOS}
+    total = 0
+
+    armado = temporal(destino)
+    bloques = []
+    with open(armado, 'wb') as archivo:
+        archivo.write(MAGIA)
+        while lote := list(itertools.islice(filas, FILAS_POR_BLOQUE)):
+            columnas = dict(zip(COLUMNAS, zip(*lote)))
+            arreglos = {}
+            for campo, tipo in COLUMNAS.items():
+                if tipo == 'dic':
+                    arreglos[campo] = np.fromiter(
+                        (codigos[campo].setdefault(valor, len(codigos[campo])) for valor in columnas[campo]),
+                        dtype=TIPO_CODIGO, count=len(lote),
+                    )
+                elif campo == 'nivel_valor':
+                    arreglos[campo] = np.array([np.nan if valor is None else valor for valor in columnas[campo]], dtype=tipo)
+                else:
+                    arreglos[campo] = np.array(columnas[campo], dtype=tipo)
+            bloque = {
+                'filas': len(lote),
+                'desde': int(arreglos['momento'][0]),
+                'hasta': int(arreglos['momento'][-1]),
+                'columnas': {},
+            }
+            for campo, arreglo in arreglos.items():
+                datos = zlib.compress(arreglo.tobytes(), NIVEL_COMPRESION)
+                bloque['columnas'][campo] = [archivo.tell(), len(datos)]
+                archivo.write(datos)
+            bloques.append(bloque)
+            total += len(lote)
+        pie = json.dumps({
+            'ubicacion': ubicacion,
+            'mes': f'{mes:%Y-%m}',
+            'filas': total,
+            'diccionarios': {campo: list(valores) for campo, valores in codigos.items()},
+            'bloques': bloques,
+        }, ensure_ascii=False).encode()
+        archivo.write(pie)
+        archivo.write(COLA.pack(len(pie), MAGIA))
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    if publicar:
+        os.replace(armado, destino)
+    return total
+
+
+class Archivo:
+    """Archivo de lecturas abierto con mmap. Usar con with."""
+
+    def __init__(self, origen):
+        self.ruta = Path(origen)
+        self._archivo = open(self.ruta, 'rb')
+        try:
+            self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # archivo vacío
+            self._archivo.close()
+            raise ValueError(f'{self.ruta}: archivo vacío.')
+        self.pie = _pie(self.ruta, self._mapa, os.fstat(self._archivo.fileno()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cerrar(self):
+        self._mapa.close()
+        self._archivo.close()
+
+    def columna(self, bloque, campo):
+        inicio, largo = bloque['columnas'][campo]
+        tipo = TIPO_CODIGO if COLUMNAS[campo] == 'dic' else COLUMNAS[campo]
+        return np.frombuffer(zlib.decompress(self._mapa[inicio:inicio + largo]), dtype=tipo)
+
+    def filas(self):
+        # Todas las filas como tuplas en el orden de COLUMNAS (para reescribir el
+        # archivo), descomprimiendo un bloque a la vez
+        for bloque in self.pie['bloques']:
+            columnas = []
+            for campo in COLUMNAS:
+                valores = self.columna(bloque, campo)
+                if campo in DICCIONARIOS:
+                    diccionario = self.pie['diccionarios'][campo]
+                    columnas.append([diccionario[codigo] for codigo in valores.tolist()])
+                elif campo == 'nivel_valor':
+                    columnas.append([None if valor != valor else valor for valor in valores.tolist()])
+                else:
+                    columnas.append(valores.tolist())
+            yield from zip(*columnas)
+
+
+_pies = {}
+_lock_pies = RLock()
+
+
+def _pie(origen, mapa, estado):
+    # El pie de cada archivo se decodifica una vez por proceso (mientras no cambie)
+    clave = (str(origen), estado.st_mtime_ns, estado.st_size)
+    with _lock_pies:
+        pie = _pies.get(str(origen))
+        if pie is not None and pie[0] == clave:
+            return pie[1]
+    largo, magia = COLA.unpack(mapa[-COLA.size:])
+    if mapa[:len(MAGIA)] != MAGIA or magia != MAGIA:
+        raise ValueError(f'{origen}: no es un archivo de lecturas de gas.')
+    pie = json.loads(mapa[-COLA.size - largo:-COLA.size])
+    with _lock_pies:
+        _pies[str(origen)] = (clave, pie)
+    return pie
+
+
+def archivos(desde=None, hasta=None, ubicacion=None):
+    # Rutas de los archivos cuyo mes cae entre las fechas dadas (inclusive)
+    if not DIRECTORIO.is_dir():
+        return []
+    primero = f'{desde:%Y-%m}' if desde else None
+    ultimo = f'{hasta:%Y-%m}' if hasta else None
+    sufijo = f'_{slugify(ubicacion)}{EXTENSION}' if ubicacion else EXTENSION
+    rutas = []
+    for entrada in os.scandir(DIRECTORIO):
+        if not entrada.name.endswith(sufijo):
+            continue
+        mes = entrada.name[:7]
+        if (primero and mes < primero) or (ultimo and mes > ultimo):
+            continue
+        rutas.append(Path(entrada.path))
+    return sorted(rutas)
+
+
+def _limites(filtros):
+    # Rango [desde, hasta) en microsegundos a partir de fecha__gte / fecha__lte
+    desde = hasta = None
+    if filtros.get('fecha__gte'):
+        desde = microsegundos(datetime.combine(filtros['fecha__gte'], datetime.min.time()))
+    if filtros.get('fecha__lte'):
+        hasta = microsegundos(datetime.combine(filtros['fecha__lte'], datetime.min.time())) + MICROSEGUNDOS_DIA
+    return desde, hasta
+
+
+COMPARACIONES = {'gte': np.greater_equal, 'gt': np.greater, 'lte': np.less_equal, 'lt': np.less}
+
+
+def bloques(filtros, campos, origenes=None, despues=None):
+    # Recorre los archivos y bloques que pueden tener lecturas que cumplan los filtros
+    # (los mismos argumentos que Registro_de_gases.objects.filter(): tipo_gas,
+    # ubicacion, estado, nivel_unidad, fecha__gte, fecha__lte, nivel_valor__gte/gt/lte/lt).
+    # origenes: archivos a recorrer (por defecto todos los del rango de fechas).
+    # despues: clave (momento, id) en microsegundos; solo se devuelven filas posteriores.
+    # Devuelve (pie, {campo: arreglo}) con solo las filas que cumplen.
+    desde, hasta = _limites(filtros)
+    if despues is not None:
+        desde = despues[0] if desde is None else max(desde, despues[0])
+    exactos = {campo: filtros[campo] for campo in ('tipo_gas', 'estado', 'nivel_unidad') if filtros.get(campo)}
+    rangos = [
+        (COMPARACIONES[filtro.split('__')[1]], valor)
+        for filtro, valor in filtros.items() if filtro.startswith('nivel_valor__')
+    ]
+    if origenes is None:
+        origenes = archivos(filtros.get('fecha__gte'), filtros.get('fecha__lte'), filtros.get('ubicacion'))
+    for origen in origenes:
+        with Archivo(origen) as archivo:
+            pie = archivo.pie
+            if filtros.get('ubicacion') and pie['ubicacion'] != filtros['ubicacion']:
+                continue
+            try:
+                codigos = {campo: pie['diccionarios'][campo].index(valor) for campo, valor in exactos.items()}
+            except ValueError:
+                continue  # algún valor pedido no aparece en el archivo
+            for bloque in pie['bloques']:
+                if (desde is not None and bloque['hasta'] < desde) or (hasta is not None and bloque['desde'] >= hasta):
+                    continue
+                leidas = {}
+
+                def columna(campo):
+                    if campo not in leidas:
+                        leidas[campo] = archivo.columna(bloque, campo)
+                    return leidas[campo]
+
+                momento = columna('momento')
+                inicio = int(np.searchsorted(momento, desde)) if desde is not None else 0
+                fin = int(np.searchsorted(momento, hasta)) if hasta is not None else len(momento)
+                if inicio >= fin:
+                    continue
+                mascara = np.ones(fin - inicio, dtype=bool)
+                if despues is not None:
+                    # Las filas del mismo momento que el cursor van después solo si su id es mayor
+                    mascara &= (momento[inicio:fin] > despues[0]) | (columna('id')[inicio:fin] > despues[1])
+                for campo, codigo in codigos.items():
+                    mascara &= columna(campo)[inicio:fin] == codigo
+                if rangos:
+                    nivel_valor = columna('nivel_valor')[inicio:fin]
+                    for comparar, valor in rangos:
+                        mascara &= comparar(nivel_valor, valor)
+                if not mascara.any():
+                    continue
+                yield pie, {campo: columna(campo)[inicio:fin][mascara] for campo in campos}
+
+
+def lecturas(filtros, origenes=None, despues=None):
+    # Lecturas archivadas que cumplen los filtros, como dicts con los campos del modelo.
+    # Están ordenadas por (fecha, hora, id) dentro de cada archivo, no entre archivos.
+    for pie, columnas in bloques(filtros, list(COLUMNAS), origenes, despues):
+        valores = {}
+        for campo, arreglo in columnas.items():
+            if campo in DICCIONARIOS:
+                diccionario = pie['diccionarios'][campo]
+                valores[campo] = [diccionario[codigo] for codigo in arreglo.tolist()]
+            elif campo == 'momento':
+                valores[campo] = arreglo.astype('datetime64[us]').tolist()
+            elif campo == 'nivel_valor':
+                valores[campo] = [None if valor != valor else valor for valor in arreglo.tolist()]
+            else:
+                valores[campo] = arreglo.tolist()
+        for fila in zip(*valores.values()):
+            lectura = dict(zip(valores, fila))
+            momento = lectura.pop('momento')
+            lectura['fecha'] = momento.date()
+            lectura['hora'] = momento.time()
+            lectura['ubicacion'] = pie['ubicacion']
+            yield lectura
+
+
+def ordenadas(filtros, despues=None):
+    # Lecturas archivadas en orden (fecha, hora, id), para paginar por clave.
+    # despues: (fecha, hora, id) de la última lectura ya devuelta. Los archivos se
+    # abren de a un mes (se mezclan las ubicaciones de ese mes) y solo a partir del
+    # mes del cursor, así que leer una página no recorre el archivo entero.
+    desde = filtros.get('fecha__gte')
+    clave = None
+    if despues is not None:
+        fecha, hora, pk = despues
+        clave = (microsegundos(datetime.combine(fecha, hora)), pk)
+        desde = max(desde, fecha) if desde else fecha
+    origenes = archivos(desde, filtros.get('fecha__lte'), filtros.get('ubicacion'))
+    for _, del_mes in itertools.groupby(origenes, key=lambda origen: origen.name[:7]):
+        yield from heapq.merge(
+            *(lecturas(filtros, [origen], clave) for origen in del_mes),
+            key=lambda lectura: (lectura['fecha'], lectura['hora'], lectura['id']),
+        )
+
+
+def registros(filtros, relacionados=(), despues=None, limite=None):
+    # Hasta limite lecturas archivadas posteriores a despues (ver ordenadas), como
+    # instancias (sin guardar) de Registro_de_gases, para serializarlas igual que las
+    # de la tabla. relacionados: relaciones a cargar, como en prefetch_related
+    # ('nombre__proyecto'), con una consulta por relación.
+    resultado = [Registro_de_gases(**lectura) for lectura in itertools.islice(ordenadas(filtros, despues), limite)]
+    if relacionados:
+        prefetch_related_objects(resultado, *relacionados)
+    return resultado
+
+
+def resumir(filtros, agrupar):
+    # Conteo, mínimo, máximo y suma de nivel_valor de las lecturas archivadas,
+    # agrupados por los campos de agrupar y la unidad (como la acción resumen).
+    # Devuelve {(valores de agrupar..., unidad): [lecturas, mínimo, máximo, suma]}.
+    campos = [*agrupar, 'nivel_unidad']
+    leidos = ['nivel_valor', *(campo for campo in campos if campo in COLUMNAS)]
+    if 'fecha' in campos:
+        leidos.append('momento')
+    grupos = {}
+    for pie, columnas in bloques(filtros, leidos):
+        presentes = ~np.isnan(columnas['nivel_valor'])
+        if not presentes.any():
+            continue
+        valores = columnas['nivel_valor'][presentes]
+        claves = []
+        for campo in campos:
+            if campo == 'ubicacion':
+                claves.append(np.zeros(len(valores), dtype='<i8'))
+            elif campo == 'fecha':
+                claves.append(columnas['momento'][presentes] // MICROSEGUNDOS_DIA)
+            else:
+                claves.append(columnas[campo][presentes].astype('<i8'))
+        # Una sola clave entera por grupo (cada código llevado a 0..n-1); se ordena
+        # una vez y cada grupo queda como un tramo contiguo
+        combinada = np.zeros(len(valores), dtype='<i8')
+        for codigos in claves:
+            base = codigos.min()
+            combinada = combinada * (int(codigos.max() - base) + 1) + (codigos - base)
+        orden = np.argsort(combinada, kind='stable')
+        combinada = combinada[orden]
+        valores = valores[orden]
+        inicios = np.flatnonzero(np.r_[True, combinada[1:] != combinada[:-1]])
+        conteos = np.diff(np.r_[inicios, len(combinada)])
+        sumas = np.add.reduceat(valores, inicios)
+        minimos = np.minimum.reduceat(valores, inicios)
+        maximos = np.maximum.reduceat(valores, inicios)
+        for fila, inicio in enumerate(inicios.tolist()):
+            decodificada = []
+            for campo, codigos in zip(campos, claves):
+                valor = int(codigos[orden[inicio]])
+                if campo == 'ubicacion':
+                    decodificada.append(pie['ubicacion'])
+                elif campo == 'fecha':
+                    decodificada.append((EPOCA + timedelta(days=valor)).date())
+                else:
+                    decodificada.append(pie['diccionarios'][campo][valor])
+            grupo = grupos.get(tuple(decodificada))
+            parcial = [int(conteos[fila]), float(minimos[fila]), float(maximos[fila]), float(sumas[fila])]
+            if grupo is None:
+                grupos[tuple(decodificada)] = parcial
+            else:
+                grupo[0] += parcial[0]
+                grupo[1] = min(grupo[1], parcial[1])
+                grupo[2] = max(grupo[2], parcial[2])
+                grupo[3] += parcial[3]
+    return grupos
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import EventoGas
+
+# Canal en vivo de gases (SSE, ver views_async.py).
+# - publicar() guarda los eventos en EventoGas en la misma transacción que las lecturas.
+#   El id autoincremental es el id del evento SSE: un cliente que se reconecta con
+#   Last-Event-ID recibe lo que se perdió, mientras siga en la tabla (RETENCION).
+# - Eventos: 'alarma' cuando el motor de umbrales cambia el estado de un sensor y
+#   'lectura' con el último valor de un sensor (la ingesta por lotes envía uno por
+#   sensor y lote, con la lectura más reciente).
+# - Cada proceso tiene un Difusor: una sola tarea lee los eventos nuevos y los reparte
+#   en memoria a las conexiones abiertas según sus filtros, en lugar de una consulta
+#   por cliente. Si la lectura se guardó en el mismo proceso la tarea se despierta al
+#   confirmarse la transacción; los eventos de otros workers llegan con la consulta
+#   periódica (INTERVALO).
+
+INTERVALO = 1  # segundos entre consultas si nadie despierta al difusor
+LOTE = 500
+RETENCION = timedelta(hours=24)
+PODA = 600  # segundos entre borrados de eventos viejos, por proceso
+MAXIMO_PENDIENTES = 1000  # eventos en cola por conexión antes de cortarla
+
+registro = logging.getLogger(__name__)
+
+
+def _texto(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def evento_lectura(ubicacion, tipo_gas, nivel_valor, nivel_unidad, estado, momento, id_lectura=None):
+    datos = {
+        'nivel_valor': nivel_valor,
+        'nivel_unidad': nivel_unidad,
+        'estado': estado,
+        'momento': _texto(momento),
+    }
+    if id_lectura is not None:
+        datos['id'] = id_lectura
+    return EventoGas(tipo=EventoGas.LECTURA, ubicacion=ubicacion, tipo_gas=tipo_gas, datos=datos)
+
+
+def evento_alarma(cambio):
+    # cambio: uno de los que agrega MotorUmbrales.evaluar()
+    datos = {campo: _texto(valor) for campo, valor in cambio.items() if campo not in ('ubicacion', 'tipo_gas')}
+    return EventoGas(tipo=EventoGas.ALARMA, ubicacion=cambio['ubicacion'], tipo_gas=cambio['tipo_gas'], datos=datos)
+
+
+_ultima_poda = 0
+
+
+def publicar(eventos):
+    # Guarda los eventos (dentro de la transacción en curso, si hay) y despierta al
+    # difusor de este proceso cuando se confirma
+    global _ultima_poda
+    if not eventos:
+        return
+    EventoGas.objects.bulk_create(eventos, batch_size=LOTE)
+    transaction.on_commit(difusor.despertar)
+    if time.monotonic() - _ultima_poda > PODA:
+        _ultima_poda = time.monotonic()
+        EventoGas.objects.filter(creado__lt=timezone.now() - RETENCION).delete()
+
+
+def mensaje(evento):
+    # Evento en formato SSE
+    datos = {'ubicacion': evento.ubicacion, 'tipo_gas': evento.tipo_gas, **evento.datos}
+    return f"id: {evento.id}\nevent: {evento.tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+def filtrar(eventos, ubicacion=None, tipo_gas=None, tipo=None):
+    if ubicacion:
+        eventos = eventos.filter(ubicacion=ubicacion)
+    if tipo_gas:
+        eventos = eventos.filter(tipo_gas=tipo_gas)
+    if tipo:
+        eventos = eventos.filter(tipo=tipo)
+    return eventos
+
+
+async def eventos_guardados(desde, hasta, **filtros):
+    # Eventos con id en (desde, hasta], en orden y por páginas, para reanudar
+    while desde < hasta:
+        pagina = filtrar(EventoGas.objects.filter(id__gt=desde, id__lte=hasta), **filtros).order_by('id')[:LOTE]
+        eventos = [evento async for evento in pagina]
+        if not eventos:
+            return
+        for evento in eventos:
+            yield mensaje(evento)
+        desde = eventos[-1].id
+
+
+class Suscripcion:
+    def __init__(self, ubicacion=None, tipo_gas=None, tipo=None):
+        self.ubicacion = ubicacion
+        self.tipo_gas = tipo_gas
+        self.tipo = tipo
+        self.cola = asyncio.Queue(maxsize=MAXIMO_PENDIENTES)
+        # Si el cliente no lee a tiempo se deja de encolar y se corta la conexión;
+        # al reconectarse con Last-Event-ID recupera los eventos desde la base
+        self.desbordada = False
+
+    def acepta(self, evento):
+        return (
+            (not self.ubicacion or evento.ubicacion == self.ubicacion)
+            and (not self.tipo_gas or evento.tipo_gas == self.tipo_gas)
+            and (not self.tipo or evento.tipo == self.tipo)
+        )
+
+    def entregar(self, texto):
+        if self.desbordada:
+            return
+        try:
+            self.cola.put_nowait(texto)
+        except asyncio.QueueFull:
+            self.desbordada = True
+
+
+class Difusor:
+    """Reparte los eventos nuevos a las conexiones SSE abiertas en este proceso."""
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._ultimo = 0  # id del último evento repartido
+        self._tarea = None
+        self._loop = None
+        self._aviso = None
+
+    async def suscribir(self, suscripcion):
+        # Devuelve el id del último evento repartido: los posteriores llegan por la cola
+        loop = asyncio.get_running_loop()
+        if self._tarea is None or self._tarea.done() or self._loop is not loop:
+            self._loop = loop
+            self._aviso = asyncio.Event()
+            self._ultimo = (await EventoGas.objects.aaggregate(ultimo=Max('id')))['ultimo'] or 0
+            self._tarea = loop.create_task(self._repartir())
+        self._suscripciones.add(suscripcion)
+        return self._ultimo
+
+    def desuscribir(self, suscripcion):
+        self._suscripciones.discard(suscripcion)
+
+    def despertar(self):
+        # Se llama desde los hilos que guardan lecturas (on_commit)
+        loop, aviso = self._loop, self._aviso
+        if loop is not None and aviso is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(aviso.set)
+
+    async def _repartir(self):
+        while self._suscripciones:
+            try:
+                await asyncio.wait_for(self._aviso.wait(), INTERVALO)
+            except asyncio.TimeoutError:
+                pass
+            self._aviso.clear()
+            try:
+                await self._leer_nuevos()
+            except Exception:
+                # Un error de la base no debe dejar a las conexiones sin eventos:
+                # se registra y se reintenta en la próxima vuelta
+                registro.exception('No se pudieron leer los eventos de gases')
+
+    async def _leer_nuevos(self):
+        while True:
+            pagina = EventoGas.objects.filter(id__gt=self._ultimo).order_by('id')[:LOTE]
+            eventos = [evento async for evento in pagina]
+            for evento in eventos:
+                texto = None
+                for suscripcion in self._suscripciones:
+                    if suscripcion.acepta(evento):
+                        texto = texto or mensaje(evento)
+                        suscripcion.entregar(texto)
+            if eventos:
+                self._ultimo = eventos[-1].id
+            if len(eventos) < LOTE:
+                return
+
+
+difusor = Difusor()
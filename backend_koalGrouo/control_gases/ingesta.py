@@ -0,0 +1,290 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime, time
+from threading import RLock
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from lugares_trabajo.models import Lugares_de_trabajo
+from .models import Registro_de_gases
+from .eventos import evento_alarma, evento_lectura, publicar
+from .niveles import parsear_nivel
+from .resumenes import Acumulador
+from . import ultimas
+from .umbrales import ESTADO_POR_DEFECTO, motor_umbrales
+
+# Ingesta por lotes de lecturas de sensores fijos de gas.
+# El cuerpo es NDJSON (un objeto por línea) o CSV con encabezado, opcionalmente
+# comprimido con gzip. Cada lectura se valida en Python, sin consultas por fila:
+# los ids de Lugares_de_trabajo se toman de una caché del proceso que se invalida
+# desde las señales de lugares de trabajo (ver signals.py). Primero se lee y valida
+# el cuerpo entero en bloques, sin tocar la base: mientras el sensor sigue subiendo
+# el lote no se toma el bloqueo de escritura de SQLite, que frenaría las marcaciones.
+# Después cada bloque se inserta con un INSERT preparado (executemany) en su propia
+# transacción corta, junto con los resúmenes por intervalo (ver resumenes.py), los
+# estados del motor de umbrales y los eventos del canal en vivo. Si un bloque falla,
+# los anteriores quedan guardados y insertadas dice cuántas lecturas son.
+# bulk_create compila el SQL campo por campo y en SQLite lo parte en sentencias de
+# ~99 filas; eso limitaba la ingesta a unas 7.500 lecturas por segundo.
+#
+# Campos de cada lectura (los mismos del modelo):
+#   fecha + hora, o momento (ISO 8601); ubicacion; tipo_gas (acepta CH4, CO, O2, H2S);
+#   nivel ('2.5%', '35 ppm', o un número sin unidad, como en el serializador);
+#   registrado_por (o sensor); nombre (id del lugar).
+# El estado lo calcula el motor de umbrales (ver umbrales.py); el que envía el sensor
+# (opcional) solo se usa para gases sin umbral configurado.
+# Para el canal en vivo (ver eventos.py) y la caché de últimas lecturas (ultimas.py)
+# se usan los cambios de estado y, por cada sensor del lote, solo su lectura más reciente.
+
+BLOQUE = 2000
+MAXIMO_LECTURAS = 200_000
+MAXIMO_ERRORES = 100
+
+TIPOS_GAS = {
+    'ch4': 'Metano',
+    'co': 'Monóxido de carbono',
+    'o2': 'Oxígeno',
+    'h2s': 'Sulfuro de hidrógeno',
+}
+UBICACIONES = {ubicacion for ubicacion, _ in Registro_de_gases.UBICACIONES}
+ESTADOS = {estado for estado, _ in Registro_de_gases._meta.get_field('estado').choices}
+LARGO_NIVEL = Registro_de_gases._meta.get_field('nivel').max_length
+LARGO_TIPO_GAS = Registro_de_gases._meta.get_field('tipo_gas').max_length
+LARGO_REGISTRADO_POR = Registro_de_gases._meta.get_field('registrado_por').max_length
+# Orden de las columnas del INSERT; lectura() devuelve las tuplas en este orden
+CAMPOS = [
+    'fecha', 'hora', 'ubicacion', 'tipo_gas', 'nivel', 'nivel_valor', 'nivel_unidad',
+    'estado', 'registrado_por', 'nombre',
+]
+
+
+class DemasiadasLecturas(Exception):
+    pass
+
+
+class LecturaInvalida(Exception):
+    pass
+
+
+class CacheLugares:
+    """Ids de Lugares_de_trabajo existentes, cargados una vez por proceso."""
+
+    def __init__(self):
+        self._ids = None
+        self._lock = RLock()
+
+    def ids(self):
+        with self._lock:
+            if self._ids is None:
+                self._ids = frozenset(Lugares_de_trabajo.objects.values_list('pk', flat=True))
+            return self._ids
+
+    def invalidar(self):
+        with self._lock:
+            self._ids = None
+
+
+cache_lugares = CacheLugares()
+
+
+class _Flujo(io.RawIOBase):
+    # Adapta el stream de la petición (solo tiene read) para leerlo con búfer
+    def __init__(self, flujo):
+        self._flujo = flujo
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        datos = self._flujo.read(len(destino))
+        destino[:len(datos)] = datos
+        return len(datos)
+
+
+def abrir(cuerpo, comprimido=None):
+    # Devuelve un archivo de texto sobre el cuerpo sin leerlo entero en memoria.
+    # Si no se indicó por Content-Encoding, detecta gzip por el número mágico.
+    crudo = io.BufferedReader(_Flujo(cuerpo))
+    if comprimido is None:
+        comprimido = crudo.peek(2)[:2] == b'\x1f\x8b'
+    if comprimido:
+        crudo = gzip.GzipFile(fileobj=crudo)
+    return io.TextIOWrapper(crudo, encoding='utf-8', newline='')
+
+
+def filas_ndjson(archivo):
+    for numero, linea in enumerate(archivo, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError:
+            yield numero, None
+            continue
+        yield numero, fila if isinstance(fila, dict) else None
+
+
+def filas_csv(archivo):
+    # La línea 1 es el encabezado
+    for numero, fila in enumerate(csv.DictReader(archivo), start=2):
+        yield numero, fila
+
+
+def _texto(fila, campo, largo, obligatorio=True):
+    valor = fila.get(campo)
+    if valor is None or valor == '':
+        if obligatorio:
+            raise LecturaInvalida(f'{campo}: obligatorio.')
+        return None
+    valor = str(valor).strip()
+    if len(valor) > largo:
+        raise LecturaInvalida(f'{campo}: máximo {largo} caracteres.')
+    return valor
+
+
+def _momento(fila, zona):
+    try:
+        if fila.get('momento'):
+            momento = datetime.fromisoformat(str(fila['momento']))
+            if timezone.is_aware(momento):
+                momento = momento.astimezone(zona)
+            return momento.date(), momento.time().replace(tzinfo=None)
+        return date.fromisoformat(str(fila['fecha'])), time.fromisoformat(str(fila['hora']))
+    except KeyError as error:
+        raise LecturaInvalida(f'{error.args[0]}: obligatorio (o enviar momento).')
+    except ValueError:
+        raise LecturaInvalida('fecha/hora inválidas, use ISO 8601.')
+
+
+def lectura(fila, lugares, zona):
+    # Valida una fila y devuelve la tupla de valores (en el orden de CAMPOS),
+    # o lanza LecturaInvalida. El estado es el que envió el sensor (o None): el del
+    # motor de umbrales se calcula al guardar (ver _guardar).
+    if fila is None:
+        raise LecturaInvalida('Línea mal formada.')
+    fecha, hora = _momento(fila, zona)
+
+    ubicacion = _texto(fila, 'ubicacion', 100)
+    if ubicacion not in UBICACIONES:
+        raise LecturaInvalida(f'ubicacion: "{ubicacion}" no es una opción válida.')
+    tipo_gas = _texto(fila, 'tipo_gas', LARGO_TIPO_GAS)
+    tipo_gas = TIPOS_GAS.get(tipo_gas.lower(), tipo_gas)
+    estado = _texto(fila, 'estado', 20, obligatorio=False)
+    if estado is not None and estado not in ESTADOS:
+        raise LecturaInvalida(f'estado: "{estado}" no es una opción válida.')
+
+    nivel = _texto(fila, 'nivel', LARGO_NIVEL)
+    nivel_valor, nivel_unidad = parsear_nivel(nivel)
+    # Sin unidad se acepta, igual que en RegistroDeGasesSerializer.validate_nivel
+    if nivel_valor is None:
+        raise LecturaInvalida(f'nivel: "{nivel}" inválido.')
+
+    registrado_por = _texto(fila, 'registrado_por', LARGO_REGISTRADO_POR, obligatorio=False) \
+        or _texto(fila, 'sensor', LARGO_REGISTRADO_POR)
+    try:
+        lugar_id = int(fila.get('nombre'))
+    except (TypeError, ValueError):
+        raise LecturaInvalida('nombre: id de lugar de trabajo obligatorio.')
+    if lugar_id not in lugares:
+        raise LecturaInvalida(f'nombre: no existe el lugar de trabajo {lugar_id}.')
+
+    return (
+        fecha,
+        hora,
+        ubicacion,
+        tipo_gas,
+        nivel,
+        nivel_valor,
+        nivel_unidad,
+        estado,
+        registrado_por,
+        lugar_id,
+    )
+
+
+def _sentencia_insert():
+    opciones = Registro_de_gases._meta
+    columnas = ', '.join(connection.ops.quote_name(opciones.get_field(campo).column) for campo in CAMPOS)
+    marcadores = ', '.join(['%s'] * len(CAMPOS))
+    return f'INSERT INTO {connection.ops.quote_name(opciones.db_table)} ({columnas}) VALUES ({marcadores})'
+
+
+def ingerir(filas):
+    # filas: iterable de (número de línea, dict o None).
+    # Devuelve {'recibidas', 'insertadas', 'rechazadas', 'errores'}; los errores se
+    # reportan hasta MAXIMO_ERRORES. Lanza DemasiadasLecturas si el lote es muy grande
+    # (en ese caso no se guarda nada: se detecta antes de escribir).
+    lugares = cache_lugares.ids()
+    zona = timezone.get_current_timezone()
+    recibidas = 0
+    errores = []
+    bloques = [[]]
+    for numero, fila in filas:
+        recibidas += 1
+        if recibidas > MAXIMO_LECTURAS:
+            raise DemasiadasLecturas(f'Máximo {MAXIMO_LECTURAS} lecturas por lote.')
+        try:
+            valores = lectura(fila, lugares, zona)
+        except LecturaInvalida as error:
+            if len(errores) < MAXIMO_ERRORES:
+                errores.append({'linea': numero, 'error': str(error)})
+            continue
+        if len(bloques[-1]) >= BLOQUE:
+            bloques.append([])
+        bloques[-1].append(valores)
+
+    sentencia = _sentencia_insert()
+    # Estados de los sensores en todo el lote, para que cada lectura vea el que dejó
+    # la anterior del mismo sensor aunque esté en otro bloque
+    pendientes = {}
+    insertadas = 0
+    for bloque in bloques:
+        if bloque:
+            _guardar(bloque, sentencia, pendientes)
+            insertadas += len(bloque)
+    return {
+        'recibidas': recibidas,
+        'insertadas': insertadas,
+        'rechazadas': recibidas - insertadas,
+        'errores': errores,
+    }
+
+
+def _guardar(bloque, sentencia, pendientes):
+    # Inserta un bloque de lecturas validadas en una transacción corta, con el estado
+    # del motor de umbrales, los resúmenes y los eventos en vivo. Los estados nuevos y
+    # las últimas lecturas se aplican al confirmarse el bloque.
+    acumulador = Acumulador()
+    cambios = []
+    # (ubicación, tipo de gas) -> lectura más reciente del bloque (en el orden de CAMPOS)
+    recientes = {}
+    filas = []
+    adaptar_fecha = connection.ops.adapt_datefield_value
+    adaptar_hora = connection.ops.adapt_timefield_value
+    with transaction.atomic(), connection.cursor() as cursor:
+        for fecha, hora, ubicacion, tipo_gas, nivel, nivel_valor, nivel_unidad, estado, *resto in bloque:
+            estado = motor_umbrales.evaluar(
+                ubicacion, tipo_gas, nivel_unidad, nivel_valor, datetime.combine(fecha, hora), cambios, pendientes
+            ) or estado or ESTADO_POR_DEFECTO
+            acumulador.agregar(fecha, hora, ubicacion, tipo_gas, nivel_unidad, nivel_valor, estado)
+            valores = (nivel, nivel_valor, nivel_unidad, estado, *resto)
+            reciente = recientes.get((ubicacion, tipo_gas))
+            if reciente is None or (fecha, hora) >= (reciente[0], reciente[1]):
+                recientes[(ubicacion, tipo_gas)] = (fecha, hora, ubicacion, tipo_gas, *valores)
+            filas.append((adaptar_fecha(fecha), adaptar_hora(hora), ubicacion, tipo_gas, *valores))
+        cursor.executemany(sentencia, filas)
+        acumulador.guardar()
+        lecturas_recientes = [dict(zip(CAMPOS, fila)) for fila in recientes.values()]
+        publicar([evento_alarma(cambio) for cambio in cambios] + [
+            evento_lectura(
+                lectura['ubicacion'], lectura['tipo_gas'], lectura['nivel_valor'], lectura['nivel_unidad'],
+                lectura['estado'], datetime.combine(lectura['fecha'], lectura['hora']),
+            )
+            for lectura in lecturas_recientes
+        ])
+        confirmados = dict(pendientes)
+        transaction.on_commit(lambda: ultimas.registrar(lecturas_recientes))
+        transaction.on_commit(lambda: motor_umbrales.confirmar(confirmados))
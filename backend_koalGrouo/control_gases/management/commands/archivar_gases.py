@@ -0,0 +1,130 @@
+import heapq
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from control_gases import archivo
+from control_gases.models import Registro_de_gases
+
+CAMPOS = [
+    'id', 'fecha', 'hora', 'nivel_valor', 'nombre_id', 'tipo_gas', 'nivel', 'nivel_unidad', 'estado',
+    'registrado_por',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las lecturas de gas más viejas que --dias a archivos columnares comprimidos '
+        '(uno por mes y ubicación, ver control_gases/archivo.py) y las borra de la tabla.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90, help='Antigüedad mínima de las lecturas a archivar.')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuántas lecturas se archivarían.')
+
+    def handle(self, *args, **opciones):
+        if opciones['dias'] < 1:
+            raise CommandError('--dias debe ser mayor que cero.')
+        corte = timezone.localdate() - timedelta(days=opciones['dias'])
+        viejas = Registro_de_gases.objects.filter(fecha__lt=corte)
+        primera = viejas.aggregate(primera=Min('fecha'))['primera']
+        if primera is None:
+            self.stdout.write(f'No hay lecturas anteriores al {corte}.')
+            return
+        ubicaciones = sorted(viejas.order_by().values_list('ubicacion', flat=True).distinct())
+
+        inicio = time.perf_counter()
+        total = 0
+        mes = primera.replace(day=1)
+        while mes < corte:
+            siguiente = (mes + timedelta(days=32)).replace(day=1)
+            for ubicacion in ubicaciones:
+                total += self._archivar(ubicacion, mes, min(siguiente, corte), opciones['simular'])
+            mes = siguiente
+        accion = 'se archivarían' if opciones['simular'] else 'archivadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} lecturas anteriores al {corte} {accion} en {time.perf_counter() - inicio:.1f} s.'
+        ))
+
+    def _archivar(self, ubicacion, mes, fin, simular):
+        # Archiva las lecturas de una ubicación entre mes (inclusive) y fin (exclusive).
+        # Las lecturas se leen de la tabla con un iterador y se escriben de a bloques,
+        # así la memoria no depende de cuántas lecturas tenga el mes.
+        lecturas = Registro_de_gases.objects.filter(ubicacion=ubicacion, fecha__gte=mes, fecha__lt=fin)
+        # Solo se archiva hasta el id más alto al empezar; lo que llegue durante la
+        # corrida queda en la tabla para la siguiente
+        tope = lecturas.aggregate(tope=Max('id'))['tope']
+        if tope is None:
+            return 0
+        lecturas = lecturas.filter(id__lte=tope)
+        destino = archivo.ruta(mes, ubicacion)
+        if simular:
+            cantidad = lecturas.count()
+            self.stdout.write(f'{destino.name}: {cantidad} lecturas')
+            return cantidad
+
+        leidas = 0
+
+        def nuevas():
+            nonlocal leidas
+            consulta = lecturas.order_by('fecha', 'hora', 'id').values_list(*CAMPOS)
+            for id_, fecha, hora, *resto in consulta.iterator(chunk_size=10000):
+                leidas += 1
+                yield (id_, archivo.microsegundos(datetime.combine(fecha, hora)), *resto)
+
+        if destino.exists():
+            # Una corrida anterior ya archivó parte del mes: se combinan. Si una lectura
+            # quedó en los dos lados (corte entre escribir y borrar), gana la de la tabla:
+            # con el mismo (momento, id) la de la tabla sale primero y la otra se descarta.
+            with archivo.Archivo(destino) as anterior:
+                combinadas = _sin_repetidas(heapq.merge(
+                    ((fila[1], fila[0], 0, fila) for fila in nuevas()),
+                    ((fila[1], fila[0], 1, fila) for fila in anterior.filas()),
+                ))
+                escritas = archivo.escribir(destino, ubicacion, mes, combinadas, publicar=False)
+        else:
+            escritas = archivo.escribir(destino, ubicacion, mes, nuevas(), publicar=False)
+
+        # El archivo nuevo queda sin publicar hasta borrar las lecturas de la tabla: si
+        # algo falla antes se descarta y el archivo anterior (y la tabla) siguen como
+        # estaban, sin lecturas repetidas en los dos lados. Se publica dentro de la
+        # transacción del borrado, así si el reemplazo falla tampoco se borra nada.
+        armado = archivo.temporal(destino)
+        try:
+            with archivo.Archivo(armado) as escrito:
+                if escrito.pie['filas'] != escritas:
+                    raise CommandError(f'{destino}: se esperaban {escritas} lecturas y el archivo tiene {escrito.pie["filas"]}.')
+
+            # Se borra con SQL directo: delete() del ORM dispararía las señales que
+            # recalculan los resúmenes, y los resúmenes de lo archivado se conservan.
+            # Se borra con la misma consulta con la que se leyó; si no coinciden (alguien
+            # editó una lectura mientras tanto) no se borra nada y queda para otra corrida.
+            tabla = Registro_de_gases._meta
+            seleccion, parametros = lecturas.values('id').query.sql_with_params()
+            sentencia = (
+                f'DELETE FROM {connection.ops.quote_name(tabla.db_table)} '
+                f'WHERE {connection.ops.quote_name(tabla.pk.column)} IN ({seleccion})'
+            )
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sentencia, parametros)
+                if cursor.rowcount != leidas:
+                    raise CommandError(f'{destino}: se archivaron {leidas} lecturas y se iban a borrar {cursor.rowcount}.')
+                os.replace(armado, destino)
+        finally:
+            armado.unlink(missing_ok=True)
+        self.stdout.write(f'{destino.name}: {leidas} lecturas ({destino.stat().st_size / 1024:.0f} KiB en total)')
+        return leidas
+
+
+def _sin_repetidas(combinadas):
+    # Filas de la mezcla (momento, id, origen, fila) sin repetir el id consecutivo
+    anterior = None
+    for _, id_, _, fila in combinadas:
+        if id_ != anterior:
+            yield fila
+        anterior = id_
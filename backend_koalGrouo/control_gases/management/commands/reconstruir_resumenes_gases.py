@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from control_gases.models import Registro_de_gases
+from control_gases.resumenes import reconstruir_dia
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes de gases (1 min, 1 h, 1 día) a partir de las lecturas crudas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a reconstruir (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día a reconstruir (AAAA-MM-DD).')
+
+    def handle(self, *args, **opciones):
+        dias = Registro_de_gases.objects.order_by('fecha').values_list('fecha', flat=True).distinct()
+        for opcion, filtro in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+            if opciones[opcion]:
+                fecha = parse_date(opciones[opcion])
+                if fecha is None:
+                    raise CommandError(f'--{opcion}: fecha inválida, use el formato AAAA-MM-DD.')
+                dias = dias.filter(**{filtro: fecha})
+
+        inicio = time.perf_counter()
+        total = 0
+        for fecha in list(dias):
+            creados = reconstruir_dia(fecha)
+            total += creados
+            self.stdout.write(f'{fecha}: {creados} resúmenes')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} resúmenes reconstruidos en {time.perf_counter() - inicio:.1f} s.'
+        ))
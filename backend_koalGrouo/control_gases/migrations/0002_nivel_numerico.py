@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+from control_gases.niveles import parsear_nivel
+
+LOTE = 2000
+
+
+def poblar_nivel_valor(apps, schema_editor):
+    # Convierte el texto de nivel de los registros existentes, por lotes de ids
+    Registro_de_gases = apps.get_model('control_gases', 'Registro_de_gases')
+    ultimo = 0
+    while True:
+        lote = list(
+            Registro_de_gases.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'nivel')[:LOTE]
+        )
+        if not lote:
+            break
+        for registro in lote:
+            registro.nivel_valor, registro.nivel_unidad = parsear_nivel(registro.nivel)
+        Registro_de_gases.objects.bulk_update(lote, ['nivel_valor', 'nivel_unidad'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_gases', '0001_initial'),
+        ('lugares_trabajo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registro_de_gases',
+            name='nivel_unidad',
+            field=models.CharField(blank=True, choices=[('%', '%'), ('ppm', 'ppm')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='registro_de_gases',
+            name='nivel_valor',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='registro_de_gases',
+            index=models.Index(fields=['tipo_gas', 'nivel_valor'], name='gases_tipo_nivel_idx'),
+        ),
+        migrations.RunPython(poblar_nivel_valor, migrations.RunPython.noop),
+    ]
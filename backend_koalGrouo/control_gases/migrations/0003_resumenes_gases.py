@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_gases', '0002_nivel_numerico'),
+        ('lugares_trabajo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenGas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolucion', models.CharField(choices=[('1m', '1 minuto'), ('1h', '1 hora'), ('1d', '1 día')], max_length=2)),
+                ('ubicacion', models.CharField(choices=[('Mina Norte - Sección A', 'Mina Norte - Sección A'), ('Mina Norte - Sección B', 'Mina Norte - Sección B'), ('Mina Sur - Sección A', 'Mina Sur - Sección A'), ('Mina Este - Galería 1', 'Mina Este - Galería 1'), ('Mina Este - Galería 3', 'Mina Este - Galería 3'), ('Mina Norte - Sección D', 'Mina Norte - Sección D'), ('Mina Oeste - Galería 1', 'Mina Oeste - Galería 1'), ('Mina Oeste - Galería 2', 'Mina Oeste - Galería 2')], max_length=100)),
+                ('tipo_gas', models.CharField(max_length=50)),
+                ('nivel_unidad', models.CharField(choices=[('%', '%'), ('ppm', 'ppm')], max_length=10)),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField()),
+                ('lecturas', models.PositiveIntegerField()),
+                ('minimo', models.FloatField()),
+                ('maximo', models.FloatField()),
+                ('suma', models.FloatField()),
+                ('peor_estado', models.CharField(choices=[('Normal', 'Normal'), ('Advertencia', 'Advertencia'), ('Peligro', 'Peligro')], max_length=20)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='registro_de_gases',
+            index=models.Index(fields=['ubicacion', 'tipo_gas', 'fecha', 'hora'], name='gases_sensor_momento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registro_de_gases',
+            index=models.Index(fields=['fecha', 'hora'], name='gases_momento_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumengas',
+            constraint=models.UniqueConstraint(fields=('resolucion', 'ubicacion', 'tipo_gas', 'nivel_unidad', 'fecha', 'hora'), name='resumen_gas_unico'),
+        ),
+    ]
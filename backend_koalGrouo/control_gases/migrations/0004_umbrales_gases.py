@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+# Valores usuales para minería subterránea; se ajustan desde el admin o la API
+UMBRALES_INICIALES = [
+    # tipo de gas, unidad, advertencia, peligro, histéresis, dirección
+    ('Metano', '%', 1.0, 1.5, 0.1, 'sube'),
+    ('Monóxido de carbono', 'ppm', 25, 50, 3, 'sube'),
+    ('Sulfuro de hidrógeno', 'ppm', 10, 15, 1, 'sube'),
+    ('Oxígeno', '%', 19.5, 18.0, 0.2, 'baja'),
+]
+
+
+def crear_umbrales_iniciales(apps, schema_editor):
+    UmbralGas = apps.get_model('control_gases', 'UmbralGas')
+    UmbralGas.objects.bulk_create([
+        UmbralGas(
+            tipo_gas=tipo_gas,
+            nivel_unidad=unidad,
+            advertencia=advertencia,
+            peligro=peligro,
+            histeresis=histeresis,
+            direccion=direccion,
+        )
+        for tipo_gas, unidad, advertencia, peligro, histeresis, direccion in UMBRALES_INICIALES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_gases', '0003_resumenes_gases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UmbralGas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_gas', models.CharField(max_length=50)),
+                ('ubicacion', models.CharField(blank=True, choices=[('Mina Norte - Sección A', 'Mina Norte - Sección A'), ('Mina Norte - Sección B', 'Mina Norte - Sección B'), ('Mina Sur - Sección A', 'Mina Sur - Sección A'), ('Mina Este - Galería 1', 'Mina Este - Galería 1'), ('Mina Este - Galería 3', 'Mina Este - Galería 3'), ('Mina Norte - Sección D', 'Mina Norte - Sección D'), ('Mina Oeste - Galería 1', 'Mina Oeste - Galería 1'), ('Mina Oeste - Galería 2', 'Mina Oeste - Galería 2')], max_length=100, null=True)),
+                ('nivel_unidad', models.CharField(choices=[('%', '%'), ('ppm', 'ppm')], max_length=10)),
+                ('advertencia', models.FloatField()),
+                ('peligro', models.FloatField()),
+                ('histeresis', models.FloatField(default=0)),
+                ('direccion', models.CharField(choices=[('sube', 'Peligroso al subir'), ('baja', 'Peligroso al bajar')], default='sube', max_length=4)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tipo_gas', 'ubicacion'), name='umbral_gas_por_ubicacion'), models.UniqueConstraint(condition=models.Q(('ubicacion__isnull', True)), fields=('tipo_gas',), name='umbral_gas_general', violation_error_message='Ya existe un umbral general para este gas.')],
+            },
+        ),
+        migrations.RunPython(crear_umbrales_iniciales, migrations.RunPython.noop),
+    ]
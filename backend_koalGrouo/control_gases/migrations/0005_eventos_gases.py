@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_gases', '0004_umbrales_gases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoGas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('lectura', 'Último valor de un sensor'), ('alarma', 'Cambio de estado de un sensor')], max_length=10)),
+                ('ubicacion', models.CharField(max_length=100)),
+                ('tipo_gas', models.CharField(max_length=50)),
+                ('datos', models.JSONField()),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from lugares_trabajo.models import Lugares_de_trabajo
+from .niveles import UNIDADES, parsear_nivel
 class Registro_de_gases(models.Model):
     UBICACIONES = [
         ('Mina Norte - Sección A', 'Mina Norte - Sección A'),
@@ -11,23 +13,138 @@ class Registro_de_gases(models.Model):
         ('Mina Oeste - Galería 1', 'Mina Oeste - Galería 1'),
         ('Mina Oeste - Galería 2', 'Mina Oeste - Galería 2'),
     ]
+    ESTADOS = [
+        ('Normal', 'Normal'),
+        ('Advertencia', 'Advertencia'),
+        ('Peligro', 'Peligro')
+    ]
 
     fecha = models.DateField()
     hora = models.TimeField()
     ubicacion = models.CharField(max_length=100, choices=UBICACIONES)
     tipo_gas = models.CharField(max_length=50)
     nivel = models.CharField(max_length=20)  # Puede ser '2.5%' o '35 ppm'
-    estado = models.CharField(
-        max_length=20,
-        choices=[
-            ('Normal', 'Normal'),
-            ('Advertencia', 'Advertencia'),
-            ('Peligro', 'Peligro')
-        ]
-    )
+    # Valor numérico y unidad normalizada de nivel; se calculan al guardar (ver niveles.py)
+    # para filtrar y agregar en la base de datos. Las escrituras con bulk_create o update()
+    # deben asignarlos a mano con parsear_nivel.
+    nivel_valor = models.FloatField(blank=True, null=True, db_index=True)
+    nivel_unidad = models.CharField(max_length=10, choices=UNIDADES, blank=True, null=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS)
     registrado_por = models.CharField(max_length=50)
     nombre = models.ForeignKey(Lugares_de_trabajo ,on_delete=models.CASCADE, related_name='nombre_del_lugar_de_trabajo')
 
+    class Meta:
+        indexes = [
+            # Lecturas de un gas por encima/debajo de un nivel
+            models.Index(fields=['tipo_gas', 'nivel_valor'], name='gases_tipo_nivel_idx'),
+            # Recalcular los resúmenes de un sensor (ubicación y gas) en un intervalo
+            models.Index(fields=['ubicacion', 'tipo_gas', 'fecha', 'hora'], name='gases_sensor_momento_idx'),
+            # Reconstrucción de resúmenes por día
+            models.Index(fields=['fecha', 'hora'], name='gases_momento_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.nivel_valor, self.nivel_unidad = parsear_nivel(self.nivel)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nivel' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'nivel_valor', 'nivel_unidad'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.fecha} {self.hora} - {self.tipo_gas} ({self.estado}"
 # Create your models here.
+
+
+class ResumenGas(models.Model):
+    """Lecturas de gas agregadas por ubicación, tipo de gas e intervalo de tiempo."""
+    RESOLUCIONES = [
+        ('1m', '1 minuto'),
+        ('1h', '1 hora'),
+        ('1d', '1 día'),
+    ]
+    resolucion = models.CharField(max_length=2, choices=RESOLUCIONES)
+    ubicacion = models.CharField(max_length=100, choices=Registro_de_gases.UBICACIONES)
+    tipo_gas = models.CharField(max_length=50)
+    nivel_unidad = models.CharField(max_length=10, choices=UNIDADES)
+    # Inicio del intervalo, en la misma hora local que fecha/hora de Registro_de_gases
+    fecha = models.DateField()
+    hora = models.TimeField()
+    lecturas = models.PositiveIntegerField()
+    minimo = models.FloatField()
+    maximo = models.FloatField()
+    # Se guarda la suma y no el promedio para poder acumular lecturas nuevas
+    suma = models.FloatField()
+    peor_estado = models.CharField(max_length=20, choices=Registro_de_gases.ESTADOS)
+
+    class Meta:
+        constraints = [
+            # También sirve de índice para las consultas de series
+            models.UniqueConstraint(
+                fields=['resolucion', 'ubicacion', 'tipo_gas', 'nivel_unidad', 'fecha', 'hora'],
+                name='resumen_gas_unico',
+            ),
+        ]
+
+    @property
+    def promedio(self):
+        return self.suma / self.lecturas if self.lecturas else None
+
+    def __str__(self):
+        return f"{self.resolucion} {self.fecha} {self.hora} - {self.ubicacion} {self.tipo_gas}"
+
+
+class UmbralGas(models.Model):
+    """Umbrales de advertencia y peligro de un gas, para todas las ubicaciones o una en particular."""
+    SUBE = 'sube'
+    BAJA = 'baja'
+    DIRECCIONES = [
+        (SUBE, 'Peligroso al subir'),
+        (BAJA, 'Peligroso al bajar'),  # por ejemplo el oxígeno
+    ]
+    tipo_gas = models.CharField(max_length=50)
+    # Vacío: el umbral aplica a todas las ubicaciones que no tengan uno propio
+    ubicacion = models.CharField(max_length=100, choices=Registro_de_gases.UBICACIONES, blank=True, null=True)
+    nivel_unidad = models.CharField(max_length=10, choices=UNIDADES)
+    advertencia = models.FloatField()
+    peligro = models.FloatField()
+    # Cuánto tiene que alejarse el valor del umbral para volver al estado anterior
+    histeresis = models.FloatField(default=0)
+    direccion = models.CharField(max_length=4, choices=DIRECCIONES, default=SUBE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tipo_gas', 'ubicacion'], name='umbral_gas_por_ubicacion'),
+            models.UniqueConstraint(
+                fields=['tipo_gas'], condition=models.Q(ubicacion__isnull=True), name='umbral_gas_general',
+                violation_error_message='Ya existe un umbral general para este gas.',
+            ),
+        ]
+
+    def clean(self):
+        if self.histeresis < 0:
+            raise ValidationError({'histeresis': 'No puede ser negativa.'})
+        if self.direccion == self.SUBE and self.advertencia >= self.peligro:
+            raise ValidationError('El umbral de advertencia debe ser menor que el de peligro.')
+        if self.direccion == self.BAJA and self.advertencia <= self.peligro:
+            raise ValidationError('Para gases peligrosos al bajar, la advertencia debe ser mayor que el peligro.')
+
+    def __str__(self):
+        return f"{self.tipo_gas} ({self.ubicacion or 'todas'}): {self.advertencia}/{self.peligro} {self.nivel_unidad}"
+
+
+class EventoGas(models.Model):
+    """Evento del canal en vivo de gases (ver eventos.py). El id es el id del evento SSE."""
+    LECTURA = 'lectura'
+    ALARMA = 'alarma'
+    TIPOS = [
+        (LECTURA, 'Último valor de un sensor'),
+        (ALARMA, 'Cambio de estado de un sensor'),
+    ]
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    ubicacion = models.CharField(max_length=100)
+    tipo_gas = models.CharField(max_length=50)
+    datos = models.JSONField()
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.id} {self.tipo} - {self.ubicacion} {self.tipo_gas}"
@@ -0,0 +1,38 @@
+import math
+import re
+
+# Conversión del texto libre de Registro_de_gases.nivel ('2.5%', '35 ppm', '0,8 %vol')
+# a un valor numérico y una unidad normalizada. Los ppb se guardan como ppm.
+
+UNIDAD_PORCENTAJE = '%'
+UNIDAD_PPM = 'ppm'
+UNIDADES = [
+    (UNIDAD_PORCENTAJE, '%'),
+    (UNIDAD_PPM, 'ppm'),
+]
+
+# unidad escrita -> (unidad normalizada, factor)
+_UNIDADES = {
+    '%': (UNIDAD_PORCENTAJE, 1),
+    '%vol': (UNIDAD_PORCENTAJE, 1),
+    'vol%': (UNIDAD_PORCENTAJE, 1),
+    'ppm': (UNIDAD_PPM, 1),
+    'ppb': (UNIDAD_PPM, 0.001),
+}
+
+_PATRON = re.compile(r'^\s*([-+]?\d+(?:[.,]\d+)?)\s*([a-z%]*)\s*$')
+
+
+def parsear_nivel(texto):
+    # Devuelve (valor, unidad). valor es None si el texto no tiene un número;
+    # unidad es None si no se indicó o no se reconoce.
+    if texto is None:
+        return None, None
+    coincidencia = _PATRON.match(str(texto).lower().replace(' ', ''))
+    if coincidencia is None:
+        return None, None
+    valor = float(coincidencia.group(1).replace(',', '.'))
+    if not math.isfinite(valor):
+        return None, None
+    unidad, factor = _UNIDADES.get(coincidencia.group(2), (None, 1))
+    return valor * factor, unidad
@@ -0,0 +1,244 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from . import archivo
+from .models import Registro_de_gases, ResumenGas
+
+# Resúmenes de lecturas de gas por intervalos de 1 minuto, 1 hora y 1 día
+# (ResumenGas), para graficar semanas de datos sin recorrer las lecturas crudas.
+# - La ingesta por lotes y las señales de Registro_de_gases los mantienen al día:
+#   las lecturas nuevas se acumulan (conteo, mínimo, máximo, suma, peor estado) y
+#   los cambios o borrados recalculan los intervalos afectados desde las lecturas.
+# - Las escrituras que no pasan por ahí (bulk_create, update(), datos viejos) se
+#   reconstruyen con el comando reconstruir_resumenes_gases.
+
+# resolución: segundos por intervalo, de la más fina a la más gruesa
+SEGUNDOS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+GRAVEDAD = {'Normal': 0, 'Advertencia': 1, 'Peligro': 2}
+ESTADO_POR_GRAVEDAD = {gravedad: estado for estado, gravedad in GRAVEDAD.items()}
+
+# Gravedad del estado calculada en la base de datos, para agregar con Max
+GRAVEDAD_SQL = Case(
+    *[When(estado=estado, then=Value(gravedad)) for estado, gravedad in GRAVEDAD.items()],
+    default=Value(0),
+    output_field=IntegerField(),
+)
+
+CAMPOS_VALOR = ['lecturas', 'minimo', 'maximo', 'suma', 'peor_estado']
+
+
+def inicio_intervalo(fecha, hora, resolucion):
+    if resolucion == '1d':
+        return fecha, time(0, 0)
+    if resolucion == '1h':
+        return fecha, time(hora.hour, 0)
+    return fecha, time(hora.hour, hora.minute)
+
+
+def fin_intervalo(fecha, hora, resolucion):
+    # Inicio del intervalo siguiente, como datetime local
+    return datetime.combine(fecha, hora) + timedelta(seconds=SEGUNDOS[resolucion])
+
+
+class Acumulador:
+    """Agrega lecturas nuevas en memoria y las suma a los resúmenes con guardar()."""
+
+    def __init__(self):
+        # (resolución, ubicación, tipo de gas, unidad, fecha, hora) -> [lecturas, mínimo, máximo, suma, gravedad]
+        self._intervalos = {}
+
+    def __bool__(self):
+        return bool(self._intervalos)
+
+    def agregar(self, fecha, hora, ubicacion, tipo_gas, nivel_unidad, nivel_valor, estado):
+        if nivel_valor is None or nivel_unidad is None:
+            return
+        gravedad = GRAVEDAD.get(estado, 0)
+        for resolucion in SEGUNDOS:
+            clave = (resolucion, ubicacion, tipo_gas, nivel_unidad, *inicio_intervalo(fecha, hora, resolucion))
+            intervalo = self._intervalos.get(clave)
+            if intervalo is None:
+                self._intervalos[clave] = [1, nivel_valor, nivel_valor, nivel_valor, gravedad]
+            else:
+                intervalo[0] += 1
+                if nivel_valor < intervalo[1]:
+                    intervalo[1] = nivel_valor
+                if nivel_valor > intervalo[2]:
+                    intervalo[2] = nivel_valor
+                intervalo[3] += nivel_valor
+                if gravedad > intervalo[4]:
+                    intervalo[4] = gravedad
+
+    def guardar(self):
+        # Suma lo acumulado a los resúmenes existentes y crea los que faltan
+        if not self._intervalos:
+            return
+        with transaction.atomic():
+            existentes = {}
+            for resolucion in SEGUNDOS:
+                claves = [clave for clave in self._intervalos if clave[0] == resolucion]
+                if not claves:
+                    continue
+                resumenes = ResumenGas.objects.select_for_update().filter(
+                    resolucion=resolucion,
+                    ubicacion__in={clave[1] for clave in claves},
+                    tipo_gas__in={clave[2] for clave in claves},
+                    fecha__in={clave[4] for clave in claves},
+                    hora__in={clave[5] for clave in claves},
+                )
+                for resumen in resumenes:
+                    existentes[_clave(resumen)] = resumen
+
+            nuevos = []
+            cambiados = []
+            for clave, (lecturas, minimo, maximo, suma, gravedad) in self._intervalos.items():
+                resumen = existentes.get(clave)
+                if resumen is None:
+                    nuevos.append(ResumenGas(
+                        resolucion=clave[0],
+                        ubicacion=clave[1],
+                        tipo_gas=clave[2],
+                        nivel_unidad=clave[3],
+                        fecha=clave[4],
+                        hora=clave[5],
+                        lecturas=lecturas,
+                        minimo=minimo,
+                        maximo=maximo,
+                        suma=suma,
+                        peor_estado=ESTADO_POR_GRAVEDAD[gravedad],
+                    ))
+                    continue
+                resumen.lecturas += lecturas
+                resumen.minimo = min(resumen.minimo, minimo)
+                resumen.maximo = max(resumen.maximo, maximo)
+                resumen.suma += suma
+                resumen.peor_estado = ESTADO_POR_GRAVEDAD[max(GRAVEDAD[resumen.peor_estado], gravedad)]
+                cambiados.append(resumen)
+            ResumenGas.objects.bulk_update(cambiados, CAMPOS_VALOR, batch_size=500)
+            ResumenGas.objects.bulk_create(nuevos, batch_size=500)
+        self._intervalos = {}
+
+
+def _clave(resumen):
+    return (resumen.resolucion, resumen.ubicacion, resumen.tipo_gas, resumen.nivel_unidad, resumen.fecha, resumen.hora)
+
+
+def _lecturas_del_intervalo(resolucion, ubicacion, tipo_gas, nivel_unidad, fecha, hora):
+    lecturas = Registro_de_gases.objects.filter(
+        ubicacion=ubicacion, tipo_gas=tipo_gas, nivel_unidad=nivel_unidad, nivel_valor__isnull=False, fecha=fecha,
+    )
+    if resolucion == '1d':
+        return lecturas
+    fin = fin_intervalo(fecha, hora, resolucion)
+    lecturas = lecturas.filter(hora__gte=hora)
+    # El último intervalo del día termina a medianoche
+    return lecturas.filter(hora__lt=fin.time()) if fin.date() == fecha else lecturas
+
+
+def recalcular(fecha, hora, ubicacion, tipo_gas, nivel_unidad):
+    # Vuelve a calcular desde las lecturas crudas los tres intervalos que contienen
+    # el momento dado (después de modificar o borrar una lectura)
+    if nivel_unidad is None:
+        return
+    with transaction.atomic():
+        for resolucion in SEGUNDOS:
+            clave = (resolucion, ubicacion, tipo_gas, nivel_unidad, *inicio_intervalo(fecha, hora, resolucion))
+            totales = _lecturas_del_intervalo(*clave).aggregate(
+                lecturas=Count('id'),
+                minimo=Min('nivel_valor'),
+                maximo=Max('nivel_valor'),
+                suma=Sum('nivel_valor'),
+                gravedad=Max(GRAVEDAD_SQL),
+            )
+            filtro = dict(zip(['resolucion', 'ubicacion', 'tipo_gas', 'nivel_unidad', 'fecha', 'hora'], clave))
+            if not totales['lecturas']:
+                ResumenGas.objects.filter(**filtro).delete()
+                continue
+            ResumenGas.objects.update_or_create(**filtro, defaults={
+                'lecturas': totales['lecturas'],
+                'minimo': totales['minimo'],
+                'maximo': totales['maximo'],
+                'suma': totales['suma'],
+                'peor_estado': ESTADO_POR_GRAVEDAD[totales['gravedad']],
+            })
+
+
+def reconstruir_dia(fecha):
+    # Reescribe los resúmenes de un día agregando las lecturas en la base de datos.
+    # Devuelve la cantidad de resúmenes creados.
+    agrupaciones = {
+        '1m': {'h': ExtractHour('hora'), 'm': ExtractMinute('hora')},
+        '1h': {'h': ExtractHour('hora')},
+        '1d': {},
+    }
+    lecturas = Registro_de_gases.objects.filter(fecha=fecha, nivel_valor__isnull=False, nivel_unidad__isnull=False)
+    resumenes = []
+    for resolucion, campos_hora in agrupaciones.items():
+        filas = (
+            lecturas.annotate(**campos_hora)
+            .values('ubicacion', 'tipo_gas', 'nivel_unidad', *campos_hora)
+            .annotate(
+                lecturas=Count('id'),
+                minimo=Min('nivel_valor'),
+                maximo=Max('nivel_valor'),
+                suma=Sum('nivel_valor'),
+                gravedad=Max(GRAVEDAD_SQL),
+            )
+            .order_by()
+        )
+        for fila in filas:
+            resumenes.append(ResumenGas(
+                resolucion=resolucion,
+                ubicacion=fila['ubicacion'],
+                tipo_gas=fila['tipo_gas'],
+                nivel_unidad=fila['nivel_unidad'],
+                fecha=fecha,
+                hora=time(fila.get('h', 0), fila.get('m', 0)),
+                lecturas=fila['lecturas'],
+                minimo=fila['minimo'],
+                maximo=fila['maximo'],
+                suma=fila['suma'],
+                peor_estado=ESTADO_POR_GRAVEDAD[fila['gravedad']],
+            ))
+    with transaction.atomic():
+        ResumenGas.objects.filter(fecha=fecha).delete()
+        ResumenGas.objects.bulk_create(resumenes, batch_size=1000)
+        # Lecturas del día que ya están en el archivo frío (ver archivo.py)
+        acumulador = Acumulador()
+        for lectura in archivo.lecturas({'fecha__gte': fecha, 'fecha__lte': fecha}):
+            acumulador.agregar(
+                lectura['fecha'], lectura['hora'], lectura['ubicacion'], lectura['tipo_gas'],
+                lectura['nivel_unidad'], lectura['nivel_valor'], lectura['estado'],
+            )
+        acumulador.guardar()
+    return ResumenGas.objects.filter(fecha=fecha).count()
+
+
+def elegir_resolucion(desde, hasta, puntos):
+    # La resolución más fina cuya cantidad de intervalos en la ventana entra en el
+    # presupuesto de puntos; si ninguna entra, la más gruesa
+    segundos = max((hasta - desde).total_seconds(), 1)
+    for resolucion, tamano in SEGUNDOS.items():
+        if segundos / tamano <= puntos:
+            return resolucion
+    return list(SEGUNDOS)[-1]
+
+
+def serie(ubicacion, tipo_gas, nivel_unidad, desde, hasta, resolucion):
+    # Resúmenes de un sensor entre dos datetimes locales (sin zona horaria), en orden
+    fecha_desde, hora_desde = inicio_intervalo(desde.date(), desde.time(), resolucion)
+    return ResumenGas.objects.filter(
+        Q(fecha__gt=fecha_desde) | Q(fecha=fecha_desde, hora__gte=hora_desde),
+        Q(fecha__lt=hasta.date()) | Q(fecha=hasta.date(), hora__lte=hasta.time()),
+        resolucion=resolucion,
+        ubicacion=ubicacion,
+        tipo_gas=tipo_gas,
+        nivel_unidad=nivel_unidad,
+    ).order_by('fecha', 'hora')
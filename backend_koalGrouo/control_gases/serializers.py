@@ -1,14 +1,19 @@
+from copy import copy
+from datetime import datetime
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
-from .models import Registro_de_gases
-from lugares_trabajo.models import Lugares_de_trabajo
+from rest_framework.settings import api_settings
+from .eventos import evento_alarma, publicar
+from .models import Registro_de_gases, UmbralGas
+from .niveles import parsear_nivel
+from .umbrales import ESTADO_POR_DEFECTO, motor_umbrales
+from administracion.expansion import ExpandibleMixin
 from lugares_trabajo.serializers import LugaresDeTrabajoSerializer  # Asegúrate de tenerlo
 
-class RegistroDeGasesSerializer(serializers.ModelSerializer):
-    nombre = serializers.PrimaryKeyRelatedField(
-        queryset=Lugares_de_trabajo.objects.all(),
-        write_only=True
-    )
-    nombre_info = LugaresDeTrabajoSerializer(source='nombre', read_only=True)
+class RegistroDeGasesSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    expandibles = {'nombre': LugaresDeTrabajoSerializer}
 
     class Meta:
         model = Registro_de_gases
@@ -19,8 +24,81 @@ class RegistroDeGasesSerializer(serializers.ModelSerializer):
             'ubicacion',
             'tipo_gas',
             'nivel',
+            'nivel_valor',   # Calculado a partir de nivel
+            'nivel_unidad',
             'estado',
             'registrado_por',
-            'nombre',        # Para escritura (ID del lugar)
-            'nombre_info'    # Para lectura (detalle del lugar)
+            'nombre',        # ID del lugar; el detalle con ?expand=nombre
         ]
+        read_only_fields = ['nivel_valor', 'nivel_unidad']
+        # El estado lo calcula el motor de umbrales; el enviado solo se usa para gases sin umbral
+        extra_kwargs = {'estado': {'required': False}}
+
+    def validate_nivel(self, value):
+        # Sin unidad ('12') se acepta como antes: se guarda el valor con nivel_unidad
+        # vacío y no se compara con los umbrales (que están en % o ppm)
+        valor, _ = parsear_nivel(value)
+        if valor is None:
+            raise serializers.ValidationError("Nivel inválido. Use un número, por ejemplo '2.5%', '35 ppm' o '12'.")
+        return value
+
+    def create(self, validated_data):
+        valor, unidad = parsear_nivel(validated_data['nivel'])
+        cambios = []
+        # El motor de umbrales aplica el estado nuevo del sensor solo si la lectura se guarda
+        with transaction.atomic():
+            estado = motor_umbrales.evaluar(
+                validated_data['ubicacion'],
+                validated_data['tipo_gas'],
+                unidad,
+                valor,
+                datetime.combine(validated_data['fecha'], validated_data['hora']),
+                cambios,
+            )
+            validated_data['estado'] = estado or validated_data.get('estado') or ESTADO_POR_DEFECTO
+            registro = super().create(validated_data)
+            # Alarmas para el canal en vivo (el último valor lo publica la señal post_save)
+            publicar([evento_alarma(cambio) for cambio in cambios])
+        return registro
+
+    def update(self, instance, validated_data):
+        # Una corrección de una lectura vieja se clasifica sin histéresis
+        # y no cambia el estado actual del sensor
+        valor, unidad = parsear_nivel(validated_data.get('nivel', instance.nivel))
+        estado = motor_umbrales.clasificar(
+            validated_data.get('ubicacion', instance.ubicacion),
+            validated_data.get('tipo_gas', instance.tipo_gas),
+            unidad,
+            valor,
+        )
+        if estado is not None:
+            validated_data['estado'] = estado
+        return super().update(instance, validated_data)
+
+
+class UmbralGasSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    class Meta:
+        model = UmbralGas
+        fields = '__all__'
+
+    def validate(self, attrs):
+        # Mismas reglas que UmbralGas.clean() y un solo umbral por gas y ubicación
+        # (también el general), también en actualizaciones parciales
+        if 'ubicacion' in attrs:
+            attrs['ubicacion'] = attrs['ubicacion'] or None
+        if self.instance is not None:
+            umbral = copy(self.instance)
+            for campo, valor in attrs.items():
+                setattr(umbral, campo, valor)
+        else:
+            umbral = UmbralGas(**attrs)
+        try:
+            umbral.clean()
+            umbral.validate_constraints()
+        except DjangoValidationError as error:
+            errores = error.message_dict if hasattr(error, 'error_dict') else {NON_FIELD_ERRORS: error.messages}
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY if campo == NON_FIELD_ERRORS else campo: mensajes
+                for campo, mensajes in errores.items()
+            })
+        return attrs
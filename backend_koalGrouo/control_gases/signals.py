@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from lugares_trabajo.models import Lugares_de_trabajo
+from .ingesta import cache_lugares
+from .models import Registro_de_gases, UmbralGas
+from . import eventos, resumenes, ultimas
+from .umbrales import motor_umbrales
+
+# Campos de una lectura que definen en qué resúmenes cae
+CAMPOS_RESUMEN = ['fecha', 'hora', 'ubicacion', 'tipo_gas', 'nivel_unidad']
+
+
+@receiver([post_save, post_delete], sender=Lugares_de_trabajo)
+def invalidar_cache_lugares(sender, instance, **kwargs):
+    cache_lugares.invalidar()
+
+
+@receiver(pre_save, sender=Registro_de_gases)
+def recordar_intervalo_anterior(sender, instance, **kwargs):
+    # Si una lectura se modifica, hay que recalcular también el intervalo donde estaba
+    instance._resumen_anterior = None
+    if instance.pk is not None:
+        instance._resumen_anterior = sender.objects.filter(pk=instance.pk).values_list(*CAMPOS_RESUMEN).first()
+
+
+@receiver(post_save, sender=Registro_de_gases)
+def actualizar_resumenes(sender, instance, created, **kwargs):
+    if created:
+        acumulador = resumenes.Acumulador()
+        acumulador.agregar(
+            instance.fecha, instance.hora, instance.ubicacion, instance.tipo_gas,
+            instance.nivel_unidad, instance.nivel_valor, instance.estado,
+        )
+        acumulador.guardar()
+        return
+    actual = tuple(getattr(instance, campo) for campo in CAMPOS_RESUMEN)
+    anterior = getattr(instance, '_resumen_anterior', None)
+    if anterior is not None and anterior != actual:
+        resumenes.recalcular(*anterior)
+    resumenes.recalcular(*actual)
+
+
+@receiver(post_save, sender=Registro_de_gases)
+def publicar_lectura(sender, instance, raw=False, **kwargs):
+    # Último valor del sensor para el canal en vivo (la ingesta por lotes publica los suyos)
+    if raw:
+        return
+    eventos.publicar([eventos.evento_lectura(
+        instance.ubicacion, instance.tipo_gas, instance.nivel_valor, instance.nivel_unidad,
+        instance.estado, datetime.combine(instance.fecha, instance.hora), id_lectura=instance.pk,
+    )])
+
+
+@receiver(post_save, sender=Registro_de_gases)
+def actualizar_ultimas(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    lectura = {campo: getattr(instance, campo) for campo in ultimas.CAMPOS if campo != 'nombre'}
+    lectura['nombre'] = instance.nombre_id
+    anterior = getattr(instance, '_resumen_anterior', None)
+
+    def actualizar():
+        if not created and anterior is not None:
+            fecha, hora, ubicacion, tipo_gas, _ = anterior
+            ultimas.invalidar(ubicacion, tipo_gas, fecha, hora)
+        ultimas.registrar([lectura])
+    transaction.on_commit(actualizar)
+
+
+@receiver(post_delete, sender=Registro_de_gases)
+def quitar_de_resumenes(sender, instance, **kwargs):
+    resumenes.recalcular(*(getattr(instance, campo) for campo in CAMPOS_RESUMEN))
+
+
+@receiver(post_delete, sender=Registro_de_gases)
+def quitar_de_ultimas(sender, instance, **kwargs):
+    transaction.on_commit(lambda: ultimas.invalidar(instance.ubicacion, instance.tipo_gas, instance.fecha, instance.hora))
+
+
+@receiver([post_save, post_delete], sender=UmbralGas)
+def invalidar_umbrales(sender, instance, **kwargs):
+    motor_umbrales.invalidar()
@@ -1,3 +1,430 @@
-from django.test import TestCase
+import asyncio
+import io
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from administracion.models import Proyecto
+from lugares_trabajo.models import Lugares_de_trabajo
+from . import archivo, ingesta, ultimas, views_async
+from .eventos import difusor
+from .ingesta import ingerir
+from .models import EventoGas, Registro_de_gases, UmbralGas
+from .serializers import RegistroDeGasesSerializer
+from .umbrales import motor_umbrales
+from .views import RegistroDeGasesViewSet
+
+
+def crear_lugar():
+    proyecto = Proyecto.objects.create(nombre='Mina', fecha_inicio=date(2025, 1, 1))
+    return Lugares_de_trabajo.objects.create(
+        nombre='Mina Norte', estado='activo', ubicacion='Mina Norte', trabajadores=10,
+        start_date=date(2025, 1, 1), estimated_end=date(2026, 1, 1), proyecto=proyecto,
+    )
+
+
+# Caché en memoria para no usar (ni borrar) la de desarrollo
+CACHE_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def lectura(lugar, nivel, **extra):
+    return {
+        'fecha': date(2025, 3, 1), 'hora': time(8, 0), 'ubicacion': 'Mina Norte - Sección A',
+        'tipo_gas': 'Metano', 'nivel': nivel, 'registrado_por': 'sensor-1', 'nombre': lugar.pk, **extra,
+    }
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class NivelTests(TestCase):
+
+    def setUp(self):
+        motor_umbrales.invalidar()
+        motor_umbrales.limpiar_estados()
+        self.lugar = crear_lugar()
+
+    def test_nivel_con_unidad(self):
+        serializer = RegistroDeGasesSerializer(data=lectura(self.lugar, '0,8 %vol'))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        registro = serializer.save()
+        self.assertEqual((registro.nivel_valor, registro.nivel_unidad), (0.8, '%'))
+
+    def test_nivel_sin_unidad_se_acepta(self):
+        serializer = RegistroDeGasesSerializer(data=lectura(self.lugar, '12', estado='Advertencia'))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        registro = serializer.save()
+        self.assertEqual((registro.nivel_valor, registro.nivel_unidad), (12.0, None))
+        self.assertEqual(registro.estado, 'Advertencia')
+
+    def test_nivel_sin_numero_se_rechaza(self):
+        serializer = RegistroDeGasesSerializer(data=lectura(self.lugar, 'alto'))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('nivel', serializer.errors)
+        self.assertFalse(Registro_de_gases.objects.exists())
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class MotorUmbralesTests(TestCase):
+
+    def setUp(self):
+        motor_umbrales.invalidar()
+        motor_umbrales.limpiar_estados()
+        self.addCleanup(motor_umbrales.limpiar_estados)
+        self.lugar = crear_lugar()
+        UmbralGas.objects.update_or_create(
+            tipo_gas='Metano', ubicacion=None,
+            defaults={'nivel_unidad': '%', 'advertencia': 1.0, 'peligro': 1.5, 'histeresis': 0.1},
+        )
+
+    def guardar(self, nivel, hora):
+        serializer = RegistroDeGasesSerializer(data=lectura(self.lugar, nivel, hora=hora))
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def alarmas(self):
+        return list(EventoGas.objects.filter(tipo=EventoGas.ALARMA).order_by('pk').values_list('datos__estado', flat=True))
+
+    def test_lectura_revertida_no_cambia_el_estado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.guardar('2%', time(8, 0))
+                    raise RuntimeError('falla después de evaluar')
+            except RuntimeError:
+                pass
+        self.assertEqual(motor_umbrales.estados(), [])
+        self.assertEqual(self.alarmas(), [])
+
+        # La siguiente lectura real sigue produciendo la alarma
+        with self.captureOnCommitCallbacks(execute=True):
+            registro = self.guardar('2%', time(8, 1))
+        self.assertEqual(registro.estado, 'Peligro')
+        self.assertEqual(self.alarmas(), ['Peligro'])
+        self.assertEqual(motor_umbrales.estados()[0]['estado'], 'Peligro')
+
+    def test_lote_usa_el_estado_de_la_lectura_anterior_del_mismo_sensor(self):
+        filas = [
+            (numero, lectura(self.lugar, nivel, hora=hora.isoformat(), fecha='2025-03-01'))
+            for numero, (nivel, hora) in enumerate([('2%', time(8, 0)), ('1.6%', time(8, 1)), ('0.2%', time(8, 2))], 1)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = ingerir(filas)
+        self.assertEqual(resultado['insertadas'], 3)
+        self.assertEqual(self.alarmas(), ['Peligro', 'Normal'])
+        self.assertEqual(motor_umbrales.estados()[0]['estado'], 'Normal')
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class IngestaTests(TestCase):
+
+    def setUp(self):
+        motor_umbrales.invalidar()
+        motor_umbrales.limpiar_estados()
+        UmbralGas.objects.update_or_create(
+            tipo_gas='Metano', ubicacion=None, defaults={'nivel_unidad': '%', 'advertencia': 1.0, 'peligro': 1.5, 'histeresis': 0.5},
+        )
+        self.lugar = crear_lugar()
+        ingesta.cache_lugares.invalidar()
+
+    def filas(self, niveles):
+        # Como el cuerpo de la petición: mientras se lee no se escribió nada todavía
+        for numero, nivel in enumerate(niveles, 1):
+            self.assertFalse(Registro_de_gases.objects.exists())
+            yield numero, lectura(self.lugar, nivel, hora=time(8, numero).isoformat())
+
+    def test_nivel_sin_unidad_como_en_el_serializador(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = ingerir(self.filas(['12', 'alto']))
+        self.assertEqual(resultado['insertadas'], 1)
+        self.assertEqual(resultado['errores'], [{'linea': 2, 'error': 'nivel: "alto" inválido.'}])
+        registro = Registro_de_gases.objects.get()
+        self.assertEqual((registro.nivel_valor, registro.nivel_unidad), (12.0, None))
+
+    def test_bloques_en_transacciones_separadas(self):
+        with mock.patch.object(ingesta, 'BLOQUE', 2), \
+                mock.patch.object(ingesta, '_guardar', wraps=ingesta._guardar) as guardar, \
+                self.captureOnCommitCallbacks(execute=True):
+            resultado = ingerir(self.filas(['2%', '1.6%', '1.2%', '0.2%', '0.3%']))
+        self.assertEqual(resultado['insertadas'], 5)
+        self.assertEqual([len(llamada.args[0]) for llamada in guardar.call_args_list], [2, 2, 1])
+        # La histéresis sigue de un bloque al otro
+        estados = list(Registro_de_gases.objects.order_by('hora').values_list('estado', flat=True))
+        self.assertEqual(estados, ['Peligro', 'Peligro', 'Peligro', 'Normal', 'Normal'])
+        self.assertEqual(motor_umbrales.estados()[0]['estado'], 'Normal')
+
+    def test_lote_muy_grande_no_guarda_nada(self):
+        with mock.patch.object(ingesta, 'MAXIMO_LECTURAS', 2), self.assertRaises(ingesta.DemasiadasLecturas):
+            ingerir(self.filas(['1%', '1%', '1%']))
+        self.assertFalse(Registro_de_gases.objects.exists())
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class UltimasLecturasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lugar = crear_lugar()
+
+    def guardar(self, ubicacion, tipo_gas, hora):
+        # Lectura guardada por otro worker: sin señales, registrar() como en su on_commit
+        registro = Registro_de_gases(
+            fecha=date(2025, 3, 1), hora=hora, ubicacion=ubicacion, tipo_gas=tipo_gas, nivel='1%',
+            nivel_valor=1.0, nivel_unidad='%', estado='Normal', registrado_por='sensor', nombre=self.lugar,
+        )
+        Registro_de_gases.objects.bulk_create([registro])
+        lectura = {campo: getattr(registro, campo) for campo in ultimas.CAMPOS if campo != 'nombre'}
+        return {**lectura, 'nombre': self.lugar.pk}
+
+    def sensores(self):
+        return [(lectura['ubicacion'], lectura['tipo_gas']) for lectura in ultimas.consultar()]
+
+    def test_sensores_nuevos_de_dos_workers(self):
+        self.guardar('Mina Norte - Sección A', 'Metano', time(8, 0))
+        self.assertEqual(self.sensores(), [('Mina Norte - Sección A', 'Metano')])
+
+        # Una lista armada antes de que aparezcan los sensores nuevos y guardada después
+        vieja = cache.get(ultimas.CLAVE_SENSORES)
+        ultimas.registrar([self.guardar('Mina Sur - Sección A', 'Metano', time(8, 1))])
+        ultimas.registrar([self.guardar('Mina Norte - Sección A', 'Oxígeno', time(8, 1))])
+        cache.set(ultimas.CLAVE_SENSORES, vieja)
+
+        self.assertEqual(self.sensores(), [
+            ('Mina Norte - Sección A', 'Metano'),
+            ('Mina Norte - Sección A', 'Oxígeno'),
+            ('Mina Sur - Sección A', 'Metano'),
+        ])
+
+    def test_una_lectura_vieja_no_pisa_una_nueva_de_otro_worker(self):
+        sensor = ('Mina Norte - Sección A', 'Metano')
+        self.guardar(*sensor, time(8, 0))
+        self.sensores()
+        vieja = self.guardar(*sensor, time(8, 30))
+        nueva = self.guardar(*sensor, time(9, 0))
+
+        # El worker con la lectura vieja ya leyó y comparó; antes de que guarde,
+        # otro worker registra la nueva
+        otro = threading.Thread(target=ultimas.registrar, args=([nueva],))
+        instancia = caches['default']
+        guardar = instancia.set_many
+
+        def set_many(*args, **kwargs):
+            otro.start()
+            otro.join(0.1)
+            return guardar(*args, **kwargs)
+
+        with mock.patch.object(instancia, 'set_many', side_effect=set_many):
+            ultimas.registrar([vieja])
+        otro.join()
+
+        self.assertEqual(ultimas.consultar()[0]['hora'], time(9, 0))
+        self.assertIsNone(cache.get(ultimas.CLAVE_BLOQUEO))
+
+    def test_lectura_mas_reciente_de_un_sensor_conocido(self):
+        self.guardar('Mina Norte - Sección A', 'Metano', time(8, 0))
+        self.sensores()
+        ultimas.registrar([self.guardar('Mina Norte - Sección A', 'Metano', time(9, 0))])
+        with self.assertNumQueries(0):
+            self.assertEqual(ultimas.consultar()[0]['hora'], time(9, 0))
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class SerieTests(TestCase):
+
+    def setUp(self):
+        self.lugar = crear_lugar()
+        self.serie = RegistroDeGasesViewSet.as_view({'get': 'serie'}, permission_classes=[])
+
+    def guardar(self, hora, nivel, estado='Normal'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Registro_de_gases.objects.create(
+                fecha=date(2025, 3, 1), hora=hora, ubicacion='Mina Norte - Sección A', tipo_gas='Metano',
+                nivel=nivel, estado=estado, registrado_por='sensor', nombre=self.lugar,
+            )
+
+    def consultar(self, **parametros):
+        consulta = {
+            'ubicacion': 'Mina Norte - Sección A', 'tipo_gas': 'Metano',
+            'desde': '2025-03-01', 'hasta': '2025-03-02', **parametros,
+        }
+        return self.serie(APIRequestFactory().get('/', consulta))
+
+    def puntos(self, resolucion):
+        respuesta = self.consultar(resolucion=resolucion)
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return [
+            (punto['inicio'].time(), punto['lecturas'], punto['minimo'], punto['maximo'], punto['promedio'], punto['peor_estado'])
+            for punto in respuesta.data['puntos']
+        ]
+
+    def test_resumenes_por_minuto_y_hora(self):
+        primera = self.guardar(time(8, 0, 10), '1%')
+        self.guardar(time(8, 0, 40), '3%', estado='Advertencia')
+        self.guardar(time(8, 5), '2%')
+
+        self.assertEqual(self.puntos('1m'), [
+            (time(8, 0), 2, 1.0, 3.0, 2.0, 'Advertencia'),
+            (time(8, 5), 1, 2.0, 2.0, 2.0, 'Normal'),
+        ])
+        self.assertEqual(self.puntos('1h'), [(time(8, 0), 3, 1.0, 3.0, 2.0, 'Advertencia')])
+
+        # Editar una lectura recalcula sus intervalos
+        primera.nivel = '5%'
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.save()
+        self.assertEqual(self.puntos('1h'), [(time(8, 0), 3, 2.0, 5.0, 3.3333, 'Advertencia')])
+
+    def test_fecha_inexistente_es_un_400(self):
+        for campo, valor in (('desde', '2026-13-01T00:00'), ('hasta', '2026-02-30'), ('desde', 'ayer')):
+            respuesta = self.consultar(**{campo: valor})
+            self.assertEqual(respuesta.status_code, 400, valor)
+            self.assertIn(campo, respuesta.data)
+
+
+class EventosEnVivoTests(TestCase):
+
+    def setUp(self):
+        self.eventos = [
+            EventoGas.objects.create(tipo=EventoGas.LECTURA, ubicacion='Mina Norte', tipo_gas='Metano', datos={'nivel': nivel})
+            for nivel in ('1%', '2%')
+        ]
+
+    def pedir(self, usuario, **parametros):
+        consulta = {'token': str(AccessToken.for_user(usuario)), **parametros}
+        return views_async.eventos(AsyncRequestFactory().get('/', consulta))
+
+    async def test_supervisor_recibe_el_flujo(self):
+        supervisor = await get_user_model().objects.acreate_user('supervisor', password='x', is_staff=True)
+        respuesta = await self.pedir(supervisor, ultimo_id=self.eventos[0].pk)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+
+        # Se lee el generador de la vista (streaming_content lo envuelve y al cerrarlo
+        # no lo cierra) para poder cerrarlo al final y que se desuscriba
+        flujo = respuesta._iterator
+        try:
+            self.assertEqual(await anext(flujo), 'retry: 3000\n\n')
+            # Al reanudar se reenvían los eventos posteriores a ultimo_id
+            reenviado = await anext(flujo)
+            self.assertTrue(reenviado.startswith(f'id: {self.eventos[1].pk}\nevent: lectura\n'), reenviado)
+        finally:
+            await flujo.aclose()
+            tarea = difusor._tarea
+            difusor.despertar()
+            await asyncio.wait_for(tarea, 5)
+
+    async def test_usuario_comun_no_puede_suscribirse(self):
+        usuario = await get_user_model().objects.acreate_user('operario', password='x')
+        respuesta = await self.pedir(usuario)
+        self.assertEqual(respuesta.status_code, 403)
+
+
+class ArchivoTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        for parche in (
+            mock.patch.object(archivo, 'DIRECTORIO', Path(directorio.name)),
+            mock.patch.object(archivo, 'FILAS_POR_BLOQUE', 4),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.lugar = crear_lugar()
+        self.listar = RegistroDeGasesViewSet.as_view({'get': 'list'}, permission_classes=[])
+
+    def guardar(self, *momentos, ubicacion='Mina Norte - Sección A'):
+        Registro_de_gases.objects.bulk_create([
+            Registro_de_gases(
+                fecha=momento.date(), hora=momento.time(), ubicacion=ubicacion, tipo_gas='Metano', nivel='1%',
+                nivel_valor=1.0, nivel_unidad='%', estado='Normal', registrado_por='sensor', nombre=self.lugar,
+            )
+            for momento in momentos
+        ])
+
+    def archivar(self):
+        call_command('archivar_gases', dias=1, stdout=io.StringIO())
+
+    def paginas(self, limite, **parametros):
+        cursor = None
+        while True:
+            consulta = {'limite': limite, **parametros, **({'cursor': cursor} if cursor else {})}
+            respuesta = self.listar(APIRequestFactory().get('/', consulta))
+            self.assertEqual(respuesta.status_code, 200, respuesta.data)
+            self.assertLessEqual(len(respuesta.data['resultados']), limite)
+            yield respuesta.data['resultados']
+            cursor = respuesta.data['siguiente']
+            if cursor is None:
+                return
+
+    def test_listado_paginado_mezcla_archivo_y_tabla(self):
+        inicio = datetime(2025, 1, 30, 6, 0)
+        # Dos ubicaciones intercaladas en dos meses, más bloques que FILAS_POR_BLOQUE
+        self.guardar(*(inicio + timedelta(hours=5 * i) for i in range(12)))
+        self.guardar(*(inicio + timedelta(hours=5 * i, minutes=1) for i in range(12)), ubicacion='Mina Sur - Sección A')
+        self.archivar()
+        self.assertEqual(len(archivo.archivos()), 4)
+        self.assertFalse(Registro_de_gases.objects.exists())
+        # Lecturas atrasadas que llegaron después de archivar, entre las archivadas
+        self.guardar(inicio + timedelta(hours=7), datetime.now())
+
+        lecturas = [lectura for pagina in self.paginas(5) for lectura in pagina]
+        self.assertEqual(len(lecturas), 26)
+        claves = [(lectura['fecha'], lectura['hora'], lectura['id']) for lectura in lecturas]
+        self.assertEqual(claves, sorted(claves))
+        self.assertEqual(len({lectura['id'] for lectura in lecturas}), 26)
+
+        en_febrero = [lectura for pagina in self.paginas(3, desde='2025-02-01', hasta='2025-02-28') for lectura in pagina]
+        self.assertEqual(len(en_febrero), 6)
+
+    def test_una_pagina_solo_abre_los_archivos_del_primer_mes(self):
+        self.guardar(datetime(2025, 1, 1, 6, 0), datetime(2025, 1, 2, 6, 0), datetime(2025, 2, 1, 6, 0))
+        self.guardar(datetime(2025, 1, 1, 7, 0), datetime(2025, 2, 1, 7, 0), ubicacion='Mina Sur - Sección A')
+        self.archivar()
+
+        with mock.patch.object(archivo, 'Archivo', wraps=archivo.Archivo) as abrir:
+            primera = next(self.paginas(2))
+        self.assertEqual([lectura['hora'] for lectura in primera], ['06:00:00', '07:00:00'])
+        self.assertEqual(sorted(llamada.args[0].name[:7] for llamada in abrir.call_args_list), ['2025-01', '2025-01'])
+
+    def test_archivar_de_nuevo_combina_sin_repetir(self):
+        self.guardar(datetime(2025, 1, 10, 6, 0), datetime(2025, 1, 11, 6, 0))
+        self.archivar()
+        self.guardar(datetime(2025, 1, 10, 12, 0), *(datetime(2025, 1, 12, 6, i) for i in range(5)))
+        self.archivar()
+
+        (destino,) = archivo.archivos()
+        with archivo.Archivo(destino) as combinado:
+            filas = list(combinado.filas())
+        self.assertEqual(len(filas), 8)
+        self.assertEqual(filas, sorted(filas, key=lambda fila: (fila[1], fila[0])))
+        self.assertFalse(Registro_de_gases.objects.exists())
+
+    def test_si_el_borrado_falla_no_se_publica_el_archivo(self):
+        self.guardar(datetime(2025, 1, 10, 6, 0))
+        self.archivar()
+        self.guardar(datetime(2025, 1, 11, 6, 0), datetime(2025, 1, 12, 6, 0))
+        (destino,) = archivo.archivos()
+        escribir = archivo.escribir
+
+        def editada_mientras_tanto(*args, **kwargs):
+            # Una lectura se borra de la tabla entre leerla y borrarla: no coincide la cantidad
+            escritas = escribir(*args, **kwargs)
+            Registro_de_gases.objects.order_by('pk').first().delete()
+            return escritas
+
+        with mock.patch.object(archivo, 'escribir', editada_mientras_tanto):
+            with self.assertRaises(CommandError):
+                self.archivar()
+        with archivo.Archivo(destino) as anterior:
+            self.assertEqual(anterior.pie['filas'], 1)
+        self.assertEqual(Registro_de_gases.objects.count(), 1)
+        self.assertEqual(sorted(entrada.name for entrada in destino.parent.iterdir()), [destino.name])
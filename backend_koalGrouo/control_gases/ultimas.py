@@ -0,0 +1,176 @@
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from django.core.cache import cache
+
+from .models import Registro_de_gases
+
+# Última lectura de cada (ubicación, tipo de gas), servida desde la caché de Django
+# (CACHES en settings, compartida por los workers) en lugar de recorrer y ordenar
+# todo el historial.
+# - Cada sensor tiene su propia clave, y CLAVE_SENSORES guarda la lista de sensores.
+#   Así dos workers que escriben lecturas de sensores distintos no se pisan.
+# - Las escrituras llaman a registrar() al confirmarse la transacción (on_commit) y
+#   solo reemplazan la lectura guardada si la nueva es igual o más reciente.
+#   Leer, comparar y guardar se hace con CLAVE_BLOQUEO tomado (cache.add es atómico
+#   en todos los backends): sin él, un worker con una lectura vieja podía leer,
+#   quedar atrás de otro que guardaba una más nueva y pisarla. El bloqueo expira
+#   solo (BLOQUEO_DURACION) si el worker que lo tiene muere; si al terminar el
+#   bloqueo ya no es suyo, las claves que escribió se borran y se recalculan.
+# - Las escrituras nunca reescriben la lista (leer, agregar y guardar no es atómico
+#   entre workers y un sensor nuevo se podía perder). Un sensor que no está en la
+#   lista cambia CLAVE_VERSION, y la lista se vuelve a armar desde la base en la
+#   próxima consulta. La lista guarda la versión con la que se armó: una lista
+#   armada antes del cambio (aunque se guarde después) no se usa.
+# - Si se modifica o borra la lectura que estaba en caché, su clave se borra
+#   (invalidar()) y se vuelve a calcular con una consulta al leer.
+# - Sin la lista de sensores (caché vacía o expirada) se reconstruye todo con un
+#   recorrido del índice gases_sensor_momento_idx: una búsqueda por ubicación, por
+#   gas y por última lectura, sin leer el historial completo.
+
+CLAVE_SENSORES = 'gases:ultimas:sensores'
+CLAVE_VERSION = 'gases:ultimas:version'
+CLAVE_BLOQUEO = 'gases:ultimas:bloqueo'
+BLOQUEO_DURACION = 2  # segundos; leer y escribir unas claves tarda milisegundos
+DURACION = 3600  # las claves se renuevan en cada escritura; expiran si el sensor deja de enviar
+CAMPOS = [
+    'fecha', 'hora', 'ubicacion', 'tipo_gas', 'nivel', 'nivel_valor', 'nivel_unidad',
+    'estado', 'registrado_por', 'nombre',
+]
+
+
+def _clave(ubicacion, tipo_gas):
+    # Las claves de caché no pueden tener espacios (memcached)
+    return f'gases:ultima:{quote(ubicacion)}:{quote(tipo_gas)}'
+
+
+def _ultima_lectura(ubicacion, tipo_gas):
+    fila = (
+        Registro_de_gases.objects.filter(ubicacion=ubicacion, tipo_gas=tipo_gas)
+        .order_by('-fecha', '-hora', '-id')
+        .values_list(*CAMPOS[:-1], 'nombre_id')
+        .first()
+    )
+    return dict(zip(CAMPOS, fila)) if fila is not None else None
+
+
+def _siguiente(lecturas, campo, anterior):
+    # Siguiente valor distinto de campo en el orden del índice (recorrido por saltos)
+    if anterior is not None:
+        lecturas = lecturas.filter(**{f'{campo}__gt': anterior})
+    return lecturas.order_by(campo).values_list(campo, flat=True).first()
+
+
+def _nueva_version():
+    version = time.time_ns()
+    cache.set(CLAVE_VERSION, version, None)
+    return version
+
+
+@contextmanager
+def _bloqueo():
+    # Espera a que el bloqueo quede libre (o expire) y lo toma. Devuelve una función
+    # que dice si el bloqueo sigue siendo de este worker.
+    dueno = uuid.uuid4().hex
+    while not cache.add(CLAVE_BLOQUEO, dueno, BLOQUEO_DURACION):
+        time.sleep(0.005)
+    try:
+        yield lambda: cache.get(CLAVE_BLOQUEO) == dueno
+    finally:
+        if cache.get(CLAVE_BLOQUEO) == dueno:
+            cache.delete(CLAVE_BLOQUEO)
+
+
+def reconstruir(version=None):
+    # Busca la última lectura de cada sensor y las guarda en la caché.
+    # version: la vigente antes de empezar a leer la base
+    if version is None:
+        version = cache.get(CLAVE_VERSION) or _nueva_version()
+    lecturas = {}
+    ubicacion = _siguiente(Registro_de_gases.objects.all(), 'ubicacion', None)
+    while ubicacion is not None:
+        de_la_ubicacion = Registro_de_gases.objects.filter(ubicacion=ubicacion)
+        tipo_gas = _siguiente(de_la_ubicacion, 'tipo_gas', None)
+        while tipo_gas is not None:
+            lecturas[(ubicacion, tipo_gas)] = _ultima_lectura(ubicacion, tipo_gas)
+            tipo_gas = _siguiente(de_la_ubicacion, 'tipo_gas', tipo_gas)
+        ubicacion = _siguiente(Registro_de_gases.objects.all(), 'ubicacion', ubicacion)
+    cache.set_many({_clave(*sensor): lectura for sensor, lectura in lecturas.items()}, DURACION)
+    cache.set(CLAVE_SENSORES, (version, sorted(lecturas)), DURACION)
+    return lecturas
+
+
+def _sensores():
+    # (versión vigente, lista de sensores o None si falta o es de otra versión)
+    guardadas = cache.get_many([CLAVE_VERSION, CLAVE_SENSORES])
+    version = guardadas.get(CLAVE_VERSION)
+    lista = guardadas.get(CLAVE_SENSORES)
+    if version is None or lista is None or lista[0] != version:
+        return version, None
+    return version, lista[1]
+
+
+def consultar():
+    # Última lectura de cada sensor, ordenadas por ubicación y tipo de gas
+    version, sensores = _sensores()
+    if sensores is None:
+        lecturas = reconstruir(version or _nueva_version())
+        return [lecturas[sensor] for sensor in sorted(lecturas)]
+    claves = {sensor: _clave(*sensor) for sensor in sensores}
+    guardadas = cache.get_many(list(claves.values()))
+    resultado = []
+    for sensor, clave in claves.items():
+        lectura = guardadas.get(clave)
+        if lectura is None:
+            lectura = _ultima_lectura(*sensor)
+            if lectura is None:
+                continue
+            cache.set(clave, lectura, DURACION)
+        resultado.append(lectura)
+    return resultado
+
+
+def registrar(lecturas):
+    # lecturas: dicts con CAMPOS, ya guardadas. Llamar después del commit.
+    recientes = {}
+    for lectura in lecturas:
+        sensor = (lectura['ubicacion'], lectura['tipo_gas'])
+        actual = recientes.get(sensor)
+        if actual is None or (lectura['fecha'], lectura['hora']) >= (actual['fecha'], actual['hora']):
+            recientes[sensor] = lectura
+    if not recientes:
+        return
+    _, sensores = _sensores()
+    if sensores is None:
+        # Sin caché armada: la próxima consulta la reconstruye con estas lecturas
+        return
+    claves = {sensor: _clave(*sensor) for sensor in recientes}
+    with _bloqueo() as sigue_siendo_mio:
+        guardadas = cache.get_many(list(claves.values()))
+        nuevas = {}
+        for sensor, lectura in recientes.items():
+            guardada = guardadas.get(claves[sensor])
+            # Sin lectura guardada no se sabe si esta es la última (podría ser un dato
+            # atrasado): la clave se calcula en la próxima consulta
+            if guardada is not None and (lectura['fecha'], lectura['hora']) >= (guardada['fecha'], guardada['hora']):
+                nuevas[claves[sensor]] = lectura
+        cache.set_many(nuevas, DURACION)
+        if not sigue_siendo_mio():
+            # El bloqueo expiró mientras tanto: otro worker pudo guardar algo más nuevo
+            cache.delete_many(list(nuevas))
+    if set(recientes) - {tuple(sensor) for sensor in sensores}:
+        # Sensor nuevo: la lista se rearma desde la base en la próxima consulta
+        _nueva_version()
+    else:
+        cache.touch(CLAVE_SENSORES, DURACION)
+
+
+def invalidar(ubicacion, tipo_gas, fecha, hora):
+    # Una lectura se modificó o se borró: si era la que estaba en caché (o una más
+    # nueva), se borra la clave del sensor y se recalcula en la próxima consulta
+    clave = _clave(ubicacion, tipo_gas)
+    guardada = cache.get(clave)
+    if guardada is not None and (fecha, hora) >= (guardada['fecha'], guardada['hora']):
+        cache.delete(clave)
@@ -0,0 +1,171 @@
+from threading import RLock
+
+from django.db import transaction
+
+from .models import Registro_de_gases, UmbralGas
+from .niveles import UNIDAD_PORCENTAJE, UNIDAD_PPM
+
+# Motor de umbrales: calcula en el servidor el estado (Normal/Advertencia/Peligro) de
+# cada lectura con los umbrales de UmbralGas, que se cargan una vez por proceso y se
+# invalidan desde las señales (ver signals.py). Evaluar una lectura son unas pocas
+# búsquedas en diccionarios, sin consultas.
+#
+# Histéresis: para subir de estado basta con alcanzar el umbral; para bajar, el valor
+# tiene que quedar por debajo del umbral menos la histéresis. Así una lectura que oscila
+# alrededor de un umbral no cambia de estado a cada rato. Para el oxígeno (peligroso al
+# bajar) se evalúa con los valores negados.
+#
+# El último estado de cada (ubicación, tipo de gas) se guarda en memoria del proceso.
+# Las lecturas más viejas que la última evaluada se clasifican sin histéresis y no
+# cambian ese estado. El estado nuevo se aplica cuando se confirma la transacción de
+# la lectura (transaction.on_commit): si la escritura se revierte, el sensor conserva
+# su estado y la próxima lectura real vuelve a producir el cambio.
+
+ESTADOS = [estado for estado, _ in Registro_de_gases.ESTADOS]  # ordenados por gravedad
+ESTADO_POR_DEFECTO = ESTADOS[0]
+
+# Factor para pasar de la unidad de la lectura a la unidad del umbral
+CONVERSIONES = {
+    (UNIDAD_PORCENTAJE, UNIDAD_PPM): 10_000,
+    (UNIDAD_PPM, UNIDAD_PORCENTAJE): 1 / 10_000,
+}
+
+
+class Regla:
+    __slots__ = ('unidad', 'signo', 'advertencia', 'peligro', 'histeresis')
+
+    def __init__(self, umbral):
+        self.unidad = umbral.nivel_unidad
+        self.signo = -1 if umbral.direccion == UmbralGas.BAJA else 1
+        self.advertencia = self.signo * umbral.advertencia
+        self.peligro = self.signo * umbral.peligro
+        self.histeresis = umbral.histeresis
+
+    def valor(self, valor, unidad):
+        # Valor de la lectura en la unidad del umbral y con el signo de la regla
+        if unidad != self.unidad:
+            factor = CONVERSIONES.get((unidad, self.unidad))
+            if factor is None:
+                return None
+            valor *= factor
+        return self.signo * valor
+
+    def nivel(self, valor, margen=0):
+        if valor >= self.peligro - margen:
+            return 2
+        if valor >= self.advertencia - margen:
+            return 1
+        return 0
+
+
+class MotorUmbrales:
+    """Umbrales en memoria y último estado por (ubicación, tipo de gas)."""
+
+    def __init__(self):
+        self._lock = RLock()
+        self._reglas = None
+        # (ubicación, tipo de gas) -> (nivel, valor, unidad, momento)
+        self._estados = {}
+
+    def invalidar(self):
+        with self._lock:
+            self._reglas = None
+
+    def limpiar_estados(self):
+        with self._lock:
+            self._estados = {}
+
+    def _cargar(self):
+        # (tipo de gas, ubicación o None) -> Regla
+        reglas = {}
+        for umbral in UmbralGas.objects.all():
+            reglas[(umbral.tipo_gas, umbral.ubicacion or None)] = Regla(umbral)
+        return reglas
+
+    def regla(self, ubicacion, tipo_gas):
+        reglas = self._reglas
+        if reglas is None:
+            with self._lock:
+                if self._reglas is None:
+                    self._reglas = self._cargar()
+                reglas = self._reglas
+        return reglas.get((tipo_gas, ubicacion)) or reglas.get((tipo_gas, None))
+
+    def clasificar(self, ubicacion, tipo_gas, unidad, valor):
+        # Estado de una lectura aislada (sin histéresis), o None si no hay umbral aplicable
+        regla = self.regla(ubicacion, tipo_gas)
+        if regla is None or valor is None:
+            return None
+        valor = regla.valor(valor, unidad)
+        if valor is None:
+            return None
+        return ESTADOS[regla.nivel(valor)]
+
+    def evaluar(self, ubicacion, tipo_gas, unidad, valor, momento, cambios=None, pendientes=None):
+        # Estado de una lectura nueva teniendo en cuenta el estado anterior del sensor.
+        # Devuelve None si no hay umbral aplicable (el estado lo decide quien llama).
+        # Si se pasa la lista cambios, se le agregan los cambios de estado del sensor
+        # (un sensor sin estado previo cuenta como Normal).
+        # Llamar dentro de la transacción que guarda la lectura. Un lote pasa su propio
+        # dict pendientes, para que cada lectura vea el estado que dejó la anterior del
+        # mismo sensor, y llama a confirmar(pendientes) en on_commit.
+        regla = self.regla(ubicacion, tipo_gas)
+        if regla is None or valor is None:
+            return None
+        ajustado = regla.valor(valor, unidad)
+        if ajustado is None:
+            return None
+        nivel = regla.nivel(ajustado)
+        clave = (ubicacion, tipo_gas)
+        anterior = pendientes.get(clave) if pendientes else None
+        if anterior is None:
+            with self._lock:
+                anterior = self._estados.get(clave)
+        if anterior is not None:
+            if momento < anterior[3]:
+                return ESTADOS[nivel]
+            if nivel < anterior[0]:
+                nivel = max(nivel, min(anterior[0], regla.nivel(ajustado, regla.histeresis)))
+        estado = (nivel, valor, unidad, momento)
+        if pendientes is None:
+            transaction.on_commit(lambda: self.confirmar({clave: estado}))
+        else:
+            pendientes[clave] = estado
+        nivel_anterior = anterior[0] if anterior is not None else 0
+        if cambios is not None and nivel != nivel_anterior:
+            cambios.append({
+                'ubicacion': ubicacion,
+                'tipo_gas': tipo_gas,
+                'anterior': ESTADOS[nivel_anterior],
+                'estado': ESTADOS[nivel],
+                'nivel_valor': valor,
+                'nivel_unidad': unidad,
+                'momento': momento,
+            })
+        return ESTADOS[nivel]
+
+    def confirmar(self, pendientes):
+        # Aplica los estados de lecturas ya guardadas; no retrocede a un momento anterior
+        with self._lock:
+            for clave, estado in pendientes.items():
+                actual = self._estados.get(clave)
+                if actual is None or estado[3] >= actual[3]:
+                    self._estados[clave] = estado
+
+    def estados(self):
+        # Último estado evaluado de cada sensor
+        with self._lock:
+            return [
+                {
+                    'ubicacion': ubicacion,
+                    'tipo_gas': tipo_gas,
+                    'estado': ESTADOS[nivel],
+                    'nivel_valor': valor,
+                    'nivel_unidad': unidad,
+                    'momento': momento,
+                }
+                for (ubicacion, tipo_gas), (nivel, valor, unidad, momento) in sorted(self._estados.items())
+            ]
+
+
+motor_umbrales = MotorUmbrales()
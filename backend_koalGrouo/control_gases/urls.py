@@ -1,10 +1,14 @@
 from django.urls import path , include 
 from rest_framework.routers import DefaultRouter
-from .views import RegistroDeGasesViewSet
+from .views import RegistroDeGasesViewSet, UmbralGasViewSet
+from . import views_async
 
 router = DefaultRouter()
 router.register(r'registros', RegistroDeGasesViewSet)
+router.register(r'umbrales', UmbralGasViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Canal en vivo (Server-Sent Events), solo con ASGI (ver views_async.py)
+    path('eventos/', views_async.eventos, name='eventos-gases'),
 ]
\ No newline at end of file
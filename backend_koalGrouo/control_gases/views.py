@@ -1,11 +1,308 @@
-from rest_framework import viewsets
-from .models import Registro_de_gases
-from .serializers import RegistroDeGasesSerializer
+import base64
+import binascii
+import csv
+import heapq
+import itertools
+import zlib
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .models import Registro_de_gases, ResumenGas, UmbralGas
+from . import archivo, ingesta, resumenes, ultimas
+from .serializers import RegistroDeGasesSerializer, UmbralGasSerializer
+from .umbrales import motor_umbrales
+from administracion.expansion import ConsultaExpandibleMixin
+from administracion.exportacion import ExportableMixin
 from administracion.permisos import EsSupervisor,EsAdministrador
-class RegistroDeGasesViewSet(viewsets.ModelViewSet):
+
+# Filtros de rango sobre el nivel numérico: ?nivel_valor__gte=1.5&nivel_valor__lt=3
+FILTROS_NIVEL = ['nivel_valor__gte', 'nivel_valor__gt', 'nivel_valor__lte', 'nivel_valor__lt']
+# Campos por los que se puede agrupar el resumen: ?agrupar=tipo_gas,ubicacion
+AGRUPACIONES = ['tipo_gas', 'ubicacion', 'estado', 'fecha']
+# Puntos por defecto y máximos de una serie
+PUNTOS_POR_DEFECTO = 500
+PUNTOS_MAXIMO = 5000
+# Tamaño de página del listado
+LIMITE_POR_DEFECTO = 500
+LIMITE_MAXIMO = 5000
+
+class RegistroDeGasesViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     #API endpoint para gestionar los registros de gases.
-    
+    # Filtros: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&tipo_gas=Metano&ubicacion=...&estado=Peligro
+    # &unidad=ppm&nivel_valor__gte=1.5 (también __gt, __lte, __lt)
+    # El listado y el resumen incluyen las lecturas del archivo frío (ver archivo.py).
+    # El listado pagina por cursor (keyset) sobre (fecha, hora, id): ?limite=500&cursor=...
+
     queryset = Registro_de_gases.objects.all()
     serializer_class = RegistroDeGasesSerializer
     permission_classes =  [EsSupervisor,EsAdministrador]
-# Create your views here.
+
+    def filtros(self):
+        # Filtros de la consulta como argumentos de filter(); se aplican igual a la
+        # tabla y al archivo frío
+        filtros = {}
+        parametros = self.request.query_params
+        for campo in ('tipo_gas', 'ubicacion', 'estado'):
+            if parametros.get(campo):
+                filtros[campo] = parametros[campo]
+        if parametros.get('unidad'):
+            filtros['nivel_unidad'] = parametros['unidad']
+        for campo, filtro in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+            if parametros.get(campo):
+                try:
+                    fecha = parse_date(parametros[campo]) if len(parametros[campo]) == 10 else None
+                except ValueError:
+                    fecha = None
+                if fecha is None:
+                    raise ValidationError({campo: 'Fecha inválida, use AAAA-MM-DD.'})
+                filtros[filtro] = fecha
+        for filtro in FILTROS_NIVEL:
+            if parametros.get(filtro):
+                try:
+                    filtros[filtro] = float(parametros[filtro])
+                except ValueError:
+                    raise ValidationError({filtro: 'Debe ser un número.'})
+        return filtros
+
+    def get_queryset(self):
+        return self.relacionar(Registro_de_gases.objects.filter(**self.filtros()))
+
+    def list(self, request, *args, **kwargs):
+        # Lecturas archivadas y de la tabla mezcladas en orden (fecha, hora, id), con las
+        # relaciones que pide ?expand= ya cargadas. De cada lado se leen a lo sumo
+        # limite + 1 lecturas a partir del cursor, así una página no carga el archivo
+        # ni la tabla enteros; el registro de más indica si hay página siguiente.
+        filtros = self.filtros()
+        parametros = request.query_params
+        try:
+            limite = min(int(parametros.get('limite', LIMITE_POR_DEFECTO)), LIMITE_MAXIMO)
+        except ValueError:
+            raise ValidationError({'limite': 'Debe ser un número entero.'})
+        if limite < 1:
+            raise ValidationError({'limite': 'Debe ser mayor que cero.'})
+        despues = _decodificar_cursor(parametros['cursor']) if parametros.get('cursor') else None
+
+        uno, muchos = self.get_serializer().relaciones()
+        archivadas = archivo.registros(filtros, [*uno, *muchos], despues, limite + 1)
+        tabla = self.get_queryset().order_by('fecha', 'hora', 'id')
+        if despues is not None:
+            tabla = tabla.filter(_filtro_despues_de(despues))
+        pagina = list(itertools.islice(
+            heapq.merge(archivadas, tabla[:limite + 1], key=lambda registro: (registro.fecha, registro.hora, registro.pk)),
+            limite + 1,
+        ))
+        siguiente = None
+        if len(pagina) > limite:
+            pagina = pagina[:limite]
+            siguiente = _codificar_cursor(pagina[-1])
+        return Response({'resultados': self.get_serializer(pagina, many=True).data, 'siguiente': siguiente})
+
+    def filas_exportacion(self, rutas):
+        # Como el listado: primero las lecturas archivadas y después las de la tabla
+        archivadas = (tuple(lectura.get(ruta) for ruta in rutas) for lectura in archivo.lecturas(self.filtros()))
+        return itertools.chain(archivadas, super().filas_exportacion(rutas))
+
+    @action(detail=False, methods=['get'])
+    # Mínimo, máximo y promedio del nivel calculados en la base de datos, con los mismos
+    # filtros del listado. Siempre se agrupa también por unidad para no mezclar % con ppm.
+
+    def resumen(self, request):
+        agrupar = [campo for campo in request.query_params.get('agrupar', 'tipo_gas,ubicacion').split(',') if campo]
+        invalidos = [campo for campo in agrupar if campo not in AGRUPACIONES]
+        if invalidos:
+            raise ValidationError({'agrupar': f'Campos no permitidos: {", ".join(invalidos)}. Use {", ".join(AGRUPACIONES)}.'})
+        campos = [*agrupar, 'nivel_unidad']
+        filtros = self.filtros()
+        filas = (
+            Registro_de_gases.objects.filter(**filtros)
+            .filter(nivel_valor__isnull=False)
+            .values_list(*campos)
+            .annotate(
+                lecturas=Count('id'),
+                minimo=Min('nivel_valor'),
+                maximo=Max('nivel_valor'),
+                suma=Sum('nivel_valor'),
+            )
+            .order_by()
+        )
+        # Se suman los grupos del archivo frío a los de la tabla
+        grupos = archivo.resumir(filtros, agrupar)
+        for *clave, lecturas, minimo, maximo, suma in filas:
+            grupo = grupos.get(tuple(clave))
+            if grupo is None:
+                grupos[tuple(clave)] = [lecturas, minimo, maximo, suma]
+            else:
+                grupos[tuple(clave)] = [grupo[0] + lecturas, min(grupo[1], minimo), max(grupo[2], maximo), grupo[3] + suma]
+        return Response([
+            {
+                **dict(zip(campos, clave)),
+                'lecturas': lecturas,
+                'minimo': minimo,
+                'maximo': maximo,
+                'promedio': round(suma / lecturas, 4),
+            }
+            for clave, (lecturas, minimo, maximo, suma) in sorted(grupos.items(), key=lambda grupo: [str(valor or '') for valor in grupo[0]])
+        ])
+
+    @action(detail=False, methods=['get'])
+    # Serie temporal de un sensor desde los resúmenes (ver resumenes.py):
+    # ?ubicacion=...&tipo_gas=Metano&desde=2026-10-11T00:00&hasta=2026-10-18T00:00&puntos=500
+    # Por defecto la última semana. Usa la resolución más fina (1m, 1h, 1d) que entre en
+    # la cantidad de puntos pedida, o la indicada con ?resolucion=.
+
+    def serie(self, request):
+        parametros = request.query_params
+        ubicacion = parametros.get('ubicacion')
+        tipo_gas = parametros.get('tipo_gas')
+        if not (ubicacion and tipo_gas):
+            raise ValidationError({'detail': 'ubicacion y tipo_gas son obligatorios.'})
+        tipo_gas = ingesta.TIPOS_GAS.get(tipo_gas.lower(), tipo_gas)
+
+        hasta = _momento_local(parametros, 'hasta') or timezone.localtime().replace(tzinfo=None)
+        desde = _momento_local(parametros, 'desde') or hasta - timedelta(days=7)
+        if desde > hasta:
+            raise ValidationError({'detail': 'desde debe ser anterior a hasta.'})
+        try:
+            puntos = min(int(parametros.get('puntos', PUNTOS_POR_DEFECTO)), PUNTOS_MAXIMO)
+        except ValueError:
+            raise ValidationError({'puntos': 'Debe ser un número entero.'})
+        if puntos < 1:
+            raise ValidationError({'puntos': 'Debe ser mayor que cero.'})
+        resolucion = parametros.get('resolucion') or resumenes.elegir_resolucion(desde, hasta, puntos)
+        if resolucion not in resumenes.SEGUNDOS:
+            raise ValidationError({'resolucion': f'Use {", ".join(resumenes.SEGUNDOS)}.'})
+
+        # Si no se indica la unidad se usa la del resumen más reciente del sensor
+        unidad = parametros.get('unidad') or ResumenGas.objects.filter(
+            resolucion='1d', ubicacion=ubicacion, tipo_gas=tipo_gas,
+        ).order_by('-fecha').values_list('nivel_unidad', flat=True).first()
+
+        filas = resumenes.serie(ubicacion, tipo_gas, unidad, desde, hasta, resolucion).values_list(
+            'fecha', 'hora', 'lecturas', 'minimo', 'maximo', 'suma', 'peor_estado',
+        )[:PUNTOS_MAXIMO]
+        return Response({
+            'ubicacion': ubicacion,
+            'tipo_gas': tipo_gas,
+            'unidad': unidad,
+            'resolucion': resolucion,
+            'desde': desde,
+            'hasta': hasta,
+            'puntos': [
+                {
+                    'inicio': datetime.combine(fecha, hora),
+                    'lecturas': lecturas,
+                    'minimo': minimo,
+                    'maximo': maximo,
+                    'promedio': round(suma / lecturas, 4),
+                    'peor_estado': peor_estado,
+                }
+                for fecha, hora, lecturas, minimo, maximo, suma, peor_estado in filas
+            ],
+        })
+
+    @action(detail=False, methods=['get'], url_path='ultimas')
+    # Última lectura de cada ubicación y gas, desde la caché (ver ultimas.py), sin
+    # recorrer el historial. Filtros opcionales: ?ubicacion=...&tipo_gas=Metano
+
+    def ultimas_lecturas(self, request):
+        lecturas = ultimas.consultar()
+        ubicacion = request.query_params.get('ubicacion')
+        tipo_gas = request.query_params.get('tipo_gas')
+        if tipo_gas:
+            tipo_gas = ingesta.TIPOS_GAS.get(tipo_gas.lower(), tipo_gas)
+        return Response([
+            lectura for lectura in lecturas
+            if (not ubicacion or lectura['ubicacion'] == ubicacion)
+            and (not tipo_gas or lectura['tipo_gas'] == tipo_gas)
+        ])
+
+    @action(detail=False, methods=['get'], url_path='estado-actual')
+    # Último estado calculado por el motor de umbrales para cada ubicación y gas.
+    # Es memoria del proceso: refleja las lecturas que recibió este worker.
+
+    def estado_actual(self, request):
+        return Response(motor_umbrales.estados())
+
+    @action(detail=False, methods=['post'], url_path='ingesta', parser_classes=[])
+    # Ingesta por lotes de sensores fijos (ver ingesta.py). El cuerpo es NDJSON o CSV,
+    # según Content-Type (application/x-ndjson o text/csv) o ?formato=ndjson|csv,
+    # y puede venir comprimido con gzip. Las líneas inválidas se rechazan una por una
+    # y se informan; el resto del lote se guarda.
+
+    def ingerir_lote(self, request):
+        tipo = request.content_type.split(';')[0].strip()
+        formato = request.query_params.get('formato') or ('csv' if tipo == 'text/csv' else 'ndjson')
+        if formato not in ('csv', 'ndjson'):
+            raise ValidationError({'formato': 'Use ndjson o csv.'})
+        if request.stream is None:
+            raise ValidationError({'detail': 'El cuerpo está vacío.'})
+        comprimido = True if request.headers.get('Content-Encoding', '').lower() == 'gzip' else None
+
+        archivo = ingesta.abrir(request.stream, comprimido)
+        filas = ingesta.filas_csv(archivo) if formato == 'csv' else ingesta.filas_ndjson(archivo)
+        try:
+            resultado = ingesta.ingerir(filas)
+        except ingesta.DemasiadasLecturas as error:
+            return Response({'detail': str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except (OSError, EOFError, zlib.error, UnicodeDecodeError, csv.Error) as error:
+            raise ValidationError({'detail': f'No se pudo leer el lote: {error}'})
+
+        codigo = status.HTTP_201_CREATED if resultado['insertadas'] else status.HTTP_400_BAD_REQUEST
+        return Response(resultado, status=codigo)
+
+
+class UmbralGasViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
+    # Umbrales de advertencia y peligro que usa el motor de umbrales (ver umbrales.py)
+    queryset = UmbralGas.objects.all().order_by('tipo_gas', 'ubicacion')
+    serializer_class = UmbralGasSerializer
+    permission_classes = [EsAdministrador]
+
+
+def _codificar_cursor(registro):
+    # El cursor es la clave (fecha, hora, id) de la última lectura de la página
+    clave = f'{registro.fecha.isoformat()}|{registro.hora.isoformat()}|{registro.pk}'
+    return base64.urlsafe_b64encode(clave.encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    try:
+        fecha, hora, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        clave = parse_date(fecha), parse_time(hora), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        clave = (None, None, None)
+    if None in clave:
+        raise ValidationError({'cursor': 'Cursor inválido.'})
+    return clave
+
+
+def _filtro_despues_de(clave):
+    # Lecturas que van después de la clave en orden (fecha, hora, id) ascendente
+    fecha, hora, pk = clave
+    return Q(fecha__gt=fecha) | Q(fecha=fecha, hora__gt=hora) | Q(fecha=fecha, hora=hora, id__gt=pk)
+
+
+def _momento_local(parametros, campo):
+    # Fecha u hora de la consulta como datetime local sin zona (como fecha/hora de las lecturas)
+    valor = parametros.get(campo)
+    if not valor:
+        return None
+    # parse_datetime/parse_date devuelven None si el formato no coincide y lanzan
+    # ValueError si coincide pero la fecha no existe (2026-02-30)
+    try:
+        momento = parse_datetime(valor)
+        fecha = parse_date(valor) if momento is None and len(valor) == 10 else None
+    except ValueError:
+        raise ValidationError({campo: 'La fecha no existe.'})
+    if momento is None:
+        if fecha is None:
+            raise ValidationError({campo: 'Use AAAA-MM-DD o AAAA-MM-DDTHH:MM.'})
+        momento = datetime.combine(fecha, datetime.min.time())
+    if timezone.is_aware(momento):
+        momento = timezone.localtime(momento).replace(tzinfo=None)
+    return momento
@@ -0,0 +1,71 @@
+import asyncio
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+from administracion.permisos import EsAdministrador, EsSupervisor
+from control_acceso.views_async import vista_api
+from .eventos import Suscripcion, difusor, eventos_guardados
+from .ingesta import TIPOS_GAS
+from .models import EventoGas
+
+# Canal en vivo de gases con Server-Sent Events (ver eventos.py), para que el tablero
+# de la sala de control no tenga que consultar el listado de registros cada pocos
+# segundos. Necesita ASGI (uvicorn/daphne sobre asgi.py): con WSGI la respuesta
+# infinita ocuparía un hilo del servidor por cliente.
+#
+#   GET /api/v1/control-gases/eventos/?ubicacion=...&tipo_gas=CH4&tipo=alarma
+#
+# Con EventSource el token va en ?token= (no se pueden enviar encabezados). Al
+# reconectarse el navegador envía Last-Event-ID y se reenvían los eventos perdidos;
+# en la primera conexión se puede pedir lo mismo con ?ultimo_id=.
+
+LATIDO = 15  # segundos entre comentarios para que los proxies no corten la conexión
+REINTENTO_MS = 3000
+
+
+# Supervisores o administradores (los dos permisos por separado no los cumple nadie)
+@vista_api('GET', permisos=(EsSupervisor | EsAdministrador,), token_en_url=True)
+async def eventos(request):
+    parametros = request.GET
+    tipo = parametros.get('tipo')
+    if tipo and tipo not in (EventoGas.LECTURA, EventoGas.ALARMA):
+        raise ValidationError({'tipo': f'Use {EventoGas.LECTURA} o {EventoGas.ALARMA}.'})
+    tipo_gas = parametros.get('tipo_gas')
+    if tipo_gas:
+        tipo_gas = TIPOS_GAS.get(tipo_gas.lower(), tipo_gas)
+    ultimo = request.headers.get('Last-Event-ID') or parametros.get('ultimo_id')
+    if ultimo:
+        try:
+            ultimo = int(ultimo)
+        except ValueError:
+            raise ValidationError({'detail': 'Last-Event-ID debe ser un número.'})
+
+    filtros = {'ubicacion': parametros.get('ubicacion'), 'tipo_gas': tipo_gas, 'tipo': tipo}
+    respuesta = StreamingHttpResponse(_flujo(filtros, ultimo), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'  # nginx: no acumular la respuesta
+    return respuesta
+
+
+async def _flujo(filtros, ultimo):
+    suscripcion = Suscripcion(**filtros)
+    tope = await difusor.suscribir(suscripcion)
+    try:
+        yield f'retry: {REINTENTO_MS}\n\n'
+        # Eventos perdidos desde la última conexión; los posteriores a tope llegan por la cola
+        if ultimo:
+            async for texto in eventos_guardados(ultimo, tope, **filtros):
+                yield texto
+        while True:
+            try:
+                texto = await asyncio.wait_for(suscripcion.cola.get(), LATIDO)
+            except asyncio.TimeoutError:
+                yield ': latido\n\n'
+                continue
+            yield texto
+            if suscripcion.desbordada and suscripcion.cola.empty():
+                # El cliente se atrasó: se corta y al reconectarse sigue desde la base
+                return
+    finally:
+        difusor.desuscribir(suscripcion)
@@ -6,7 +6,7 @@ from .models import Herramienta, ListaDeChequeo, Verificacion, Prestamo
 
 @admin.register(Herramienta)
 class HerramientaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'categoria', 'cantidad', 'estado')
+    list_display = ('nombre', 'categoria', 'cantidad', 'disponible', 'estado')
     search_fields = ('nombre', 'categoria')
     list_filter = ('estado',)
 
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:47
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def calcular_disponible(apps, schema_editor):
+    # disponible = cantidad menos los préstamos sin devolver (nunca negativo)
+    Herramienta = apps.get_model('inventario', 'Herramienta')
+    Prestamo = apps.get_model('inventario', 'Prestamo')
+    prestadas = (
+        Prestamo.objects.filter(herramienta_prestada=OuterRef('pk'), fecha_devolucion__isnull=True)
+        .order_by()
+        .values('herramienta_prestada')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Herramienta.objects.update(
+        disponible=Greatest(
+            F('cantidad') - Coalesce(Subquery(prestadas, output_field=IntegerField()), Value(0)),
+            Value(0),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='herramienta',
+            name='disponible',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_disponible, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='herramienta',
+            constraint=models.CheckConstraint(condition=models.Q(('disponible__lte', models.F('cantidad'))), name='herramienta_disponible_hasta_cantidad'),
+        ),
+    ]
@@ -1,16 +1,80 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from administracion.models import Empleado
 
+
+class SinDisponibilidad(Exception):
+    pass
+
+
 class Herramienta(models.Model):
     """Representa las herramientas disponibles."""
     nombre = models.CharField(max_length=100)
     categoria = models.CharField(max_length=100, blank=True, null=True)
-    cantidad = models.PositiveIntegerField(default=0) # Cantidad total disponible
+    cantidad = models.PositiveIntegerField(default=0) # Cantidad total de unidades
+    # Unidades en el estante (cantidad menos préstamos sin devolver). No se edita a mano:
+    # la mueven los préstamos (Prestamo.save/delete) y los cambios de cantidad, siempre
+    # con un UPDATE condicional sobre la fila, así dos préstamos simultáneos no pueden
+    # llevarse la misma unidad. Las escrituras con update() o bulk_create sobre Prestamo
+    # no pasan por acá.
+    disponible = models.PositiveIntegerField(default=0, editable=False)
     # estado puede ser CharField (ej: 'disponible', 'prestado', 'en_mantenimiento')
     estado = models.CharField(max_length=50, default='disponible')
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(disponible__lte=F('cantidad')),
+                name='herramienta_disponible_hasta_cantidad',
+            ),
+        ]
+
+    def clean(self):
+        # Aviso temprano para los formularios; save() vuelve a comprobarlo sobre la fila
+        if self.pk is not None:
+            actual = Herramienta.objects.filter(pk=self.pk).values_list('cantidad', 'disponible').first()
+            if actual and self.cantidad < actual[0] - actual[1]:
+                raise ValidationError({'cantidad': f'Hay {actual[0] - actual[1]} unidades prestadas.'})
+
+    @classmethod
+    def tomar(cls, pk):
+        # Saca una unidad del estante o falla si no queda ninguna
+        if not cls.objects.filter(pk=pk, disponible__gt=0).update(disponible=F('disponible') - 1):
+            raise SinDisponibilidad('No quedan unidades disponibles de esta herramienta.')
+
+    @classmethod
+    def reponer(cls, pk):
+        cls.objects.filter(pk=pk, disponible__lt=F('cantidad')).update(disponible=F('disponible') + 1)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding:
+            self.disponible = self.cantidad
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            if update_fields is None or 'cantidad' in update_fields:
+                # Cambia el total y el disponible en la misma cantidad, sin dejar menos
+                # unidades que las prestadas
+                actualizadas = Herramienta.objects.filter(
+                    pk=self.pk, disponible__gte=F('cantidad') - self.cantidad,
+                ).update(disponible=F('disponible') + self.cantidad - F('cantidad'), cantidad=self.cantidad)
+                if not actualizadas and Herramienta.objects.filter(pk=self.pk).exists():
+                    raise SinDisponibilidad('La cantidad no puede ser menor que las unidades prestadas.')
+                self.disponible = Herramienta.objects.filter(pk=self.pk).values_list('disponible', flat=True).first() or 0
+            # cantidad y disponible ya quedaron guardados
+            campos = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.attname not in ('cantidad', 'disponible')
+            ]
+            if update_fields is not None:
+                campos = [campo for campo in campos if campo in update_fields]
+            kwargs['update_fields'] = campos
+            super().save(*args, **kwargs)
+
     def _str_(self):
-        return f"{self.nombre} ({self.cantidad} disponibles)"
+        return f"{self.nombre} ({self.disponible} de {self.cantidad} disponibles)"
 
 class ListaDeChequeo(models.Model):
     """Representa listas de chequeo, posiblemente asociadas a herramientas."""
@@ -51,6 +115,49 @@ class Prestamo(models.Model):
     empleado = models.ForeignKey(Empleado, on_delete=models.PROTECT, related_name='prestamos')
     herramienta_prestada = models.ForeignKey(Herramienta, on_delete=models.PROTECT, related_name='prestamos')
 
+    def clean(self):
+        # Aviso temprano para los formularios; la garantía es Herramienta.tomar() al guardar
+        if self.pk is None and self.fecha_devolucion is None and self.herramienta_prestada_id:
+            disponible = Herramienta.objects.filter(pk=self.herramienta_prestada_id).values_list('disponible', flat=True).first()
+            if not disponible:
+                raise ValidationError({'herramienta_prestada': 'No quedan unidades disponibles de esta herramienta.'})
+
+    def save(self, *args, **kwargs):
+        # El préstamo abierto (sin fecha_devolucion) ocupa una unidad de su herramienta.
+        # El disponible se mueve en la misma transacción que el préstamo. En un préstamo
+        # existente lo primero es un UPDATE condicional de la fila: bloquea el préstamo y
+        # dice si cambió de estado, así dos devoluciones simultáneas reponen una sola
+        # unidad (y SQLite no tiene que pasar de lectura a escritura a mitad de camino).
+        with transaction.atomic():
+            if self.pk is None:
+                if self.fecha_devolucion is None:
+                    Herramienta.tomar(self.herramienta_prestada_id)
+                return super().save(*args, **kwargs)
+
+            prestamos = Prestamo.objects.filter(pk=self.pk)
+            if self.fecha_devolucion is not None:
+                cambio = prestamos.filter(fecha_devolucion__isnull=True).update(fecha_devolucion=self.fecha_devolucion)
+            else:
+                cambio = prestamos.filter(fecha_devolucion__isnull=False).update(fecha_devolucion=None)
+            herramienta_anterior = prestamos.values_list('herramienta_prestada_id', flat=True).first()
+            if cambio and self.fecha_devolucion is not None:
+                Herramienta.reponer(herramienta_anterior)
+            elif cambio or (herramienta_anterior is None and self.fecha_devolucion is None):
+                # Reabierto, o pk explícito de un préstamo que todavía no existe
+                Herramienta.tomar(self.herramienta_prestada_id)
+            elif self.fecha_devolucion is None and herramienta_anterior != self.herramienta_prestada_id:
+                Herramienta.tomar(self.herramienta_prestada_id)
+                Herramienta.reponer(herramienta_anterior)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Borrar un préstamo abierto devuelve la unidad (se cierra y se borra)
+        with transaction.atomic():
+            prestamos = Prestamo.objects.filter(pk=self.pk)
+            abierto = prestamos.filter(fecha_devolucion__isnull=True).update(fecha_devolucion=timezone.localdate())
+            if abierto:
+                Herramienta.reponer(prestamos.values_list('herramienta_prestada_id', flat=True).first())
+            return super().delete(*args, **kwargs)
 
     def _str_(self):
         return f"Préstamo de {self.herramienta_prestada} a {self.empleado} ({self.fecha_entrega})"
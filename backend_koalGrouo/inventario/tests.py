@@ -1,3 +1,139 @@
-from django.test import TestCase
+import threading
+from datetime import date
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from administracion.models import Cargo, Empleado
+from .models import Herramienta, ListaDeChequeo, Prestamo, SinDisponibilidad, Verificacion
+from .views import PrestamoViewSet
+
+
+def crear_datos(cantidad):
+    cargo = Cargo.objects.create(nombre_cargo='Minero', nivel_acceso='bajo')
+    empleado = Empleado.objects.create(cargo=cargo, cedula=1001, nombres='Ana Pérez', nivel_acceso='bajo')
+    herramienta = Herramienta.objects.create(nombre='Taladro', cantidad=cantidad)
+    return empleado, herramienta
+
+
+def prestar(empleado, herramienta, fecha_devolucion=None):
+    lista = ListaDeChequeo.objects.create(nombre='Taladro', herramienta=herramienta)
+    verificacion = Verificacion.objects.create(lista=lista, estado='aprobado')
+    return Prestamo.objects.create(
+        verificacion=verificacion, fecha_entrega=date(2026, 10, 1), fecha_devolucion=fecha_devolucion,
+        empleado=empleado, herramienta_prestada=herramienta,
+    )
+
+
+def disponible(herramienta):
+    return Herramienta.objects.values_list('disponible', flat=True).get(pk=herramienta.pk)
+
+
+class PrestamoTests(TestCase):
+
+    def setUp(self):
+        self.empleado, self.herramienta = crear_datos(cantidad=2)
+
+    def test_no_se_presta_mas_de_lo_que_hay(self):
+        prestar(self.empleado, self.herramienta)
+        prestar(self.empleado, self.herramienta)
+        self.assertEqual(disponible(self.herramienta), 0)
+
+        with self.assertRaises(SinDisponibilidad):
+            prestar(self.empleado, self.herramienta)
+        self.assertEqual(Prestamo.objects.count(), 2)
+        self.assertEqual(disponible(self.herramienta), 0)
+
+    def test_devolver_repone_una_sola_vez(self):
+        prestamo = prestar(self.empleado, self.herramienta)
+        self.assertEqual(disponible(self.herramienta), 1)
+
+        prestamo.fecha_devolucion = date(2026, 10, 2)
+        prestamo.save()
+        prestamo.save()
+        self.assertEqual(disponible(self.herramienta), 2)
+
+        # Reabrirlo vuelve a ocupar la unidad y borrarlo abierto la devuelve
+        prestamo.fecha_devolucion = None
+        prestamo.save()
+        self.assertEqual(disponible(self.herramienta), 1)
+        prestamo.delete()
+        self.assertEqual(disponible(self.herramienta), 2)
+
+    def test_prestamo_ya_devuelto_no_ocupa_unidad(self):
+        prestar(self.empleado, self.herramienta, fecha_devolucion=date(2026, 10, 2))
+        self.assertEqual(disponible(self.herramienta), 2)
+
+    def test_la_api_rechaza_el_prestamo_sin_unidades(self):
+        prestar(self.empleado, self.herramienta)
+        prestar(self.empleado, self.herramienta)
+        lista = ListaDeChequeo.objects.create(nombre='Taladro', herramienta=self.herramienta)
+        verificacion = Verificacion.objects.create(lista=lista, estado='aprobado')
+
+        vista = PrestamoViewSet.as_view({'post': 'create'}, permission_classes=[])
+        respuesta = vista(APIRequestFactory().post('/', {
+            'verificacion_id': verificacion.pk, 'fecha_entrega': '2026-10-01',
+            'empleado_id': self.empleado.pk, 'herramienta_id': self.herramienta.pk,
+        }, format='json'))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('herramienta_id', respuesta.data)
+        self.assertEqual(Prestamo.objects.count(), 2)
+
+
+# Las altas de empleados publican una versión en la caché (ver control_acceso/roster.py)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PrestamosSimultaneosTests(TransactionTestCase):
+
+    def setUp(self):
+        self.empleado, self.herramienta = crear_datos(cantidad=3)
+
+    def en_paralelo(self, tareas):
+        # Corre las tareas a la vez, cada una en su hilo y su conexión
+        resultados = []
+        barrera = threading.Barrier(len(tareas))
+
+        def hilo(tarea):
+            try:
+                barrera.wait()
+                tarea()
+                resultados.append(True)
+            except SinDisponibilidad:
+                resultados.append(False)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo, args=(tarea,)) for tarea in tareas]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return resultados
+
+    def test_prestamos_simultaneos(self):
+        verificaciones = [
+            Verificacion.objects.create(lista=ListaDeChequeo.objects.create(nombre=f'Lista {i}'), estado='aprobado')
+            for i in range(8)
+        ]
+
+        def tarea(verificacion):
+            return lambda: Prestamo.objects.create(
+                verificacion=verificacion, fecha_entrega=date(2026, 10, 1),
+                empleado=self.empleado, herramienta_prestada=self.herramienta,
+            )
+
+        resultados = self.en_paralelo([tarea(verificacion) for verificacion in verificaciones])
+        self.assertEqual(resultados.count(True), 3)
+        self.assertEqual(Prestamo.objects.count(), 3)
+        self.assertEqual(disponible(self.herramienta), 0)
+
+    def test_devoluciones_simultaneas(self):
+        prestamo = prestar(self.empleado, self.herramienta)
+
+        def devolver():
+            copia = Prestamo.objects.get(pk=prestamo.pk)
+            copia.fecha_devolucion = date(2026, 10, 2)
+            copia.save()
+
+        self.en_paralelo([devolver] * 6)
+        self.assertEqual(disponible(self.herramienta), 3)
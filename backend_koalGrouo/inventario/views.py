@@ -1,17 +1,52 @@
 from rest_framework import viewsets
-from .models import Herramienta,ListaDeChequeo,Verificacion, Prestamo
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .models import Herramienta,ListaDeChequeo,Verificacion, Prestamo, SinDisponibilidad
 from .serializers import HerramientaSerializer,ListaDeChequeoSerializer,VerificacionSerializer, PrestamoSerializer
+from administracion.expansion import ConsultaExpandibleMixin
+from administracion.exportacion import ExportableMixin
 from administracion.permisos import EsSupervisor,EsAdministrador
 
-class HerramientaViewSet(viewsets.ModelViewSet):
+class HerramientaViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint paraa gestionar herramientas.
     
     queryset = Herramienta.objects.all()
     serializer_class = HerramientaSerializer
     permission_classes = [EsSupervisor,EsAdministrador]
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except SinDisponibilidad as error:
+            raise ValidationError({'cantidad': str(error)})
+
+    @action(detail=False, methods=['get'])
+    # Unidades totales, disponibles y prestadas por herramienta, leídas del contador
+    # Herramienta.disponible (sin contar préstamos). ?herramientas=1,2 para algunas.
+
+    def disponibilidad(self, request):
+        consulta = Herramienta.objects.order_by('pk')
+        herramientas = request.query_params.get('herramientas')
+        if herramientas:
+            try:
+                ids = [int(valor) for valor in herramientas.split(',') if valor]
+            except ValueError:
+                raise ValidationError({'herramientas': 'Use IDs numéricos separados por comas.'})
+            consulta = consulta.filter(pk__in=ids)
+        return Response([
+            {
+                'id': pk,
+                'nombre': nombre,
+                'cantidad': cantidad,
+                'disponible': disponible,
+                'prestadas': cantidad - disponible,
+            }
+            for pk, nombre, cantidad, disponible in consulta.values_list('pk', 'nombre', 'cantidad', 'disponible')
+        ])
     
-class ListaDeChequeoViewSet(viewsets.ModelViewSet):
+class ListaDeChequeoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint para gestionar listas de chequeo.
     
@@ -20,7 +55,7 @@ class ListaDeChequeoViewSet(viewsets.ModelViewSet):
     permission_classes = [EsSupervisor,EsAdministrador]
     
 
-class VerificacionViewSet(viewsets.ModelViewSet):
+class VerificacionViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint para gestionar verificaciones 
     
@@ -28,9 +63,24 @@ class VerificacionViewSet(viewsets.ModelViewSet):
     serializer_class = VerificacionSerializer
     permission_classes = [EsSupervisor,EsAdministrador]
     
-class PrestamoViewSet(viewsets.ModelViewSet):
+class PrestamoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint para gestionar préstamos de herramientas 
     queryset = Prestamo.objects.all()
     serializer_class = PrestamoSerializer
-    permission_classes = [EsSupervisor,EsAdministrador]
\ No newline at end of file
+    permission_classes = [EsSupervisor,EsAdministrador]
+    columnas_exportacion = {'empleadoNombre': 'empleado__nombres', 'herramientaNombre': 'herramienta_prestada__nombre'}
+
+    # Prestamo.save/delete mueven Herramienta.disponible en la misma transacción;
+    # sin unidades libres el préstamo se rechaza
+    def perform_create(self, serializer):
+        try:
+            serializer.save()
+        except SinDisponibilidad as error:
+            raise ValidationError({'herramienta_id': str(error)})
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except SinDisponibilidad as error:
+            raise ValidationError({'herramienta_id': str(error)})
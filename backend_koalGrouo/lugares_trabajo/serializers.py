@@ -1,11 +1,10 @@
 from rest_framework import serializers
 from .models import Lugares_de_trabajo
-from administracion.models import Proyecto
+from administracion.expansion import ExpandibleMixin
 from administracion.serializers import ProyectoSerializer  # asegúrate de tenerlo creado
 
-class LugaresDeTrabajoSerializer(serializers.ModelSerializer):
-    proyecto = serializers.PrimaryKeyRelatedField(queryset=Proyecto.objects.all(), write_only=True)
-    proyecto_info = ProyectoSerializer(source='proyecto', read_only=True)
+class LugaresDeTrabajoSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    expandibles = {'proyecto': ProyectoSerializer}
 
     class Meta:
         model = Lugares_de_trabajo
@@ -20,6 +19,5 @@ class LugaresDeTrabajoSerializer(serializers.ModelSerializer):
             'estimated_end',
             'progreso',
             'descripcion',
-            'proyecto',        # para escritura
-            'proyecto_info'    # para lectura
+            'proyecto',        # ID del proyecto; el detalle con ?expand=proyecto
         ]
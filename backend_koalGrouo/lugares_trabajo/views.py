@@ -1,8 +1,10 @@
 from rest_framework import viewsets
 from .models import Lugares_de_trabajo
 from .serializers import LugaresDeTrabajoSerializer
+from administracion.expansion import ConsultaExpandibleMixin
+from administracion.exportacion import ExportableMixin
 from administracion.permisos import EsSupervisor,EsAdministrador
-class LugaresDeTrabajoViewSet(viewsets.ModelViewSet):
+class LugaresDeTrabajoViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #API endpoint para gestionar lugares de trabajo
     
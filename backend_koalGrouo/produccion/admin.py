@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Produccion
+from .models import Produccion, ProductividadDiaria
 
 @admin.register(Produccion)
 class ProduccionAdmin(admin.ModelAdmin):
@@ -14,5 +14,11 @@ class ProduccionAdmin(admin.ModelAdmin):
     list_filter = ('fecha', 'proyecto', 'empleado')
     date_hierarchy = 'fecha'
 
+@admin.register(ProductividadDiaria)
+class ProductividadDiariaAdmin(admin.ModelAdmin):
+    list_display = ('empleado', 'proyecto', 'fecha', 'producido', 'horas', 'rendimiento')
+    search_fields = ('empleado__nombres', 'empleado__cedula', 'proyecto__nombre')
+    list_filter = ('fecha', 'proyecto')
+
 
 # Register your models here.
@@ -0,0 +1,136 @@
+import hashlib
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import Produccion
+
+# Totales de cantidad_producida agrupados por proyecto, empleado y período,
+# calculados con una sola consulta agrupada y guardados en la caché de Django.
+# - Cada mes tiene una versión en la caché. Las escrituras de Produccion (señales, o
+#   invalidar() desde las cargas masivas) cambian la versión de los meses tocados y
+#   la versión general.
+# - La clave de un resultado incluye las versiones de los meses del rango pedido:
+#   una producción nueva en otro mes no invalida el resultado. Las consultas sin
+#   rango cerrado (o de más de MESES_MAXIMO meses) usan la versión general.
+
+AGRUPACIONES = ['proyecto', 'empleado']
+NOMBRES = {'proyecto': 'proyecto__nombre', 'empleado': 'empleado__nombres'}
+
+
+class InicioSemana(TruncWeek):
+    # Lunes de la semana ISO. En SQLite TruncWeek llama a una función Python por
+    # fila; date() nativo da lo mismo para un DateField y es varias veces más rápido.
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql}, '-6 days', 'weekday 1')", params
+
+
+class InicioMes(TruncMonth):
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql}, 'start of month')", params
+
+
+# Período: función de truncado (por día se agrupa directo por fecha)
+PERIODOS = {
+    'dia': None,
+    'semana': InicioSemana,
+    'mes': InicioMes,
+}
+DURACION = 24 * 3600
+MESES_MAXIMO = 36
+VERSION_GENERAL = 'produccion:agregados:version'
+
+
+def _clave_mes(fecha):
+    return f'produccion:agregados:version:{fecha:%Y-%m}'
+
+
+def _meses(desde, hasta):
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        yield mes
+        mes = (mes + timedelta(days=32)).replace(day=1)
+
+
+def versiones(claves):
+    # Una versión que no está (caché vacía o expulsada) se crea nueva: los resultados
+    # guardados con la anterior dejan de encontrarse
+    versiones = cache.get_many(claves)
+    faltantes = {clave: time.time_ns() for clave in claves if clave not in versiones}
+    if faltantes:
+        for clave, version in faltantes.items():
+            cache.add(clave, version, None)
+        versiones.update(cache.get_many(list(faltantes)))
+    return [versiones.get(clave, 0) for clave in claves]
+
+
+def invalidar(fechas):
+    # Llamar después del commit con las fechas de las producciones creadas, modificadas o borradas
+    claves = {_clave_mes(fecha) for fecha in fechas if fecha is not None}
+    if not claves:
+        return
+    version = time.time_ns()
+    cache.set_many({clave: version for clave in [*claves, VERSION_GENERAL]}, None)
+
+
+def calcular(agrupar, periodo=None, desde=None, hasta=None, proyectos=None):
+    campos = list(agrupar)
+    consulta = Produccion.objects.all()
+    if desde:
+        consulta = consulta.filter(fecha__gte=desde)
+    if hasta:
+        consulta = consulta.filter(fecha__lte=hasta)
+    if proyectos:
+        consulta = consulta.filter(proyecto_id__in=proyectos)
+    if periodo:
+        consulta = consulta.annotate(periodo=PERIODOS[periodo]('fecha') if PERIODOS[periodo] else F('fecha'))
+        campos.append('periodo')
+    if not campos:
+        # Sin agrupación ni período: un solo total (values() sin campos agruparía por fila)
+        fila = consulta.aggregate(total=Sum('cantidad_producida'), registros=Count('id'))
+        return [{
+            'total': str(Decimal(fila['total'] or 0).quantize(Decimal('0.01'))),
+            'registros': fila['registros'],
+        }]
+    # El nombre depende del id: agruparlo también no cambia los grupos
+    nombres = [NOMBRES[campo] for campo in agrupar]
+    filas = (
+        consulta
+        .values(*campos, *nombres)
+        .annotate(total=Sum('cantidad_producida'), registros=Count('id'))
+        .values_list(*campos, *nombres, 'total', 'registros')
+        .order_by(*campos)
+    )
+    resultado = []
+    for fila in filas:
+        grupo = dict(zip(campos, fila))
+        for indice, campo in enumerate(agrupar):
+            grupo[f'{campo}Nombre'] = fila[len(campos) + indice]
+        if periodo:
+            grupo['periodo'] = grupo['periodo'].isoformat()
+        grupo['total'] = str(Decimal(fila[-2]).quantize(Decimal('0.01')))
+        grupo['registros'] = fila[-1]
+        resultado.append(grupo)
+    return resultado
+
+
+def consultar(agrupar, periodo=None, desde=None, hasta=None, proyectos=None):
+    # calcular() con caché
+    parametros = repr((list(agrupar), periodo, desde, hasta, sorted(proyectos or [])))
+    if desde and hasta and (hasta.year - desde.year) * 12 + hasta.month - desde.month < MESES_MAXIMO:
+        vigentes = versiones([_clave_mes(mes) for mes in _meses(desde, hasta)])
+    else:
+        vigentes = versiones([VERSION_GENERAL])
+    huella = hashlib.sha1(f'{parametros}:{vigentes}'.encode()).hexdigest()
+    clave = f'produccion:agregados:{huella}'
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular(agrupar, periodo, desde, hasta, proyectos)
+        cache.set(clave, resultado, DURACION)
+    return resultado
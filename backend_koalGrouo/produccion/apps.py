@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProduccionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'produccion'
+
+    def ready(self):
+        # Registra las señales que invalidan la caché de los agregados
+        from . import signals  # noqa: F401
@@ -0,0 +1,354 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import ParseError, iterparse
+from xml.parsers import expat
+
+from django.db import transaction
+
+from administracion.models import Empleado, Proyecto
+from .models import Produccion
+from . import agregados, productividad, tendencias
+
+# Carga masiva de producción desde planillas CSV o XLSX (la primera hoja).
+# - Los archivos se leen fila por fila: el CSV con csv.DictReader y el XLSX con expat
+#   sobre el XML de la hoja dentro del zip, sin cargar el libro entero (solo la tabla
+#   de textos compartidos del libro).
+# - Empleado por cédula y Proyecto por nombre se resuelven con diccionarios cargados
+#   una vez por importación, sin consultas por fila.
+# - Las filas válidas se guardan con bulk_create por bloques de BLOQUE, cada bloque en
+#   su propia transacción: una planilla grande no deja la base bloqueada para escribir
+#   mientras se lee. Si algo falla a mitad de camino los bloques anteriores quedan
+#   guardados; el informe dice hasta qué fila se confirmó (confirmado_hasta_fila) para
+#   volver a cargar solo el resto.
+# - Las filas inválidas se saltan. El informe cuenta todas (rechazadas) y guarda el
+#   detalle de las primeras MAXIMO_ERRORES; errores_omitidos dice cuántas quedaron
+#   fuera. El detalle completo se puede escribir a un CSV (errores de importar()).
+#
+# Columnas (encabezado en la primera fila, sin distinguir mayúsculas):
+#   cedula; proyecto (nombre); fecha (AAAA-MM-DD, DD/MM/AAAA o fecha de Excel);
+#   cantidad_producida (o cantidad; acepta coma decimal); observaciones (opcional).
+
+BLOQUE = 2000
+MAXIMO_ERRORES = 100
+
+CANTIDAD = Produccion._meta.get_field('cantidad_producida')
+MAXIMO_CANTIDAD = Decimal(10) ** (CANTIDAD.max_digits - CANTIDAD.decimal_places)
+CENTESIMOS = Decimal(1).scaleb(-CANTIDAD.decimal_places)
+# Columnas del modelo en orden (id y fecha_registro los completa la base / auto_now_add)
+CAMPOS = [campo.attname for campo in Produccion._meta.concrete_fields]
+# Día 0 de las fechas de Excel (sistema 1900, con el 29/02/1900 que no existió)
+EPOCA_EXCEL = date(1899, 12, 30)
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+class ImportacionInterrumpida(Exception):
+    """La planilla dejó de poder leerse a mitad de la importación."""
+
+    def __init__(self, mensaje, informe):
+        super().__init__(mensaje)
+        # Informe de lo leído y confirmado hasta el error (ver Importacion.importar)
+        self.informe = informe
+
+
+# Errores al leer la planilla (archivo dañado, mal codificado o que no es del formato)
+ERRORES_LECTURA = (ArchivoInvalido, UnicodeDecodeError, csv.Error, zipfile.BadZipFile, ParseError)
+
+
+def filas_csv(archivo):
+    # archivo binario; la línea 1 es el encabezado
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    lector = csv.DictReader(texto)
+    if lector.fieldnames:
+        lector.fieldnames = [nombre.strip().lower() for nombre in lector.fieldnames]
+    for numero, fila in enumerate(lector, start=2):
+        yield numero, fila
+
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+# Etiquetas de la hoja como las entrega expat (espacio de nombres, espacio, nombre)
+_FILA, _CELDA, _VALOR, _TEXTO = (f'{_NS[1:-1]} {nombre}' for nombre in ('row', 'c', 'v', 't'))
+LECTURA = 64 * 1024
+_NS_RELACIONES = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_COLUMNA = re.compile(r'[A-Z]+')
+
+
+def _indice_columna(referencia):
+    # 'C12' -> 2
+    indice = 0
+    for letra in _COLUMNA.match(referencia).group():
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+def _primera_hoja(libro):
+    # Ruta dentro del zip de la primera hoja del libro
+    relacion = None
+    with libro.open('xl/workbook.xml') as xml:
+        for _, elemento in iterparse(xml):
+            if elemento.tag == f'{_NS}sheet':
+                relacion = elemento.get(f'{_NS_RELACIONES}id')
+                break
+    with libro.open('xl/_rels/workbook.xml.rels') as xml:
+        for _, elemento in iterparse(xml):
+            if elemento.get('Id') == relacion:
+                destino = elemento.get('Target')
+                return destino.lstrip('/') if destino.startswith('/') else f'xl/{destino}'
+    raise ArchivoInvalido('El libro no tiene hojas.')
+
+
+def _textos_compartidos(libro):
+    if 'xl/sharedStrings.xml' not in libro.namelist():
+        return []
+    textos = []
+    with libro.open('xl/sharedStrings.xml') as xml:
+        for _, elemento in iterparse(xml):
+            if elemento.tag == f'{_NS}si':
+                textos.append(''.join(texto.text or '' for texto in elemento.iter(f'{_NS}t')))
+                elemento.clear()
+    return textos
+
+
+class _LectorHoja:
+    # Recorre el XML de una hoja con expat, sin armar el árbol: cada fila terminada
+    # queda en filas como (número, {índice de columna: valor}) hasta que se consume
+    def __init__(self, textos):
+        self.textos = textos
+        self.filas = []
+        self.parser = expat.ParserCreate(namespace_separator=' ')
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self._inicio
+        self.parser.EndElementHandler = self._fin
+        self.parser.CharacterDataHandler = self._texto
+        self._numero = None
+        self._valores = None
+        self._celda = None
+        self._partes = None
+        self._capturar = False
+
+    def leer(self, bloque, final=False):
+        self.parser.Parse(bloque, final)
+
+    def _inicio(self, etiqueta, atributos):
+        if etiqueta == _FILA:
+            self._numero = int(atributos.get('r', 0)) or None
+            self._valores = {}
+        elif etiqueta == _CELDA:
+            referencia = atributos.get('r')
+            self._celda = (_indice_columna(referencia) if referencia else len(self._valores), atributos.get('t'))
+            self._partes = []
+        elif etiqueta in (_VALOR, _TEXTO) and self._celda is not None:
+            self._capturar = True
+
+    def _texto(self, datos):
+        if self._partes is not None and self._capturar:
+            self._partes.append(datos)
+
+    def _fin(self, etiqueta):
+        if etiqueta in (_VALOR, _TEXTO):
+            self._capturar = False
+        elif etiqueta == _CELDA:
+            indice, tipo = self._celda
+            valor = ''.join(self._partes)
+            if tipo == 's' and valor:
+                valor = self.textos[int(valor)]
+            self._valores[indice] = valor
+            self._celda = self._partes = None
+        elif etiqueta == _FILA:
+            self.filas.append((self._numero, self._valores))
+            self._valores = None
+
+
+def filas_xlsx(archivo):
+    # archivo binario con posicionamiento (seek); la fila 1 es el encabezado
+    try:
+        libro = zipfile.ZipFile(archivo)
+    except zipfile.BadZipFile:
+        raise ArchivoInvalido('El archivo no es un XLSX válido.')
+    with libro:
+        try:
+            hoja = _primera_hoja(libro)
+            textos = _textos_compartidos(libro)
+            xml = libro.open(hoja)
+        except KeyError as error:
+            raise ArchivoInvalido(f'El archivo no es un XLSX válido ({error}).')
+        lector = _LectorHoja(textos)
+        encabezado = None
+        with xml:
+            while True:
+                bloque = xml.read(LECTURA)
+                try:
+                    lector.leer(bloque, final=not bloque)
+                except expat.ExpatError as error:
+                    raise ArchivoInvalido(f'La hoja no es un XML válido ({error}).')
+                for numero, valores in lector.filas:
+                    if encabezado is None:
+                        encabezado = {indice: str(nombre).strip().lower() for indice, nombre in valores.items()}
+                        continue
+                    if not any(valor.strip() for valor in valores.values()):
+                        continue
+                    yield numero, {encabezado[indice]: valor for indice, valor in valores.items() if indice in encabezado}
+                lector.filas.clear()
+                if not bloque:
+                    return
+
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+
+def _fecha(valor):
+    if not valor:
+        raise FilaInvalida('fecha: obligatoria.')
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        pass
+    try:
+        if '/' in valor:
+            return datetime.strptime(valor, '%d/%m/%Y').date()
+        if '-' in valor:
+            return datetime.fromisoformat(valor).date()
+        return EPOCA_EXCEL + timedelta(days=int(float(valor)))
+    except (ValueError, OverflowError):
+        raise FilaInvalida(f'fecha: "{valor}" inválida, use AAAA-MM-DD o DD/MM/AAAA.')
+
+
+def _cantidad(valor):
+    if not valor:
+        raise FilaInvalida('cantidad_producida: obligatoria.')
+    if ',' in valor:
+        # El separador decimal es el último de los dos que aparezca ('1.234,5' o '1,234.5')
+        decimal, miles = (',', '.') if valor.rfind(',') > valor.rfind('.') else ('.', ',')
+        valor = valor.replace(miles, '').replace(decimal, '.')
+    try:
+        cantidad = Decimal(valor)
+    except InvalidOperation:
+        raise FilaInvalida(f'cantidad_producida: "{valor}" no es un número.')
+    if not cantidad.is_finite() or cantidad < 0 or cantidad >= MAXIMO_CANTIDAD \
+            or cantidad.quantize(CENTESIMOS) >= MAXIMO_CANTIDAD:
+        raise FilaInvalida(f'cantidad_producida: debe ser mayor o igual a 0 y menor que {MAXIMO_CANTIDAD}.')
+    return cantidad.quantize(CENTESIMOS)
+
+
+def _por_clave(pares):
+    # {clave: id}; las claves repetidas quedan en None (no se sabe a cuál se refieren)
+    resultado = {}
+    for clave, id_ in pares:
+        resultado[clave] = None if clave in resultado else id_
+    return resultado
+
+
+class Importacion:
+    """Valida y guarda filas de producción con los empleados y proyectos ya cargados."""
+
+    def __init__(self):
+        self.empleados = _por_clave(Empleado.objects.values_list('cedula', 'id').iterator())
+        self.proyectos = _por_clave(
+            (nombre.strip().casefold(), id_) for nombre, id_ in Proyecto.objects.values_list('nombre', 'id').iterator()
+        )
+
+    def produccion(self, fila):
+        # Devuelve una Produccion sin guardar o lanza FilaInvalida
+        cedula = _texto(fila, 'cedula')
+        if not cedula:
+            raise FilaInvalida('cedula: obligatoria.')
+        try:
+            # En XLSX los números pueden venir como 1234567.0
+            cedula = int(cedula) if cedula.isdigit() else int(float(cedula))
+        except (ValueError, OverflowError):
+            raise FilaInvalida(f'cedula: "{cedula}" no es un número.')
+        if cedula not in self.empleados:
+            raise FilaInvalida(f'cedula: no existe el empleado {cedula}.')
+        if self.empleados[cedula] is None:
+            raise FilaInvalida(f'cedula: hay más de un empleado con la cédula {cedula}.')
+
+        nombre = _texto(fila, 'proyecto')
+        if not nombre:
+            raise FilaInvalida('proyecto: obligatorio.')
+        proyecto_id = self.proyectos.get(nombre.casefold(), 0)
+        if proyecto_id == 0:
+            raise FilaInvalida(f'proyecto: no existe el proyecto "{nombre}".')
+        if proyecto_id is None:
+            raise FilaInvalida(f'proyecto: hay más de un proyecto llamado "{nombre}".')
+
+        valores = {
+            'empleado_id': self.empleados[cedula],
+            'proyecto_id': proyecto_id,
+            'fecha': _fecha(_texto(fila, 'fecha')),
+            'cantidad_producida': _cantidad(_texto(fila, 'cantidad_producida') or _texto(fila, 'cantidad')),
+            'observaciones': _texto(fila, 'observaciones') or None,
+        }
+        # Por posición: Model.__init__ con argumentos por nombre es la mitad del costo por fila
+        return Produccion(*(valores.get(campo) for campo in CAMPOS))
+
+    def importar(self, filas, errores=None, simular=False):
+        # filas: iterable de (número de fila, dict). Cada error se pasa a errores(numero,
+        # mensaje) si se indica. Con simular solo se valida.
+        # Devuelve {'leidas', 'insertadas', 'rechazadas', 'confirmado_hasta_fila',
+        # 'errores', 'errores_omitidos'}: hasta confirmado_hasta_fila (inclusive) todas
+        # las filas válidas están guardadas (None si no se guardó nada).
+        # Si la planilla no se puede leer lanza ImportacionInterrumpida con ese informe.
+        informe = {
+            'leidas': 0,
+            'insertadas': 0,
+            'rechazadas': 0,
+            'confirmado_hasta_fila': None,
+            'errores': [],
+            'errores_omitidos': 0,
+        }
+        bloque = []
+        numero = None
+        try:
+            for numero, fila in filas:
+                informe['leidas'] += 1
+                try:
+                    produccion = self.produccion(fila)
+                except FilaInvalida as error:
+                    informe['rechazadas'] += 1
+                    if len(informe['errores']) < MAXIMO_ERRORES:
+                        informe['errores'].append({'fila': numero, 'error': str(error)})
+                    else:
+                        informe['errores_omitidos'] += 1
+                    if errores is not None:
+                        errores(numero, str(error))
+                    continue
+                bloque.append(produccion)
+                if len(bloque) >= BLOQUE:
+                    self._guardar(bloque, numero, informe, simular)
+                    bloque = []
+        except ERRORES_LECTURA as error:
+            mensaje = str(error) if isinstance(error, ArchivoInvalido) else f'No se pudo leer la planilla: {error}'
+            raise ImportacionInterrumpida(mensaje, informe) from error
+        self._guardar(bloque, numero, informe, simular)
+        return informe
+
+    def _guardar(self, bloque, hasta_fila, informe, simular):
+        # Guarda y confirma un bloque; hasta_fila es la última fila leída
+        if simular:
+            informe['insertadas'] += len(bloque)
+            return
+        if bloque:
+            with transaction.atomic():
+                Produccion.objects.bulk_create(bloque)
+                # bulk_create no dispara las señales de Produccion: se recalcula la
+                # productividad de los días cargados y se invalidan los agregados y las tendencias
+                for fecha in sorted({produccion.fecha for produccion in bloque}):
+                    productividad.recalcular_dia(fecha)
+                meses = {produccion.fecha.replace(day=1) for produccion in bloque}
+                proyectos = {produccion.proyecto_id for produccion in bloque}
+                transaction.on_commit(lambda: (agregados.invalidar(meses), tendencias.invalidar(proyectos)))
+            informe['insertadas'] += len(bloque)
+        if hasta_fila is not None:
+            informe['confirmado_hasta_fila'] = hasta_fila
@@ -0,0 +1,61 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from produccion import importacion
+
+
+class Command(BaseCommand):
+    help = 'Importa producción desde una planilla CSV o XLSX (ver produccion/importacion.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta de la planilla (.csv o .xlsx).')
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], help='Por defecto según la extensión.')
+        parser.add_argument('--errores', help='Escribe todas las filas rechazadas en este CSV (- para la salida estándar).')
+        parser.add_argument('--simular', action='store_true', help='Solo valida, no guarda nada.')
+
+    def handle(self, *args, **opciones):
+        formato = opciones['formato'] or opciones['archivo'].rsplit('.', 1)[-1].lower()
+        if formato not in ('csv', 'xlsx'):
+            raise CommandError('No se reconoce el formato; use --formato csv o xlsx.')
+        try:
+            archivo = open(opciones['archivo'], 'rb')
+        except OSError as error:
+            raise CommandError(f'No se pudo abrir la planilla: {error}')
+
+        salida_errores = None
+        if opciones['errores'] == '-':
+            salida_errores = sys.stdout
+        elif opciones['errores']:
+            salida_errores = open(opciones['errores'], 'w', newline='', encoding='utf-8')
+        escritor = csv.writer(salida_errores) if salida_errores else None
+        if escritor:
+            escritor.writerow(['fila', 'error'])
+
+        inicio = time.perf_counter()
+        try:
+            with archivo:
+                filas = importacion.filas_csv(archivo) if formato == 'csv' else importacion.filas_xlsx(archivo)
+                resultado = importacion.Importacion().importar(
+                    filas,
+                    errores=(lambda numero, error: escritor.writerow([numero, error])) if escritor else None,
+                    simular=opciones['simular'],
+                )
+        except importacion.ImportacionInterrumpida as error:
+            hasta = error.informe['confirmado_hasta_fila']
+            guardado = f' Quedaron guardadas las filas válidas hasta la {hasta}.' if hasta else ''
+            raise CommandError(f'{error}{guardado}')
+        finally:
+            if salida_errores not in (None, sys.stdout):
+                salida_errores.close()
+
+        if not escritor:
+            for error in resultado['errores']:
+                self.stderr.write(f'fila {error["fila"]}: {error["error"]}')
+        accion = 'se importarían' if opciones['simular'] else 'importadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado["leidas"]} filas leídas, {resultado["insertadas"]} {accion}, '
+            f'{resultado["rechazadas"]} rechazadas en {time.perf_counter() - inicio:.1f} s.'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from control_acceso.models import JornadaDiaria
+from produccion import productividad
+from produccion.models import Produccion
+
+
+class Command(BaseCommand):
+    help = 'Recalcula ProductividadDiaria desde Produccion y JornadaDiaria (carga inicial o reparación).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día a recalcular (AAAA-MM-DD).')
+
+    def handle(self, *args, **opciones):
+        filtros = {}
+        for campo, busqueda in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+            if opciones[campo]:
+                fecha = parse_date(opciones[campo])
+                if fecha is None:
+                    raise CommandError(f'--{campo}: fecha inválida, use el formato AAAA-MM-DD.')
+                filtros[busqueda] = fecha
+
+        dias = sorted(
+            set(Produccion.objects.filter(**filtros).values_list('fecha', flat=True).distinct())
+            | set(JornadaDiaria.objects.filter(**filtros).values_list('fecha', flat=True).distinct())
+        )
+        if not dias:
+            self.stdout.write('No hay días para recalcular.')
+            return
+        filas = sum(productividad.recalcular_dia(fecha) for fecha in dias)
+        self.stdout.write(self.style.SUCCESS(f'{len(dias)} días recalculados ({dias[0]} a {dias[-1]}), {filas} filas.'))
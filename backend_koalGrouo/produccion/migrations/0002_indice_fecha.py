@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_alter_empleado_cedula'),
+        ('produccion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produccion',
+            index=models.Index(fields=['fecha'], name='produccion_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_alter_empleado_cedula'),
+        ('produccion', '0002_indice_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductividadDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('producido', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('horas', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('rendimiento', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productividad', to='administracion.empleado')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productividad', to='administracion.proyecto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='productividad_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'proyecto', 'fecha'), name='productividad_empleado_proyecto_fecha')],
+            },
+        ),
+    ]
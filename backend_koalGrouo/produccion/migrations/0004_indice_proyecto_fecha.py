@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_alter_empleado_cedula'),
+        ('produccion', '0003_productividad_diaria'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produccion',
+            index=models.Index(fields=['proyecto', 'fecha', 'cantidad_producida'], name='produccion_proyecto_fecha_idx'),
+        ),
+    ]
@@ -12,5 +12,36 @@ class Produccion(models.Model):
     observaciones = models.TextField(blank=True, null=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Agregados y filtros por rango de fechas (ver agregados.py)
+            models.Index(fields=['fecha'], name='produccion_fecha_idx'),
+            # Series diarias por proyecto (ver tendencias.py): el índice cubre la consulta
+            models.Index(fields=['proyecto', 'fecha', 'cantidad_producida'], name='produccion_proyecto_fecha_idx'),
+        ]
+
     def _str_(self):
-        return f"Producción de {self.cantidad_producida} por {self.empleado} en {self.proyecto} el {self.fecha}"
\ No newline at end of file
+        return f"Producción de {self.cantidad_producida} por {self.empleado} en {self.proyecto} el {self.fecha}"
+
+
+class ProductividadDiaria(models.Model):
+    """Producción y horas trabajadas por empleado, proyecto y día, materializadas desde Produccion y JornadaDiaria."""
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='productividad')
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='productividad')
+    fecha = models.DateField()
+    producido = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    horas = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    # producido / horas; vacío si no hay horas registradas ese día
+    rendimiento = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'proyecto', 'fecha'], name='productividad_empleado_proyecto_fecha'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='productividad_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.empleado_id} {self.fecha}: {self.producido} en {self.horas} h"
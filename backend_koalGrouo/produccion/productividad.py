@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+
+from control_acceso.models import JornadaDiaria
+from .models import ProductividadDiaria, Produccion
+
+# Tabla materializada ProductividadDiaria: producción y horas por empleado, proyecto y día.
+# - Las horas salen de JornadaDiaria (el rollup de ControlDeIngreso, ver
+#   control_acceso/jornadas.py), no de los registros crudos.
+# - Cada día se reescribe entero, igual que las jornadas: cuando jornadas.recalcular_dia
+#   envía jornada_recalculada, y en las importaciones masivas de producción. Guardar o
+#   borrar una producción recalcula solo su fila (recalcular). Así el ranking lee una
+#   tabla chica en vez de cruzar las dos tablas en cada consulta.
+
+CENTESIMOS = Decimal('0.01')
+DIEZMILESIMOS = Decimal('0.0001')
+ORDENES = ['mejores', 'peores']
+AGRUPACIONES = {'empleado': 'empleado__nombres', 'proyecto': 'proyecto__nombre'}
+
+
+def rendimiento(producido, horas):
+    return (producido / horas).quantize(DIEZMILESIMOS) if horas else None
+
+
+def recalcular_dia(fecha):
+    # Reescribe la productividad de un día a partir de Produccion y JornadaDiaria
+    totales = {}
+    producido = (
+        Produccion.objects.filter(fecha=fecha)
+        .values('empleado_id', 'proyecto_id')
+        .annotate(total=Sum('cantidad_producida'))
+        .values_list('empleado_id', 'proyecto_id', 'total')
+        .order_by()
+    )
+    for empleado_id, proyecto_id, total in producido:
+        totales[(empleado_id, proyecto_id)] = [Decimal(total), Decimal(0)]
+    horas = JornadaDiaria.objects.filter(fecha=fecha).values_list('empleado_id', 'proyecto_id', 'horas')
+    for empleado_id, proyecto_id, horas_dia in horas:
+        totales.setdefault((empleado_id, proyecto_id), [Decimal(0), Decimal(0)])[1] += horas_dia
+
+    with transaction.atomic():
+        ProductividadDiaria.objects.filter(fecha=fecha).delete()
+        ProductividadDiaria.objects.bulk_create(
+            [
+                ProductividadDiaria(
+                    empleado_id=empleado_id,
+                    proyecto_id=proyecto_id,
+                    fecha=fecha,
+                    producido=total.quantize(CENTESIMOS),
+                    horas=horas_dia,
+                    rendimiento=rendimiento(total, horas_dia),
+                )
+                for (empleado_id, proyecto_id), (total, horas_dia) in totales.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totales)
+
+
+def recalcular(empleado_id, proyecto_id, fecha):
+    # Solo la fila de un empleado en un proyecto y día (al guardar o borrar una producción)
+    clave = {'empleado_id': empleado_id, 'proyecto_id': proyecto_id, 'fecha': fecha}
+    total = Produccion.objects.filter(**clave).aggregate(total=Sum('cantidad_producida'))['total']
+    horas = JornadaDiaria.objects.filter(**clave).aggregate(horas=Sum('horas'))['horas']
+    with transaction.atomic():
+        if total is None and horas is None:
+            ProductividadDiaria.objects.filter(**clave).delete()
+            return
+        total, horas = Decimal(total or 0), Decimal(horas or 0)
+        ProductividadDiaria.objects.update_or_create(
+            **clave,
+            defaults={
+                'producido': total.quantize(CENTESIMOS),
+                'horas': horas,
+                'rendimiento': rendimiento(total, horas),
+            },
+        )
+
+
+def ranking(por='empleado', orden='mejores', desde=None, hasta=None, proyectos=None, limite=10):
+    # Rendimiento (producido / horas) acumulado en el rango, agrupado por empleado o proyecto.
+    # Solo entran los grupos con horas y producción: sin horas no hay rendimiento, y
+    # con producción cero todos empatarían al final del ranking.
+    consulta = ProductividadDiaria.objects.all()
+    if desde:
+        consulta = consulta.filter(fecha__gte=desde)
+    if hasta:
+        consulta = consulta.filter(fecha__lte=hasta)
+    if proyectos:
+        consulta = consulta.filter(proyecto_id__in=proyectos)
+    tasa = ExpressionWrapper(
+        F('total_producido') / F('total_horas'),
+        output_field=DecimalField(max_digits=14, decimal_places=4),
+    )
+    filas = (
+        consulta
+        .values(por, AGRUPACIONES[por])
+        .annotate(total_producido=Sum('producido'), total_horas=Sum('horas'))
+        .filter(Q(total_producido__gt=0) & Q(total_horas__gt=0))
+        .annotate(tasa=tasa)
+        .order_by('-tasa' if orden == 'mejores' else 'tasa', por)
+        .values_list(por, AGRUPACIONES[por], 'total_producido', 'total_horas')
+    )[:limite]
+    resultado = []
+    for posicion, (identificador, nombre, total, horas) in enumerate(filas, start=1):
+        total, horas = Decimal(total), Decimal(horas)
+        resultado.append({
+            'posicion': posicion,
+            por: identificador,
+            f'{por}Nombre': nombre,
+            'producido': str(total.quantize(CENTESIMOS)),
+            'horas': str(horas.quantize(CENTESIMOS)),
+            'rendimiento': str(rendimiento(total, horas)),
+        })
+    return resultado
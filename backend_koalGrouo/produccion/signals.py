@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from control_acceso.jornadas import jornada_recalculada
+from control_acceso.models import JornadaDiaria
+from .models import Produccion
+from . import agregados, productividad, tendencias
+
+
+@receiver(pre_save, sender=Produccion)
+def recordar_fecha_anterior(sender, instance, **kwargs):
+    # Si cambia la fecha, el mes anterior también tiene que dejar de usar la caché,
+    # y si cambia el empleado, el proyecto o la fecha hay que recalcular la fila anterior
+    # de productividad
+    instance._fecha_anterior = None
+    instance._clave_anterior = None
+    if instance.pk is not None:
+        instance._clave_anterior = (
+            sender.objects.filter(pk=instance.pk).values_list('empleado_id', 'proyecto_id', 'fecha').first()
+        )
+        if instance._clave_anterior is not None:
+            instance._fecha_anterior = instance._clave_anterior[2]
+
+
+@receiver(post_save, sender=Produccion)
+def invalidar_agregados(sender, instance, **kwargs):
+    fechas = [instance.fecha, getattr(instance, '_fecha_anterior', None)]
+    anterior = getattr(instance, '_clave_anterior', None)
+    proyectos = [instance.proyecto_id, anterior[1] if anterior else None]
+    transaction.on_commit(lambda: (agregados.invalidar(fechas), tendencias.invalidar(proyectos)))
+
+
+@receiver(post_delete, sender=Produccion)
+def quitar_de_agregados(sender, instance, **kwargs):
+    transaction.on_commit(lambda: (agregados.invalidar([instance.fecha]), tendencias.invalidar([instance.proyecto_id])))
+
+
+@receiver(post_save, sender=Produccion)
+def actualizar_productividad(sender, instance, **kwargs):
+    # Dentro de la misma transacción que la producción
+    clave = (instance.empleado_id, instance.proyecto_id, instance.fecha)
+    anterior = getattr(instance, '_clave_anterior', None)
+    productividad.recalcular(*clave)
+    if anterior is not None and anterior != clave:
+        productividad.recalcular(*anterior)
+
+
+@receiver(post_delete, sender=Produccion)
+def quitar_de_productividad(sender, instance, **kwargs):
+    productividad.recalcular(instance.empleado_id, instance.proyecto_id, instance.fecha)
+
+
+@receiver(jornada_recalculada, sender=JornadaDiaria)
+def actualizar_horas(sender, fecha, **kwargs):
+    productividad.recalcular_dia(fecha)
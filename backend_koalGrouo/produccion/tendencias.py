@@ -0,0 +1,163 @@
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import CharField, FloatField, Max, Sum
+from django.db.models.functions import Cast
+
+from administracion.models import Proyecto
+from .models import Produccion
+from .agregados import versiones
+
+# Tendencias y pronóstico de la producción diaria por proyecto, calculados con NumPy.
+# - La serie diaria completa de cada proyecto (total producido por día, desde su primer
+#   día con producción) se guarda en la caché con una versión por proyecto. Las
+#   escrituras de Produccion (señales, o invalidar() desde las cargas masivas) cambian
+#   la versión de los proyectos tocados. Las series que faltan se leen todas juntas
+#   con una sola consulta agrupada.
+# - Con las series se arma una matriz proyectos x días y todo se calcula por columnas,
+#   sin recorrer proyectos ni días en Python:
+#   media: promedio móvil de `ventana` días.
+#   variacion: total de los últimos 7 días menos el de los 7 anteriores.
+#   pronostico: recta de mínimos cuadrados sobre los últimos BASE días; con
+#   metodo=estacional se le suma el desvío promedio de cada día de la semana.
+
+METODOS = ['lineal', 'estacional']
+BASE = 56  # días usados para el pronóstico; múltiplo de 7 para el perfil semanal
+SEMANA = 7
+VENTANA_MAXIMA = 90
+DIAS_MAXIMO = 180
+RANGO_MAXIMO = 5 * 366
+DURACION = 24 * 3600
+EPOCA = date(1970, 1, 1).toordinal()
+
+
+def _clave_version(proyecto_id):
+    return f'produccion:tendencias:version:{proyecto_id}'
+
+
+def invalidar(proyectos):
+    # Llamar después del commit con los proyectos de las producciones creadas, modificadas o borradas
+    claves = {_clave_version(proyecto_id) for proyecto_id in proyectos if proyecto_id is not None}
+    if claves:
+        cache.set_many(dict.fromkeys(claves, time.time_ns()), None)
+
+
+def _leer_series(proyectos):
+    # {proyecto_id: (primer día como ordinal, totales diarios)} en una sola consulta.
+    # La fecha llega como texto ISO y el total como float: NumPy los convierte de una
+    # vez, sin crear un date y un Decimal por fila. Se pide como Max del grupo (es la
+    # misma fecha) para que el texto no entre al GROUP BY y el índice cubra la consulta.
+    filas = (
+        Produccion.objects.filter(proyecto_id__in=proyectos)
+        .values('proyecto_id', 'fecha')
+        .annotate(dia=Cast(Max('fecha'), CharField()), total=Cast(Sum('cantidad_producida'), FloatField()))
+        .values_list('proyecto_id', 'dia', 'total')
+        .order_by('proyecto_id', 'fecha')
+    )
+    series = {proyecto_id: (0, np.zeros(0)) for proyecto_id in proyectos}
+    filas = list(filas)
+    if not filas:
+        return series
+    ids, fechas, totales = zip(*filas)
+    ids = np.array(ids, dtype=np.int64)
+    dias = np.array(fechas, dtype='datetime64[D]').astype(np.int64) + EPOCA
+    totales = np.array(totales, dtype=np.float64)
+    cortes = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1], True])
+    for inicio, fin in zip(cortes[:-1].tolist(), cortes[1:].tolist()):
+        primero = int(dias[inicio])
+        serie = np.zeros(int(dias[fin - 1]) - primero + 1)
+        serie[dias[inicio:fin] - primero] = totales[inicio:fin]
+        series[int(ids[inicio])] = (primero, serie)
+    return series
+
+
+def series(proyectos):
+    # Series diarias de los proyectos, desde la caché cuando la versión no cambió
+    claves = {
+        proyecto_id: f'produccion:tendencias:{proyecto_id}:{version}'
+        for proyecto_id, version in zip(proyectos, versiones([_clave_version(proyecto_id) for proyecto_id in proyectos]))
+    }
+    guardadas = cache.get_many(list(claves.values()))
+    resultado = {proyecto_id: guardadas[clave] for proyecto_id, clave in claves.items() if clave in guardadas}
+    faltantes = [proyecto_id for proyecto_id in proyectos if proyecto_id not in resultado]
+    if faltantes:
+        leidas = _leer_series(faltantes)
+        cache.set_many({claves[proyecto_id]: serie for proyecto_id, serie in leidas.items()}, DURACION)
+        resultado.update(leidas)
+    return resultado
+
+
+def _matriz(series_proyectos, desde, dias):
+    # Totales diarios de cada proyecto (filas) desde el día ordinal desde (columnas)
+    matriz = np.zeros((len(series_proyectos), dias))
+    for fila, (primero, serie) in enumerate(series_proyectos):
+        inicio = max(primero, desde)
+        fin = min(primero + len(serie), desde + dias)
+        if inicio < fin:
+            matriz[fila, inicio - desde:fin - desde] = serie[inicio - primero:fin - primero]
+    return matriz
+
+
+def _suma_movil(matriz, ventana):
+    # Suma de los últimos `ventana` días que terminan en cada columna desde ventana - 1
+    acumulada = np.cumsum(np.pad(matriz, ((0, 0), (1, 0))), axis=1)
+    return acumulada[:, ventana:] - acumulada[:, :-ventana]
+
+
+def pronosticar(historia, dias, metodo='lineal'):
+    # historia: matriz proyectos x BASE días. Devuelve (pronóstico, pendiente por día)
+    x = np.arange(historia.shape[1]) - (historia.shape[1] - 1) / 2
+    media = historia.mean(axis=1, keepdims=True)
+    pendiente = (historia @ x)[:, None] / (x @ x)
+    futuro = np.arange(historia.shape[1], historia.shape[1] + dias) - (historia.shape[1] - 1) / 2
+    pronostico = media + pendiente * futuro
+    if metodo == 'estacional':
+        residuos = historia - (media + pendiente * x)
+        perfil = residuos.reshape(len(historia), historia.shape[1] // SEMANA, SEMANA).mean(axis=1)
+        pronostico += perfil[:, np.arange(dias) % SEMANA]
+    return np.clip(pronostico, 0, None), pendiente[:, 0]
+
+
+def calcular(proyectos, desde, hasta, ventana=7, dias=14, metodo='lineal'):
+    # proyectos: [(id, nombre)]
+    periodo = (hasta - desde).days + 1
+    margen = max(ventana - 1, 2 * SEMANA - 1, BASE - periodo, 0)
+    inicio = desde.toordinal() - margen
+    guardadas = series([proyecto_id for proyecto_id, _ in proyectos])
+    matriz = _matriz([guardadas[proyecto_id] for proyecto_id, _ in proyectos], inicio, margen + periodo)
+
+    media = _suma_movil(matriz, ventana)[:, -periodo:] / ventana
+    semanal = _suma_movil(matriz, SEMANA)
+    variacion = (semanal[:, SEMANA:] - semanal[:, :-SEMANA])[:, -periodo:]
+    pronostico, pendiente = pronosticar(matriz[:, -BASE:], dias, metodo)
+
+    redondear = lambda arreglo: np.round(arreglo, 2).tolist()
+    totales, media, variacion, pronostico, pendiente = map(
+        redondear, (matriz[:, -periodo:], media, variacion, pronostico, pendiente)
+    )
+    return {
+        'fechas': [(desde + timedelta(days=dia)).isoformat() for dia in range(periodo)],
+        'fechasPronostico': [(hasta + timedelta(days=dia)).isoformat() for dia in range(1, dias + 1)],
+        'proyectos': [
+            {
+                'proyecto': proyecto_id,
+                'proyectoNombre': nombre,
+                'totales': totales[fila],
+                'media': media[fila],
+                'variacion': variacion[fila],
+                'pronostico': pronostico[fila],
+                'pendiente': pendiente[fila],
+            }
+            for fila, (proyecto_id, nombre) in enumerate(proyectos)
+        ],
+    }
+
+
+def consultar(proyectos, desde, hasta, ventana=7, dias=14, metodo='lineal'):
+    # Sin proyectos se incluyen todos
+    consulta = Proyecto.objects.order_by('pk')
+    if proyectos:
+        consulta = consulta.filter(pk__in=proyectos)
+    return calcular(list(consulta.values_list('pk', 'nombre')), desde, hasta, ventana, dias, metodo)
@@ -1,3 +1,313 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory
+
+from administracion.models import Cargo, Empleado, Proyecto
+from control_acceso import jornadas
+from control_acceso.models import ControlDeIngreso
+from . import importacion, tendencias
+from .models import Produccion, ProductividadDiaria
+from .views import ProduccionViewSet, _rango_y_proyectos
+
+# Caché en memoria para no usar (ni borrar) la de desarrollo
+CACHE_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class ConProduccion(TestCase):
+    # Dos proyectos y dos empleados; producir() guarda con las señales y sus on_commit
+
+    def setUp(self):
+        cargo = Cargo.objects.create(nombre_cargo='Minero', nivel_acceso='bajo')
+        self.norte = Proyecto.objects.create(nombre='Norte', fecha_inicio=date(2026, 1, 1))
+        self.sur = Proyecto.objects.create(nombre='Sur', fecha_inicio=date(2026, 1, 1))
+        self.ana = Empleado.objects.create(cargo=cargo, cedula=1001, nombres='Ana', nivel_acceso='bajo')
+        self.luis = Empleado.objects.create(cargo=cargo, cedula=1002, nombres='Luis', nivel_acceso='bajo')
+
+    def producir(self, proyecto, empleado, fecha, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Produccion.objects.create(
+                proyecto=proyecto, empleado=empleado, fecha=fecha, cantidad_producida=Decimal(cantidad),
+            )
+
+    def consultar(self, accion, **parametros):
+        vista = ProduccionViewSet.as_view({'get': accion}, permission_classes=[])
+        respuesta = vista(APIRequestFactory().get('/', parametros))
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return respuesta.data
+
+
+class RangoYProyectosTests(SimpleTestCase):
+
+    def test_fechas_y_proyectos(self):
+        fechas, proyectos = _rango_y_proyectos(QueryDict('desde=2026-01-01&hasta=2026-03-31&proyecto=1,2'))
+        self.assertEqual(fechas, {'desde': date(2026, 1, 1), 'hasta': date(2026, 3, 31)})
+        self.assertEqual(proyectos, [1, 2])
+        self.assertEqual(_rango_y_proyectos(QueryDict()), ({}, []))
+
+    def test_valores_invalidos(self):
+        for consulta, campo in (('desde=2026-1-1', 'desde'), ('hasta=2026-02-30', 'hasta'), ('proyecto=1,a', 'proyecto')):
+            with self.subTest(consulta=consulta), self.assertRaises(ValidationError) as error:
+                _rango_y_proyectos(QueryDict(consulta))
+            self.assertIn(campo, error.exception.detail)
+
+    def test_las_tres_consultas_validan_igual(self):
+        for accion in ('agregados', 'productividad', 'tendencias'):
+            vista = ProduccionViewSet.as_view({'get': accion}, permission_classes=[])
+            with self.subTest(accion=accion):
+                respuesta = vista(APIRequestFactory().get('/', {'desde': '01/02/2026', 'proyecto': 'x'}))
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('desde', respuesta.data)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class AgregadosTests(ConProduccion):
+
+    def setUp(self):
+        super().setUp()
+        self.producir(self.norte, self.ana, date(2026, 1, 5), '10')
+        self.producir(self.norte, self.ana, date(2026, 1, 20), '5.5')
+        self.producir(self.norte, self.luis, date(2026, 2, 2), '7')
+        self.producir(self.sur, self.luis, date(2026, 2, 3), '3')
+
+    def test_totales_por_proyecto_y_mes(self):
+        filas = self.consultar('agregados', agrupar='proyecto', periodo='mes')
+        self.assertEqual(
+            [(fila['proyectoNombre'], fila['periodo'], fila['total'], fila['registros']) for fila in filas],
+            [('Norte', '2026-01-01', '15.50', 2), ('Norte', '2026-02-01', '7.00', 1), ('Sur', '2026-02-01', '3.00', 1)],
+        )
+        filas = self.consultar('agregados', agrupar='empleado', desde='2026-02-01', hasta='2026-02-28')
+        self.assertEqual([(fila['empleadoNombre'], fila['total']) for fila in filas], [('Luis', '10.00')])
+
+    def test_agrupar_vacio_es_el_total_general(self):
+        self.assertEqual(self.consultar('agregados', agrupar=''), [{'total': '25.50', 'registros': 4}])
+        self.assertEqual(
+            self.consultar('agregados', agrupar='', proyecto=str(self.sur.pk), desde='2026-03-01'),
+            [{'total': '0.00', 'registros': 0}],
+        )
+
+    def test_una_escritura_invalida_solo_su_mes(self):
+        enero = {'agrupar': 'proyecto', 'desde': '2026-01-01', 'hasta': '2026-01-31'}
+        febrero = {'agrupar': 'proyecto', 'desde': '2026-02-01', 'hasta': '2026-02-28'}
+        self.assertEqual(self.consultar('agregados', **enero)[0]['total'], '15.50')
+        self.consultar('agregados', **febrero)
+
+        self.producir(self.norte, self.luis, date(2026, 1, 25), '2')
+        with self.assertNumQueries(0):
+            self.consultar('agregados', **febrero)
+        self.assertEqual(self.consultar('agregados', **enero)[0]['total'], '17.50')
+
+        # Mover una producción de mes invalida los dos meses
+        produccion = Produccion.objects.get(fecha=date(2026, 2, 3))
+        produccion.fecha = date(2026, 1, 31)
+        with self.captureOnCommitCallbacks(execute=True):
+            produccion.save()
+        self.assertEqual(
+            [(fila['proyectoNombre'], fila['total']) for fila in self.consultar('agregados', **enero)],
+            [('Norte', '17.50'), ('Sur', '3.00')],
+        )
+        self.assertEqual([fila['proyectoNombre'] for fila in self.consultar('agregados', **febrero)], ['Norte'])
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ImportacionTests(ConProduccion):
+
+    def subir(self, contenido, consulta=''):
+        vista = ProduccionViewSet.as_view({'post': 'importar'}, permission_classes=[])
+        archivo = SimpleUploadedFile('produccion.csv', contenido, content_type='text/csv')
+        return vista(APIRequestFactory().post(f'/{consulta}', {'archivo': archivo}, format='multipart'))
+
+    def planilla(self, *filas):
+        return '\n'.join(['cedula,proyecto,fecha,cantidad', *filas]).encode()
+
+    def test_guarda_las_validas_e_informa_las_invalidas(self):
+        agregados = {'agrupar': '', 'desde': '2026-01-01', 'hasta': '2026-01-31'}
+        self.assertEqual(self.consultar('agregados', **agregados)[0]['total'], '0.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.subir(self.planilla(
+                '1001,norte,05/01/2026,"1.234,5"',
+                '9999,Norte,2026-01-06,1',
+                '1002,Sur,2026-01-07,2.25',
+                '1002,Sur,2026-02-30,2',
+            ))
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        self.assertEqual(respuesta.data['leidas'], 4)
+        self.assertEqual(respuesta.data['insertadas'], 2)
+        self.assertEqual(respuesta.data['confirmado_hasta_fila'], 5)
+        self.assertEqual([error['fila'] for error in respuesta.data['errores']], [3, 5])
+        self.assertEqual(
+            sorted(Produccion.objects.values_list('empleado__cedula', 'proyecto__nombre', 'fecha', 'cantidad_producida')),
+            [(1001, 'Norte', date(2026, 1, 5), Decimal('1234.50')), (1002, 'Sur', date(2026, 1, 7), Decimal('2.25'))],
+        )
+        # bulk_create no dispara señales: la importación invalida los agregados
+        self.assertEqual(self.consultar('agregados', **agregados)[0]['total'], '1236.75')
+
+    def test_bloques_confirmados_antes_de_un_error_de_lectura(self):
+        filas = [f'1001,Norte,2026-01-{dia % 28 + 1:02},{dia}' for dia in range(400)]
+        # Bytes que no son UTF-8 después del primer tramo que lee el decodificador
+        contenido = self.planilla(*filas) + b'\n1001,Norte,2026-01-01,\xff\xfe\n'
+        with mock.patch.object(importacion, 'BLOQUE', 100):
+            respuesta = self.subir(contenido)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('archivo', respuesta.data)
+        insertadas = respuesta.data['insertadas']
+        self.assertTrue(0 < insertadas < 400 and insertadas % 100 == 0, insertadas)
+        self.assertEqual(Produccion.objects.count(), insertadas)
+        # Fila 1: encabezado; todas las filas hasta la confirmada son válidas
+        self.assertEqual(respuesta.data['confirmado_hasta_fila'], insertadas + 1)
+
+    def test_todos_los_errores_en_csv(self):
+        contenido = self.planilla('1001,Norte,2026-01-05,1', *(f'{cedula},Norte,2026-01-05,1' for cedula in range(1, 6)))
+        with mock.patch.object(importacion, 'MAXIMO_ERRORES', 2):
+            informe = self.subir(contenido, '?simular=1').data
+            respuesta = self.subir(contenido, '?errores=csv')
+        self.assertEqual((informe['rechazadas'], len(informe['errores']), informe['errores_omitidos']), (5, 2, 3))
+
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta['X-Importacion-Rechazadas'], '5')
+        self.assertEqual(respuesta['X-Importacion-Confirmado-Hasta-Fila'], '7')
+        lineas = list(csv.reader(io.StringIO(b''.join(respuesta.streaming_content).decode())))
+        self.assertEqual(lineas[0], ['fila', 'error'])
+        self.assertEqual([linea[0] for linea in lineas[1:]], ['3', '4', '5', '6', '7'])
+        self.assertEqual(Produccion.objects.count(), 1)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ProductividadTests(ConProduccion):
+    dia = date(2026, 1, 5)
+
+    def turno(self, empleado, proyecto, entrada, salida):
+        registro = ControlDeIngreso.objects.create(
+            cedula=empleado, proyecto=proyecto, fecha=self.dia, hora_entrada=entrada, hora_salida=salida,
+            lugar_trabajo='Mina Norte',
+        )
+        jornadas.recalcular_dia(self.dia)
+        return registro
+
+    def fila(self, empleado, proyecto):
+        return ProductividadDiaria.objects.filter(empleado=empleado, proyecto=proyecto, fecha=self.dia).values_list(
+            'producido', 'horas', 'rendimiento',
+        ).first()
+
+    def test_se_actualiza_con_cada_produccion_y_jornada(self):
+        registro = self.turno(self.ana, self.norte, time(8, 0), time(16, 0))
+        self.assertEqual(self.fila(self.ana, self.norte), (Decimal('0.00'), Decimal('8.00'), Decimal('0.0000')))
+
+        produccion = self.producir(self.norte, self.ana, self.dia, '80')
+        self.assertEqual(self.fila(self.ana, self.norte), (Decimal('80.00'), Decimal('8.00'), Decimal('10.0000')))
+
+        # La jornada cambia: las horas se recalculan desde JornadaDiaria
+        registro.hora_salida = time(12, 0)
+        registro.save()
+        jornadas.recalcular_dia(self.dia)
+        self.assertEqual(self.fila(self.ana, self.norte), (Decimal('80.00'), Decimal('4.00'), Decimal('20.0000')))
+
+        # La producción pasa a otro proyecto: la fila anterior queda solo con las horas
+        # y la nueva sin horas no tiene rendimiento
+        produccion.proyecto = self.sur
+        with self.captureOnCommitCallbacks(execute=True):
+            produccion.save()
+        self.assertEqual(self.fila(self.ana, self.norte), (Decimal('0.00'), Decimal('4.00'), Decimal('0.0000')))
+        self.assertEqual(self.fila(self.ana, self.sur), (Decimal('80.00'), Decimal('0.00'), None))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            produccion.delete()
+        self.assertIsNone(self.fila(self.ana, self.sur))
+
+    def test_ranking_por_rendimiento(self):
+        self.turno(self.ana, self.norte, time(8, 0), time(16, 0))
+        self.turno(self.luis, self.norte, time(8, 0), time(12, 0))
+        self.turno(self.luis, self.sur, time(13, 0), time(17, 0))
+        self.producir(self.norte, self.ana, self.dia, '40')
+        self.producir(self.norte, self.luis, self.dia, '30')
+        # Horas en Sur sin producción: bajan el rendimiento de Luis (30 / 8 h)
+        self.producir(self.sur, self.ana, self.dia, '0')
+
+        mejores = self.consultar('productividad', por='empleado')
+        self.assertEqual(
+            [(fila['posicion'], fila['empleadoNombre'], fila['rendimiento']) for fila in mejores],
+            [(1, 'Ana', '5.0000'), (2, 'Luis', '3.7500')],
+        )
+        peores = self.consultar('productividad', por='empleado', orden='peores', limite=1)
+        self.assertEqual([fila['empleadoNombre'] for fila in peores], ['Luis'])
+
+        # Sur tiene horas pero no producción: no entra al ranking
+        proyectos = self.consultar('productividad', por='proyecto')
+        self.assertEqual(
+            [(fila['proyectoNombre'], fila['producido'], fila['horas'], fila['rendimiento']) for fila in proyectos],
+            [('Norte', '70.00', '12.00', '5.8333')],
+        )
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class TendenciasTests(ConProduccion):
+    inicio = date(2026, 1, 1)
+
+    def serie(self, valores, proyecto=None):
+        # Un total por día desde inicio (None: sin producción ese día)
+        for dia, valor in enumerate(valores):
+            if valor is not None:
+                self.producir(proyecto or self.norte, self.ana, self.inicio + timedelta(days=dia), str(valor))
+
+    def consultar_norte(self, desde, hasta, **parametros):
+        datos = self.consultar(
+            'tendencias', proyecto=str(self.norte.pk), desde=desde.isoformat(), hasta=hasta.isoformat(), **parametros,
+        )
+        (norte,) = datos['proyectos']
+        return datos, norte
+
+    def test_media_movil_y_variacion_semanal(self):
+        valores = [(dia * 7) % 11 if dia % 5 else None for dia in range(40)]
+        self.serie(valores)
+        diarios = [valor or 0 for valor in valores]
+        desde, hasta = self.inicio + timedelta(days=20), self.inicio + timedelta(days=34)
+
+        datos, norte = self.consultar_norte(desde, hasta, ventana=3)
+        self.assertEqual(datos['fechas'][0], '2026-01-21')
+        self.assertEqual(len(datos['fechas']), 15)
+        self.assertEqual(norte['totales'], [float(valor) for valor in diarios[20:35]])
+        # Los primeros días usan la producción anterior a desde
+        self.assertEqual(norte['media'], [round(sum(diarios[dia - 2:dia + 1]) / 3, 2) for dia in range(20, 35)])
+        self.assertEqual(
+            norte['variacion'], [float(sum(diarios[dia - 6:dia + 1]) - sum(diarios[dia - 13:dia - 6])) for dia in range(20, 35)],
+        )
+
+    def test_pronostico_lineal_sigue_la_recta(self):
+        self.serie([5 + 2 * dia for dia in range(tendencias.BASE)])
+        hasta = self.inicio + timedelta(days=tendencias.BASE - 1)
+        datos, norte = self.consultar_norte(hasta - timedelta(days=6), hasta, dias=3)
+        self.assertEqual(norte['pendiente'], 2.0)
+        self.assertEqual(norte['pronostico'], [5.0 + 2 * dia for dia in range(tendencias.BASE, tendencias.BASE + 3)])
+        self.assertEqual(datos['fechasPronostico'][0], (hasta + timedelta(days=1)).isoformat())
+
+    def test_pronostico_estacional_repite_la_semana(self):
+        # Desvío de cada día de la semana con promedio cero y sin tendencia dentro de la
+        # semana, así la recta de mínimos cuadrados es la misma que sin desvíos
+        semana = np.array([2.0, -1.0, -1.0, 0.0, -1.0, -1.0, 2.0])
+        dias = np.arange(tendencias.BASE)
+        historia = (10 + 0.5 * dias + semana[dias % 7])[None, :]
+
+        pronostico, pendiente = tendencias.pronosticar(historia, 10, 'estacional')
+        futuro = np.arange(tendencias.BASE, tendencias.BASE + 10)
+        np.testing.assert_allclose(pendiente, [0.5])
+        np.testing.assert_allclose(pronostico[0], 10 + 0.5 * futuro + semana[futuro % 7])
+        # Lineal: solo la recta; nunca negativo
+        lineal, _ = tendencias.pronosticar(historia, 10)
+        np.testing.assert_allclose(lineal[0], 10 + 0.5 * futuro)
+        bajando, _ = tendencias.pronosticar(np.linspace(50, 0, tendencias.BASE)[None, :], 10)
+        self.assertTrue((bajando >= 0).all() and bajando[0, -1] == 0)
+
+    def test_una_produccion_nueva_actualiza_la_serie(self):
+        self.serie([1, 2, 3])
+        hasta = self.inicio + timedelta(days=2)
+        self.assertEqual(self.consultar_norte(self.inicio, hasta)[1]['totales'], [1.0, 2.0, 3.0])
+        self.producir(self.norte, self.luis, self.inicio + timedelta(days=1), '4')
+        self.assertEqual(self.consultar_norte(self.inicio, hasta)[1]['totales'], [1.0, 6.0, 3.0])
@@ -1,12 +1,161 @@
-from rest_framework import viewsets
+import csv
+import tempfile
+from datetime import timedelta
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from .models import Produccion
 from .serializers import ProduccionSerializer
+from . import agregados, importacion, productividad, tendencias
+from administracion.expansion import ConsultaExpandibleMixin
+from administracion.exportacion import ExportableMixin
 from administracion.permisos import EsSupervisor,EsAdministrador
 
-class ProduccionViewSet(viewsets.ModelViewSet):
+class ProduccionViewSet(ExportableMixin, ConsultaExpandibleMixin, viewsets.ModelViewSet):
     
     #Api endpoint para gestionar la producción de empleados en proyectos
     
     queryset = Produccion.objects.all()
     serializer_class = ProduccionSerializer
-    permission_classes = [EsSupervisor,EsAdministrador]
\ No newline at end of file
+    permission_classes = [EsSupervisor,EsAdministrador]
+    columnas_exportacion = {'empleadoNombre': 'empleado__nombres', 'proyectoNombre': 'proyecto__nombre'}
+
+    @action(detail=False, methods=['get'])
+    # Total producido agrupado en la base de datos (ver agregados.py):
+    # ?agrupar=proyecto,empleado&periodo=semana&desde=2026-01-01&hasta=2026-03-31&proyecto=1,2
+    # periodo: dia, semana (ISO, desde el lunes) o mes; sin periodo se suma todo el rango.
+    # Sin agrupar se agrupa por proyecto; con ?agrupar= vacío no se agrupa (total general).
+
+    def agregados(self, request):
+        parametros = request.query_params
+        agrupar = [campo for campo in parametros.get('agrupar', 'proyecto').split(',') if campo]
+        invalidos = [campo for campo in agrupar if campo not in agregados.AGRUPACIONES]
+        if invalidos:
+            raise ValidationError({'agrupar': f'Campos no permitidos: {", ".join(invalidos)}. Use {", ".join(agregados.AGRUPACIONES)}.'})
+        periodo = parametros.get('periodo') or None
+        if periodo is not None and periodo not in agregados.PERIODOS:
+            raise ValidationError({'periodo': f'Use {", ".join(agregados.PERIODOS)}.'})
+        fechas, proyectos = _rango_y_proyectos(parametros)
+        return Response(agregados.consultar(agrupar, periodo, proyectos=proyectos, **fechas))
+
+    @action(detail=False, methods=['get'])
+    # Ranking de rendimiento (producido por hora trabajada) desde ProductividadDiaria:
+    # ?por=empleado|proyecto&orden=mejores|peores&desde=2026-01-01&hasta=2026-03-31&proyecto=1,2&limite=10
+
+    def productividad(self, request):
+        parametros = request.query_params
+        por = parametros.get('por', 'empleado')
+        if por not in productividad.AGRUPACIONES:
+            raise ValidationError({'por': f'Use {", ".join(productividad.AGRUPACIONES)}.'})
+        orden = parametros.get('orden', 'mejores')
+        if orden not in productividad.ORDENES:
+            raise ValidationError({'orden': f'Use {", ".join(productividad.ORDENES)}.'})
+        fechas, proyectos = _rango_y_proyectos(parametros)
+        try:
+            limite = int(parametros.get('limite', 10))
+        except ValueError:
+            limite = 0
+        if not 1 <= limite <= 100:
+            raise ValidationError({'limite': 'Use un número entre 1 y 100.'})
+        return Response(productividad.ranking(por, orden, proyectos=proyectos, limite=limite, **fechas))
+
+    @action(detail=False, methods=['get'])
+    # Serie diaria por proyecto con promedio móvil, variación semanal y pronóstico (ver tendencias.py):
+    # ?proyecto=1,2&desde=2026-01-01&hasta=2026-03-31&ventana=7&dias=14&metodo=lineal|estacional
+    # Sin rango se devuelven los últimos 90 días.
+
+    def tendencias(self, request):
+        parametros = request.query_params
+        fechas, proyectos = _rango_y_proyectos(parametros)
+        fechas.setdefault('hasta', timezone.localdate())
+        fechas.setdefault('desde', fechas['hasta'] - timedelta(days=89))
+        if fechas['desde'] > fechas['hasta']:
+            raise ValidationError({'desde': 'Debe ser anterior o igual a hasta.'})
+        if (fechas['hasta'] - fechas['desde']).days >= tendencias.RANGO_MAXIMO:
+            raise ValidationError({'desde': f'El rango no puede superar {tendencias.RANGO_MAXIMO} días.'})
+        enteros = {}
+        for campo, defecto, maximo in (('ventana', 7, tendencias.VENTANA_MAXIMA), ('dias', 14, tendencias.DIAS_MAXIMO)):
+            try:
+                enteros[campo] = int(parametros.get(campo, defecto))
+            except ValueError:
+                enteros[campo] = 0
+            if not 1 <= enteros[campo] <= maximo:
+                raise ValidationError({campo: f'Use un número entre 1 y {maximo}.'})
+        metodo = parametros.get('metodo', 'lineal')
+        if metodo not in tendencias.METODOS:
+            raise ValidationError({'metodo': f'Use {", ".join(tendencias.METODOS)}.'})
+        return Response(tendencias.consultar(proyectos, metodo=metodo, **fechas, **enteros))
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    # Carga masiva desde una planilla (ver importacion.py): multipart con el campo
+    # archivo (.csv o .xlsx, o ?formato=csv|xlsx). Con ?simular=1 solo se valida.
+    # Las filas inválidas se informan y el resto se guarda. El informe JSON trae el
+    # detalle de los primeros errores; con ?errores=csv la respuesta es un CSV con
+    # todas las filas rechazadas y el resumen va en los encabezados X-Importacion-*.
+
+    def importar(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            raise ValidationError({'archivo': 'Envíe la planilla en el campo archivo.'})
+        formato = request.query_params.get('formato') or archivo.name.rsplit('.', 1)[-1].lower()
+        if formato not in ('csv', 'xlsx'):
+            raise ValidationError({'formato': 'Use csv o xlsx.'})
+        simular = request.query_params.get('simular') in ('1', 'true')
+        errores_csv = request.query_params.get('errores') == 'csv'
+
+        # Las filas rechazadas van a un archivo temporal, no a memoria
+        salida = tempfile.TemporaryFile('w+', encoding='utf-8', newline='') if errores_csv else None
+        escritor = csv.writer(salida) if salida else None
+        if escritor:
+            escritor.writerow(['fila', 'error'])
+        filas = importacion.filas_csv(archivo) if formato == 'csv' else importacion.filas_xlsx(archivo)
+        try:
+            resultado = importacion.Importacion().importar(
+                filas,
+                errores=(lambda numero, error: escritor.writerow([numero, error])) if escritor else None,
+                simular=simular,
+            )
+        except importacion.ImportacionInterrumpida as error:
+            if salida:
+                salida.close()
+            # Los bloques anteriores al error quedaron guardados: se informa hasta dónde
+            return Response({'archivo': [str(error)], **error.informe}, status=status.HTTP_400_BAD_REQUEST)
+
+        if simular:
+            codigo = status.HTTP_200_OK
+        else:
+            codigo = status.HTTP_201_CREATED if resultado['insertadas'] else status.HTTP_400_BAD_REQUEST
+        if not salida:
+            return Response(resultado, status=codigo)
+        salida.seek(0)
+        respuesta = StreamingHttpResponse(salida, status=codigo, content_type='text/csv; charset=utf-8')
+        respuesta['Content-Disposition'] = 'attachment; filename="errores_importacion.csv"'
+        for campo in ('leidas', 'insertadas', 'rechazadas', 'confirmado_hasta_fila'):
+            respuesta[f'X-Importacion-{campo.replace("_", "-").title()}'] = '' if resultado[campo] is None else str(resultado[campo])
+        return respuesta
+
+
+def _rango_y_proyectos(parametros):
+    # ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&proyecto=1,2 comunes a las consultas de
+    # producción. Devuelve ({'desde': fecha, 'hasta': fecha} con las que vinieron,
+    # [ids de proyecto]).
+    fechas = {}
+    for campo in ('desde', 'hasta'):
+        if parametros.get(campo):
+            try:
+                fechas[campo] = parse_date(parametros[campo]) if len(parametros[campo]) == 10 else None
+            except ValueError:
+                fechas[campo] = None
+            if fechas[campo] is None:
+                raise ValidationError({campo: 'Fecha inválida, use AAAA-MM-DD.'})
+    try:
+        proyectos = [int(proyecto) for proyecto in parametros.get('proyecto', '').split(',') if proyecto]
+    except ValueError:
+        raise ValidationError({'proyecto': 'Use ids de proyecto separados por coma.'})
+    return fechas, proyectos